@@ -0,0 +1,217 @@
+"""
+ชั้น async สำหรับ db_operations ของบอท Discord Shop
+ทุกฟังก์ชันในไฟล์นี้มีชื่อเดียวกับใน db_operations แต่เป็นแบบ awaitable
+งานที่บล็อก (pymongo, open()/json.load) จะถูกส่งไปทำใน thread pool เฉพาะที่จำกัดขนาด
+เพื่อไม่ให้ event loop ของ discord.py ค้างเมื่อ MongoDB หรือดิสก์ตอบช้า
+"""
+import asyncio
+import functools
+import inspect
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import db_operations
+
+# จำนวน thread สำหรับงาน I/O และจำนวนงานที่รอคิวได้สูงสุด ปรับได้ผ่าน environment variable
+MAX_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "4"))
+MAX_QUEUE = int(os.getenv("DB_EXECUTOR_QUEUE", "64"))
+
+
+class BlockingExecutor:
+    """thread pool สำหรับงานที่บล็อก พร้อมสถิติความยาวคิวและเวลารอ
+
+    จำนวนงานที่ส่งเข้าไปพร้อมกันถูกจำกัดที่ max_workers + max_queue
+    งานที่เกินจะรอใน event loop (ไม่กิน thread) จนกว่าจะมีที่ว่าง
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, max_queue=MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="db-io")
+        self._lock = threading.Lock()
+        self._slots = None
+        self.submitted = 0       # จำนวนงานทั้งหมดที่ส่งเข้า pool
+        self.completed = 0       # จำนวนงานที่ทำเสร็จ (รวมที่ผิดพลาด)
+        self.failed = 0          # จำนวนงานที่เกิด exception
+        self.queued = 0          # จำนวนงานที่รอ thread อยู่ตอนนี้
+        self.running = 0         # จำนวนงานที่กำลังทำอยู่ตอนนี้
+        self.max_queue_depth = 0
+        self.wait_total = 0.0    # เวลารอคิวรวม (วินาที)
+        self.wait_max = 0.0
+        self.run_total = 0.0     # เวลาทำงานรวม (วินาที)
+        self.run_max = 0.0
+
+    def _get_slots(self):
+        # สร้าง semaphore เมื่อถูกเรียกครั้งแรกภายใน event loop
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_queue)
+        return self._slots
+
+    def _job(self, func, args, kwargs, submitted_at):
+        """ทำงานใน thread ของ pool พร้อมเก็บเวลารอและเวลาทำงาน"""
+        started_at = time.perf_counter()
+        waited = started_at - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+        ok = False
+        try:
+            result = func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed = time.perf_counter() - started_at
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                if not ok:
+                    self.failed += 1
+                self.run_total += elapsed
+                self.run_max = max(self.run_max, elapsed)
+
+    async def run(self, func, *args, **kwargs):
+        """เรียกฟังก์ชันที่บล็อกใน thread pool แล้วรอผลลัพธ์
+
+        Args:
+            func (callable): ฟังก์ชันปกติ (ไม่ใช่ coroutine)
+
+        Returns:
+            ค่าที่ func คืนกลับมา (exception จะถูกส่งต่อให้ผู้เรียก)
+        """
+        async with self._get_slots():
+            loop = asyncio.get_running_loop()
+            with self._lock:
+                self.submitted += 1
+                self.queued += 1
+                self.max_queue_depth = max(self.max_queue_depth, self.queued)
+            return await loop.run_in_executor(
+                self._executor, self._job, func, args, kwargs, time.perf_counter()
+            )
+
+    def stats(self):
+        """สถิติของ thread pool"""
+        with self._lock:
+            completed = self.completed or 1
+            return {
+                "workers": self.max_workers,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "queued": self.queued,
+                "running": self.running,
+                "max_queue_depth": self.max_queue_depth,
+                "avg_wait_ms": self.wait_total / completed * 1000,
+                "max_wait_ms": self.wait_max * 1000,
+                "avg_run_ms": self.run_total / completed * 1000,
+                "max_run_ms": self.run_max * 1000
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+# thread pool ที่ใช้ร่วมกันทั้งโปรเซส
+db_executor = BlockingExecutor()
+
+
+async def run_blocking(func, *args, **kwargs):
+    """เรียกฟังก์ชันที่บล็อก (อ่าน/เขียนไฟล์, pymongo) ผ่าน thread pool กลาง"""
+    return await db_executor.run(func, *args, **kwargs)
+
+
+def _run_coroutine(func, args, kwargs):
+    """รัน coroutine ของ db_operations ให้จบภายใน thread ของ pool"""
+    return asyncio.run(func(*args, **kwargs))
+
+
+def _offload(func, native=None):
+    """สร้างเวอร์ชัน awaitable ของฟังก์ชันใน db_operations
+
+    ถ้ามี driver แบบ async (AsyncMongoClient) จะเรียกฟังก์ชัน async ของ db_operations
+    บน event loop โดยตรง (หรือ native ที่ระบุสำหรับฟังก์ชันแบบปกติ)
+    ถ้าไม่มี ฟังก์ชัน async เดิมจะเรียก pymongo แบบบล็อกอยู่ข้างใน
+    จึงต้องรันทั้ง coroutine ใน thread ของ pool เช่นกัน
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if db_operations.ASYNC_MONGODB_AVAILABLE:
+                return await func(*args, **kwargs)
+            return await db_executor.run(_run_coroutine, func, args, kwargs)
+    else:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if native is not None and db_operations.ASYNC_MONGODB_AVAILABLE:
+                return await native(*args, **kwargs)
+            return await db_executor.run(func, *args, **kwargs)
+    return wrapper
+
+
+# ================================
+# ข้อมูลประเทศ
+# ================================
+load_countries = _offload(db_operations.load_countries)
+load_countries_tuple = _offload(db_operations.load_countries_tuple)
+save_countries = _offload(db_operations.save_countries)
+save_countries_to_mongodb = _offload(db_operations.save_countries_to_mongodb)
+add_country = _offload(db_operations.add_country)
+edit_country = _offload(db_operations.edit_country)
+remove_country = _offload(db_operations.remove_country)
+
+# ================================
+# ข้อมูลสินค้า
+# ================================
+load_products = _offload(db_operations.load_products, db_operations.load_products_async)
+load_products_async = _offload(db_operations.load_products_async)
+load_products_since = _offload(db_operations.load_products_since, db_operations.load_products_since_async)
+load_product_keys = _offload(db_operations.load_product_keys, db_operations.load_product_keys_async)
+save_product = _offload(db_operations.save_product)
+batch_add_products = _offload(db_operations.batch_add_products)
+remove_product = _offload(db_operations.remove_product)
+update_product = _offload(db_operations.update_product)
+clear_category_products = _offload(db_operations.clear_category_products)
+delete_all_products = _offload(db_operations.delete_all_products)
+add_no_product_placeholders = _offload(db_operations.add_no_product_placeholders)
+save_products_to_mongodb = _offload(db_operations.save_products_to_mongodb)
+
+# ================================
+# ประวัติการซื้อ
+# ================================
+log_purchase = _offload(db_operations.log_purchase)
+get_purchase_history = _offload(db_operations.get_purchase_history)
+
+# ================================
+# การตั้งค่า
+# ================================
+load_qrcode_url = _offload(db_operations.load_qrcode_url)
+load_qrcode_url_async = _offload(db_operations.load_qrcode_url_async)
+save_qrcode_url = _offload(db_operations.save_qrcode_url)
+save_qrcode_to_mongodb = _offload(db_operations.save_qrcode_to_mongodb)
+load_thank_you_message = _offload(db_operations.load_thank_you_message, db_operations.load_thank_you_message_async)
+load_thank_you_message_async = _offload(db_operations.load_thank_you_message_async)
+save_thank_you_message = _offload(db_operations.save_thank_you_message)
+save_thank_you_message_to_mongodb = _offload(db_operations.save_thank_you_message_to_mongodb)
+load_categories = _offload(db_operations.load_categories)
+save_categories_to_mongodb = _offload(db_operations.save_categories_to_mongodb)
+load_configs_since = _offload(db_operations.load_configs_since, db_operations.load_configs_since_async)
+load_target_channel_id = _offload(db_operations.load_target_channel_id, db_operations.load_target_channel_id_async)
+load_target_channel_id_async = _offload(db_operations.load_target_channel_id_async)
+save_target_channel_id = _offload(db_operations.save_target_channel_id, db_operations.save_target_channel_id_to_mongodb)
+save_target_channel_id_to_mongodb = _offload(db_operations.save_target_channel_id_to_mongodb)
+
+# ================================
+# สถานะชื่อช่อง
+# ================================
+load_channel_state = _offload(db_operations.load_channel_state, db_operations.load_channel_state_async)
+load_channel_state_async = _offload(db_operations.load_channel_state_async)
+save_channel_state = _offload(db_operations.save_channel_state, db_operations.save_channel_state_async)
+save_channel_state_async = _offload(db_operations.save_channel_state_async)
+get_next_channel_number = _offload(db_operations.get_next_channel_number)
+update_pending_number = _offload(db_operations.update_pending_number)
+increment_channel_state = _offload(db_operations.increment_channel_state, db_operations.increment_channel_state_async)
+advance_channel_state = _offload(db_operations.advance_channel_state, db_operations.advance_channel_state_async)
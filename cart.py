@@ -0,0 +1,226 @@
+"""
+ตะกร้าสินค้าสำหรับหน้าร้าน CategoryShopView
+เก็บเฉพาะรายการที่มีจำนวนมากกว่า 0 พร้อมยอดรวมที่อัปเดตทีละรายการ
+ทำให้การเปลี่ยนจำนวนสินค้าหรือเปลี่ยนหน้าใช้เวลาตามจำนวนรายการในตะกร้า ไม่ใช่ตามขนาดแคตตาล็อก
+ตะกร้าถูกเก็บใน cart_store แยกตามผู้ใช้ (guild, user) แทนการเก็บไว้ใน view (view ของหน้าร้านสร้างใหม่จาก custom_id ทุกครั้งที่กด)
+cart_store จำกัดจำนวนตะกร้า (LRU) และลบตะกร้าที่ไม่ถูกใช้นานเกิน CART_TTL_SECONDS
+"""
+import os
+import sys
+import time
+from collections import OrderedDict
+
+# ตะกร้าที่ไม่ถูกใช้เกินเวลานี้ (วินาที) จะหมดอายุ และจำนวนตะกร้าสูงสุดที่เก็บพร้อมกัน
+CART_TTL = float(os.getenv("CART_TTL_SECONDS", "3600"))
+CART_MAX = int(os.getenv("CART_MAX", "5000"))
+
+# ขนาดโดยประมาณของแต่ละรายการในตะกร้า (list [สินค้า, จำนวน] + คีย์ใน dict)
+_LINE_BYTES = sys.getsizeof([None, 0]) + 2 * sys.getsizeof(0)
+
+
+def _to_quantity(qty):
+    """แปลงจำนวนสินค้าเป็น int (ค่าที่ไม่ถูกต้องถือเป็น 0)"""
+    try:
+        if isinstance(qty, str) and qty.isdigit():
+            return int(qty)
+        if isinstance(qty, int):
+            return qty
+    except (ValueError, TypeError):
+        pass
+    return 0
+
+
+class Cart:
+    """ตะกร้าสินค้าแบบ incremental
+
+    แต่ละรายการเก็บเป็น product_id -> [สินค้า, จำนวน] ตามลำดับที่เลือก
+    ยอดรวม (total) ถูกปรับตามส่วนต่างทุกครั้งที่เปลี่ยนจำนวน ไม่ต้องคำนวณใหม่ทั้งตะกร้า
+    """
+
+    def __init__(self):
+        self._lines = {}
+        self.total = 0
+
+    def set_quantity(self, product, qty):
+        """กำหนดจำนวนสินค้าในตะกร้า (จำนวน 0 หรือน้อยกว่าจะลบรายการออก)
+
+        Args:
+            product (Mapping): สินค้าที่มี id, name, price, emoji, country
+            qty (int): จำนวนที่ต้องการ
+        """
+        product_id = product["id"]
+        qty = _to_quantity(qty)
+
+        line = self._lines.get(product_id)
+        if line is not None:
+            self.total -= line[0]["price"] * line[1]
+
+        if qty > 0:
+            self._lines[product_id] = [product, qty]
+            self.total += product["price"] * qty
+        else:
+            self._lines.pop(product_id, None)
+
+        if not self._lines:
+            self.total = 0
+
+    def get(self, product_id, default=0):
+        """จำนวนสินค้าที่เลือกไว้ของรหัสสินค้านี้"""
+        line = self._lines.get(product_id)
+        return line[1] if line is not None else default
+
+    @property
+    def quantities(self):
+        """จำนวนสินค้าที่เลือกไว้ในรูปแบบ dict (สำเนา)"""
+        return {product_id: line[1] for product_id, line in self._lines.items()}
+
+    def clear(self):
+        """ล้างตะกร้า"""
+        self._lines.clear()
+        self.total = 0
+
+    def sync(self, catalog):
+        """ปรับตะกร้าให้ตรงกับ snapshot ของแคตตาล็อกเวอร์ชันใหม่
+
+        รายการที่ไม่มีในแคตตาล็อกแล้วจะถูกลบออก รายการที่ราคาเปลี่ยนจะใช้ข้อมูลใหม่
+        """
+        for product_id in list(self._lines):
+            product = catalog.get(product_id)
+            if product is None:
+                self.set_quantity(self._lines[product_id][0], 0)
+            elif product is not self._lines[product_id][0]:
+                self.set_quantity(product, self._lines[product_id][1])
+
+    def lines(self):
+        """รายการในตะกร้า (สินค้า, จำนวน) ตามลำดับที่เลือก"""
+        return [(line[0], line[1]) for line in self._lines.values()]
+
+    def render_lines(self, country_names):
+        """สร้างข้อความแต่ละบรรทัดของรายการที่เลือก"""
+        rendered = []
+        for product, qty in self._lines.values():
+            item_total = product["price"] * qty
+            country_name = country_names.get(product.get("country", ""), "")
+            if country_name:
+                rendered.append(f"{product['emoji']} {product['name']} ({country_name}) - {product['price']:.2f}฿ x {qty} = {item_total:.2f}฿")
+            else:
+                rendered.append(f"{product['emoji']} {product['name']} - {product['price']:.2f}฿ x {qty} = {item_total:.2f}฿")
+        return rendered
+
+    def render_summary(self, country_names):
+        """สร้างบล็อก "📝 รายการที่เลือก" สำหรับต่อท้ายข้อความ (คืนค่าว่างถ้าตะกร้าว่าง)"""
+        if not self._lines:
+            return ""
+        return "\n\n📝 รายการที่เลือก:\n" + "\n".join(self.render_lines(country_names)) + f"\n\n💵 ยอดรวม: {self.total:.2f}฿"
+
+    def to_items(self, country_names):
+        """รายการสินค้าสำหรับบันทึกประวัติการสั่งซื้อ"""
+        items = []
+        for product, qty in self._lines.values():
+            country_code = product.get("country", "")
+            items.append({
+                "name": product["name"],
+                "qty": qty,
+                "price": product["price"],
+                "country": country_names.get(country_code, "") or country_code,
+                "category": product.get("category", "")
+            })
+        return items
+
+    def country_names(self, country_names):
+        """ชื่อประเทศของสินค้าที่อยู่ในตะกร้า (ไม่ซ้ำ)"""
+        names = []
+        for product, _ in self._lines.values():
+            name = country_names.get(product.get("country", ""), "")
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    def __contains__(self, product_id):
+        return product_id in self._lines
+
+    def __len__(self):
+        return len(self._lines)
+
+
+class CartStore:
+    """ที่เก็บตะกร้าของลูกค้าแต่ละคน (คีย์คือ (guild id, user id)) แบบจำกัดขนาด
+
+    เก็บเฉพาะตะกร้าที่มีสินค้าอย่างน้อยหนึ่งรายการ ตะกร้าที่ไม่ถูกใช้เกิน ttl วินาทีจะหมดอายุ
+    และถ้าจำนวนตะกร้าเกิน max_carts จะลบตะกร้าที่ไม่ได้ใช้นานที่สุด (LRU) ออก
+    """
+
+    def __init__(self, ttl=CART_TTL, max_carts=CART_MAX):
+        self.ttl = ttl
+        self.max_carts = max_carts
+        self._carts = OrderedDict()   # คีย์ -> (ตะกร้า, เวลาที่ใช้ล่าสุด) เรียงจากใช้นานที่สุด
+        self.expired = 0              # จำนวนตะกร้าที่หมดอายุ
+        self.evicted = 0              # จำนวนตะกร้าที่ถูกลบเพราะเกิน max_carts
+
+    def _expire(self, now):
+        while self._carts:
+            key, (_, used_at) = next(iter(self._carts.items()))
+            if now - used_at < self.ttl:
+                break
+            del self._carts[key]
+            self.expired += 1
+
+    def get(self, key):
+        """ตะกร้าของคีย์นี้ (ถ้ายังไม่มีจะได้ตะกร้าว่างที่ยังไม่ถูกเก็บ ต้องเรียก save หลังเพิ่มสินค้า)"""
+        now = time.monotonic()
+        self._expire(now)
+        entry = self._carts.get(key)
+        if entry is None:
+            return Cart()
+        self._carts[key] = (entry[0], now)
+        self._carts.move_to_end(key)
+        return entry[0]
+
+    def save(self, key, cart):
+        """เก็บตะกร้าหลังแก้ไข (ตะกร้าว่างจะถูกลบออก)"""
+        if not len(cart):
+            self.discard(key)
+            return
+        now = time.monotonic()
+        self._carts[key] = (cart, now)
+        self._carts.move_to_end(key)
+        self._expire(now)
+        while len(self._carts) > self.max_carts:
+            self._carts.popitem(last=False)
+            self.evicted += 1
+
+    def discard(self, key):
+        """ลบตะกร้าของคีย์นี้"""
+        self._carts.pop(key, None)
+
+    def purge(self):
+        """ลบตะกร้าที่หมดอายุทั้งหมด (เรียกจากทาสค์เบื้องหลัง)
+
+        Returns:
+            int: จำนวนตะกร้าที่ถูกลบ
+        """
+        before = self.expired
+        self._expire(time.monotonic())
+        return self.expired - before
+
+    def stats(self):
+        """สถิติของที่เก็บตะกร้า (approx_bytes ไม่รวมข้อมูลสินค้าที่ใช้ร่วมกับแคตตาล็อก)"""
+        lines = sum(len(cart) for cart, _ in self._carts.values())
+        approx_bytes = sys.getsizeof(self._carts) + sum(
+            sys.getsizeof(cart) + sys.getsizeof(cart._lines) + len(cart) * _LINE_BYTES
+            for cart, _ in self._carts.values()
+        )
+        return {
+            "carts": len(self._carts),
+            "lines": lines,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "approx_bytes": approx_bytes
+        }
+
+    def __len__(self):
+        return len(self._carts)
+
+
+# ที่เก็บตะกร้าที่ใช้ร่วมกันทั้งโปรเซส
+cart_store = CartStore()
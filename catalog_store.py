@@ -0,0 +1,538 @@
+"""
+ที่เก็บแคตตาล็อกสินค้าในหน่วยความจำสำหรับบอท Discord Shop
+โหลดไฟล์ categories/<ประเทศ>/<หมวด>.json ครั้งเดียวต่อโปรเซส แล้วโหลดใหม่เฉพาะไฟล์ที่ mtime เปลี่ยน
+หรือไฟล์ที่บอทเขียนเอง (ผ่าน mark_written) เท่านั้น
+"""
+import bisect
+import difflib
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from types import MappingProxyType
+
+# ตำแหน่งไฟล์ข้อมูลสินค้า
+SCRIPT_DIR = Path(__file__).parent.absolute()
+CATEGORIES_DIR = SCRIPT_DIR / "categories"
+PRODUCTS_FILE = SCRIPT_DIR / "products.json"
+
+
+# นิคหิต + สระอา ที่พิมพ์แยกกัน (ํา) ให้เป็นสระอำ (ำ) ตัวเดียว
+_THAI_SARA_AM = ("\u0e4d\u0e32", "\u0e33")
+# ไม้ไต่คู้ วรรณยุกต์ และทัณฑฆาต ที่มักพิมพ์ตกหล่นหรือพิมพ์ผิด
+_THAI_MARKS = re.compile(r"[\u0e47-\u0e4c]")
+_WHITESPACE = re.compile(r"\s+")
+_NON_WORD = re.compile(r"[\W_]+")
+
+# จำนวนตัวเลือกสูงสุดของ autocomplete ใน Discord และความยาวสูงสุดของ value ของตัวเลือก
+COMPLETE_LIMIT = 25
+CHOICE_VALUE_LIMIT = 100
+
+# snapshot() ตรวจ mtime ของไฟล์ไม่บ่อยกว่านี้ (วินาที) การเขียนของบอทเองแจ้งผ่าน mark_written/invalidate จึงเห็นทันที
+CATALOG_CHECK_SECONDS = float(os.getenv("CATALOG_CHECK_SECONDS", "2"))
+
+
+def normalize_name(name):
+    """แปลงชื่อสินค้าให้อยู่ในรูปแบบมาตรฐานสำหรับใช้เป็นคีย์ค้นหา (case-folded และช่องว่างเหลือช่องเดียว)"""
+    text = unicodedata.normalize("NFC", str(name or "")).replace(*_THAI_SARA_AM)
+    return _WHITESPACE.sub(" ", text).strip().casefold()
+
+
+def loose_name(name):
+    """คีย์สำหรับค้นหาแบบคลาดเคลื่อน (ตัดวรรณยุกต์ไทย ช่องว่าง และเครื่องหมายออก)"""
+    return _NON_WORD.sub("", _THAI_MARKS.sub("", normalize_name(name)))
+
+
+def make_product_id(country, category, name):
+    """สร้างรหัสสินค้าในรูปแบบเดียวกับที่ CategoryShopView ใช้"""
+    return f"{country}_{category}_{name}"
+
+
+def choice_value(product_id):
+    """ค่า value ของตัวเลือก autocomplete ที่ชี้ไปยังสินค้า (แปลงกลับด้วย CatalogSnapshot.resolve)
+
+    ใช้รหัสสินค้าโดยตรง ถ้ายาวเกินที่ Discord รับได้จะใช้ hash ของรหัสแทน (ไม่ตัดชื่อทิ้ง)
+    """
+    if len(product_id) <= CHOICE_VALUE_LIMIT:
+        return product_id
+    return "#" + hashlib.sha1(product_id.encode("utf-8")).hexdigest()
+
+
+def _file_signature(path):
+    """คืนค่า (mtime_ns, size) ของไฟล์ หรือ None ถ้าไม่มีไฟล์"""
+    try:
+        stat = path.stat()
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _freeze_product(product):
+    """แปลงสินค้าเป็น mapping แบบอ่านอย่างเดียว พร้อมเติมรหัสสินค้า (id)"""
+    frozen = dict(product)
+    frozen["id"] = make_product_id(frozen.get("country", ""), frozen.get("category", ""), frozen.get("name", ""))
+    return MappingProxyType(frozen)
+
+
+class NameIndex:
+    """ดัชนีชื่อสินค้าของ snapshot หนึ่ง (สร้างครั้งเดียวต่อเวอร์ชันของแคตตาล็อก)
+
+    ชื่อที่ normalize แล้วชี้ไปยังสินค้าทุกรายการที่ชื่อตรงกัน (เรียงตามประเทศและหมวดหมู่)
+    และใช้คีย์แบบ loose_name สำหรับแนะนำชื่อที่ใกล้เคียงเมื่อค้นหาไม่พบ
+    ส่วน autocomplete ใช้รายการคีย์ที่เรียงแล้วแยกตามประเทศ (สร้างเมื่อใช้ครั้งแรก)
+    """
+
+    __slots__ = ("_exact", "_loose", "_sorted")
+
+    def __init__(self, products):
+        exact = {}
+        loose = {}
+        for product in products:
+            key = normalize_name(product.get("name", ""))
+            if key not in exact:
+                exact[key] = []
+                loose.setdefault(loose_name(key), []).append(product.get("name", ""))
+            exact[key].append(product)
+        self._exact = {key: tuple(matches) for key, matches in exact.items()}
+        self._loose = loose
+        self._sorted = {}
+
+    def _sorted_names(self, country):
+        """คีย์ชื่อสินค้าที่เรียงแล้วของประเทศหนึ่ง (None = ทุกประเทศ) สำหรับค้นหา prefix ด้วย bisect
+
+        Returns:
+            tuple: (คีย์ที่เรียงแล้ว, (ชื่อสินค้า, รหัสสินค้า) ของสินค้ารายการแรกที่ตรงกับแต่ละคีย์)
+        """
+        cached = self._sorted.get(country)
+        if cached is None:
+            entries = []
+            for key, products in self._exact.items():
+                product = next((p for p in products if country is None or p.get("country") == country), None)
+                if product is not None:
+                    entries.append((key, (product.get("name", ""), product.get("id"))))
+            entries.sort(key=lambda entry: entry[0])
+            cached = ([key for key, _ in entries], [match for _, match in entries])
+            self._sorted[country] = cached
+        return cached
+
+    def complete(self, text, country=None, limit=COMPLETE_LIMIT):
+        """ชื่อสินค้าสำหรับ autocomplete (ชื่อที่ขึ้นต้นด้วยคำค้นก่อน แล้วจึงชื่อที่มีคำค้นอยู่ภายใน)
+
+        Args:
+            text (str): ข้อความที่ผู้ใช้พิมพ์อยู่
+            country (str, optional): ค้นหาเฉพาะสินค้าในประเทศนี้
+            limit (int): จำนวนชื่อสูงสุด
+
+        Returns:
+            list: (ชื่อสินค้า, รหัสสินค้า)
+        """
+        keys, matches = self._sorted_names(country)
+        key = normalize_name(text)
+
+        # ชื่อที่ขึ้นต้นด้วยคำค้นอยู่ติดกันในรายการที่เรียงแล้ว
+        start = bisect.bisect_left(keys, key)
+        results = []
+        for index in range(start, len(keys)):
+            if len(results) >= limit or not keys[index].startswith(key):
+                break
+            results.append(matches[index])
+
+        if key and len(results) < limit:
+            # เติมด้วยชื่อที่มีคำค้นอยู่ภายใน (ภาษาไทยไม่มีการเว้นวรรคระหว่างคำ)
+            for name_key, match in zip(keys, matches):
+                if len(results) >= limit:
+                    break
+                if key in name_key and not name_key.startswith(key):
+                    results.append(match)
+        return results
+
+    def find(self, name):
+        """สินค้าทุกรายการที่ชื่อตรงกัน (ไม่สนตัวพิมพ์เล็กใหญ่และช่องว่าง) คืนค่า tuple ว่างถ้าไม่พบ"""
+        return self._exact.get(normalize_name(name), ())
+
+    def suggest(self, name, limit=3):
+        """ชื่อสินค้าที่ใกล้เคียงสำหรับข้อความ "หมายถึง ... หรือไม่?"
+
+        เรียงจากชื่อที่ต่างกันแค่วรรณยุกต์/ช่องว่าง, ชื่อที่มีคำค้นอยู่ภายใน แล้วจึงชื่อที่คล้ายกัน
+
+        Args:
+            name (str): ชื่อที่ค้นหาไม่พบ
+            limit (int): จำนวนชื่อที่แนะนำสูงสุด
+
+        Returns:
+            list: ชื่อสินค้าที่แนะนำ
+        """
+        key = loose_name(name)
+        if not key:
+            return []
+
+        # dict เก็บลำดับและตัดชื่อซ้ำ หยุดทันทีเมื่อได้ครบ limit ชื่อ
+        suggestions = dict.fromkeys(self._loose.get(key, ()))
+        if len(suggestions) < limit:
+            # ชื่อที่มีคำค้นอยู่ภายใน (วนรอบเดียว หยุดเมื่อครบ)
+            for loose_key, names in self._loose.items():
+                if key in loose_key and loose_key != key:
+                    suggestions.update(dict.fromkeys(names))
+                    if len(suggestions) >= limit:
+                        break
+        if len(suggestions) < limit:
+            for close in difflib.get_close_matches(key, self._loose.keys(), n=limit, cutoff=0.6):
+                suggestions.update(dict.fromkeys(self._loose[close]))
+        return list(suggestions)[:limit]
+
+
+class CatalogSnapshot:
+    """ภาพนิ่งของแคตตาล็อกแบบอ่านอย่างเดียว ณ เวอร์ชันหนึ่ง
+
+    ใช้ร่วมกันระหว่าง view ทุกตัวที่เปิดอยู่ จะสร้างใหม่ (copy-on-write) เฉพาะเมื่อเวอร์ชันของแคตตาล็อกเปลี่ยน
+    สินค้าแต่ละรายการเป็น MappingProxyType ที่มี id, country และ category อยู่แล้ว
+    """
+
+    __slots__ = ("version", "countries", "categories", "_buckets", "_by_id", "_all_products", "_name_index")
+
+    def __init__(self, version, countries, categories, buckets):
+        self.version = version
+        self.countries = tuple(countries)
+        self.categories = tuple(categories)
+        self._buckets = buckets
+        self._by_id = {}
+        all_products = []
+        for country in self.countries:
+            for category in self.categories:
+                for product in buckets.get((country, category), ()):
+                    self._by_id.setdefault(product["id"], product)
+                    all_products.append(product)
+        self._all_products = tuple(all_products)
+        self._name_index = None
+
+    @property
+    def name_index(self):
+        """ดัชนีชื่อสินค้า (สร้างเมื่อใช้ครั้งแรก)"""
+        if self._name_index is None:
+            self._name_index = NameIndex(self._all_products)
+        return self._name_index
+
+    @property
+    def all_products(self):
+        """สินค้าทั้งหมดในแคตตาล็อก (tuple เรียงตามประเทศและหมวดหมู่)"""
+        return self._all_products
+
+    def products(self, country, category):
+        """สินค้าในประเทศและหมวดหมู่ที่ระบุ (tuple)"""
+        return self._buckets.get((country, category), ())
+
+    def count(self, country, category):
+        """จำนวนสินค้าในประเทศและหมวดหมู่ที่ระบุ"""
+        return len(self._buckets.get((country, category), ()))
+
+    def page(self, country, category, page, per_page):
+        """สินค้าเฉพาะหน้าที่ระบุ (เริ่มนับหน้าจาก 0)"""
+        start = page * per_page
+        return self._buckets.get((country, category), ())[start:start + per_page]
+
+    def get(self, product_id):
+        """ค้นหาสินค้าจากรหัสสินค้า คืนค่า None ถ้าไม่พบ"""
+        return self._by_id.get(product_id)
+
+    def resolve(self, value):
+        """ค้นหาสินค้าจาก value ของตัวเลือก autocomplete (ดู choice_value) คืนค่า None ถ้าไม่พบ"""
+        product = self._by_id.get(value)
+        if product is None and value.startswith("#"):
+            # รหัสสินค้าที่ยาวเกินถูกแทนด้วย hash (มีเฉพาะสินค้าชื่อยาวมาก จึงค้นหาแบบเรียงลำดับได้)
+            product = next((p for product_id, p in self._by_id.items() if choice_value(product_id) == value), None)
+        return product
+
+    def __contains__(self, product_id):
+        return product_id in self._by_id
+
+    def __len__(self):
+        return len(self._all_products)
+
+
+class CatalogStore:
+    """ดัชนีสินค้าในหน่วยความจำที่ใช้ร่วมกันทั้งโปรเซส
+
+    เก็บสินค้าแยกตาม (ประเทศ, หมวดหมู่) พร้อมดัชนีตามรหัสสินค้าและชื่อสินค้า (case-folded)
+    ทุกครั้งที่มีการอ่านจะตรวจเฉพาะ mtime ของไฟล์ ไม่ได้เปิดไฟล์ใหม่ถ้าไม่มีการเปลี่ยนแปลง
+    โค้ดใน event loop อ่านผ่าน current() ซึ่งไม่แตะดิสก์ การตรวจไฟล์ทำผ่าน snapshot()/refresh() ใน thread pool
+    """
+
+    def __init__(self, categories_dir=CATEGORIES_DIR, legacy_file=PRODUCTS_FILE, check_interval=CATALOG_CHECK_SECONDS):
+        self.categories_dir = Path(categories_dir)
+        self.legacy_file = Path(legacy_file)
+        self.check_interval = check_interval
+        self._checked_at = None  # เวลาที่ตรวจไฟล์ทุกหมวดครั้งล่าสุด (time.monotonic)
+        self._lock = threading.RLock()
+        self._buckets = {}      # (country, category) -> list ของสินค้า (มี country/category แล้ว)
+        self._signatures = {}   # (country, category) -> (mtime_ns, size) ตอนที่โหลดล่าสุด
+        self._dirty = set()     # ไฟล์ที่บอทเขียนแต่ยังไม่ได้อัปเดตในหน่วยความจำ
+        self._pinned = set()    # หมวดที่มีข้อมูลรอเขียนลงไฟล์ (ห้ามโหลดทับจากไฟล์)
+        self._by_id = {}
+        self._by_name = {}
+        self._legacy_products = None
+        self._legacy_signature = None
+        self._frozen = {}       # (country, category) -> (bucket ต้นฉบับ, tuple แบบอ่านอย่างเดียว)
+        self._snapshot = None
+        self.version = 0
+        self.file_reads = 0
+
+    def _category_file(self, country, category):
+        return self.categories_dir / country / f"{category}.json"
+
+    def _read_bucket(self, country, category):
+        """อ่านไฟล์หมวดหมู่หนึ่งไฟล์ และเติม country/category ให้สินค้าแต่ละรายการ"""
+        category_file = self._category_file(country, category)
+        self.file_reads += 1
+        try:
+            with open(category_file, "r", encoding="utf-8") as f:
+                products = json.load(f)
+        except FileNotFoundError:
+            return []
+        except json.JSONDecodeError:
+            print(f"Invalid JSON in category file at {category_file}, treating as empty")
+            return []
+
+        if not isinstance(products, list):
+            return []
+
+        for product in products:
+            product["country"] = country
+            product["category"] = category
+        return products
+
+    def _rebuild_indexes(self):
+        """สร้างดัชนีตามรหัสสินค้าและชื่อสินค้าใหม่จาก bucket ทั้งหมด"""
+        by_id = {}
+        by_name = {}
+        for (country, category), products in self._buckets.items():
+            for product in products:
+                name = product.get("name", "")
+                by_id[make_product_id(country, category, name)] = product
+                by_name.setdefault(normalize_name(name), []).append(product)
+        self._by_id = by_id
+        self._by_name = by_name
+
+    def refresh(self, countries, categories):
+        """ตรวจไฟล์ทุกหมวดและโหลดใหม่เฉพาะไฟล์ที่เปลี่ยนไป (เรียกใน thread pool)
+
+        stat และอ่านไฟล์นอก lock เพื่อให้ current() ที่เรียกจาก event loop ไม่ต้องรอ I/O
+        หมวดที่ถูกแก้ผ่าน mark_written/invalidate ระหว่างอ่านจะไม่ถูกเขียนทับด้วยข้อมูลที่อ่านมา
+
+        Args:
+            countries (list): รหัสประเทศที่ใช้งานอยู่
+            categories (list): รหัสหมวดหมู่ที่ใช้งานอยู่
+
+        Returns:
+            bool: True ถ้ามีการเปลี่ยนแปลงในแคตตาล็อก
+        """
+        with self._lock:
+            pinned = set(self._pinned)
+            dirty = set(self._dirty)
+            signatures = dict(self._signatures)
+            buckets = dict(self._buckets)
+
+        active_keys = set()
+        loaded = {}
+        for country in countries:
+            for category in categories:
+                key = (country, category)
+                active_keys.add(key)
+                if key in pinned:
+                    continue
+                signature = _file_signature(self._category_file(country, category))
+                if key in dirty or key not in signatures or signatures[key] != signature:
+                    loaded[key] = (self._read_bucket(country, category) if signature else [], signature)
+
+        with self._lock:
+            changed = False
+            for key, (products, signature) in loaded.items():
+                if (key in self._pinned or self._buckets.get(key) is not buckets.get(key)
+                        or (key in self._dirty) != (key in dirty)):
+                    # หมวดนี้ถูกแก้ระหว่างอ่านไฟล์ ใช้ข้อมูลในหน่วยความจำต่อ (รอบถัดไปจะตรวจใหม่)
+                    continue
+                self._buckets[key] = products
+                self._signatures[key] = signature
+                self._dirty.discard(key)
+                changed = True
+
+            # ลบ bucket ของประเทศหรือหมวดหมู่ที่ถูกลบออกจากระบบแล้ว
+            for key in [k for k in self._buckets if k not in active_keys and k not in self._pinned]:
+                del self._buckets[key]
+                self._signatures.pop(key, None)
+                changed = True
+
+            if changed:
+                self._rebuild_indexes()
+                self.version += 1
+
+            self._checked_at = time.monotonic()
+            return changed
+
+    def get_products(self, countries, categories, country=None, category=None):
+        """ดึงรายการสินค้าตามประเทศและหมวดหมู่ (คืนค่าเป็นสำเนา แก้ไขได้โดยไม่กระทบแคตตาล็อก)
+
+        Args:
+            countries (list): รหัสประเทศที่ใช้งานอยู่ (ใช้กำหนดลำดับผลลัพธ์)
+            categories (list): รหัสหมวดหมู่ที่ใช้งานอยู่ (ใช้กำหนดลำดับผลลัพธ์)
+            country (str, optional): กรองเฉพาะประเทศนี้
+            category (str, optional): กรองเฉพาะหมวดหมู่นี้
+
+        Returns:
+            list: รายการสินค้า
+        """
+        self.refresh(countries, categories)
+        with self._lock:
+            selected_countries = [country] if country else countries
+            selected_categories = [category] if category else categories
+
+            products = []
+            for c in selected_countries:
+                for cat in selected_categories:
+                    for product in self._buckets.get((c, cat), []):
+                        products.append(dict(product))
+            return products
+
+    def find_by_id(self, product_id):
+        """ค้นหาสินค้าจากรหัสสินค้า (country_category_name) คืนค่าสำเนาหรือ None"""
+        with self._lock:
+            product = self._by_id.get(product_id)
+            return dict(product) if product else None
+
+    def find_by_name(self, name):
+        """ค้นหาสินค้าจากชื่อ (ไม่สนตัวพิมพ์เล็กใหญ่) คืนค่าเป็นรายการสำเนา"""
+        with self._lock:
+            return [dict(p) for p in self._by_name.get(normalize_name(name), [])]
+
+    def snapshot(self, countries, categories):
+        """ดึงภาพนิ่งของแคตตาล็อกปัจจุบัน (เรียกใน thread pool เพราะอาจต้อง stat/อ่านไฟล์)
+
+        ถ้าเวอร์ชันไม่เปลี่ยนจะคืน snapshot เดิมที่ใช้ร่วมกัน ถ้าเปลี่ยนจะสร้างใหม่
+        โดยใช้ tuple ของหมวดที่ไม่เปลี่ยนแปลงซ้ำ (แปลงเฉพาะหมวดที่ถูกแก้ไข)
+        mtime ของไฟล์ถูกตรวจไม่บ่อยกว่า check_interval วินาที (เรียกถี่ๆ ตอนเปลี่ยนหน้าร้านจึงไม่ต้อง stat ทุกไฟล์)
+
+        Args:
+            countries (list): รหัสประเทศที่ใช้งานอยู่
+            categories (list): รหัสหมวดหมู่ที่ใช้งานอยู่
+
+        Returns:
+            CatalogSnapshot: ภาพนิ่งของแคตตาล็อก
+        """
+        with self._lock:
+            snapshot = self._snapshot
+            stale = (self._checked_at is None or self._dirty
+                     or time.monotonic() - self._checked_at >= self.check_interval
+                     or snapshot is None or snapshot.countries != tuple(countries)
+                     or snapshot.categories != tuple(categories))
+        if stale:
+            self.refresh(countries, categories)
+        with self._lock:
+            return self._build_snapshot(countries, categories)
+
+    def current(self, countries, categories):
+        """ภาพนิ่งของแคตตาล็อกจากข้อมูลในหน่วยความจำเท่านั้น (ไม่ stat หรืออ่านไฟล์) สำหรับโค้ดใน event loop
+
+        การแก้ไขของบอทเอง (mark_written) เห็นทันที ส่วนไฟล์ที่ถูกแก้จากภายนอกจะเห็นหลังจาก
+        snapshot()/refresh() ใน thread pool รอบถัดไป
+
+        Returns:
+            CatalogSnapshot: ภาพนิ่งของแคตตาล็อก หรือ None ถ้ายังไม่เคยโหลดแคตตาล็อก
+        """
+        with self._lock:
+            if self.version == 0:
+                return None
+            return self._build_snapshot(countries, categories)
+
+    def _build_snapshot(self, countries, categories):
+        """สร้าง snapshot จาก bucket ในหน่วยความจำ (เรียกภายใต้ self._lock)"""
+        snapshot = self._snapshot
+        if (snapshot is not None and snapshot.version == self.version
+                and snapshot.countries == tuple(countries) and snapshot.categories == tuple(categories)):
+            return snapshot
+
+        buckets = {}
+        frozen = {}
+        for key, products in self._buckets.items():
+            cached = self._frozen.get(key)
+            if cached is not None and cached[0] is products:
+                frozen[key] = cached
+            else:
+                frozen[key] = (products, tuple(_freeze_product(p) for p in products))
+            buckets[key] = frozen[key][1]
+        self._frozen = frozen
+
+        self._snapshot = CatalogSnapshot(self.version, countries, categories, buckets)
+        return self._snapshot
+
+    def mark_written(self, country, category, products=None, pin=False):
+        """แจ้งว่าบอทเพิ่งเขียนไฟล์หมวดหมู่นี้
+
+        ถ้าส่ง products มาด้วย จะอัปเดตในหน่วยความจำทันทีโดยไม่ต้องอ่านไฟล์ซ้ำ
+        ถ้าไม่ส่ง จะโหลดไฟล์นี้ใหม่ในการอ่านครั้งถัดไป
+        ถ้า pin=True แปลว่าข้อมูลยังไม่ได้เขียนลงไฟล์ จะไม่โหลดทับจากไฟล์จนกว่าจะเรียก unpin()
+        """
+        with self._lock:
+            key = (country, category)
+            if pin:
+                self._pinned.add(key)
+            if products is None:
+                self._dirty.add(key)
+                return
+
+            self._buckets[key] = [dict(p, country=country, category=category) for p in products]
+            self._signatures[key] = _file_signature(self._category_file(country, category))
+            self._dirty.discard(key)
+            self._rebuild_indexes()
+            self.version += 1
+
+    def unpin(self, country, category):
+        """แจ้งว่าข้อมูลของหมวดนี้ถูกเขียนลงไฟล์แล้ว (บันทึก mtime ใหม่โดยไม่อ่านไฟล์ซ้ำ)"""
+        with self._lock:
+            key = (country, category)
+            self._pinned.discard(key)
+            self._signatures[key] = _file_signature(self._category_file(country, category))
+
+    def invalidate(self):
+        """บังคับให้โหลดทุกไฟล์ใหม่ในการอ่านครั้งถัดไป (เช่น หลังดาวน์โหลดจาก MongoDB)"""
+        with self._lock:
+            self._dirty.update(self._buckets.keys())
+            self._signatures.clear()
+            self._legacy_signature = None
+            self._checked_at = None
+
+    def load_legacy_products(self):
+        """โหลดสินค้าจากไฟล์ products.json เดิม (ใช้เมื่อระบบหมวดหมู่ใหม่ยังไม่มีสินค้า)"""
+        with self._lock:
+            signature = _file_signature(self.legacy_file)
+            if signature is None:
+                self._legacy_products = None
+                self._legacy_signature = None
+                return []
+
+            if self._legacy_products is None or signature != self._legacy_signature:
+                self.file_reads += 1
+                try:
+                    with open(self.legacy_file, "r", encoding="utf-8") as f:
+                        self._legacy_products = json.load(f)
+                except json.JSONDecodeError:
+                    self._legacy_products = []
+                self._legacy_signature = signature
+
+            return [dict(p) for p in self._legacy_products]
+
+    def stats(self):
+        """สถิติของแคตตาล็อกสำหรับแสดงผลหรือตรวจสอบ"""
+        with self._lock:
+            return {
+                "version": self.version,
+                "files": len(self._buckets),
+                "products": sum(len(p) for p in self._buckets.values()),
+                "file_reads": self.file_reads
+            }
+
+
+# แคตตาล็อกที่ใช้ร่วมกันทั้งโปรเซส
+catalog_store = CatalogStore()
@@ -0,0 +1,239 @@
+"""
+ติดตามการเปลี่ยนแปลงของคอลเลกชัน products และ configs ผ่าน MongoDB change stream
+การแก้ไขจาก MongoDB โดยตรงหรือจากบอทตัวอื่นจะถูกนำมาใช้กับแคตตาล็อกและแคชการตั้งค่าภายในไม่กี่วินาที
+resume token ถูกบันทึกไว้ในไฟล์ เพื่อให้เริ่มต่อจากจุดเดิมหลังรีสตาร์ทโดยไม่ต้องโหลดใหม่ทั้งหมด
+ถ้า MongoDB ไม่รองรับ change stream (standalone mongod) จะใช้การดาวน์โหลดทุก 30 นาทีตามเดิม
+"""
+import asyncio
+import os
+from pathlib import Path
+
+from async_db import run_blocking
+from config_cache import config_cache, channel_state_value
+from delta_sync import delta_sync
+from json_store import JsonFileStore
+
+try:
+    from pymongo.errors import OperationFailure
+except ImportError:
+    OperationFailure = None
+
+# ใช้ client แบบ async ตัวเดียวกับ db_operations
+try:
+    from mongodb_config import async_db as async_database
+except (ImportError, AttributeError):
+    async_database = None
+
+# เปิด/ปิดการใช้ change stream และเวลารวมการเปลี่ยนแปลงของสินค้าก่อนเขียนไฟล์ (วินาที)
+CHANGE_STREAMS_ENABLED = os.getenv("MONGODB_CHANGE_STREAMS", "1") != "0"
+CHANGE_STREAM_DEBOUNCE = float(os.getenv("CHANGE_STREAM_DEBOUNCE", "2"))
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+RESUME_TOKEN_FILE = SCRIPT_DIR / "change_stream_tokens.json"
+
+# รหัสข้อผิดพลาดเมื่อ deployment ไม่รองรับ change stream (standalone / เวอร์ชันเก่า)
+_UNSUPPORTED_CODES = {40573, 40324}
+# รหัสข้อผิดพลาดเมื่อ resume token ใช้ต่อไม่ได้ (oplog ถูกเขียนทับไปแล้ว)
+_RESUME_FAILED_CODES = {260, 280, 286}
+
+# config_type -> (ชื่อใน config_cache, ฟังก์ชันดึงค่าจากเอกสาร, ไฟล์สำรอง, ฟังก์ชันสร้างข้อมูลไฟล์)
+_CONFIG_FIELDS = {
+    "target_channel": ("target_channel_id", lambda doc: doc.get("target_channel_id"),
+                       "target_channel_config.json", lambda value: {"target_channel_id": value}),
+    "qrcode": ("qrcode_url", lambda doc: doc.get("url"),
+               "qrcode_config.json", lambda value: {"url": value}),
+    "thank_you": ("thank_you_message", lambda doc: doc.get("message"),
+                  "thank_you_config.json", lambda value: {"message": value}),
+    "categories": ("categories",
+                   lambda doc: {k: v for k, v in doc.items() if k not in ("_id", "config_type", "updated_at")},
+                   "categories_config.json", lambda value: value),
+    "channel_state": ("channel_state", channel_state_value, None, None),
+}
+
+
+class ChangeWatcher:
+    """ตัวติดตาม change stream ของ products และ configs
+
+    การเปลี่ยนแปลงของสินค้าจะถูกรวมไว้ CHANGE_STREAM_DEBOUNCE วินาทีแล้วเขียนไฟล์ครั้งเดียว
+    ส่วนการตั้งค่าจะอัปเดตแคชทันที
+    """
+
+    def __init__(self, database=async_database, debounce=CHANGE_STREAM_DEBOUNCE, token_file=RESUME_TOKEN_FILE):
+        self.database = database
+        self.debounce = debounce
+        self.unsupported = False   # MongoDB ไม่รองรับ change stream
+        self.events = 0            # จำนวนเหตุการณ์ที่ได้รับ
+        self.reloads = 0           # จำนวนครั้งที่เขียนการเปลี่ยนแปลงของสินค้าลงไฟล์
+        self.errors = 0
+        self._tokens = JsonFileStore(token_file)   # ชื่อ collection -> resume token
+        self._open = set()
+        self._tasks = []
+        self._listeners = {}
+        self._pending = {}         # _id ของสินค้า -> เอกสารล่าสุด (None = ถูกลบ)
+        self._pending_token = None
+        self._reload_task = None
+
+    @property
+    def live(self):
+        """change stream เปิดอยู่ครบทั้งสองคอลเลกชัน"""
+        return len(self._open) == 2
+
+    def add_listener(self, config_type, callback):
+        """เรียก callback(ค่าใหม่) เมื่อการตั้งค่าประเภทนี้เปลี่ยนจากภายนอก"""
+        self._listeners.setdefault(config_type, []).append(callback)
+
+    def start(self):
+        """เริ่มติดตามการเปลี่ยนแปลง (เรียกภายใน event loop)
+
+        Returns:
+            bool: True ถ้าเริ่มติดตามได้
+        """
+        if not CHANGE_STREAMS_ENABLED or self.database is None or self.unsupported:
+            return False
+        if any(not task.done() for task in self._tasks):
+            return True
+        self._tasks = [
+            asyncio.ensure_future(self._watch("products", self._on_product_change)),
+            asyncio.ensure_future(self._watch("configs", self._on_config_change))
+        ]
+        return True
+
+    async def _save_token(self, name, token):
+        """บันทึก resume token หลังใช้การเปลี่ยนแปลงเสร็จแล้วเท่านั้น"""
+        tokens = self._tokens.load()
+        if token is None:
+            tokens.pop(name, None)
+        else:
+            tokens[name] = token
+        await run_blocking(self._tokens.save, dict(tokens))
+
+    async def _watch(self, name, handler):
+        backoff = 1
+        while True:
+            token = self._tokens.load().get(name)
+            try:
+                stream = await self.database[name].watch(full_document="updateLookup", resume_after=token)
+                async with stream:
+                    self._open.add(name)
+                    backoff = 1
+                    print(f"👀 ติดตามการเปลี่ยนแปลงของ {name} ผ่าน change stream")
+                    async for change in stream:
+                        self.events += 1
+                        await handler(change)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                code = getattr(e, "code", None) if OperationFailure is not None and isinstance(e, OperationFailure) else None
+                if code in _UNSUPPORTED_CODES:
+                    self.unsupported = True
+                    print("⚠️ MongoDB ไม่รองรับ change stream - ใช้การดาวน์โหลดอัตโนมัติทุก 30 นาทีแทน")
+                    return
+                if code in _RESUME_FAILED_CODES and token is not None:
+                    # resume token เก่าเกินไป โหลดใหม่ทั้งหมดแล้วเริ่มติดตามจากตอนนี้
+                    print(f"⚠️ resume token ของ {name} ใช้ไม่ได้แล้ว - จะโหลดข้อมูลใหม่ทั้งหมด")
+                    await self._save_token(name, None)
+                    await self._resync(name)
+                    continue
+                self.errors += 1
+                print(f"❌ change stream ของ {name} หยุดทำงาน: {str(e)} (ลองใหม่ใน {backoff} วินาที)")
+            finally:
+                self._open.discard(name)
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60)
+
+    async def _resync(self, name):
+        """โหลดข้อมูลใหม่ทั้งหมดเมื่อ resume ต่อไม่ได้"""
+        if name == "products":
+            async with delta_sync.lock:
+                delta_sync.begin()
+                await delta_sync.sync_products(full=True)
+                await run_blocking(delta_sync.finish)
+        else:
+            for cache_name, _, _, _ in _CONFIG_FIELDS.values():
+                config_cache.invalidate(cache_name)
+
+    async def _on_product_change(self, change):
+        operation = change.get("operationType")
+        if operation in ("insert", "update", "replace"):
+            doc = change.get("fullDocument")
+            if doc is None:
+                # เอกสารถูกลบไปก่อนจะ lookup ได้ จะมีเหตุการณ์ delete ตามมา
+                return
+            self._pending[doc["_id"]] = doc
+        elif operation == "delete":
+            self._pending[change["documentKey"]["_id"]] = None
+        elif operation in ("drop", "rename", "dropDatabase", "invalidate"):
+            # ไม่สามารถใช้การเปลี่ยนแปลงทีละรายการได้ โหลดใหม่ทั้งหมด
+            await self._resync("products")
+            await self._save_token("products", None)
+            self._pending.clear()
+            return
+        else:
+            return
+
+        self._pending_token = change["_id"]
+        if self._reload_task is None or self._reload_task.done():
+            self._reload_task = asyncio.ensure_future(self._apply_products())
+
+    async def _apply_products(self):
+        """รวมการเปลี่ยนแปลงของสินค้าแล้วเขียนไฟล์ (เหตุการณ์ที่เข้ามาระหว่างเขียนจะถูกใช้ในรอบถัดไป)"""
+        while self._pending:
+            await asyncio.sleep(self.debounce)
+            changes, self._pending = self._pending, {}
+            token = self._pending_token
+            try:
+                async with delta_sync.lock:
+                    delta_sync.begin()
+                    await delta_sync.apply_product_changes(changes)
+                    report = await run_blocking(delta_sync.finish)
+            except Exception as e:
+                self.errors += 1
+                print(f"❌ ไม่สามารถใช้การเปลี่ยนแปลงของสินค้า: {str(e)}")
+                # เก็บการเปลี่ยนแปลงไว้ลองใหม่ (เหตุการณ์ที่ใหม่กว่าจะทับ)
+                self._pending = {**changes, **self._pending}
+                continue
+
+            self.reloads += 1
+            print(
+                f"🔄 change stream: สินค้า ➕ {report['added']} ✏️ {report['updated']} 🗑️ {report['removed']} "
+                f"(เขียน {report['files_written']} ไฟล์ ใน {report['elapsed']:.2f} วินาที)"
+            )
+            await self._save_token("products", token)
+
+    async def _on_config_change(self, change):
+        if change.get("operationType") not in ("insert", "update", "replace"):
+            return
+        doc = change.get("fullDocument") or {}
+        fields = _CONFIG_FIELDS.get(doc.get("config_type"))
+        if fields is None:
+            return
+
+        cache_name, extract, backup_file, backup_data = fields
+        value = extract(doc)
+        if value is None:
+            return
+        config_cache.update(cache_name, value)
+        if backup_file is not None:
+            async with delta_sync.lock:
+                delta_sync.begin()
+                await run_blocking(delta_sync.write_json, SCRIPT_DIR / backup_file, backup_data(value))
+                await run_blocking(delta_sync.finish)
+        for callback in self._listeners.get(doc["config_type"], []):
+            callback(config_cache.peek(cache_name))
+        print(f"🔄 change stream: อัปเดตการตั้งค่า {cache_name}")
+        await self._save_token("configs", change["_id"])
+
+    def stats(self):
+        """สถิติของตัวติดตาม"""
+        return {
+            "live": self.live,
+            "unsupported": self.unsupported,
+            "events": self.events,
+            "reloads": self.reloads,
+            "pending": len(self._pending),
+            "errors": self.errors
+        }
+
+
+# ตัวติดตามที่ใช้ร่วมกันทั้งโปรเซส
+change_watcher = ChangeWatcher()
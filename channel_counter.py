@@ -0,0 +1,212 @@
+"""
+ตัวนับข้อความสำหรับช่องเครดิตร้าน (ช่องเป้าหมาย)
+นับข้อความด้วยคำสั่ง atomic ครั้งเดียวต่อข้อความ (ใช้ตัวนับร่วมกันได้หลายบอท)
+และให้ทาสค์เบื้องหลังเปลี่ยนชื่อช่องเป็นตัวเลขล่าสุดตามอัตราที่ Discord อนุญาต
+(เปลี่ยนชื่อช่องได้ 2 ครั้งต่อ 10 นาที) แทนการเปลี่ยนชื่อทุกข้อความแล้วติด 429
+"""
+import asyncio
+import os
+import re
+import time
+from collections import deque
+
+from async_db import increment_channel_state, advance_channel_state
+from config_cache import config_cache
+
+# จำนวนครั้งที่เปลี่ยนชื่อช่องได้ต่อช่วงเวลา (วินาที) ตามข้อจำกัดของ Discord
+RENAME_LIMIT = int(os.getenv("CHANNEL_RENAME_LIMIT", "2"))
+RENAME_WINDOW = float(os.getenv("CHANNEL_RENAME_WINDOW", "600"))
+# เวลารอก่อนลองเปลี่ยนชื่อใหม่หลังเกิดข้อผิดพลาดอื่นที่ไม่ใช่ 429 (วินาที เพิ่มเป็นสองเท่าทุกครั้งที่ผิดพลาดซ้ำ)
+RENAME_RETRY = float(os.getenv("CHANNEL_RENAME_RETRY", "5"))
+
+
+def number_in_name(name):
+    """ตัวเลขท้ายชื่อช่อง (0 ถ้าไม่มี)"""
+    match = re.search(r'(\d+)$', name or "")
+    return int(match.group(1)) if match else 0
+
+
+class ChannelCounter:
+    """ตัวนับข้อความพร้อมตัวจัดคิวการเปลี่ยนชื่อช่อง
+
+    pending คือตัวเลขล่าสุดที่นับได้ ส่วน applied คือตัวเลขที่แสดงในชื่อช่องตอนนี้
+    ส่วนต่าง (lag) จะถูกลดลงโดยทาสค์เบื้องหลังเมื่อมีโควต้าเปลี่ยนชื่อว่าง
+    """
+
+    def __init__(self, limit=RENAME_LIMIT, window=RENAME_WINDOW, retry=RENAME_RETRY):
+        self.limit = limit
+        self.window = window
+        self.retry = retry
+        self.channel = None
+        self.channel_name = ""
+        self.pending = 0
+        self.applied = 0
+        self.renames = 0           # จำนวนการเปลี่ยนชื่อที่สำเร็จ
+        self.rate_limited = 0      # จำนวนครั้งที่ได้ 429
+        self.failures = 0          # จำนวนครั้งที่เปลี่ยนชื่อไม่สำเร็จด้วยข้อผิดพลาดอื่น
+        self._retries = 0          # จำนวนครั้งที่ผิดพลาดติดกัน (ใช้คำนวณเวลารอ)
+        self.lag_since = None      # เวลาที่ตัวเลขเริ่มไม่ตรงกับชื่อช่อง
+        self._recent = deque()     # เวลาที่เปลี่ยนชื่อภายในช่วง window
+        self._load_lock = None
+        self._wake = None
+        self._task = None
+
+    def start(self):
+        """เริ่มทาสค์เปลี่ยนชื่อช่องเบื้องหลัง (เรียกภายใน event loop)"""
+        if self._wake is None:
+            self._wake = asyncio.Event()
+            self._load_lock = asyncio.Lock()
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def _load(self, channel, exact=False):
+        """โหลดสถานะเมื่อพบช่องเป้าหมายครั้งแรก (หรือเมื่อเปลี่ยนช่องเป้าหมาย)
+
+        Args:
+            channel: ช่องเป้าหมาย
+            exact (bool): True = ตั้งตัวนับตามตัวเลขในชื่อช่องด้วย $set (ลดลงได้)
+        """
+        actual = number_in_name(channel.name)
+        try:
+            # เลื่อนตัวเลขที่บันทึกไว้ให้ไม่น้อยกว่าชื่อช่องจริงในคำสั่งเดียว
+            # (หรือตั้งให้เท่ากับชื่อช่องเมื่อแอดมินสั่งซิงค์เอง)
+            _, state = await advance_channel_state(channel.name, actual, actual, exact=exact)
+            config_cache.update("channel_state", state)
+        except Exception as e:
+            print(f"⚠️ ไม่สามารถซิงค์ตัวนับของช่อง: {str(e)}")
+            state = await config_cache.get("channel_state")
+        self.channel = channel
+        self.channel_name = channel.name
+        self.applied = actual
+        self.pending = max(state.get("pending_number", 0), actual)
+        self.lag_since = time.monotonic() if self.pending != self.applied else None
+
+    async def resync(self, channel):
+        """ตั้งตัวนับให้ตรงกับตัวเลขในชื่อช่องจริง (ใช้เมื่อแอดมินเปลี่ยนช่องเป้าหมาย)
+
+        Args:
+            channel: ช่องเป้าหมายใหม่
+
+        Returns:
+            int: ตัวเลขหลังซิงค์
+        """
+        self.start()
+        async with self._load_lock:
+            await self._load(channel, exact=True)
+        return self.pending
+
+    async def increment(self, channel):
+        """นับข้อความใหม่ในช่องเป้าหมาย
+
+        Args:
+            channel: ช่อง Discord ที่ได้รับข้อความ
+
+        Returns:
+            int: ตัวเลขล่าสุดหลังนับ
+        """
+        self.start()
+        if self.channel is None or self.channel.id != channel.id:
+            async with self._load_lock:
+                if self.channel is None or self.channel.id != channel.id:
+                    await self._load(channel)
+        self.channel = channel
+
+        try:
+            state = await increment_channel_state(1)
+            config_cache.update("channel_state", state)
+            # ผลลัพธ์ของคำสั่งที่พร้อมกันอาจกลับมาไม่ตามลำดับ จึงใช้ค่าที่มากที่สุด
+            self.pending = max(self.pending, state["pending_number"])
+        except Exception as e:
+            # นับในหน่วยความจำไว้ก่อน จะถูกบันทึกด้วย $max หลังเปลี่ยนชื่อช่องครั้งถัดไป
+            print(f"⚠️ ไม่สามารถบันทึกตัวนับของช่อง: {str(e)}")
+            self.pending += 1
+        if self.lag_since is None:
+            self.lag_since = time.monotonic()
+        self._wake.set()
+        return self.pending
+
+    async def _persist(self):
+        """บันทึกชื่อช่องและตัวเลขที่แสดงแล้ว (ตัวเลขเลื่อนขึ้นด้วย $max เท่านั้น)"""
+        try:
+            _, state = await advance_channel_state(self.channel_name, self.applied, self.pending)
+            config_cache.update("channel_state", state)
+            return True
+        except Exception as e:
+            print(f"⚠️ ไม่สามารถบันทึกสถานะช่อง: {str(e)}")
+            return False
+
+    def _next_slot(self):
+        """จำนวนวินาทีที่ต้องรอก่อนเปลี่ยนชื่อได้อีกครั้ง (0 = เปลี่ยนได้ทันที)"""
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] >= self.window:
+            self._recent.popleft()
+        if len(self._recent) < self.limit:
+            return 0
+        return self._recent[0] + self.window - now
+
+    async def _run(self):
+        while True:
+            await self._wake.wait()
+            self._wake.clear()
+
+            while self.channel is not None and self.pending != self.applied:
+                delay = self._next_slot()
+                if delay > 0:
+                    print(f"⏳ รอเปลี่ยนชื่อช่องอีก {delay:.0f} วินาที (ค้างอยู่ {self.lag} ข้อความ)")
+                    await asyncio.sleep(delay)
+                    continue
+
+                # ใช้ตัวเลขล่าสุด ณ ตอนที่มีโควต้า (ข้อความที่ค้างอยู่ถูกรวมเป็นการเปลี่ยนชื่อครั้งเดียว)
+                target = self.pending
+                channel = self.channel
+                new_name = re.sub(r'\d+$', str(target), channel.name)
+                self._recent.append(time.monotonic())
+                try:
+                    await channel.edit(name=new_name)
+                except Exception as e:
+                    if getattr(e, "status", None) == 429:
+                        # ถูกจำกัดอัตรา นับเป็นการใช้โควต้าเต็มช่วงเวลา
+                        self.rate_limited += 1
+                        while len(self._recent) < self.limit:
+                            self._recent.append(time.monotonic())
+                        print(f"⏳ ถูกจำกัดอัตราการเปลี่ยนชื่อช่อง - จะลองใหม่ภายหลัง (ค้างอยู่ {self.lag} ข้อความ)")
+                        continue
+                    # คำขอที่ไม่สำเร็จไม่นับเป็นการใช้โควต้า รอแล้วลองใหม่โดยไม่ต้องรอข้อความถัดไป
+                    self._recent.pop()
+                    self.failures += 1
+                    self._retries += 1
+                    delay = min(self.retry * 2 ** (self._retries - 1), self.window)
+                    print(f"❌ ไม่สามารถเปลี่ยนชื่อช่อง: {e} - จะลองใหม่ใน {delay:.0f} วินาที")
+                    await asyncio.sleep(delay)
+                    continue
+
+                self._retries = 0
+                self.renames += 1
+                self.applied = target
+                self.channel_name = new_name
+                if self.pending == self.applied:
+                    self.lag_since = None
+                print(f"✅ เปลี่ยนชื่อช่องเป็น {new_name} (ค้างอยู่ {self.lag} ข้อความ)")
+                await self._persist()
+
+    @property
+    def lag(self):
+        """จำนวนข้อความที่นับแล้วแต่ยังไม่แสดงในชื่อช่อง"""
+        return self.pending - self.applied
+
+    def stats(self):
+        """สถิติของตัวนับและการเปลี่ยนชื่อช่อง"""
+        return {
+            "pending": self.pending,
+            "applied": self.applied,
+            "lag": self.lag,
+            "lag_seconds": time.monotonic() - self.lag_since if self.lag_since is not None else 0.0,
+            "renames": self.renames,
+            "rate_limited": self.rate_limited,
+            "failures": self.failures,
+            "next_rename_in": self._next_slot()
+        }
+
+
+# ตัวนับที่ใช้ร่วมกันทั้งโปรเซส
+channel_counter = ChannelCounter()
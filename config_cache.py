@@ -0,0 +1,193 @@
+"""
+แคชการตั้งค่าในหน่วยความจำสำหรับบอท Discord Shop
+เก็บค่าที่อ่านบ่อย (Target Channel ID, QR Code, ข้อความขอบคุณ, หมวดหมู่, สถานะช่อง)
+ไว้ในโปรเซส การบันทึกผ่านแคชจะเขียนลงแหล่งข้อมูลจริงก่อนแล้วอัปเดตแคชทันที (write-through)
+ถ้ากำหนด TTL ค่าที่เก่าเกินจะถูกโหลดใหม่เบื้องหลัง โดยผู้เรียกยังได้ค่าเดิมทันทีไม่ต้องรอ
+"""
+import asyncio
+import os
+import time
+
+# อายุของค่าในแคช (วินาที) 0 = ไม่หมดอายุ ใช้เมื่อมีบอทหลายตัวแก้ค่าใน MongoDB ร่วมกัน
+CONFIG_CACHE_TTL = float(os.getenv("CONFIG_CACHE_TTL", "0"))
+
+
+class ConfigEntry:
+    """ค่าการตั้งค่าหนึ่งรายการพร้อมฟังก์ชันโหลด/บันทึก"""
+
+    __slots__ = ("name", "loader", "saver", "cast", "value", "loaded_at", "task", "writes")
+
+    def __init__(self, name, loader, saver=None, cast=None):
+        self.name = name
+        self.loader = loader
+        self.saver = saver
+        self.cast = cast
+        self.value = None
+        self.loaded_at = None
+        self.task = None
+        self.writes = 0  # นับการเขียนค่า เพื่อไม่ให้ผลการโหลดที่เก่ากว่าเขียนทับ
+
+    @property
+    def loaded(self):
+        return self.loaded_at is not None
+
+
+class ConfigCache:
+    """แคชการตั้งค่าแบบ typed
+
+    แต่ละรายการลงทะเบียนด้วย register() พร้อม loader/saver ที่เป็น async
+    และ cast สำหรับแปลงชนิดข้อมูล (เช่น int สำหรับ ID ช่อง)
+    """
+
+    def __init__(self, ttl=CONFIG_CACHE_TTL):
+        self.ttl = ttl
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.refreshes = 0
+        self.writes = 0
+
+    def register(self, name, loader, saver=None, cast=None):
+        """ลงทะเบียนค่าการตั้งค่า
+
+        Args:
+            name (str): ชื่อค่า
+            loader (callable): async function สำหรับโหลดค่าจากแหล่งข้อมูลจริง
+            saver (callable, optional): async function สำหรับบันทึกค่า (รับค่าใหม่ 1 อาร์กิวเมนต์)
+            cast (callable, optional): ฟังก์ชันแปลงชนิดข้อมูล
+        """
+        self._entries[name] = ConfigEntry(name, loader, saver, cast)
+
+    def _convert(self, entry, value):
+        return entry.cast(value) if entry.cast is not None else value
+
+    @staticmethod
+    def _copy(value):
+        # คืนสำเนาของ dict เพื่อไม่ให้ผู้เรียกแก้ค่าในแคชโดยตรง
+        return dict(value) if isinstance(value, dict) else value
+
+    def _is_stale(self, entry):
+        return self.ttl > 0 and time.monotonic() - entry.loaded_at > self.ttl
+
+    async def _run_loader(self, entry):
+        writes = entry.writes
+        try:
+            value = self._convert(entry, await entry.loader())
+            if entry.writes != writes and entry.loaded:
+                # มีการบันทึกค่าใหม่ระหว่างโหลด ใช้ค่าที่บันทึกแทน
+                return entry.value
+            entry.value = value
+            entry.loaded_at = time.monotonic()
+            self.refreshes += 1
+            return value
+        finally:
+            entry.task = None
+
+    def _start_load(self, entry):
+        # โหลดพร้อมกันได้ครั้งเดียวต่อรายการ ผู้เรียกคนอื่นรอผลลัพธ์เดียวกัน
+        if entry.task is None:
+            entry.task = asyncio.ensure_future(self._run_loader(entry))
+        return entry.task
+
+    async def _background_refresh(self, entry):
+        try:
+            await self._start_load(entry)
+        except Exception as e:
+            # โหลดใหม่ไม่สำเร็จ ใช้ค่าเดิมต่อไป
+            print(f"⚠️ ไม่สามารถโหลดการตั้งค่า {entry.name} ใหม่: {str(e)}")
+
+    async def get(self, name):
+        """อ่านค่าการตั้งค่า (โหลดจากแหล่งข้อมูลจริงเฉพาะครั้งแรก)"""
+        entry = self._entries[name]
+        if not entry.loaded:
+            self.misses += 1
+            return self._copy(await asyncio.shield(self._start_load(entry)))
+
+        self.hits += 1
+        if self._is_stale(entry) and entry.task is None:
+            asyncio.ensure_future(self._background_refresh(entry))
+        return self._copy(entry.value)
+
+    def read(self, name, default=None):
+        """อ่านค่าในแคชแบบไม่ต้อง await สำหรับโค้ดที่ไม่ใช่ coroutine (เช่น การสร้าง view ของหน้าร้าน)
+
+        ไม่โหลดค่าที่ยังไม่เคยโหลด (คืน default) ถ้าค่าเก่าเกิน TTL จะโหลดใหม่เบื้องหลังเหมือน get()
+        ค่าที่คืนเป็นออบเจกต์ในแคชโดยตรง (ไม่คัดลอกเพราะอยู่บน hot path) ผู้เรียกห้ามแก้ไข
+        """
+        entry = self._entries[name]
+        if not entry.loaded:
+            return default
+
+        self.hits += 1
+        if self._is_stale(entry) and entry.task is None:
+            try:
+                asyncio.get_running_loop()
+            except RuntimeError:
+                # เรียกนอก event loop (เช่นใน thread pool) ให้ get()/read() ใน event loop เป็นผู้โหลดใหม่
+                pass
+            else:
+                asyncio.ensure_future(self._background_refresh(entry))
+        return entry.value
+
+    def peek(self, name, default=None):
+        """อ่านค่าในแคชโดยไม่โหลด (คืน default ถ้ายังไม่เคยโหลด)"""
+        entry = self._entries[name]
+        return self._copy(entry.value) if entry.loaded else default
+
+    async def refresh(self, name):
+        """บังคับโหลดค่าใหม่จากแหล่งข้อมูลจริง"""
+        entry = self._entries[name]
+        return self._copy(await asyncio.shield(self._start_load(entry)))
+
+    async def set(self, name, value):
+        """บันทึกค่าใหม่ลงแหล่งข้อมูลจริงแล้วอัปเดตแคช
+
+        Returns:
+            ค่าที่ saver คืนกลับมา
+        """
+        entry = self._entries[name]
+        value = self._convert(entry, value)
+        result = await entry.saver(value) if entry.saver is not None else True
+        entry.value = value
+        entry.loaded_at = time.monotonic()
+        entry.writes += 1
+        self.writes += 1
+        return result
+
+    def update(self, name, value):
+        """อัปเดตค่าในแคชโดยไม่บันทึก (ใช้เมื่อค่าถูกเขียนลงแหล่งข้อมูลไปแล้ว)"""
+        entry = self._entries[name]
+        entry.value = self._convert(entry, value)
+        entry.loaded_at = time.monotonic()
+        entry.writes += 1
+
+    def invalidate(self, name=None):
+        """ลบค่าในแคช (ไม่ระบุชื่อ = ลบทั้งหมด) ครั้งถัดไปจะโหลดใหม่"""
+        entries = [self._entries[name]] if name is not None else self._entries.values()
+        for entry in entries:
+            entry.value = None
+            entry.loaded_at = None
+
+    def stats(self):
+        """สถิติการใช้งานแคช"""
+        return {
+            "entries": sum(1 for entry in self._entries.values() if entry.loaded),
+            "hits": self.hits,
+            "misses": self.misses,
+            "refreshes": self.refreshes,
+            "writes": self.writes
+        }
+
+
+def channel_state_value(state):
+    """แปลงข้อมูลสถานะช่องให้มีคีย์และชนิดข้อมูลครบ"""
+    state = state or {}
+    return {
+        "channel_name": str(state.get("channel_name", "")),
+        "current_number": int(state.get("current_number", 0)),
+        "pending_number": int(state.get("pending_number", 0))
+    }
+
+
+# แคชการตั้งค่าที่ใช้ร่วมกันทั้งโปรเซส
+config_cache = ConfigCache()
@@ -1,6 +1,7 @@
 import json
 import os
-from datetime import datetime
+import threading
+from datetime import datetime, timezone
 import os.path
 from pathlib import Path
 
@@ -31,13 +32,90 @@ except (ImportError, AttributeError):
     MONGODB_AVAILABLE = False
     print("⚠️ ไม่สามารถเชื่อมต่อกับ MongoDB - จะใช้ไฟล์ JSON ท้องถิ่นแทน")
 
+# คำสั่งสำหรับ bulk_write และ find_one_and_update
+try:
+    from pymongo import DeleteOne, ReplaceOne, ReturnDocument
+except ImportError:
+    DeleteOne = None
+    ReplaceOne = None
+    ReturnDocument = None
+
+# file lock สำหรับตัวนับในไฟล์ JSON (มีเฉพาะบน POSIX)
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# collection สำหรับ driver แบบ asyncio (ใช้ client ตัวเดียวกันจาก mongodb_config)
+try:
+    from mongodb_config import async_db as async_database
+except (ImportError, AttributeError):
+    async_database = None
+
+if async_database is not None:
+    async_products_collection = async_database["products"]
+    async_countries_collection = async_database["countries"]
+    async_history_collection = async_database["history"]
+    async_configs_collection = async_database["configs"]
+    ASYNC_MONGODB_AVAILABLE = True
+else:
+    async_products_collection = None
+    async_countries_collection = None
+    async_history_collection = None
+    async_configs_collection = None
+    ASYNC_MONGODB_AVAILABLE = False
+
+def _read_json_file(path, default):
+    """อ่านไฟล์ JSON (คืนค่า default ถ้าไม่มีไฟล์หรืออ่านไม่ได้)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return default
+
+def _write_json_file(path, data, indent=2):
+    """เขียนข้อมูลลงไฟล์ JSON (เขียนไฟล์ชั่วคราวแล้วสลับ เพื่อไม่ให้ผู้อ่านเห็นไฟล์ที่เขียนไม่ครบ)"""
+    temp_file = str(path) + ".tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(temp_file, path)
+
+async def _run_blocking(func, *args):
+    """อ่าน/เขียนไฟล์จากฟังก์ชัน async ผ่าน thread pool กลางของ async_db (จำกัดงานที่บล็อกทั้งหมดไว้ที่เดียว)"""
+    # import ภายในฟังก์ชันเพราะ async_db import โมดูลนี้
+    from async_db import run_blocking
+    return await run_blocking(func, *args)
+
+def _stamp(doc):
+    """ใส่เวลาแก้ไขล่าสุด (updated_at) ให้เอกสาร ใช้สำหรับ delta sync"""
+    doc["updated_at"] = datetime.now(timezone.utc)
+    return doc
+
+def _serialize_product(product):
+    """แปลง _id และ updated_at เป็น str เพื่อให้สามารถแปลงเป็น JSON ได้"""
+    if "_id" in product:
+        product["_id"] = str(product["_id"])
+    if isinstance(product.get("updated_at"), datetime):
+        product["updated_at"] = product["updated_at"].isoformat()
+    return product
+
 # ================================
 # ฟังก์ชันจัดการข้อมูลประเทศ
 # ================================
 
 async def load_countries():
     """โหลดข้อมูลประเทศจาก MongoDB หรือไฟล์ JSON"""
-    
+
+    # ใช้ driver แบบ async ถ้ามี
+    if ASYNC_MONGODB_AVAILABLE:
+        try:
+            country_data = await async_countries_collection.find_one({}, {"_id": 0, "updated_at": 0})
+            if country_data:
+                return country_data
+        except Exception as e:
+            print(f"ไม่สามารถโหลดข้อมูลประเทศจาก MongoDB: {str(e)}")
+        return await _run_blocking(load_countries_tuple)
+
     # พยายามโหลดจาก MongoDB ก่อน
     if MONGODB_AVAILABLE and countries_collection is not None:
         try:
@@ -46,6 +124,7 @@ async def load_countries():
                 # ส่งคืนเป็นข้อมูลทั้งหมดเพื่อให้สามารถเขียนลงไฟล์ได้ง่าย
                 if "_id" in country_data:
                     del country_data["_id"]  # ลบ _id ออกเพื่อให้เก็บลงไฟล์ได้ง่าย
+                country_data.pop("updated_at", None)
                 return country_data
         except Exception as e:
             print(f"ไม่สามารถโหลดข้อมูลประเทศจาก MongoDB: {str(e)}")
@@ -98,9 +177,9 @@ def save_countries(countries, country_names, country_emojis, country_codes):
             # ตรวจสอบว่ามีข้อมูลอยู่แล้วหรือไม่
             existing_data = countries_collection.find_one({})
             if existing_data:
-                countries_collection.replace_one({"_id": existing_data["_id"]}, country_data)
+                countries_collection.replace_one({"_id": existing_data["_id"]}, _stamp(dict(country_data)))
             else:
-                countries_collection.insert_one(country_data)
+                countries_collection.insert_one(_stamp(dict(country_data)))
         except Exception as e:
             print(f"ไม่สามารถบันทึกข้อมูลประเทศลง MongoDB: {str(e)}")
 
@@ -117,10 +196,19 @@ async def save_countries_to_mongodb(country_data):
     if not MONGODB_AVAILABLE or countries_collection is None:
         print("ไม่สามารถเชื่อมต่อกับ MongoDB ได้ (save_countries_to_mongodb)")
         return False
-    
+
+    if ASYNC_MONGODB_AVAILABLE:
+        try:
+            # แทนที่เอกสารเดิม (หรือสร้างใหม่) ในคำสั่งเดียว
+            await async_countries_collection.replace_one({}, _stamp(country_data.copy()), upsert=True)
+            return True
+        except Exception as e:
+            print(f"ไม่สามารถบันทึกข้อมูลประเทศลง MongoDB: {str(e)}")
+            return False
+
     try:
         # สร้างสำเนาข้อมูลเพื่อไม่ให้เปลี่ยนแปลงข้อมูลต้นฉบับ
-        country_data = country_data.copy()
+        country_data = _stamp(country_data.copy())
         
         # ตรวจสอบว่ามีข้อมูลอยู่แล้วหรือไม่
         existing_data = countries_collection.find_one({})
@@ -275,12 +363,8 @@ def load_products(country=None, category=None):
         # ดึงข้อมูลจาก MongoDB
         products = list(products_collection.find(query))
         
-        # แปลง _id เป็น str เพื่อให้สามารถแปลงเป็น JSON ได้
-        for product in products:
-            if "_id" in product:
-                product["_id"] = str(product["_id"])
-        
-        return products
+        # แปลง _id และ updated_at เป็น str เพื่อให้สามารถแปลงเป็น JSON ได้
+        return [_serialize_product(product) for product in products]
     except Exception as e:
         print(f"เกิดข้อผิดพลาดในการโหลดสินค้าจาก MongoDB: {str(e)}")
         return []
@@ -295,8 +379,112 @@ async def load_products_async(country=None, category=None):
     Returns:
         list: รายการสินค้าที่ตรงกับเงื่อนไข
     """
-    # เรียกใช้ฟังก์ชันปกติเพราะไม่มีการทำงานแบบ async ใน MongoDB Client
-    return load_products(country, category)
+    # ถ้าไม่มี driver แบบ async ให้ใช้ฟังก์ชันปกติ
+    if not ASYNC_MONGODB_AVAILABLE:
+        return load_products(country, category)
+
+    query = {}
+    if country:
+        query["country"] = country
+    if category:
+        query["category"] = category
+
+    try:
+        products = await async_products_collection.find(query).to_list(None)
+
+        # แปลง _id และ updated_at เป็น str เพื่อให้สามารถแปลงเป็น JSON ได้
+        return [_serialize_product(product) for product in products]
+    except Exception as e:
+        print(f"เกิดข้อผิดพลาดในการโหลดสินค้าจาก MongoDB: {str(e)}")
+        return []
+
+def load_products_since(since):
+    """โหลดเฉพาะสินค้าที่ถูกแก้ไขตั้งแต่เวลาที่ระบุ (ใช้ index updated_at)
+
+    Args:
+        since (datetime): เวลาเริ่มต้น (UTC)
+
+    Returns:
+        list: รายการสินค้าที่ updated_at >= since
+    """
+    if not MONGODB_AVAILABLE or products_collection is None:
+        raise Exception("ไม่สามารถเชื่อมต่อกับ MongoDB ได้")
+
+    products = products_collection.find({"updated_at": {"$gte": since}})
+    return [_serialize_product(product) for product in products]
+
+async def load_products_since_async(since):
+    """โหลดเฉพาะสินค้าที่ถูกแก้ไขตั้งแต่เวลาที่ระบุ (async version)"""
+    # ถ้าไม่มี driver แบบ async ให้ใช้ฟังก์ชันปกติ
+    if not ASYNC_MONGODB_AVAILABLE:
+        return load_products_since(since)
+
+    products = await async_products_collection.find({"updated_at": {"$gte": since}}).to_list(None)
+    return [_serialize_product(product) for product in products]
+
+# config_type ใน configs ที่ซิงค์ลงไฟล์ (ข้อมูลประเทศอยู่ในคอลเลกชัน countries แยกต่างหาก)
+SYNCED_CONFIG_TYPES = ("categories", "qrcode", "thank_you")
+
+def load_configs_since(since=None):
+    """โหลดเฉพาะการตั้งค่าที่ถูกแก้ไขตั้งแต่เวลาที่ระบุ
+
+    Args:
+        since (datetime, optional): เวลาเริ่มต้น (UTC) - None = โหลดทั้งหมด
+
+    Returns:
+        dict: config_type -> เอกสารการตั้งค่า (ไม่มี _id, config_type และ updated_at)
+            ข้อมูลประเทศใช้คีย์ "countries"
+    """
+    if not MONGODB_AVAILABLE or configs_collection is None:
+        raise Exception("ไม่สามารถเชื่อมต่อกับ MongoDB ได้")
+
+    query = {} if since is None else {"updated_at": {"$gte": since}}
+    projection = {"_id": 0, "updated_at": 0}
+    configs = {}
+    for doc in configs_collection.find({**query, "config_type": {"$in": list(SYNCED_CONFIG_TYPES)}}, projection):
+        configs[doc.pop("config_type")] = doc
+    country_data = countries_collection.find_one(query, projection)
+    if country_data:
+        configs["countries"] = country_data
+    return configs
+
+async def load_configs_since_async(since=None):
+    """โหลดเฉพาะการตั้งค่าที่ถูกแก้ไขตั้งแต่เวลาที่ระบุ (async version)"""
+    # ถ้าไม่มี driver แบบ async ให้ใช้ฟังก์ชันปกติ
+    if not ASYNC_MONGODB_AVAILABLE:
+        return load_configs_since(since)
+
+    query = {} if since is None else {"updated_at": {"$gte": since}}
+    projection = {"_id": 0, "updated_at": 0}
+    configs = {}
+    cursor = async_configs_collection.find({**query, "config_type": {"$in": list(SYNCED_CONFIG_TYPES)}}, projection)
+    async for doc in cursor:
+        configs[doc.pop("config_type")] = doc
+    country_data = await async_countries_collection.find_one(query, projection)
+    if country_data:
+        configs["countries"] = country_data
+    return configs
+
+def load_product_keys():
+    """โหลดเฉพาะคีย์ (country, category, name) ของสินค้าทั้งหมด ใช้ตรวจหาสินค้าที่ถูกลบ
+
+    Returns:
+        set: คีย์ของสินค้าที่มีอยู่ใน MongoDB
+    """
+    if not MONGODB_AVAILABLE or products_collection is None:
+        raise Exception("ไม่สามารถเชื่อมต่อกับ MongoDB ได้")
+
+    docs = products_collection.find({}, {"_id": 0, "country": 1, "category": 1, "name": 1})
+    return {_product_key(doc) for doc in docs}
+
+async def load_product_keys_async():
+    """โหลดเฉพาะคีย์ของสินค้าทั้งหมด (async version)"""
+    # ถ้าไม่มี driver แบบ async ให้ใช้ฟังก์ชันปกติ
+    if not ASYNC_MONGODB_AVAILABLE:
+        return load_product_keys()
+
+    cursor = async_products_collection.find({}, {"_id": 0, "country": 1, "category": 1, "name": 1})
+    return {_product_key(doc) async for doc in cursor}
 
 def save_product(product):
     """บันทึกสินค้าเดียวลง MongoDB
@@ -320,6 +508,7 @@ def save_product(product):
         "category": product["category"]
     })
     
+    product = _stamp(dict(product))
     if existing_product:
         # อัปเดตสินค้าที่มีอยู่แล้ว
         product_id = existing_product["_id"]
@@ -410,7 +599,7 @@ def update_product(name, country, new_emoji=None, new_name=None, new_price=None,
         return True
     
     # อัปเดตสินค้า
-    products_collection.update_one({"_id": product["_id"]}, {"$set": updates})
+    products_collection.update_one({"_id": product["_id"]}, {"$set": _stamp(updates)})
     
     return True
 
@@ -472,7 +661,7 @@ def add_no_product_placeholders():
                     "country": country,
                     "category": category
                 }
-                products_collection.insert_one(placeholder)
+                products_collection.insert_one(_stamp(placeholder))
                 placeholder_count += 1
     
     return placeholder_count
@@ -556,6 +745,24 @@ async def load_qrcode_url_async():
     Returns:
         str: URL ของ QR code
     """
+    if ASYNC_MONGODB_AVAILABLE:
+        default_url = "https://promptpay.io/1234567890"
+        try:
+            config = await async_configs_collection.find_one({"config_type": "qrcode"})
+            if config and config.get("url"):
+                return config["url"]
+
+            # หากไม่พบข้อมูลใน MongoDB ให้ใช้ข้อมูลจากไฟล์ local แล้วบันทึกกลับลง MongoDB
+            local_config = await _run_blocking(_read_json_file, QRCODE_CONFIG_FILE, {})
+            local_url = local_config.get("url", default_url)
+            print(f"⚠️ ไม่พบข้อมูล QR Code ใน MongoDB - ใช้ข้อมูลจากไฟล์ local แทน: {local_url}")
+            await save_qrcode_to_mongodb(local_url)
+            return local_url
+        except Exception as e:
+            print(f"❌ เกิดข้อผิดพลาดในการโหลด QR Code จาก MongoDB: {e}")
+            local_config = await _run_blocking(_read_json_file, QRCODE_CONFIG_FILE, {})
+            return local_config.get("url", default_url)
+
     try:
         # ตรวจสอบการเชื่อมต่อกับ MongoDB
         from mongodb_config import client
@@ -605,14 +812,14 @@ def save_qrcode_url(url):
         # อัปเดตการตั้งค่าที่มีอยู่
         configs_collection.update_one(
             {"_id": config["_id"]},
-            {"$set": {"url": url}}
+            {"$set": _stamp({"url": url})}
         )
     else:
         # สร้างการตั้งค่าใหม่
-        configs_collection.insert_one({
+        configs_collection.insert_one(_stamp({
             "config_type": "qrcode",
             "url": url
-        })
+        }))
     
     # บันทึกลงไฟล์ด้วยเพื่อให้มีข้อมูลสำรอง
     with open(QRCODE_CONFIG_FILE, 'w', encoding='utf-8') as f:
@@ -632,7 +839,27 @@ async def save_qrcode_to_mongodb(url):
     if not MONGODB_AVAILABLE or configs_collection is None:
         print("ไม่สามารถเชื่อมต่อกับ MongoDB ได้ (save_qrcode_to_mongodb)")
         return False
-    
+
+    if ASYNC_MONGODB_AVAILABLE:
+        try:
+            # อัปเดตหรือสร้างการตั้งค่าในคำสั่งเดียว
+            await async_configs_collection.update_one(
+                {"config_type": "qrcode"},
+                {"$set": _stamp({"url": url})},
+                upsert=True
+            )
+            ok = True
+        except Exception as e:
+            print(f"ไม่สามารถบันทึก QR Code URL ลง MongoDB: {str(e)}")
+            ok = False
+
+        # บันทึกลงไฟล์ด้วยเพื่อให้มีข้อมูลสำรอง
+        try:
+            await _run_blocking(_write_json_file, QRCODE_CONFIG_FILE, {"url": url})
+        except Exception as file_error:
+            print(f"ไม่สามารถบันทึก QR Code URL ลงไฟล์: {str(file_error)}")
+        return ok
+
     try:
         # ตรวจสอบว่ามีการตั้งค่าอยู่แล้วหรือไม่
         config = configs_collection.find_one({"config_type": "qrcode"})
@@ -641,14 +868,14 @@ async def save_qrcode_to_mongodb(url):
             # อัปเดตการตั้งค่าที่มีอยู่
             configs_collection.update_one(
                 {"_id": config["_id"]},
-                {"$set": {"url": url}}
+                {"$set": _stamp({"url": url})}
             )
         else:
             # สร้างการตั้งค่าใหม่
-            configs_collection.insert_one({
+            configs_collection.insert_one(_stamp({
                 "config_type": "qrcode",
                 "url": url
-            })
+            }))
             
         # บันทึกลงไฟล์ด้วยเพื่อให้มีข้อมูลสำรอง
         with open(QRCODE_CONFIG_FILE, 'w', encoding='utf-8') as f:
@@ -696,7 +923,20 @@ async def load_thank_you_message_async():
     Returns:
         str: ข้อความขอบคุณ
     """
-    return load_thank_you_message()  # ใช้ฟังก์ชันปกติเพราะไม่มีการทำงานแบบ async ใน MongoDB Client
+    # ถ้าไม่มี driver แบบ async ให้ใช้ฟังก์ชันปกติ
+    if not ASYNC_MONGODB_AVAILABLE:
+        return load_thank_you_message()
+
+    default_message = "✅ ขอบคุณสำหรับการสั่งซื้อ! สินค้าจะถูกส่งถึงคุณเร็วๆ นี้"
+    try:
+        config = await async_configs_collection.find_one({"config_type": "thank_you"})
+        return config.get("message", default_message) if config else default_message
+    except Exception as e:
+        print(f"ไม่สามารถโหลดข้อความขอบคุณจาก MongoDB: {str(e)}")
+
+    # ถ้าไม่สามารถโหลดจาก MongoDB ได้ ให้โหลดจากไฟล์
+    config = await _run_blocking(_read_json_file, THANK_YOU_CONFIG_FILE, {})
+    return config.get("message", default_message)
 
 def save_thank_you_message(message):
     """บันทึกข้อความขอบคุณลง MongoDB
@@ -720,14 +960,14 @@ def save_thank_you_message(message):
         # อัปเดตการตั้งค่าที่มีอยู่
         configs_collection.update_one(
             {"_id": config["_id"]},
-            {"$set": {"message": message}}
+            {"$set": _stamp({"message": message})}
         )
     else:
         # สร้างการตั้งค่าใหม่
-        configs_collection.insert_one({
+        configs_collection.insert_one(_stamp({
             "config_type": "thank_you",
             "message": message
-        })
+        }))
     
     # บันทึกลงไฟล์ด้วยเพื่อให้มีข้อมูลสำรอง
     with open(THANK_YOU_CONFIG_FILE, 'w', encoding='utf-8') as f:
@@ -747,7 +987,27 @@ async def save_thank_you_message_to_mongodb(message):
     if not MONGODB_AVAILABLE or configs_collection is None:
         print("ไม่สามารถเชื่อมต่อกับ MongoDB ได้ (save_thank_you_message_to_mongodb)")
         return False
-    
+
+    if ASYNC_MONGODB_AVAILABLE:
+        try:
+            # อัปเดตหรือสร้างการตั้งค่าในคำสั่งเดียว
+            await async_configs_collection.update_one(
+                {"config_type": "thank_you"},
+                {"$set": _stamp({"message": message})},
+                upsert=True
+            )
+            ok = True
+        except Exception as e:
+            print(f"ไม่สามารถบันทึกข้อความขอบคุณลง MongoDB: {str(e)}")
+            ok = False
+
+        # บันทึกลงไฟล์ด้วยเพื่อให้มีข้อมูลสำรอง
+        try:
+            await _run_blocking(_write_json_file, THANK_YOU_CONFIG_FILE, {"message": message})
+        except Exception as file_error:
+            print(f"ไม่สามารถบันทึกข้อความขอบคุณลงไฟล์: {str(file_error)}")
+        return ok
+
     try:
         # ตรวจสอบว่ามีการตั้งค่าอยู่แล้วหรือไม่
         config = configs_collection.find_one({"config_type": "thank_you"})
@@ -756,14 +1016,14 @@ async def save_thank_you_message_to_mongodb(message):
             # อัปเดตการตั้งค่าที่มีอยู่
             configs_collection.update_one(
                 {"_id": config["_id"]},
-                {"$set": {"message": message}}
+                {"$set": _stamp({"message": message})}
             )
         else:
             # สร้างการตั้งค่าใหม่
-            configs_collection.insert_one({
+            configs_collection.insert_one(_stamp({
                 "config_type": "thank_you",
                 "message": message
-            })
+            }))
             
         # บันทึกลงไฟล์ด้วยเพื่อให้มีข้อมูลสำรอง
         with open(THANK_YOU_CONFIG_FILE, 'w', encoding='utf-8') as f:
@@ -788,6 +1048,22 @@ async def load_categories():
     Returns:
         dict: ข้อมูลหมวดหมู่
     """
+    if ASYNC_MONGODB_AVAILABLE:
+        try:
+            config = await async_configs_collection.find_one(
+                {"config_type": "categories"},
+                {"_id": 0, "config_type": 0, "updated_at": 0}
+            )
+            if config:
+                return config
+        except Exception as e:
+            print(f"ไม่สามารถโหลดข้อมูลหมวดหมู่จาก MongoDB: {str(e)}")
+        return await _run_blocking(
+            _read_json_file,
+            SCRIPT_DIR / "categories_config.json",
+            {"category_names": {}, "category_emojis": {}}
+        )
+
     if MONGODB_AVAILABLE and configs_collection is not None:
         try:
             config = configs_collection.find_one({"config_type": "categories"})
@@ -795,6 +1071,7 @@ async def load_categories():
                 if "_id" in config:
                     del config["_id"]
                     del config["config_type"]
+                config.pop("updated_at", None)
                 return config
         except Exception as e:
             print(f"ไม่สามารถโหลดข้อมูลหมวดหมู่จาก MongoDB: {str(e)}")
@@ -818,7 +1095,24 @@ async def save_categories_to_mongodb(categories_data):
     if not MONGODB_AVAILABLE or configs_collection is None:
         print("ไม่สามารถเชื่อมต่อกับ MongoDB ได้ (save_categories_to_mongodb)")
         return False
-    
+
+    if ASYNC_MONGODB_AVAILABLE:
+        categories_data = categories_data.copy()
+        categories_data["config_type"] = "categories"
+        try:
+            await async_configs_collection.replace_one(
+                {"config_type": "categories"}, _stamp(dict(categories_data)), upsert=True
+            )
+        except Exception as e:
+            print(f"ไม่สามารถอัพโหลดข้อมูลหมวดหมู่ไปยัง MongoDB: {str(e)}")
+            return False
+
+        # บันทึกลงไฟล์ด้วย
+        categories_data_copy = categories_data.copy()
+        del categories_data_copy["config_type"]
+        await _run_blocking(_write_json_file, SCRIPT_DIR / "categories_config.json", categories_data_copy)
+        return True
+
     try:
         # เพิ่มประเภทของข้อมูล
         categories_data = categories_data.copy()  # สร้างสำเนาเพื่อไม่ให้เปลี่ยนแปลงข้อมูลต้นฉบับ
@@ -832,10 +1126,10 @@ async def save_categories_to_mongodb(categories_data):
     
     if existing_data:
         # ถ้ามีข้อมูลอยู่แล้ว ให้อัปเดต
-        configs_collection.replace_one({"_id": existing_data["_id"]}, categories_data)
+        configs_collection.replace_one({"_id": existing_data["_id"]}, _stamp(dict(categories_data)))
     else:
         # ถ้ายังไม่มีข้อมูล ให้เพิ่มใหม่
-        configs_collection.insert_one(categories_data)
+        configs_collection.insert_one(_stamp(dict(categories_data)))
     
     # บันทึกลงไฟล์ด้วย
     categories_data_copy = categories_data.copy()
@@ -846,30 +1140,88 @@ async def save_categories_to_mongodb(categories_data):
     
     return True
     
+def _product_key(product):
+    """คีย์ของสินค้าที่ใช้จับคู่ระหว่างไฟล์กับ MongoDB"""
+    return (product.get("country"), product.get("category"), product.get("name"))
+
+def build_product_sync_operations(local_products, remote_products):
+    """เปรียบเทียบสินค้าในเครื่องกับใน MongoDB ตาม (country, category, name)
+
+    Args:
+        local_products (list): รายการสินค้าที่ต้องการให้มีใน MongoDB
+        remote_products (list): เอกสารสินค้าที่อยู่ใน MongoDB ตอนนี้ (ต้องมี _id)
+
+    Returns:
+        tuple: (รายการคำสั่งสำหรับ bulk_write, dict จำนวน inserted/updated/deleted/unchanged)
+    """
+    # สินค้าในเครื่อง (ชื่อซ้ำในหมวดเดียวกันให้ใช้รายการหลังสุด)
+    wanted = {}
+    for product in local_products:
+        doc = {k: v for k, v in product.items() if k not in ("_id", "updated_at")}
+        wanted[_product_key(doc)] = doc
+
+    operations = []
+    counts = {"inserted": 0, "updated": 0, "deleted": 0, "unchanged": 0}
+
+    existing = {}
+    for remote in remote_products:
+        key = _product_key(remote)
+        if key not in wanted or key in existing:
+            # ไม่มีในเครื่องแล้ว หรือเป็นเอกสารซ้ำ
+            operations.append(DeleteOne({"_id": remote["_id"]}))
+            counts["deleted"] += 1
+        else:
+            existing[key] = remote
+
+    for key, doc in wanted.items():
+        remote = existing.get(key)
+        if remote is None:
+            country, category, name = key
+            operations.append(ReplaceOne({"country": country, "category": category, "name": name}, _stamp(dict(doc)), upsert=True))
+            counts["inserted"] += 1
+        elif {k: v for k, v in remote.items() if k not in ("_id", "updated_at")} == doc:
+            counts["unchanged"] += 1
+        else:
+            operations.append(ReplaceOne({"_id": remote["_id"]}, _stamp(dict(doc))))
+            counts["updated"] += 1
+
+    return operations, counts
+
 async def save_products_to_mongodb(products):
-    """บันทึกข้อมูลสินค้าไปยัง MongoDB
+    """ซิงค์ข้อมูลสินค้าไปยัง MongoDB
+
+    เขียนเฉพาะเอกสารที่เปลี่ยนแปลงด้วย bulk_write แบบ unordered ครั้งเดียว
+    สินค้าที่ไม่เปลี่ยนจะไม่ถูกแตะ และคอลเลกชันจะไม่ว่างระหว่างอัพโหลด
     
     Args:
         products (list): รายการสินค้า
         
     Returns:
-        bool: True ถ้าสำเร็จ
+        dict: จำนวนสินค้า inserted, updated, deleted, unchanged
     """
     if not MONGODB_AVAILABLE or products_collection is None:
         raise Exception("ไม่สามารถเชื่อมต่อกับ MongoDB ได้")
-    
-    # ลบข้อมูลเดิมทั้งหมด
-    products_collection.delete_many({})
-    
-    # เพิ่มข้อมูลใหม่
-    for product in products:
-        products_collection.insert_one(product)
+
+    if ASYNC_MONGODB_AVAILABLE:
+        remote_products = await async_products_collection.find({}).to_list(None)
+        operations, counts = build_product_sync_operations(products, remote_products)
+        if operations:
+            await async_products_collection.bulk_write(operations, ordered=False)
+
+        # บันทึกลงไฟล์ด้วย
+        await _run_blocking(_write_json_file, PRODUCTS_FILE, products)
+        return counts
+
+    remote_products = list(products_collection.find({}))
+    operations, counts = build_product_sync_operations(products, remote_products)
+    if operations:
+        products_collection.bulk_write(operations, ordered=False)
     
     # บันทึกลงไฟล์ด้วย
     with open(PRODUCTS_FILE, 'w', encoding='utf-8') as f:
         json.dump(products, f, ensure_ascii=False, indent=2)
     
-    return True
+    return counts
 
 def load_target_channel_id():
     """โหลด Target Channel ID จาก MongoDB
@@ -904,7 +1256,19 @@ async def load_target_channel_id_async():
     Returns:
         int: ID ของช่องเป้าหมาย
     """
-    return load_target_channel_id()
+    # ถ้าไม่มี driver แบบ async ให้ใช้ฟังก์ชันปกติ
+    if not ASYNC_MONGODB_AVAILABLE:
+        return load_target_channel_id()
+
+    try:
+        data = await async_configs_collection.find_one({"config_type": "target_channel"})
+        if data:
+            return data.get("target_channel_id", 1378803518030217328)
+        else:
+            return 1378803518030217328
+    except Exception as e:
+        print(f"ไม่สามารถโหลด Target Channel ID จาก MongoDB: {str(e)}")
+        return 1378803518030217328
 
 def save_target_channel_id(channel_id):
     """บันทึก Target Channel ID ลง MongoDB
@@ -960,7 +1324,27 @@ async def save_target_channel_id_to_mongodb(channel_id):
     Returns:
         bool: True ถ้าสำเร็จ
     """
-    return save_target_channel_id(channel_id)
+    # ถ้าไม่มี driver แบบ async ให้ใช้ฟังก์ชันปกติ
+    if not ASYNC_MONGODB_AVAILABLE:
+        return save_target_channel_id(channel_id)
+
+    try:
+        await async_configs_collection.replace_one(
+            {"config_type": "target_channel"},
+            {"config_type": "target_channel", "target_channel_id": channel_id},
+            upsert=True
+        )
+
+        # บันทึกลงไฟล์ด้วย
+        await _run_blocking(
+            _write_json_file,
+            SCRIPT_DIR / "target_channel_config.json",
+            {"target_channel_id": channel_id}
+        )
+        return True
+    except Exception as e:
+        print(f"ไม่สามารถบันทึก Target Channel ID ลง MongoDB: {str(e)}")
+        return False
 
 def load_channel_state():
     """โหลดสถานะช่องจาก MongoDB
@@ -1012,8 +1396,7 @@ def save_channel_state(channel_name, current_number, pending_number):
                 "current_number": current_number,
                 "pending_number": pending_number
             }
-            with open(SCRIPT_DIR / "channel_state.json", 'w', encoding='utf-8') as f:
-                json.dump(state_data, f, ensure_ascii=False, indent=2)
+            _update_channel_state_file(lambda state: state_data)
             return True
         except Exception as e:
             print(f"ไม่สามารถบันทึกสถานะช่องลงไฟล์: {str(e)}")
@@ -1051,57 +1434,242 @@ def save_channel_state(channel_name, current_number, pending_number):
         print(f"ไม่สามารถบันทึกสถานะช่องลง MongoDB: {str(e)}")
         return False
 
-def get_next_channel_number():
-    """ดึงตัวเลขถัดไปสำหรับชื่อช่อง
-    
+async def load_channel_state_async():
+    """โหลดสถานะช่องจาก MongoDB (async version)
+
     Returns:
-        int: ตัวเลขถัดไปที่ควรใช้
+        dict: ข้อมูลสถานะช่อง (channel_name, current_number, pending_number)
     """
-    state = load_channel_state()
-    return state.get("pending_number", 0)
+    # ถ้าไม่มี driver แบบ async ให้ใช้ฟังก์ชันปกติ
+    if not ASYNC_MONGODB_AVAILABLE:
+        return load_channel_state()
+
+    try:
+        data = await async_configs_collection.find_one({"config_type": "channel_state"})
+        if data:
+            return {
+                "channel_name": data.get("channel_name", ""),
+                "current_number": data.get("current_number", 0),
+                "pending_number": data.get("pending_number", 0)
+            }
+        else:
+            return {"channel_name": "", "current_number": 0, "pending_number": 0}
+    except Exception as e:
+        print(f"ไม่สามารถโหลดสถานะช่องจาก MongoDB: {str(e)}")
+        return {"channel_name": "", "current_number": 0, "pending_number": 0}
+
+async def save_channel_state_async(channel_name, current_number, pending_number):
+    """บันทึกสถานะช่องลง MongoDB (async version)
+
+    Args:
+        channel_name (str): ชื่อช่องปัจจุบัน
+        current_number (int): ตัวเลขปัจจุบันในชื่อช่อง
+        pending_number (int): ตัวเลขที่รอการอัปเดต
+
+    Returns:
+        bool: True ถ้าสำเร็จ
+    """
+    # ถ้าไม่มี driver แบบ async ให้ใช้ฟังก์ชันปกติ
+    if not ASYNC_MONGODB_AVAILABLE:
+        return save_channel_state(channel_name, current_number, pending_number)
+
+    state_data = {
+        "channel_name": channel_name,
+        "current_number": current_number,
+        "pending_number": pending_number
+    }
+    try:
+        await async_configs_collection.replace_one(
+            {"config_type": "channel_state"},
+            {"config_type": "channel_state", **state_data},
+            upsert=True
+        )
+
+        # บันทึกลงไฟล์ด้วย
+        await _run_blocking(_write_json_file, SCRIPT_DIR / "channel_state.json", state_data)
+        return True
+    except Exception as e:
+        print(f"ไม่สามารถบันทึกสถานะช่องลง MongoDB: {str(e)}")
+        return False
+
+# ================================
+# ตัวนับของชื่อช่อง (atomic)
+# ================================
+# ทุกการแก้ตัวนับเป็นคำสั่งเดียวฝั่งเซิร์ฟเวอร์ ($inc / $max) จึงไม่มีการอ่าน-บวก-เขียนทับใน Python
+# ยกเว้นการซิงค์ที่แอดมินสั่งเอง ซึ่งตั้งตัวเลขตามชื่อช่องจริงด้วย $set (ลดลงได้)
+# บอทหลายตัวหรือข้อความที่เข้ามาพร้อมกันจะไม่ทำให้ตัวนับหาย
+CHANNEL_STATE_FILE = SCRIPT_DIR / "channel_state.json"
+_channel_state_file_lock = threading.Lock()
+
+def _channel_state_from_doc(doc):
+    """แปลงเอกสารสถานะช่องให้มีคีย์ครบ (None = ยังไม่มีสถานะ)"""
+    doc = doc or {}
+    return {
+        "channel_name": doc.get("channel_name", ""),
+        "current_number": doc.get("current_number", 0),
+        "pending_number": doc.get("pending_number", 0)
+    }
+
+def _update_channel_state_file(apply):
+    """อ่าน-แก้-เขียนไฟล์ channel_state.json ภายใต้ file lock
+
+    Args:
+        apply (callable): รับสถานะเดิม (dict) แล้วคืนสถานะใหม่
 
-def update_pending_number():
-    """อัปเดตตัวเลขที่รอการอัปเดต (+1)
-    
     Returns:
-        int: ตัวเลขใหม่ที่อัปเดตแล้ว
+        tuple: (สถานะก่อนแก้, สถานะหลังแก้)
     """
-    state = load_channel_state()
-    new_pending = state.get("pending_number", 0) + 1
-    save_channel_state(
-        state.get("channel_name", ""),
-        state.get("current_number", 0),
-        new_pending
+    with _channel_state_file_lock:
+        with open(str(CHANNEL_STATE_FILE) + ".lock", 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                before = _channel_state_from_doc(_read_json_file(CHANNEL_STATE_FILE, None))
+                after = apply(dict(before))
+                _write_json_file(CHANNEL_STATE_FILE, after)
+                return before, after
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def _increment_update(amount):
+    return {
+        "$inc": {"pending_number": amount},
+        "$setOnInsert": {"channel_name": "", "current_number": 0}
+    }
+
+def _advance_update(channel_name, current_number, pending_number, exact=False):
+    update = {}
+    numbers = {}
+    if current_number is not None:
+        numbers["current_number"] = current_number
+    if pending_number is not None:
+        numbers["pending_number"] = pending_number
+    sets = dict(numbers) if exact else {}
+    if numbers and not exact:
+        update["$max"] = numbers
+    if channel_name is not None:
+        sets["channel_name"] = channel_name
+    if sets:
+        update["$set"] = sets
+    return update
+
+def _advance_state(state, channel_name, current_number, pending_number, exact=False):
+    """คำนวณสถานะหลัง $max/$set แบบเดียวกับฝั่ง MongoDB"""
+    pick = (lambda old, new: new) if exact else max
+    if current_number is not None:
+        state["current_number"] = pick(state["current_number"], current_number)
+    if pending_number is not None:
+        state["pending_number"] = pick(state["pending_number"], pending_number)
+    if channel_name is not None:
+        state["channel_name"] = channel_name
+    return state
+
+def increment_channel_state(amount=1):
+    """เพิ่ม pending_number แบบ atomic
+
+    Args:
+        amount (int): จำนวนที่ต้องการเพิ่ม
+
+    Returns:
+        dict: สถานะช่องหลังเพิ่ม
+    """
+    if not MONGODB_AVAILABLE or configs_collection is None:
+        def apply(state):
+            state["pending_number"] += amount
+            return state
+        return _update_channel_state_file(apply)[1]
+
+    doc = configs_collection.find_one_and_update(
+        {"config_type": "channel_state"},
+        _increment_update(amount),
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
-    return new_pending
+    return _channel_state_from_doc(doc)
+
+async def increment_channel_state_async(amount=1):
+    """เพิ่ม pending_number แบบ atomic (async version)"""
+    # ถ้าไม่มี driver แบบ async ให้ใช้ฟังก์ชันปกติ
+    if not ASYNC_MONGODB_AVAILABLE:
+        return increment_channel_state(amount)
+
+    doc = await async_configs_collection.find_one_and_update(
+        {"config_type": "channel_state"},
+        _increment_update(amount),
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return _channel_state_from_doc(doc)
+
+def advance_channel_state(channel_name=None, current_number=None, pending_number=None, exact=False):
+    """เลื่อนตัวเลขในสถานะช่องขึ้นแบบ atomic ($max - ตัวเลขไม่มีวันลดลง)
 
-def sync_channel_numbers(actual_channel_name):
-    """ซิงค์ตัวเลขจากชื่อช่องจริงกับที่บันทึกไว้
-    
     Args:
-        actual_channel_name (str): ชื่อช่องจริงจาก Discord
-        
+        channel_name (str, optional): ชื่อช่องใหม่
+        current_number (int, optional): ตัวเลขที่แสดงในชื่อช่องแล้ว
+        pending_number (int, optional): ตัวเลขที่นับได้
+        exact (bool): True = ตั้งตัวเลขตามที่ให้มาด้วย $set (ใช้ตอนแอดมินซิงค์เอง)
+
     Returns:
-        bool: True ถ้ามีการซิงค์
+        tuple: (สถานะก่อนแก้, สถานะหลังแก้)
     """
-    import re
-    
-    # หาตัวเลขในชื่อช่องจริง
-    number_match = re.search(r'(\d+)$', actual_channel_name)
-    if not number_match:
-        return False
-    
-    actual_number = int(number_match.group(1))
-    state = load_channel_state()
+    if not MONGODB_AVAILABLE or configs_collection is None:
+        return _update_channel_state_file(
+            lambda state: _advance_state(state, channel_name, current_number, pending_number, exact)
+        )
+
+    doc = configs_collection.find_one_and_update(
+        {"config_type": "channel_state"},
+        _advance_update(channel_name, current_number, pending_number, exact),
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    before = _channel_state_from_doc(doc)
+    return before, _advance_state(dict(before), channel_name, current_number, pending_number, exact)
+
+async def advance_channel_state_async(channel_name=None, current_number=None, pending_number=None, exact=False):
+    """เลื่อนตัวเลขในสถานะช่องขึ้นแบบ atomic (async version)"""
+    # ถ้าไม่มี driver แบบ async ให้ใช้ฟังก์ชันปกติ
+    if not ASYNC_MONGODB_AVAILABLE:
+        return advance_channel_state(channel_name, current_number, pending_number, exact)
+
+    doc = await async_configs_collection.find_one_and_update(
+        {"config_type": "channel_state"},
+        _advance_update(channel_name, current_number, pending_number, exact),
+        upsert=True,
+        return_document=ReturnDocument.BEFORE
+    )
+    before = _channel_state_from_doc(doc)
+    return before, _advance_state(dict(before), channel_name, current_number, pending_number, exact)
+
+def get_next_channel_number():
+    """ดึงตัวเลขถัดไปสำหรับชื่อช่อง
     
-    # ถ้าตัวเลขจริงไม่ตรงกับที่บันทึกไว้ ให้ซิงค์
-    if actual_number != state.get("current_number", 0):
-        save_channel_state(
-            actual_channel_name,
-            actual_number,
-            actual_number  # ซิงค์ pending_number ด้วย
+    Returns:
+        int: ตัวเลขถัดไปที่ควรใช้
+    """
+    if not MONGODB_AVAILABLE or configs_collection is None:
+        return _channel_state_from_doc(_read_json_file(CHANNEL_STATE_FILE, None))["pending_number"]
+
+    try:
+        doc = configs_collection.find_one(
+            {"config_type": "channel_state"},
+            {"pending_number": 1, "_id": 0}
         )
-        print(f"🔄 ซิงค์ตัวเลขช่อง: {state.get('current_number', 0)} → {actual_number}")
-        return True
+        return _channel_state_from_doc(doc)["pending_number"]
+    except Exception as e:
+        print(f"ไม่สามารถโหลดสถานะช่องจาก MongoDB: {str(e)}")
+        return 0
+
+def update_pending_number():
+    """อัปเดตตัวเลขที่รอการอัปเดต (+1)
     
-    return False
\ No newline at end of file
+    Returns:
+        int: ตัวเลขใหม่ที่อัปเดตแล้ว (None ถ้าบันทึกไม่สำเร็จ)
+    """
+    try:
+        return increment_channel_state(1)["pending_number"]
+    except Exception as e:
+        print(f"ไม่สามารถอัปเดตตัวนับของช่อง: {str(e)}")
+        return None
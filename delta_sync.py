@@ -0,0 +1,293 @@
+"""
+ซิงค์ข้อมูลจาก MongoDB ลงไฟล์ JSON แบบเฉพาะส่วนที่เปลี่ยน (delta sync) สำหรับบอท Discord Shop
+ดึงเฉพาะสินค้าและการตั้งค่าที่ updated_at ใหม่กว่า checkpoint ของรอบก่อน แล้วเขียนเฉพาะไฟล์ที่เนื้อหาเปลี่ยน
+(เทียบ hash ของเนื้อหาและ mtime/size ของไฟล์ที่บันทึกไว้ใน sync_state.json)
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from async_db import load_products_async, load_products_since, load_product_keys, load_configs_since, run_blocking
+from catalog_store import catalog_store, _file_signature
+from db_operations import _product_key, _serialize_product, _read_json_file
+from json_store import JsonFileStore
+from write_behind import category_writer
+
+# ไฟล์เก็บ checkpoint และ hash ของไฟล์ที่เขียนล่าสุด
+SCRIPT_DIR = Path(__file__).parent.absolute()
+CATEGORIES_DIR = SCRIPT_DIR / "categories"
+PRODUCTS_FILE = SCRIPT_DIR / "products.json"
+SYNC_STATE_FILE = SCRIPT_DIR / "sync_state.json"
+
+# ดึงสินค้าย้อนหลังจาก checkpoint เผื่อเวลาของเครื่องที่เขียนข้อมูลไม่ตรงกัน (วินาที)
+SYNC_OVERLAP = float(os.getenv("SYNC_OVERLAP_SECONDS", "120"))
+
+# ฟิลด์ที่ไม่เก็บในไฟล์หมวดหมู่
+_CATEGORY_FILE_EXCLUDED = ("country", "category", "_id", "updated_at")
+
+
+def _content_fields(product):
+    """ข้อมูลสินค้าที่ใช้เปรียบเทียบว่าเปลี่ยนหรือไม่"""
+    return {k: v for k, v in product.items() if k not in ("_id", "updated_at")}
+
+
+def _group_products(products):
+    """แยกสินค้าตาม (ประเทศ, หมวดหมู่) ในรูปแบบเดียวกับไฟล์ categories/<ประเทศ>/<หมวด>.json"""
+    grouped = {}
+    for product in products:
+        key = (product.get("country", "1"), product.get("category", "money"))
+        product_copy = {k: v for k, v in product.items() if k not in _CATEGORY_FILE_EXCLUDED}
+        grouped.setdefault(key, []).append(product_copy)
+    return grouped
+
+
+class DeltaSync:
+    """ตัวซิงค์ข้อมูลจาก MongoDB ลงไฟล์ พร้อมรายงานผลของแต่ละรอบ"""
+
+    def __init__(self, state_file=SYNC_STATE_FILE, overlap=SYNC_OVERLAP):
+        self._state = JsonFileStore(state_file)
+        self.overlap = overlap
+        self._report = None
+        self._started = None
+        self._lock = None
+        self.last_report = None
+
+    @property
+    def lock(self):
+        """lock สำหรับรอบการซิงค์ (การดาวน์โหลดอัตโนมัติและ change stream ไม่ทำงานซ้อนกัน)"""
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _load_state(self):
+        if not self._state.loaded:
+            state = self._state.load()
+            state.setdefault("checkpoint", None)
+            state.setdefault("config_checkpoint", None)
+            state.setdefault("files", {})
+        return self._state.data
+
+    def _save_state(self):
+        self._load_state()
+        self._state.save()
+
+    @staticmethod
+    def _file_key(path):
+        return os.path.relpath(str(path), str(SCRIPT_DIR))
+
+    def _is_current(self, path, digest=None):
+        """ไฟล์บนดิสก์ยังเป็นไฟล์เดียวกับที่ซิงค์เขียนไว้ล่าสุดหรือไม่ (และมีเนื้อหาตรงกับ digest ถ้าระบุ)"""
+        entry = self._load_state()["files"].get(self._file_key(path))
+        if not entry or (digest is not None and entry["hash"] != digest):
+            return False
+        # ไฟล์ถูกเขียนทับจากที่อื่น (เช่น คำสั่งแก้ไขสินค้า) ต้องเขียนใหม่
+        return _file_signature(Path(path)) == (entry["mtime_ns"], entry["size"])
+
+    def begin(self):
+        """เริ่มรอบการซิงค์ใหม่ (ล้างรายงานของรอบก่อน)"""
+        self._started = time.perf_counter()
+        self._report = {
+            "mode": None,
+            "products": 0,
+            "fetched": 0,
+            "added": 0,
+            "updated": 0,
+            "removed": 0,
+            "files_written": 0,
+            "files_skipped": 0,
+            "configs": 0,
+            "elapsed": 0.0
+        }
+        return self._report
+
+    def finish(self):
+        """จบรอบการซิงค์ บันทึก checkpoint และ hash ของไฟล์
+
+        Returns:
+            dict: รายงานของรอบนี้
+        """
+        self._report["elapsed"] = time.perf_counter() - self._started
+        self._save_state()
+        self.last_report = self._report
+        return self._report
+
+    def write_json(self, path, data):
+        """เขียนไฟล์ JSON เฉพาะเมื่อเนื้อหาเปลี่ยน (เรียกใน thread pool)
+
+        Returns:
+            bool: True ถ้ามีการเขียนไฟล์
+        """
+        content = json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+        digest = hashlib.sha1(content).hexdigest()
+        if self._is_current(path, digest):
+            self._report["files_skipped"] += 1
+            return False
+
+        with open(path, 'wb') as f:
+            f.write(content)
+        mtime_ns, size = _file_signature(Path(path))
+        self._load_state()["files"][self._file_key(path)] = {"hash": digest, "mtime_ns": mtime_ns, "size": size}
+        self._report["files_written"] += 1
+        return True
+
+    def _count_changes(self, previous, products):
+        before = {_product_key(p): _content_fields(p) for p in previous}
+        after = {_product_key(p): _content_fields(p) for p in products}
+        for key, product in after.items():
+            if key not in before:
+                self._report["added"] += 1
+            elif before[key] != product:
+                self._report["updated"] += 1
+        self._report["removed"] += sum(1 for key in before if key not in after)
+
+    def _write_products(self, previous, products):
+        """เขียน products.json และไฟล์หมวดหมู่ที่เนื้อหาเปลี่ยน (เรียกใน thread pool)
+
+        เขียนผ่าน category_writer.write_through เพื่อไม่ให้ชนกับการเขียนแบบหน่วงเวลา
+
+        Returns:
+            list: (ประเทศ, หมวดหมู่, สินค้า) ของไฟล์หมวดหมู่ที่ถูกเขียน
+        """
+        return category_writer.write_through(lambda: self._write_product_files(previous, products))
+
+    def _write_product_files(self, previous, products):
+        self._count_changes(previous, products)
+        self.write_json(PRODUCTS_FILE, products)
+
+        grouped = _group_products(products)
+        # หมวดที่สินค้าถูกลบหมดแล้วต้องเขียนเป็นรายการว่าง
+        for key in _group_products(previous):
+            grouped.setdefault(key, [])
+
+        written = []
+        for (country, category), category_products in grouped.items():
+            country_dir = CATEGORIES_DIR / country
+            country_dir.mkdir(parents=True, exist_ok=True)
+            if self.write_json(country_dir / f"{category}.json", category_products):
+                written.append((country, category, category_products))
+        return written
+
+    async def sync_products(self, full=False):
+        """ดึงสินค้าจาก MongoDB แล้วเขียนเฉพาะไฟล์ที่เปลี่ยน
+
+        ถ้ามี checkpoint และ products.json ยังเป็นไฟล์ที่ซิงค์เขียนไว้ จะดึงเฉพาะสินค้าที่
+        updated_at >= checkpoint (ย้อนหลัง SYNC_OVERLAP วินาที) กับคีย์ของสินค้าทั้งหมด
+        (สำหรับตรวจหาสินค้าที่ถูกลบ) ไม่เช่นนั้นจะดึงสินค้าทั้งหมด
+
+        Args:
+            full (bool): บังคับดึงสินค้าทั้งหมด
+
+        Returns:
+            int: จำนวนสินค้าทั้งหมดหลังซิงค์ (0 = ไม่มีข้อมูลใน MongoDB ไม่มีการเขียนไฟล์)
+        """
+        state = self._load_state()
+        started_at = datetime.now(timezone.utc)
+        previous = await run_blocking(self._read_previous)
+        checkpoint = state.get("checkpoint")
+
+        if not full and checkpoint and previous is not None and await run_blocking(self._is_current, PRODUCTS_FILE):
+            since = datetime.fromisoformat(checkpoint) - timedelta(seconds=self.overlap)
+            changed = await load_products_since(since)
+            keys = await load_product_keys()
+            merged = {_product_key(p): p for p in previous}
+            for product in changed:
+                merged[_product_key(product)] = product
+            products = [p for key, p in merged.items() if key in keys]
+            self._report["mode"] = "delta"
+            self._report["fetched"] = len(changed)
+        else:
+            products = await load_products_async()
+            self._report["mode"] = "full"
+            self._report["fetched"] = len(products)
+
+        if not await self._commit(previous, products):
+            return 0
+        state["checkpoint"] = started_at.isoformat()
+        return len(products)
+
+    async def sync_configs(self, files, full=False):
+        """ดึงการตั้งค่า (ประเทศ หมวดหมู่ QR Code ข้อความขอบคุณ) ที่เปลี่ยนตั้งแต่รอบก่อน
+
+        ถ้ามี checkpoint และไฟล์การตั้งค่าที่ซิงค์เคยเขียนไว้ยังไม่ถูกแก้จากที่อื่น จะดึงเฉพาะ
+        เอกสารที่ updated_at >= checkpoint (ย้อนหลัง SYNC_OVERLAP วินาที) ไม่เช่นนั้นจะดึงทั้งหมด
+
+        Args:
+            files (dict): config_type -> ไฟล์สำรองของการตั้งค่านั้น
+            full (bool): บังคับดึงการตั้งค่าทั้งหมด
+
+        Returns:
+            dict: config_type -> เอกสารการตั้งค่าที่ต้องใช้ (เฉพาะที่เปลี่ยนในโหมด delta)
+        """
+        state = self._load_state()
+        started_at = datetime.now(timezone.utc)
+        checkpoint = state.get("config_checkpoint")
+
+        since = None
+        if not full and checkpoint and await run_blocking(self._configs_current, files.values()):
+            since = datetime.fromisoformat(checkpoint) - timedelta(seconds=self.overlap)
+
+        configs = await load_configs_since(since)
+        self._report["configs"] = len(configs)
+        state["config_checkpoint"] = started_at.isoformat()
+        return configs
+
+    def _configs_current(self, paths):
+        """ไฟล์การตั้งค่าที่ซิงค์เคยเขียนไว้ยังเป็นไฟล์เดิมทั้งหมดหรือไม่"""
+        files = self._load_state()["files"]
+        return all(self._is_current(path) for path in paths if self._file_key(path) in files)
+
+    async def apply_product_changes(self, changes):
+        """ใช้การเปลี่ยนแปลงจาก change stream กับไฟล์โดยตรง (ไม่ต้องดึงสินค้าจาก MongoDB)
+
+        Args:
+            changes (dict): _id ของสินค้า -> เอกสารล่าสุด (None = ถูกลบ)
+
+        Returns:
+            int: จำนวนสินค้าทั้งหมดหลังใช้การเปลี่ยนแปลง
+        """
+        previous = await run_blocking(self._read_previous)
+        if previous is None or not await run_blocking(self._is_current, PRODUCTS_FILE):
+            # ไฟล์ไม่ตรงกับที่ซิงค์ไว้ ต้องดึงใหม่ทั้งหมด
+            return await self.sync_products(full=True)
+
+        merged = {_product_key(p): p for p in previous}
+        keys_by_id = {str(p.get("_id")): key for key, p in merged.items()}
+        for product_id, doc in changes.items():
+            # ลบคีย์เดิมก่อน เพราะการแก้ชื่อ/หมวดหมู่ทำให้คีย์ของสินค้าเปลี่ยน
+            old_key = keys_by_id.get(str(product_id))
+            if old_key is not None:
+                merged.pop(old_key, None)
+            if doc is not None:
+                doc = _serialize_product(dict(doc))
+                merged[_product_key(doc)] = doc
+
+        products = list(merged.values())
+        self._report["mode"] = "stream"
+        self._report["fetched"] = len(changes)
+        await self._commit(previous, products)
+        return len(products)
+
+    async def _commit(self, previous, products):
+        """เขียนไฟล์ที่เปลี่ยนแล้วอัปเดตแคตตาล็อก (ไม่มีสินค้าเลย = ไม่แตะไฟล์)"""
+        self._report["products"] = len(products)
+        if not products:
+            return False
+
+        written = await run_blocking(self._write_products, previous or [], products)
+        for country, category, category_products in written:
+            # หมวดที่มีการแก้ไขใหม่เข้ามาระหว่างซิงค์จะถูกเขียนทับด้วยข้อมูลที่ใหม่กว่าใน flush รอบถัดไป
+            if not category_writer.is_pending(country, category):
+                catalog_store.mark_written(country, category, category_products)
+        return True
+
+    @staticmethod
+    def _read_previous():
+        return _read_json_file(PRODUCTS_FILE, None)
+
+
+# ตัวซิงค์ที่ใช้ร่วมกันทั้งโปรเซส
+delta_sync = DeltaSync()
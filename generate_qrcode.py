@@ -8,16 +8,22 @@ from PIL import Image, ImageOps
 import os
 from pathlib import Path
 
+from async_db import run_blocking
+
 # ตำแหน่งของรูป QR code
 SCRIPT_DIR = Path(__file__).parent.absolute()
 QR_IMAGE_PATH = SCRIPT_DIR / "attached_assets" / "ภาพ_1747582947880.png"
 
 async def get_qrcode_discord_file():
-    """สร้างไฟล์ Discord จากรูป QR code ที่มีอยู่แล้ว
+    """สร้างไฟล์ Discord จากรูป QR code ที่มีอยู่แล้ว (อ่านและแปลงรูปใน thread pool)
     
     Returns:
         discord.File: ไฟล์รูปภาพ QR code สำหรับส่งใน Discord
     """
+    return await run_blocking(_load_qrcode_file)
+
+def _load_qrcode_file():
+    """อ่านรูป QR code จากดิสก์แล้วแปลงเป็น discord.File (งานที่บล็อก)"""
     try:
         # ตรวจสอบว่ารูปภาพมีอยู่จริง
         if not os.path.exists(QR_IMAGE_PATH):
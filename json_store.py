@@ -0,0 +1,42 @@
+"""
+ไฟล์ JSON ขนาดเล็กที่อ่านเข้าหน่วยความจำครั้งเดียวแล้วบันทึกทับทั้งไฟล์ สำหรับบอท Discord Shop
+ใช้ร่วมกันโดยหน้าร้านถาวร รูปแบบร้านของแต่ละช่อง คำสั่งซื้อที่รอยืนยัน ยอดขายสะสม และสถานะการซิงค์
+"""
+from pathlib import Path
+
+from db_operations import _read_json_file, _write_json_file
+
+
+class JsonFileStore:
+    """ไฟล์ JSON หนึ่งไฟล์พร้อมสำเนาในหน่วยความจำ
+
+    load() อ่านไฟล์เฉพาะครั้งแรก (ควรเรียกใน thread pool) หลังจากนั้นคืนข้อมูลในหน่วยความจำโดยไม่แตะดิสก์
+    save() เขียนทับทั้งไฟล์ผ่าน _write_json_file ต้องเรียกใน thread pool
+    ไม่มี lock ของตัวเอง ผู้ใช้ต้องป้องกันการเข้าถึงพร้อมกันด้วย lock ของตัวเอง
+    """
+
+    def __init__(self, path, default=dict, indent=2):
+        self.path = Path(path)
+        self.default = default   # ฟังก์ชันที่คืนข้อมูลเริ่มต้นเมื่อไม่มีไฟล์หรืออ่านไม่ได้
+        self.indent = indent
+        self.data = None
+
+    @property
+    def loaded(self):
+        """โหลดไฟล์เข้าหน่วยความจำแล้วหรือยัง"""
+        return self.data is not None
+
+    def load(self):
+        """ข้อมูลในไฟล์ (อ่านจากดิสก์เฉพาะครั้งแรก)"""
+        if self.data is None:
+            data = _read_json_file(self.path, None)
+            self.data = data if data is not None else self.default()
+        return self.data
+
+    def save(self, data=None):
+        """บันทึกข้อมูลลงไฟล์
+
+        Args:
+            data: ข้อมูลที่จะเขียน (ค่าเริ่มต้นคือข้อมูลในหน่วยความจำ) ส่งสำเนามาเมื่อเขียนนอก event loop
+        """
+        _write_json_file(self.path, self.load() if data is None else data, self.indent)
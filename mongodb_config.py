@@ -3,12 +3,31 @@ import json
 from pymongo import MongoClient
 from dotenv import load_dotenv
 
+# AsyncMongoClient มีใน pymongo 4.13 ขึ้นไป
+try:
+    from pymongo import AsyncMongoClient
+except ImportError:
+    AsyncMongoClient = None
+
 # โหลด environment variables
 load_dotenv()
 
 # รับ MongoDB URI จาก environment variable
 MONGODB_URI = os.getenv("MONGODB_URI", "")
 
+# ชื่อ database (เปลี่ยนได้ เช่นใช้ database แยกสำหรับทดสอบกับ mongod ในเครื่อง)
+MONGODB_DB_NAME = os.getenv("MONGODB_DB_NAME", "discord_shop_bot")
+
+# ขนาด connection pool และ timeout (มิลลิวินาที) ใช้ร่วมกันทั้ง client แบบปกติและแบบ async
+CLIENT_OPTIONS = {
+    "maxPoolSize": int(os.getenv("MONGODB_MAX_POOL_SIZE", "50")),
+    "minPoolSize": int(os.getenv("MONGODB_MIN_POOL_SIZE", "0")),
+    "serverSelectionTimeoutMS": int(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+    "connectTimeoutMS": int(os.getenv("MONGODB_CONNECT_TIMEOUT_MS", "5000")),
+    "socketTimeoutMS": int(os.getenv("MONGODB_SOCKET_TIMEOUT_MS", "10000")),
+    "waitQueueTimeoutMS": int(os.getenv("MONGODB_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+}
+
 # ระบบอนุญาตให้ทำงานต่อได้แม้ไม่มี MongoDB URI
 if not MONGODB_URI:
     print("⚠️ ไม่พบการตั้งค่า MONGODB_URI ในไฟล์ .env หรือ environment variable")
@@ -23,14 +42,16 @@ if not MONGODB_URI:
     countries_collection = None
     history_collection = None
     configs_collection = None
+    async_client = None
+    async_db = None
 else:
     try:
         # เชื่อมต่อกับ MongoDB
-        client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=5000)
+        client = MongoClient(MONGODB_URI, **CLIENT_OPTIONS)
         # ทดสอบการเชื่อมต่อ
         client.server_info()
         # ระบุชื่อ database ที่ต้องการใช้งาน (ถ้าไม่มีจะถูกสร้างอัตโนมัติ)
-        db = client["discord_shop_bot"]
+        db = client[MONGODB_DB_NAME]
         
         # คอลเลกชั่นต่างๆ
         products_collection = db["products"]
@@ -39,6 +60,15 @@ else:
         history_collection = db["history"]
         configs_collection = db["configs"]
         
+        # client แบบ asyncio ตัวเดียวที่ใช้ร่วมกันทั้งบอท (เชื่อมต่อจริงเมื่อถูกใช้ครั้งแรกใน event loop)
+        if AsyncMongoClient is not None:
+            async_client = AsyncMongoClient(MONGODB_URI, **CLIENT_OPTIONS)
+            async_db = async_client[MONGODB_DB_NAME]
+        else:
+            async_client = None
+            async_db = None
+            print("⚠️ pymongo รุ่นนี้ไม่มี AsyncMongoClient - ฟังก์ชัน async จะใช้ client แบบปกติแทน")
+        
         print("✅ เชื่อมต่อกับ MongoDB สำเร็จ!")
     except Exception as e:
         print(f"❌ ไม่สามารถเชื่อมต่อกับ MongoDB ได้: {str(e)}")
@@ -52,11 +82,112 @@ else:
         countries_collection = None
         history_collection = None
         configs_collection = None
+        async_client = None
+        async_db = None
 
 # ตัวแปรเหล่านี้ถูกกำหนดไว้แล้วในเงื่อนไข if-else ด้านบน
 # จะไม่กำหนดซ้ำอีกเพื่อป้องกันการเขียนทับตัวแปรที่เป็น None
 # ในกรณีที่ไม่สามารถเชื่อมต่อกับ MongoDB ได้
 
+# index ที่ query หลักของบอทต้องใช้ (คอลเลกชัน -> รายการ index)
+INDEX_SPECS = {
+    "products": [
+        # find({country, category}) และ count_documents({country, category}) ใช้ prefix ของ index นี้
+        {"name": "country_category_name", "keys": [("country", 1), ("category", 1), ("name", 1)], "unique": True},
+        # delta sync ดึงเฉพาะสินค้าที่ updated_at ใหม่กว่า checkpoint
+        {"name": "updated_at", "keys": [("updated_at", 1)]}
+    ],
+    "history": [
+        {"name": "timestamp_desc", "keys": [("timestamp", -1)]},
+        {"name": "user_id", "keys": [("user_id", 1)]}
+    ],
+    "configs": [
+        {"name": "config_type_unique", "keys": [("config_type", 1)], "unique": True}
+    ]
+}
+
+def _index_keys(key):
+    """แปลง key ของ index ให้อยู่ในรูปแบบ tuple ที่เปรียบเทียบกันได้"""
+    normalized = []
+    for field, direction in key:
+        if isinstance(direction, float):
+            direction = int(direction)
+        normalized.append((field, direction))
+    return tuple(normalized)
+
+def ensure_indexes():
+    """สร้าง index ที่จำเป็นและรายงาน index ที่ขาดหาย ขัดแย้ง หรือซ้ำซ้อน
+
+    index ที่ซ้ำซ้อน (key เป็น prefix ของ index อื่น หรือ key ซ้ำกัน) จะถูกรายงานเท่านั้น ไม่ถูกลบ
+
+    Returns:
+        dict: รายชื่อ index แยกตามสถานะ (created, existing, conflicts, failed, redundant)
+    """
+    report = {"created": [], "existing": [], "conflicts": [], "failed": [], "redundant": []}
+
+    if client is None or db is None:
+        print("⚠️ ไม่มีการเชื่อมต่อ MongoDB - ข้ามการตรวจสอบ index")
+        return report
+
+    for collection_name, specs in INDEX_SPECS.items():
+        collection = db[collection_name]
+        try:
+            existing = collection.index_information()
+        except Exception as e:
+            print(f"❌ ไม่สามารถอ่าน index ของ {collection_name}: {str(e)}")
+            report["failed"].append(f"{collection_name}.*")
+            continue
+
+        existing_keys = {name: _index_keys(info["key"]) for name, info in existing.items()}
+
+        for spec in specs:
+            keys = _index_keys(spec["keys"])
+            unique = spec.get("unique", False)
+            label = f"{collection_name}.{spec['name']}"
+            match = next((name for name, key in existing_keys.items() if key == keys), None)
+
+            if match is not None:
+                if bool(existing[match].get("unique", False)) == unique:
+                    report["existing"].append(label)
+                else:
+                    # มี index key เดียวกันแต่ตัวเลือกไม่ตรง ต้องให้ผู้ดูแลตัดสินใจเอง
+                    report["conflicts"].append(f"{collection_name}.{match}")
+                continue
+
+            try:
+                collection.create_index(list(keys), name=spec["name"], unique=unique)
+                existing_keys[spec["name"]] = keys
+                existing[spec["name"]] = {"key": list(keys), "unique": unique}
+                report["created"].append(label)
+            except Exception as e:
+                print(f"❌ ไม่สามารถสร้าง index {label}: {str(e)}")
+                report["failed"].append(label)
+
+        # index ที่ซ้ำซ้อน: key ซ้ำกับ index อื่น หรือเป็น prefix ของ index ที่ยาวกว่า
+        seen = {}
+        for name, key in existing_keys.items():
+            if name == "_id_" or existing[name].get("unique", False):
+                continue
+            covered = any(
+                other != name and len(other_key) > len(key) and other_key[:len(key)] == key
+                for other, other_key in existing_keys.items()
+            )
+            if covered or key in seen:
+                report["redundant"].append(f"{collection_name}.{name}")
+            seen[key] = name
+
+    if report["created"]:
+        print(f"🗂️ สร้าง index ใหม่: {', '.join(report['created'])}")
+    print(f"🗂️ index ที่มีอยู่แล้ว {len(report['existing'])} รายการ")
+    if report["conflicts"]:
+        print(f"⚠️ index ที่ตัวเลือกไม่ตรงกับที่ต้องการ (unique): {', '.join(report['conflicts'])}")
+    if report["failed"]:
+        print(f"⚠️ index ที่สร้างไม่สำเร็จ: {', '.join(report['failed'])}")
+    if report["redundant"]:
+        print(f"⚠️ index ที่ซ้ำซ้อน (พิจารณาลบได้): {', '.join(report['redundant'])}")
+
+    return report
+
 # ฟังก์ชันสำหรับการตั้งค่าครั้งแรก
 def initialize_db():
     """ตั้งค่าฐานข้อมูลเริ่มต้นหากยังไม่มีข้อมูล"""
@@ -139,14 +270,19 @@ def initialize_db():
     
     # นำเข้าข้อมูลสินค้าจากไฟล์ products.json ครั้งแรก (ถ้ามี)
     if products_collection.count_documents({}) == 0:
+        # นำเข้าในหน่วยเดียวกับการซิงค์สินค้า (import ภายในฟังก์ชันเพราะ db_operations นำเข้าโมดูลนี้)
+        from db_operations import build_product_sync_operations
+        
+        # รวมสินค้าจากทุกแหล่งก่อน สินค้า (ประเทศ, หมวด, ชื่อ) ซ้ำกันให้ใช้รายการจากโฟลเดอร์ categories
+        # (index unique ของ ensure_indexes ไม่ยอมให้ insert ซ้ำ)
+        seed_products = []
         try:
             # นำเข้าจากไฟล์ products.json
             with open('products.json', 'r', encoding='utf-8') as f:
                 products_data = json.load(f)
                 if products_data:
-                    for product in products_data:
-                        products_collection.insert_one(product)
-                    print(f"✅ นำเข้าสินค้าจากไฟล์เริ่มต้นสำเร็จ จำนวน {len(products_data)} รายการ")
+                    seed_products.extend(products_data)
+                    print(f"พบสินค้าในไฟล์ products.json จำนวน {len(products_data)} รายการ")
         except (FileNotFoundError, json.JSONDecodeError):
             print("ไม่พบไฟล์ products.json หรือไฟล์ไม่ถูกต้อง - ข้ามการนำเข้า")
         
@@ -170,13 +306,20 @@ def initialize_db():
                                                 product['country'] = country
                                             if not product.get('category'):
                                                 product['category'] = category
-                                            products_collection.insert_one(product)
-                                        print(f"✅ นำเข้าสินค้าจากหมวด {category} ประเทศ {country} สำเร็จ จำนวน {len(category_products)} รายการ")
+                                        seed_products.extend(category_products)
+                                        print(f"พบสินค้าในหมวด {category} ประเทศ {country} จำนวน {len(category_products)} รายการ")
                             except (FileNotFoundError, json.JSONDecodeError) as e:
                                 print(f"ข้อผิดพลาดในการนำเข้าไฟล์ {category_file}: {e}")
+        
+        # เขียนครั้งเดียวด้วย bulk_write แบบ unordered (upsert ตามคีย์ของ index จึงไม่ชนกับเอกสารที่มีอยู่)
+        operations, counts = build_product_sync_operations(seed_products, [])
+        if operations:
+            products_collection.bulk_write(operations, ordered=False)
+            print(f"✅ นำเข้าสินค้าเริ่มต้นสำเร็จ จำนวน {counts['inserted']} รายการ")
 
 # เรียกฟังก์ชันเริ่มต้นเมื่อนำเข้าโมดูล
 if __name__ == "__main__":
     print("กำลังเริ่มต้นการเชื่อมต่อกับ MongoDB...")
     initialize_db()
+    ensure_indexes()
     print("เชื่อมต่อกับ MongoDB สำเร็จ!")
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+คำสั่งซื้อที่รอแอดมินยืนยันการส่งของ (คำสั่ง !สั่งของ) สำหรับบอท Discord Shop
+ปุ่ม "ส่งของแล้ว" เก็บเฉพาะรหัสคำสั่งซื้อไว้ใน custom_id ส่วนรายการสินค้าและยอดเงินเก็บไว้ในไฟล์นี้
+จึงยืนยันคำสั่งซื้อที่สร้างไว้ก่อนรีสตาร์ทบอทได้ คำสั่งซื้อที่ค้างนานเกิน PENDING_ORDER_TTL_DAYS วันจะถูกลบเมื่อโหลดไฟล์
+"""
+import os
+import secrets
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from json_store import JsonFileStore
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+PENDING_ORDERS_FILE = SCRIPT_DIR / "pending_orders.json"
+
+# อายุสูงสุดของคำสั่งซื้อที่ยังไม่ถูกยืนยัน (วัน) ปรับได้ผ่าน environment variable
+PENDING_ORDER_TTL_DAYS = float(os.getenv("PENDING_ORDER_TTL_DAYS", "7"))
+
+
+class PendingOrders:
+    """ที่เก็บคำสั่งซื้อที่รอยืนยัน (รหัสคำสั่งซื้อ -> ข้อมูลคำสั่งซื้อ)"""
+
+    def __init__(self, path=PENDING_ORDERS_FILE, ttl_days=PENDING_ORDER_TTL_DAYS):
+        self._file = JsonFileStore(path, indent=None)
+        self.ttl_days = ttl_days
+        self._lock = threading.Lock()
+        self.expired = 0   # จำนวนคำสั่งซื้อที่ถูกลบเพราะหมดอายุ
+
+    def _load(self):
+        if not self._file.loaded:
+            self._file.load()
+            if self._prune():
+                self._save()
+        return self._file.data
+
+    def _prune(self):
+        """ลบคำสั่งซื้อที่สร้างไว้นานเกิน ttl_days (เรียกภายใต้ self._lock)
+
+        Returns:
+            int: จำนวนคำสั่งซื้อที่ถูกลบ
+        """
+        if self.ttl_days <= 0:
+            return 0
+        cutoff = (datetime.now() - timedelta(days=self.ttl_days)).isoformat()
+        # created_at เป็น ISO format จึงเทียบเป็นสตริงได้ (ไม่มี created_at = ถือว่าหมดอายุ)
+        orders = self._file.data
+        expired = [order_id for order_id, order in orders.items() if order.get("created_at", "") < cutoff]
+        for order_id in expired:
+            del orders[order_id]
+        if expired:
+            self.expired += len(expired)
+            print(f"🧹 ลบคำสั่งซื้อที่รอยืนยันเกิน {self.ttl_days:g} วัน {len(expired)} รายการ")
+        return len(expired)
+
+    def _save(self):
+        self._file.save()
+
+    def add(self, user, items, total):
+        """บันทึกคำสั่งซื้อใหม่ (เรียกใน thread pool)
+
+        Args:
+            user (str): ชื่อผู้สั่งซื้อ
+            items (list): รายการสินค้าในรูปแบบเดียวกับที่บันทึกในประวัติการซื้อ
+            total (float): ยอดรวม
+
+        Returns:
+            str: รหัสคำสั่งซื้อ (hex 10 ตัวอักษร)
+        """
+        with self._lock:
+            orders = self._load()
+            self._prune()
+            order_id = secrets.token_hex(5)
+            while order_id in orders:
+                order_id = secrets.token_hex(5)
+            orders[order_id] = {
+                "user": user,
+                "items": items,
+                "total": total,
+                "created_at": datetime.now().isoformat()
+            }
+            self._save()
+            return order_id
+
+    def pop(self, order_id):
+        """นำคำสั่งซื้อออกจากรายการรอยืนยัน (เรียกใน thread pool)
+
+        Returns:
+            dict: ข้อมูลคำสั่งซื้อ หรือ None ถ้าไม่พบ (ถูกยืนยันไปแล้ว)
+        """
+        with self._lock:
+            order = self._load().pop(order_id, None)
+            if order is not None:
+                self._save()
+            return order
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+
+# คำสั่งซื้อที่รอยืนยันที่ใช้ร่วมกันทั้งโปรเซส
+pending_orders = PendingOrders()
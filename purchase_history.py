@@ -0,0 +1,511 @@
+"""
+ที่เก็บประวัติการซื้อแบบแบ่งไฟล์ (segment) สำหรับบอท Discord Shop
+แต่ละ segment เป็น JSONL หนึ่งบรรทัดต่อหนึ่งรายการ แยกตามวัน (หรือเมื่อไฟล์ใหญ่เกิน HISTORY_SEGMENT_MAX_BYTES)
+segment ที่จบแล้วจะถูกบีบอัดด้วย gzip และมีไฟล์ index.json เก็บช่วงเวลาของแต่ละ segment
+พร้อมตำแหน่งไบต์ของทุก ๆ HISTORY_INDEX_STRIDE รายการ การค้นหาตามช่วงวันที่จึงเปิดเฉพาะ segment ที่เกี่ยวข้อง
+การดูรายการล่าสุดอ่านย้อนกลับจากท้าย segment ล่าสุดทีละ block โดยไม่ต้องอ่านทั้งไฟล์
+"""
+import gzip
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from db_operations import _read_json_file, _write_json_file
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+HISTORY_FILE = SCRIPT_DIR / "history.json"   # ไฟล์ประวัติแบบเดิม (ย้ายเข้า segment อัตโนมัติ)
+HISTORY_DIR = SCRIPT_DIR / "history"
+
+# ขนาด block ที่อ่านจากท้ายไฟล์ต่อครั้ง (ไบต์)
+HISTORY_BLOCK_SIZE = int(os.getenv("HISTORY_BLOCK_SIZE", str(64 * 1024)))
+# ขนาดสูงสุดของ segment ก่อนเริ่มไฟล์ใหม่ภายในวันเดียวกัน (ไบต์)
+HISTORY_SEGMENT_MAX_BYTES = int(os.getenv("HISTORY_SEGMENT_MAX_BYTES", str(8 * 1024 * 1024)))
+# เก็บตำแหน่งไบต์ใน index ทุก ๆ กี่รายการ
+HISTORY_INDEX_STRIDE = int(os.getenv("HISTORY_INDEX_STRIDE", "100"))
+# ลบ segment ที่เก่ากว่ากี่วัน (0 = เก็บไว้ทั้งหมด)
+HISTORY_RETENTION_DAYS = int(os.getenv("HISTORY_RETENTION_DAYS", "0"))
+
+
+def _parse_line(line):
+    """แปลงบรรทัด JSONL เป็น dict (None ถ้าบรรทัดเสียหรือว่าง)"""
+    if not line.strip():
+        return None
+    try:
+        return json.loads(line.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError):
+        return None
+
+
+def _reverse_lines(chunk, position, remainder):
+    """แยกบรรทัดที่สมบูรณ์ใน chunk (เริ่มที่ตำแหน่ง position) เรียงจากท้ายไปต้น
+
+    Returns:
+        tuple: (รายการ (ตำแหน่งไบต์, บรรทัด) จากใหม่ไปเก่า, ส่วนต้นที่ยังไม่สมบูรณ์)
+    """
+    lines = (chunk + remainder).split(b"\n")
+    remainder = lines.pop(0)
+    offset = position + len(remainder) + 1
+    complete = []
+    for line in lines:
+        complete.append((offset, line))
+        offset += len(line) + 1
+    complete.reverse()
+    return complete, remainder
+
+
+def iter_history_reverse(path=HISTORY_FILE, before=None, block_size=HISTORY_BLOCK_SIZE):
+    """วนรายการในไฟล์ JSONL (ไม่บีบอัด) จากใหม่ไปเก่า
+
+    Args:
+        path: ไฟล์ประวัติ (JSONL)
+        before (int, optional): อ่านเฉพาะรายการที่เริ่มก่อนตำแหน่งไบต์นี้ (None = ท้ายไฟล์)
+        block_size (int): ขนาด block ที่อ่านต่อครั้ง
+
+    Yields:
+        tuple: (ตำแหน่งไบต์ที่บรรทัดเริ่มต้น, dict ของรายการ)
+    """
+    try:
+        f = open(path, 'rb')
+    except FileNotFoundError:
+        return
+
+    with f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell() if before is None else min(before, f.tell())
+        # ส่วนต้นของ block ล่าสุดที่ยังไม่รู้ว่าเป็นบรรทัดที่สมบูรณ์หรือไม่
+        remainder = b""
+        while position > 0:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            complete, remainder = _reverse_lines(f.read(read_size), position, remainder)
+            for offset, line in complete:
+                record = _parse_line(line)
+                if record is not None:
+                    yield offset, record
+
+        record = _parse_line(remainder)
+        if record is not None:
+            yield 0, record
+
+
+def _iter_bytes_reverse(data, before=None):
+    """วนรายการจากข้อมูล JSONL ในหน่วยความจำ (segment ที่บีบอัดแล้ว) จากใหม่ไปเก่า"""
+    end = len(data) if before is None else min(before, len(data))
+    complete, remainder = _reverse_lines(data[:end], 0, b"")
+    for offset, line in complete:
+        record = _parse_line(line)
+        if record is not None:
+            yield offset, record
+    record = _parse_line(remainder)
+    if record is not None:
+        yield 0, record
+
+
+class HistoryStore:
+    """ประวัติการซื้อแบบแบ่ง segment พร้อม index
+
+    index.json เก็บรายการ segment เรียงตามวัน แต่ละรายการมี
+    id, file, day, start, end (timestamp ที่เก่า/ใหม่ที่สุด), count, size,
+    compressed, offsets ([timestamp, ตำแหน่งไบต์] ทุก ๆ stride รายการ)
+    และ ordered (False เมื่อมีรายการที่เวลาย้อนหลังรายการก่อนหน้า)
+    และ legacy_offset คือจำนวนไบต์ของ history.json แบบเดิมที่ย้ายเข้า segment แล้ว
+    """
+
+    def __init__(self, directory=HISTORY_DIR, legacy_file=HISTORY_FILE,
+                 max_bytes=HISTORY_SEGMENT_MAX_BYTES, stride=HISTORY_INDEX_STRIDE,
+                 retention_days=HISTORY_RETENTION_DAYS):
+        self.directory = Path(directory)
+        self.legacy_file = Path(legacy_file)
+        self.max_bytes = max_bytes
+        self.stride = stride
+        self.retention_days = retention_days
+        self.index_file = self.directory / "index.json"
+        self._lock = threading.RLock()
+        self._index = None
+
+    # ---------- index ----------
+
+    def open(self):
+        """โหลด index (และย้ายไฟล์ history.json แบบเดิมเข้า segment ครั้งแรก)"""
+        with self._lock:
+            if self._index is not None:
+                return self._index
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._index = _read_json_file(self.index_file, None) or {"segments": []}
+
+            active = self._active_segment()
+            if active is not None:
+                self._reconcile(active)
+            self._migrate_legacy()
+            return self._index
+
+    def _save_index(self):
+        _write_json_file(self.index_file, self._index, indent=None)
+
+    def _segments(self):
+        """สำเนารายการ segment สำหรับอ่านนอก lock"""
+        with self._lock:
+            return [dict(segment) for segment in self.open()["segments"]]
+
+    def _active_segment(self):
+        segments = self._index["segments"]
+        if segments and not segments[-1]["compressed"]:
+            return segments[-1]
+        return None
+
+    def _path(self, segment):
+        return self.directory / segment["file"]
+
+    def _reconcile(self, segment):
+        """นับรายการที่เขียนลงไฟล์แล้วแต่ index ยังไม่ได้บันทึก (เช่น โปรเซสหยุดกลางคัน)"""
+        try:
+            size = self._path(segment).stat().st_size
+        except FileNotFoundError:
+            return
+        if size <= segment["size"]:
+            return
+        with open(self._path(segment), 'rb') as f:
+            f.seek(segment["size"])
+            for line in f:
+                record = _parse_line(line)
+                if record is not None:
+                    self._track(segment, record.get("timestamp", ""), len(line))
+                else:
+                    segment["size"] += len(line)
+        self._save_index()
+
+    def _track(self, segment, timestamp, length):
+        """บันทึกรายการใหม่ลงข้อมูลของ segment ใน index"""
+        if segment["count"] % self.stride == 0:
+            segment["offsets"].append([timestamp, segment["size"]])
+        if segment["count"] == 0:
+            segment["start"] = segment["end"] = timestamp
+        elif timestamp < segment["end"]:
+            segment["ordered"] = False
+        segment["start"] = min(segment["start"], timestamp)
+        segment["end"] = max(segment["end"], timestamp)
+        segment["count"] += 1
+        segment["size"] += length
+
+    # ---------- การเขียน ----------
+
+    def _make_segment(self, day, compressed=False):
+        number = sum(1 for segment in self._index["segments"] if segment["day"] == day)
+        segment_id = f"{day}.{number:03d}"
+        return {
+            "id": segment_id,
+            "file": f"{segment_id}.jsonl.gz" if compressed else f"{segment_id}.jsonl",
+            "day": day,
+            "start": None,
+            "end": None,
+            "count": 0,
+            "size": 0,
+            "compressed": compressed,
+            "ordered": True,
+            "offsets": []
+        }
+
+    def _new_segment(self, day):
+        segment = self._make_segment(day)
+        self._index["segments"].append(segment)
+        return segment
+
+    def _late_segment(self, day):
+        """segment สำหรับรายการของวันที่เก่ากว่า segment ล่าสุด (เช่น นาฬิกาของเครื่องที่บันทึกช้ากว่า)
+
+        ใช้ segment สุดท้ายของวันนั้น หรือสร้าง segment แบบบีบอัดใหม่แทรกตามลำดับวัน
+        รายการ segment จึงเรียงตามวันเสมอ (iter_range หยุดอ่านได้เมื่อเลยช่วงเวลาที่ต้องการ)
+        """
+        segments = self._index["segments"]
+        position = 0
+        for number, segment in enumerate(segments):
+            if segment["day"] > day:
+                break
+            position = number + 1
+        if position and segments[position - 1]["day"] == day:
+            return segments[position - 1]
+        segment = self._make_segment(day, compressed=True)
+        segments.insert(position, segment)
+        return segment
+
+    def _finish(self, segment):
+        """บีบอัด segment ที่จบแล้ว (เขียนไฟล์ชั่วคราวก่อนแล้วสลับ)"""
+        source = self._path(segment)
+        target = self.directory / f"{segment['file']}.gz"
+        if source.exists():
+            temp_file = str(target) + ".tmp"
+            with open(source, 'rb') as f_in, gzip.open(temp_file, 'wb') as f_out:
+                shutil.copyfileobj(f_in, f_out)
+            os.replace(temp_file, target)
+            source.unlink()
+        segment["file"] = target.name
+        segment["compressed"] = True
+        self._apply_retention(segment["day"])
+
+    def _apply_retention(self, today):
+        if self.retention_days <= 0:
+            return
+        cutoff = (datetime.fromisoformat(today) - timedelta(days=self.retention_days)).date().isoformat()
+        kept = []
+        for segment in self._index["segments"]:
+            if segment["compressed"] and segment["day"] < cutoff:
+                try:
+                    self._path(segment).unlink()
+                except FileNotFoundError:
+                    pass
+                print(f"🗑️ ลบประวัติการซื้อที่เก่ากว่า {self.retention_days} วัน: {segment['file']}")
+            else:
+                kept.append(segment)
+        self._index["segments"] = kept
+
+    def _append(self, record, save=True):
+        timestamp = record.get("timestamp") or datetime.now().isoformat()
+        day = timestamp[:10]
+        data = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+
+        segments = self._index["segments"]
+        if segments and day < segments[-1]["day"]:
+            segment = self._late_segment(day)
+        else:
+            segment = self._active_segment()
+            if segment is not None and (segment["day"] != day or segment["size"] + len(data) > self.max_bytes):
+                self._finish(segment)
+                segment = None
+            if segment is None:
+                segment = self._new_segment(day)
+
+        # segment ที่บีบอัดแล้วเขียนต่อท้ายเป็น gzip member ใหม่ (อ่านต่อกันได้เป็นไฟล์เดียว)
+        with (gzip.open if segment["compressed"] else open)(self._path(segment), 'ab') as f:
+            f.write(data)
+        self._track(segment, timestamp, len(data))
+        if save:
+            self._save_index()
+        return segment["id"], segment["size"]
+
+    def append(self, record):
+        """เพิ่มรายการประวัติการซื้อ (เรียกใน thread pool)
+
+        Args:
+            record (dict): ข้อมูลการซื้อ ต้องมี timestamp แบบ ISO
+
+        Returns:
+            tuple: (segment id, ตำแหน่งไบต์หลังรายการนี้) สำหรับ watermark ของ sales_rollup
+        """
+        with self._lock:
+            self.open()
+            return self._append(record)
+
+    def _migrate_legacy(self):
+        """ย้ายรายการจาก history.json แบบเดิมเข้า segment โดยไม่แก้ไขไฟล์เดิม
+
+        จำนวนไบต์ที่ย้ายแล้วถูกบันทึกใน index (legacy_offset) ครั้งถัดไปจึงย้ายเฉพาะส่วนที่เพิ่มมาใหม่
+        """
+        if "legacy_offset" not in self._index:
+            # ไฟล์ที่ถูกย้ายและเปลี่ยนชื่อไปแล้วในเวอร์ชันก่อน ไม่ต้องย้ายซ้ำ
+            migrated_file = self.legacy_file.with_name("history.migrated.json")
+            self._index["legacy_offset"] = migrated_file.stat().st_size if migrated_file.exists() else 0
+
+        offset = self._index["legacy_offset"]
+        try:
+            if self.legacy_file.stat().st_size <= offset:
+                return
+        except FileNotFoundError:
+            return
+
+        print(f"📦 กำลังย้ายประวัติการซื้อจาก {self.legacy_file.name} เข้า segment...")
+        migrated = 0
+        with open(self.legacy_file, 'rb') as f:
+            f.seek(offset)
+            for line in f:
+                offset += len(line)
+                record = _parse_line(line)
+                if record is not None:
+                    self._append(record, save=False)
+                    migrated += 1
+        self._index["legacy_offset"] = offset
+        self._save_index()
+        print(f"✅ ย้ายประวัติการซื้อ {migrated} รายการเรียบร้อย")
+
+    # ---------- การอ่าน ----------
+
+    def _iter_segment_reverse(self, segment, before=None):
+        if not segment["compressed"]:
+            if self._path(segment).exists():
+                yield from iter_history_reverse(self._path(segment), before)
+                return
+            # ถูกบีบอัดหลังจากอ่าน index
+            segment = dict(segment, file=f"{segment['file']}.gz")
+        try:
+            with gzip.open(self._path(segment), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return
+        yield from _iter_bytes_reverse(data, before)
+
+    def iter_reverse(self, before=None):
+        """วนรายการทั้งหมดจากใหม่ไปเก่า
+
+        Args:
+            before (str, optional): cursor "<segment id>:<ตำแหน่งไบต์>" (None = รายการล่าสุด)
+
+        Yields:
+            tuple: (cursor ของรายการ, dict ของรายการ)
+        """
+        segments = self._segments()
+        start = len(segments) - 1
+        offset = None
+        if before:
+            segment_id, _, position = str(before).rpartition(":")
+            ids = [segment["id"] for segment in segments]
+            if segment_id not in ids or not position.isdigit():
+                return
+            start = ids.index(segment_id)
+            offset = int(position)
+
+        for number in range(start, -1, -1):
+            segment = segments[number]
+            for position, record in self._iter_segment_reverse(segment, offset if number == start else None):
+                yield f"{segment['id']}:{position}", record
+
+    def read_page(self, limit=5, before=None):
+        """อ่านประวัติการซื้อล่าสุด limit รายการ
+
+        Returns:
+            tuple: (รายการเรียงจากเก่าไปใหม่, cursor สำหรับหน้าที่เก่ากว่า หรือ None ถ้าไม่มีแล้ว)
+        """
+        records = []
+        oldest = None
+        entries = self.iter_reverse(before)
+        for cursor, record in entries:
+            records.append(record)
+            oldest = cursor
+            if len(records) >= limit:
+                break
+
+        records.reverse()
+        # มีหน้าที่เก่ากว่าเมื่อยังมีรายการเหลืออยู่อย่างน้อยหนึ่งรายการ
+        next_cursor = oldest if len(records) >= limit and next(entries, None) is not None else None
+        return records, next_cursor
+
+    def iter_range(self, start=None, end=None):
+        """วนรายการในช่วงเวลา (เรียงจากเก่าไปใหม่ ยกเว้นรายการที่บันทึกย้อนหลัง) โดยเปิดเฉพาะ segment ที่ช่วงเวลาซ้อนกัน
+
+        Args:
+            start (datetime|str, optional): เวลาเริ่มต้น (รวม)
+            end (datetime|str, optional): เวลาสิ้นสุด (รวม)
+
+        Yields:
+            dict: รายการประวัติการซื้อ
+        """
+        start = start.isoformat() if isinstance(start, datetime) else start
+        end = end.isoformat() if isinstance(end, datetime) else end
+
+        for segment in self._segments():
+            if segment["count"] == 0:
+                continue
+            if start is not None and segment["end"] < start:
+                continue
+            if end is not None and segment["start"] > end:
+                # segment เรียงตามวัน แต่ segment ถัดไปของวันเดียวกันอาจมีรายการที่บันทึกย้อนหลัง
+                if segment["day"] > end[:10]:
+                    break
+                continue
+
+            # เริ่มอ่านจากตำแหน่งใน index ที่ใกล้เวลาเริ่มต้นที่สุด (เฉพาะ segment ที่รายการเรียงตามเวลา)
+            ordered = segment.get("ordered", True)
+            position = 0
+            for timestamp, offset in segment["offsets"] if ordered else ():
+                if start is not None and timestamp < start:
+                    position = offset
+                else:
+                    break
+
+            try:
+                f = gzip.open(self._path(segment), 'rb') if segment["compressed"] else open(self._path(segment), 'rb')
+            except FileNotFoundError:
+                continue
+            with f:
+                f.seek(position)
+                for line in f:
+                    record = _parse_line(line)
+                    if record is None:
+                        continue
+                    timestamp = record.get("timestamp", "")
+                    if start is not None and timestamp < start:
+                        continue
+                    if end is not None and timestamp > end:
+                        # รายการที่บันทึกย้อนหลังอาจอยู่ใน segment ถัดไปของวันเดียวกัน จึงหยุดเฉพาะ segment นี้
+                        if ordered:
+                            break
+                        continue
+                    yield record
+
+    def positions(self):
+        """จำนวนไบต์ที่บันทึกแล้วของแต่ละ segment (segment id -> ไบต์)"""
+        return {segment["id"]: segment["size"] for segment in self._segments()}
+
+    def iter_after(self, watermark):
+        """วนรายการที่อยู่หลังตำแหน่งใน watermark ของแต่ละ segment (segment ที่ไม่มีใน watermark อ่านทั้งหมด)
+
+        Args:
+            watermark (dict): segment id -> ตำแหน่งไบต์ที่อ่านไปแล้ว
+
+        Yields:
+            tuple: (segment id, ตำแหน่งไบต์หลังรายการ, dict ของรายการ)
+        """
+        for segment in self._segments():
+            position = watermark.get(segment["id"], 0)
+            if position >= segment["size"]:
+                continue
+            try:
+                f = gzip.open(self._path(segment), 'rb') if segment["compressed"] else open(self._path(segment), 'rb')
+            except FileNotFoundError:
+                continue
+            with f:
+                f.seek(position)
+                for line in f:
+                    position += len(line)
+                    record = _parse_line(line)
+                    if record is not None:
+                        yield segment["id"], position, record
+
+    def stats(self):
+        """ขนาดและจำนวนรายการของประวัติการซื้อ"""
+        segments = self._segments()
+        disk = 0
+        for segment in segments:
+            try:
+                disk += self._path(segment).stat().st_size
+            except FileNotFoundError:
+                pass
+        return {
+            "segments": len(segments),
+            "records": sum(segment["count"] for segment in segments),
+            "disk_bytes": disk
+        }
+
+
+# ที่เก็บประวัติที่ใช้ร่วมกันทั้งโปรเซส
+history_store = HistoryStore()
+
+
+def log_purchase(record):
+    """บันทึกรายการซื้อลงที่เก็บประวัติ (คืนตำแหน่งของรายการ ดู HistoryStore.append)"""
+    return history_store.append(record)
+
+
+def read_history_page(limit=5, before=None):
+    """อ่านประวัติการซื้อล่าสุด limit รายการ
+
+    Args:
+        limit (int): จำนวนรายการที่ต้องการ
+        before (str, optional): cursor จากหน้าก่อน (None = รายการล่าสุด)
+
+    Returns:
+        tuple: (รายการเรียงจากเก่าไปใหม่, cursor สำหรับหน้าที่เก่ากว่า หรือ None ถ้าไม่มีแล้ว)
+    """
+    return history_store.read_page(limit, before)
@@ -0,0 +1,182 @@
+"""
+ตัวตอบ interaction ของ Discord ที่ใช้ร่วมกันทุก view และคำสั่ง สำหรับบอท Discord Shop
+- ตอบด้วย HTTP request เดียวเมื่องานเสร็จเร็ว (เช่น edit_message แทน defer + message.edit)
+- defer ให้อัตโนมัติเมื่องานของปุ่ม/modal ใช้เวลาเกิน RESPONDER_DEFER_AFTER วินาที (Discord ให้เวลาตอบ 3 วินาที)
+  หรือเมื่อผู้เรียกประเมินไว้ก่อนว่างานจะช้า (expect_slow)
+- นับจำนวนการเรียก Discord API แยกตามประเภท interaction เพื่อดูว่าประหยัดไปได้เท่าไร
+
+ใช้งาน: await responder(interaction).edit(content=..., view=...) แทน interaction.response.edit_message(...)
+"""
+import asyncio
+import os
+from collections import Counter
+
+import discord
+
+# งานของปุ่ม/modal ที่ยังไม่ได้ตอบภายในเวลานี้ (วินาที) จะถูก defer ให้อัตโนมัติ
+RESPONDER_DEFER_AFTER = float(os.getenv("RESPONDER_DEFER_AFTER", "2"))
+
+
+def interaction_kind(interaction):
+    """ประเภทของ interaction สำหรับนับสถิติ
+
+    คำสั่ง slash ใช้ชื่อคำสั่ง (/ร้าน) ปุ่มและเมนูของหน้าร้านใช้คำนำหน้าของ custom_id (s:n, s:p, ...)
+    modal ทุกตัวรวมเป็น modal (custom_id ของ modal สุ่มใหม่ทุกครั้ง)
+    """
+    data = interaction.data or {}
+    if interaction.type == discord.InteractionType.application_command:
+        return f"/{data.get('name', '?')}"
+    if interaction.type == discord.InteractionType.component:
+        custom_id = data.get("custom_id", "")
+        parts = custom_id.split(":")
+        return ":".join(parts[:2]) if len(parts) > 2 else custom_id
+    if interaction.type == discord.InteractionType.modal_submit:
+        return "modal"
+    return interaction.type.name
+
+
+class InteractionStats:
+    """สถิติการเรียก Discord API แยกตามประเภท interaction"""
+
+    def __init__(self):
+        self.interactions = Counter()   # ประเภท -> จำนวน interaction
+        self.calls = Counter()          # ประเภท -> จำนวนการเรียก API
+        self.deferred = Counter()       # ประเภท -> จำนวนครั้งที่ถูก defer อัตโนมัติ
+        self.methods = Counter()        # ชื่อการเรียก (edit_message, followup.send, ...) -> จำนวน
+
+    def stats(self, limit=10):
+        """สถิติรวม และประเภทที่เรียก API มากที่สุด
+
+        Returns:
+            dict: interactions, calls, deferred, methods และ kinds (รายการ (ประเภท, interaction, API, defer อัตโนมัติ))
+        """
+        kinds = [(kind, self.interactions[kind], calls, self.deferred[kind])
+                 for kind, calls in self.calls.most_common(limit)]
+        return {
+            "interactions": sum(self.interactions.values()),
+            "calls": sum(self.calls.values()),
+            "deferred": sum(self.deferred.values()),
+            "methods": dict(self.methods),
+            "kinds": kinds
+        }
+
+
+# สถิติการเรียก API ที่ใช้ร่วมกันทั้งโปรเซส
+interaction_stats = InteractionStats()
+
+
+class InteractionResponder:
+    """ตัวตอบ interaction หนึ่งรายการ (สร้างผ่าน responder() เพื่อให้ได้ตัวเดียวกันตลอดการทำงาน)
+
+    การตอบทุกครั้งผ่าน lock เดียวกับตัวจับเวลา defer อัตโนมัติ จึงไม่ตอบซ้ำสองครั้ง
+    """
+
+    def __init__(self, interaction, stats=interaction_stats, defer_after=RESPONDER_DEFER_AFTER):
+        self.interaction = interaction
+        self.kind = interaction_kind(interaction)
+        self.stats = stats
+        self.defer_after = defer_after
+        self.expect_modal = False   # ตอบด้วย modal เท่านั้น (defer แล้วจะส่ง modal ไม่ได้)
+        self._lock = asyncio.Lock()
+        self._watchdog = None
+        stats.interactions[self.kind] += 1
+
+    def _count(self, method):
+        self.stats.calls[self.kind] += 1
+        self.stats.methods[method] += 1
+
+    @property
+    def done(self):
+        """ตอบ interaction แล้วหรือยัง"""
+        return self.interaction.response.is_done()
+
+    def start_watchdog(self):
+        """เริ่มจับเวลา defer อัตโนมัติ (เฉพาะปุ่ม เมนู และ modal)
+
+        คำสั่ง slash ไม่ defer อัตโนมัติ เพราะข้อความ "กำลังคิด..." ต้องรู้ล่วงหน้าว่าจะตอบแบบ ephemeral หรือไม่
+        ให้คำสั่งที่ช้าเรียก expect_slow() แทน
+        """
+        if self._watchdog is not None or self.done:
+            return
+        if self.interaction.type not in (discord.InteractionType.component, discord.InteractionType.modal_submit):
+            return
+        self._watchdog = asyncio.ensure_future(self._defer_later())
+
+    async def _defer_later(self):
+        await asyncio.sleep(self.defer_after)
+        if self.expect_modal:
+            return
+        async with self._lock:
+            if self.done:
+                return
+            try:
+                await self.interaction.response.defer()
+            except discord.HTTPException:
+                return
+            self._count("defer")
+            self.stats.deferred[self.kind] += 1
+
+    async def expect_slow(self, ephemeral=False, thinking=None):
+        """ประเมินแล้วว่างานจะช้า: defer ทันที (คำสั่ง slash จะแสดง "กำลังคิด...")"""
+        if thinking is None:
+            thinking = self.interaction.type == discord.InteractionType.application_command
+        await self.defer(ephemeral=ephemeral, thinking=thinking)
+
+    async def defer(self, **kwargs):
+        """defer interaction (ไม่ทำซ้ำถ้าตอบไปแล้ว)"""
+        async with self._lock:
+            if self.done:
+                return
+            await self.interaction.response.defer(**kwargs)
+            self._count("defer")
+
+    async def edit(self, **kwargs):
+        """แก้ข้อความของปุ่ม/เมนูที่ถูกกด: edit_message ถ้ายังไม่ได้ตอบ หรือ edit_original_response ถ้า defer แล้ว"""
+        async with self._lock:
+            if not self.done:
+                await self.interaction.response.edit_message(**kwargs)
+                self._count("edit_message")
+                return
+            await self.interaction.edit_original_response(**kwargs)
+            self._count("edit_original_response")
+
+    async def send(self, content=None, **kwargs):
+        """ส่งข้อความตอบ: send_message ถ้ายังไม่ได้ตอบ หรือ followup ถ้าตอบ/defer ไปแล้ว"""
+        async with self._lock:
+            if not self.done:
+                await self.interaction.response.send_message(content, **kwargs)
+                self._count("send_message")
+                return
+            await self.interaction.followup.send(content, **kwargs)
+            self._count("followup.send")
+
+    async def followup(self, content=None, **kwargs):
+        """ส่งข้อความเพิ่มหลังจากตอบไปแล้ว
+
+        Returns:
+            discord.WebhookMessage: ข้อความที่ส่ง
+        """
+        message = await self.interaction.followup.send(content, **kwargs)
+        self._count("followup.send")
+        return message
+
+    async def send_modal(self, modal):
+        """ตอบด้วย modal (ต้องเป็นการตอบครั้งแรก)"""
+        self.expect_modal = True
+        async with self._lock:
+            await self.interaction.response.send_modal(modal)
+            self._count("send_modal")
+
+    async def track(self, method, awaitable):
+        """รอการเรียก API อื่นที่เกิดจาก interaction นี้ (เช่น channel.send) และนับสถิติ"""
+        result = await awaitable
+        self._count(method)
+        return result
+
+
+def responder(interaction):
+    """ตัวตอบของ interaction นี้ (สร้างครั้งแรกแล้วเก็บไว้ใน interaction.extras)"""
+    current = interaction.extras.get("responder")
+    if current is None:
+        current = interaction.extras["responder"] = InteractionResponder(interaction)
+    return current
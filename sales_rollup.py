@@ -0,0 +1,205 @@
+"""
+สรุปยอดขายแบบสะสม (rollup) สำหรับบอท Discord Shop
+ทุกครั้งที่บันทึกการซื้อ ยอดขายและจำนวนชิ้นจะถูกบวกเข้าในกลุ่ม สินค้า / ประเทศ / หมวดหมู่ / วัน / สัปดาห์
+รายงานยอดขายจึงอ่านจากตัวเลขที่สรุปไว้แล้ว ไม่ต้องอ่านประวัติการซื้อทั้งหมดทุกครั้ง
+ไฟล์ sales_rollup.json ถูกเขียนแบบหน่วงเวลา (รวมการซื้อที่ติดกันเป็นการเขียนครั้งเดียว) และเมื่อปิดโปรแกรม
+"""
+import atexit
+import copy
+import os
+import threading
+from datetime import date
+from pathlib import Path
+
+from json_store import JsonFileStore
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+SALES_ROLLUP_FILE = SCRIPT_DIR / "sales_rollup.json"
+
+# ระยะเวลารอก่อนเขียนยอดสะสมลงไฟล์ (วินาที) ปรับได้ผ่าน environment variable
+# ถ้าโปรเซสหยุดก่อนเขียน open() จะบวกรายการที่อยู่หลัง watermark ในประวัติการซื้อเพิ่มให้
+ROLLUP_FLUSH_DELAY = float(os.getenv("SALES_ROLLUP_FLUSH_DELAY", "5.0"))
+
+# กลุ่มที่สรุปยอด (แต่ละค่าเป็น [ยอดขาย, จำนวนชิ้น, จำนวนคำสั่งซื้อ])
+ROLLUP_GROUPS = ("product", "country", "category", "day", "week")
+
+
+def _number(value):
+    """แปลงราคา/จำนวนเป็นตัวเลข (0 ถ้าแปลงไม่ได้)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def purchase_lines(record):
+    """แยกรายการสินค้าในประวัติการซื้อ (รองรับรูปแบบ items ทุกแบบที่บอทเคยบันทึก)
+
+    Yields:
+        tuple: (ชื่อสินค้า, ประเทศ, หมวดหมู่, จำนวนชิ้น, ยอดขาย)
+    """
+    for item in record.get("items") or []:
+        if not isinstance(item, dict):
+            continue
+        if "product" in item:
+            # รูปแบบของคำสั่ง !สั่งของ
+            product = item.get("product") or {}
+            units = _number(item.get("quantity"))
+            revenue = _number(item.get("subtotal"))
+            yield (product.get("name", ""), item.get("country") or product.get("country", ""),
+                   product.get("category", ""), units, revenue)
+        else:
+            units = _number(item.get("qty"))
+            revenue = _number(item.get("price")) * units
+            yield (item.get("name", ""), item.get("country_thai") or item.get("country", ""),
+                   item.get("category", ""), units, revenue)
+
+
+def week_key(day):
+    """คีย์สัปดาห์แบบ ISO (เช่น 2025-W07) จากวันที่ YYYY-MM-DD"""
+    try:
+        year, week, _ = date.fromisoformat(day).isocalendar()
+    except ValueError:
+        return ""
+    return f"{year}-W{week:02d}"
+
+
+def _empty():
+    # watermark: segment id ของประวัติการซื้อ -> ตำแหน่งไบต์ที่รวมเข้ายอดสะสมแล้ว
+    data = {"records": 0, "revenue": 0, "units": 0, "watermark": {}}
+    for group in ROLLUP_GROUPS:
+        data[group] = {}
+    return data
+
+
+class SalesRollup:
+    """ยอดขายสะสมที่อัปเดตทีละรายการ พร้อมบันทึกลงไฟล์แบบหน่วงเวลา"""
+
+    def __init__(self, path=SALES_ROLLUP_FILE, delay=ROLLUP_FLUSH_DELAY):
+        self._file = JsonFileStore(path, default=_empty, indent=None)
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._timer = None
+        self.writes = 0    # จำนวนการเขียนไฟล์จริง
+
+    def _load(self):
+        return self._file.load()
+
+    def _save(self):
+        self._file.save()
+        self._dirty = False
+        self.writes += 1
+
+    def _schedule(self):
+        """ตั้งเวลา flush ถ้ายังไม่มีการตั้งไว้ (เรียกภายใต้ self._lock)"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """เขียนยอดสะสมลงไฟล์ถ้ามีการเปลี่ยนแปลงที่ยังไม่ได้เขียน
+
+        Returns:
+            bool: True ถ้ามีการเขียนไฟล์
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return False
+            try:
+                self._save()
+            except OSError as e:
+                print(f"⚠️ ไม่สามารถบันทึกยอดขายสะสม: {e}")
+                self._schedule()
+                return False
+            return True
+
+    @staticmethod
+    def _add(data, record):
+        day = str(record.get("timestamp", ""))[:10]
+        keys = {"day": day, "week": week_key(day)}
+        touched = set()
+        data["records"] += 1
+        for name, country, category, units, revenue in purchase_lines(record):
+            keys.update(product=name, country=country, category=category)
+            for group in ROLLUP_GROUPS:
+                entry = data[group].setdefault(keys[group], [0, 0, 0])
+                entry[0] += revenue
+                entry[1] += units
+                if (group, keys[group]) not in touched:
+                    # นับคำสั่งซื้อครั้งเดียวต่อกลุ่ม แม้จะมีหลายสินค้าในกลุ่มเดียวกัน
+                    touched.add((group, keys[group]))
+                    entry[2] += 1
+            data["revenue"] += revenue
+            data["units"] += units
+
+    def open(self, history=None):
+        """โหลดยอดสะสม แล้วบวกรายการในประวัติที่อยู่หลัง watermark (เรียกใน thread pool)
+
+        รายการที่บันทึกลงประวัติแล้วแต่ยอดสะสมยังไม่ได้เขียนลงไฟล์ (โปรเซสหยุดก่อน flush) จะถูกบวกเพิ่ม
+        segment ที่ถูกลบตาม HISTORY_RETENTION_DAYS ไม่ทำให้ต้องสร้างยอดสะสมใหม่ ยอดขายของ segment นั้นจึงยังอยู่
+
+        Args:
+            history (HistoryStore, optional): ที่เก็บประวัติการซื้อสำหรับตรวจสอบ/สร้างยอดสะสมใหม่
+        """
+        with self._lock:
+            data = self._load()
+            if history is None:
+                return
+            positions = history.positions()
+            watermark = data.get("watermark")
+            if watermark is None:
+                # ยอดสะสมจากเวอร์ชันก่อนไม่มี watermark ตรวจด้วยจำนวนรายการแทน (ครั้งเดียว)
+                if data["records"] == history.stats()["records"]:
+                    watermark = dict(positions)
+                else:
+                    print(f"🔄 สร้างยอดขายสะสมใหม่จากประวัติการซื้อ ({history.stats()['records']} รายการ)")
+                    data = self._file.data = _empty()
+                    watermark = {}
+
+            added = 0
+            for segment_id, position, record in history.iter_after(watermark):
+                self._add(data, record)
+                watermark[segment_id] = position
+                added += 1
+            if added:
+                print(f"🔄 เพิ่มยอดขาย {added} รายการจากประวัติการซื้อที่ยังไม่ได้รวม")
+
+            # ไม่ต้องจำ segment ที่ถูกลบไปแล้ว (ยอดขายของ segment นั้นยังอยู่ในยอดสะสม)
+            watermark = {segment_id: position for segment_id, position in watermark.items() if segment_id in positions}
+            if added or watermark != data.get("watermark"):
+                data["watermark"] = watermark
+                self._save()
+
+    def record(self, purchase, position=None):
+        """บวกยอดขายของการซื้อหนึ่งครั้งเข้ายอดสะสม (ไฟล์จะถูกเขียนภายหลังใน flush)
+
+        Args:
+            purchase (dict): ข้อมูลการซื้อ
+            position (tuple, optional): (segment id, ตำแหน่งไบต์หลังรายการ) จาก history_store.append
+        """
+        with self._lock:
+            data = self._load()
+            self._add(data, purchase)
+            watermark = data.get("watermark")
+            if position is not None and watermark is not None:
+                segment_id, offset = position
+                watermark[segment_id] = max(watermark.get(segment_id, 0), offset)
+            self._dirty = True
+            self._schedule()
+
+    def report(self):
+        """สำเนายอดสะสมทั้งหมดสำหรับสร้างรายงาน"""
+        with self._lock:
+            return copy.deepcopy(self._load())
+
+
+# ยอดขายสะสมที่ใช้ร่วมกันทั้งโปรเซส
+sales_rollup = SalesRollup()
+
+# เขียนยอดสะสมที่ค้างอยู่ก่อนปิดโปรแกรม
+atexit.register(sales_rollup.flush)
@@ -0,0 +1,67 @@
+"""
+รูปแบบการเลือกสินค้าของหน้าร้านแยกตามช่อง (คำสั่ง !โหมดร้าน) สำหรับบอท Discord Shop
+- buttons: ปุ่มสินค้าหน้าละ 5 ปุ่ม (แบบเดิม)
+- select: เมนูเลือกสินค้าหน้าละ 25 รายการ เลือกได้หลายรายการแล้วใส่จำนวนใน modal เดียว
+"""
+import os
+import threading
+from pathlib import Path
+
+from json_store import JsonFileStore
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+SHOP_MODES_FILE = SCRIPT_DIR / "shop_modes.json"
+
+SHOP_MODE_BUTTONS = "buttons"
+SHOP_MODE_SELECT = "select"
+SHOP_MODES = (SHOP_MODE_BUTTONS, SHOP_MODE_SELECT)
+
+# รูปแบบของช่องที่แอดมินยังไม่ได้ตั้งค่า
+DEFAULT_SHOP_MODE = os.getenv("SHOP_PICKER_MODE", SHOP_MODE_BUTTONS)
+if DEFAULT_SHOP_MODE not in SHOP_MODES:
+    DEFAULT_SHOP_MODE = SHOP_MODE_BUTTONS
+
+
+class ShopModeStore:
+    """ที่เก็บรูปแบบการเลือกสินค้าของแต่ละช่อง (id ช่อง -> รูปแบบ) เก็บเฉพาะช่องที่ไม่ได้ใช้ค่าเริ่มต้น"""
+
+    def __init__(self, path=SHOP_MODES_FILE, default=DEFAULT_SHOP_MODE):
+        self._file = JsonFileStore(path)
+        self.default = default
+        self._lock = threading.Lock()
+
+    def _load(self):
+        return self._file.load()
+
+    def _save(self):
+        self._file.save()
+
+    def open(self):
+        """โหลดไฟล์เข้าหน่วยความจำ (เรียกใน thread pool ก่อนใช้งานครั้งแรก)"""
+        with self._lock:
+            self._load()
+
+    def get(self, channel_id):
+        """รูปแบบการเลือกสินค้าของช่อง (ใช้ค่าเริ่มต้นถ้ายังไม่ได้ตั้งค่า)"""
+        with self._lock:
+            return self._load().get(str(channel_id), self.default)
+
+    def set(self, channel_id, mode):
+        """ตั้งรูปแบบการเลือกสินค้าของช่อง (เรียกใน thread pool)
+
+        Raises:
+            ValueError: ถ้ารูปแบบไม่ถูกต้อง
+        """
+        if mode not in SHOP_MODES:
+            raise ValueError(f"รูปแบบไม่ถูกต้อง: {mode}")
+        with self._lock:
+            modes = self._load()
+            if mode == self.default:
+                modes.pop(str(channel_id), None)
+            else:
+                modes[str(channel_id)] = mode
+            self._save()
+
+
+# รูปแบบการเลือกสินค้าของทุกช่องที่ใช้ร่วมกันทั้งโปรเซส
+shop_modes = ShopModeStore()
@@ -1,17 +1,34 @@
 import discord
 from discord.ext import commands, tasks
-from discord.ui import View, Button, Modal, TextInput
+from discord.ui import View, Button, Modal, TextInput, Select
 import json
 import os
 import io
 import qrcode
 from PIL import Image
-from datetime import datetime
+from datetime import datetime, timedelta
 from pathlib import Path
 import re
+import zlib
+import copy
+from collections import OrderedDict
 from admin_examples import create_admin_examples_embed
-from db_operations import load_countries, load_products, load_qrcode_url, load_thank_you_message, load_qrcode_url_async, save_qrcode_to_mongodb, load_thank_you_message_async, save_thank_you_message_to_mongodb, load_target_channel_id, save_target_channel_id, load_channel_state, save_channel_state, update_pending_number, sync_channel_numbers
+from async_db import load_countries_tuple, load_qrcode_url_async, save_qrcode_to_mongodb, load_thank_you_message_async, save_thank_you_message_to_mongodb, load_target_channel_id, save_target_channel_id, load_channel_state, save_channel_state, run_blocking
+from async_db import load_categories as load_categories_from_db, save_categories_to_mongodb
 from generate_qrcode import get_qrcode_discord_file
+from catalog_store import catalog_store, CatalogSnapshot, choice_value, CATALOG_CHECK_SECONDS
+from cart import Cart, cart_store, CART_TTL
+from write_behind import category_writer
+from config_cache import config_cache, channel_state_value
+from channel_counter import channel_counter
+from delta_sync import delta_sync
+from change_watcher import change_watcher
+from purchase_history import history_store, read_history_page
+from sales_rollup import sales_rollup
+from pending_orders import pending_orders
+from storefronts import storefront_store
+from shop_modes import shop_modes, SHOP_MODES, SHOP_MODE_BUTTONS, SHOP_MODE_SELECT
+from responder import responder, interaction_stats
 
 # นำเข้าโมดูลช่วยสำหรับ Render.com
 try:
@@ -81,7 +98,8 @@ CATEGORIES = ["money", "weapon", "item", "story", "car", "fashion", "rentcar"]
 
 # ตัวแปรสำหรับนับข้อความที่ยังไม่ได้เปลี่ยนชื่อช่อง
 # MongoDB-based pending number system - no local counters needed
-CATEGORY_NAMES = {
+# ชื่อและอีโมจิเริ่มต้นของหมวดสินค้า (ค่าที่ใช้จริงอ่านผ่าน category_names()/category_emojis() จาก config_cache)
+DEFAULT_CATEGORY_NAMES = {
     "money": "เงิน",
     "weapon": "อาวุธ",
     "item": "ไอเทม",
@@ -91,7 +109,7 @@ CATEGORY_NAMES = {
     "rentcar": "เช่ารถ"
 }
 # อีโมจิสำหรับหมวดสินค้า
-CATEGORY_EMOJIS = {
+DEFAULT_CATEGORY_EMOJIS = {
     "money": "💵",
     "weapon": "🔫",
     "item": "🎁",
@@ -104,30 +122,47 @@ CATEGORY_EMOJIS = {
 # ไฟล์เก็บข้อมูลหมวดหมู่สินค้า
 CATEGORIES_CONFIG_FILE = SCRIPT_DIR / "categories_config.json"
 
-def save_categories():
+def category_names():
+    """ชื่อหมวดหมู่ (อ่านจาก config_cache ในหน่วยความจำ ใช้ค่าเริ่มต้นถ้ายังไม่ได้โหลด)"""
+    return (config_cache.read("categories") or {}).get("category_names") or DEFAULT_CATEGORY_NAMES
+
+def category_emojis():
+    """อีโมจิหมวดหมู่ (อ่านจาก config_cache ในหน่วยความจำ ใช้ค่าเริ่มต้นถ้ายังไม่ได้โหลด)"""
+    return (config_cache.read("categories") or {}).get("category_emojis") or DEFAULT_CATEGORY_EMOJIS
+
+def categories_config(names=None, emojis=None):
+    """ข้อมูลหมวดหมู่ในรูปแบบเดียวกับ categories_config.json และเอกสาร categories ใน MongoDB"""
+    return {
+        "categories": CATEGORIES,
+        "category_names": dict(names if names is not None else category_names()),
+        "category_emojis": dict(emojis if emojis is not None else category_emojis())
+    }
+
+def save_categories(config=None):
     """บันทึกข้อมูลหมวดหมู่ลงไฟล์"""
     with open(CATEGORIES_CONFIG_FILE, "w", encoding="utf-8") as f:
-        json.dump({
-            "categories": CATEGORIES, 
-            "category_names": CATEGORY_NAMES,
-            "category_emojis": CATEGORY_EMOJIS
-        }, f, ensure_ascii=False, indent=4)
+        json.dump(config or categories_config(), f, ensure_ascii=False, indent=4)
         
 def load_categories():
-    """โหลดข้อมูลหมวดหมู่จากไฟล์ หรือใช้ค่าเริ่มต้นถ้ายังไม่มีไฟล์"""
-    global CATEGORIES, CATEGORY_NAMES, CATEGORY_EMOJIS
+    """โหลดข้อมูลหมวดหมู่จากไฟล์ หรือใช้ค่าเริ่มต้นถ้ายังไม่มีไฟล์ (ใช้เมื่อโหลดจาก MongoDB ไม่ได้)
+    
+    ชื่อและอีโมจิที่โหลดได้ถูกเก็บใน config_cache
+    """
+    global CATEGORIES
     try:
         with open(CATEGORIES_CONFIG_FILE, "r", encoding="utf-8") as f:
             config = json.load(f)
             CATEGORIES = config.get("categories", CATEGORIES)
-            CATEGORY_NAMES = config.get("category_names", CATEGORY_NAMES)
-            CATEGORY_EMOJIS = config.get("category_emojis", CATEGORY_EMOJIS)
+            config_cache.update("categories", categories_config(
+                config.get("category_names", category_names()),
+                config.get("category_emojis", category_emojis())
+            ))
     except (FileNotFoundError, json.JSONDecodeError):
         # ถ้าไม่มีไฟล์หรืออ่านไม่ได้ ให้บันทึกค่าเริ่มต้น
         save_categories()
         
 def edit_category(category_code, new_emoji=None, new_name=None):
-    """แก้ไขอีโมจิและชื่อของหมวดหมู่สินค้า
+    """แก้ไขอีโมจิและชื่อของหมวดหมู่สินค้า แล้วบันทึกลงไฟล์
     
     Args:
         category_code (str): รหัสหมวดหมู่ที่ต้องการแก้ไข (เช่น money, weapon)
@@ -135,26 +170,26 @@ def edit_category(category_code, new_emoji=None, new_name=None):
         new_name (str, optional): ชื่อใหม่
         
     Returns:
-        bool: True ถ้าสำเร็จ, False ถ้าไม่พบหมวดหมู่
+        dict: ข้อมูลหมวดหมู่ใหม่ (ให้ผู้เรียกบันทึกผ่าน config_cache.set) หรือ None ถ้าไม่พบหมวดหมู่
     """
-    global CATEGORY_NAMES, CATEGORY_EMOJIS
-    
     # ตรวจสอบว่าหมวดหมู่นี้มีอยู่หรือไม่
     if category_code not in CATEGORIES:
-        return False
+        return None
+    
+    config = categories_config()
     
     # อัปเดตชื่อหมวดหมู่ถ้ามีการระบุ
     if new_name:
-        CATEGORY_NAMES[category_code] = new_name
+        config["category_names"][category_code] = new_name
     
     # อัปเดตอีโมจิหมวดหมู่ถ้ามีการระบุ
     if new_emoji:
-        CATEGORY_EMOJIS[category_code] = new_emoji
+        config["category_emojis"][category_code] = new_emoji
     
     # บันทึกข้อมูลหมวดหมู่ลงไฟล์
-    save_categories()
+    save_categories(config)
     
-    return True
+    return config
 
 # อีโมจิสำหรับประเทศ
 COUNTRY_EMOJIS = {
@@ -192,7 +227,6 @@ def load_qrcode_url():
 # ฟังก์ชันนี้สร้างขึ้นเพื่อให้ทำงานร่วมกับฟังก์ชันที่นำเข้าจาก db_operations
 async def load_qrcode_url_async_local():
     """Load QR code URL from MongoDB or fall back to config file (async version)"""
-    from db_operations import load_qrcode_url_async
     return await load_qrcode_url_async()
 
 def save_qrcode_url(url):
@@ -216,6 +250,27 @@ def save_thank_you_message(message):
     with open(THANK_YOU_CONFIG_FILE, "w", encoding="utf-8") as f:
         json.dump({"message": message}, f, ensure_ascii=False, indent=2)
 
+async def _save_qrcode_config(url):
+    """บันทึก QR Code URL ลงไฟล์ config และ MongoDB"""
+    await run_blocking(save_qrcode_url, url)
+    return await save_qrcode_to_mongodb(url)
+
+async def _save_thank_you_config(message):
+    """บันทึกข้อความขอบคุณลงไฟล์ config และ MongoDB (บอทตัวอื่นเห็นค่าใหม่เมื่อ TTL ของแคชหมด)"""
+    await run_blocking(save_thank_you_message, message)
+    return await save_thank_you_message_to_mongodb(message)
+
+async def _save_channel_state_config(state):
+    """บันทึกสถานะช่องจาก dict ของแคช"""
+    return await save_channel_state(state["channel_name"], state["current_number"], state["pending_number"])
+
+# ค่าการตั้งค่าที่อ่านบ่อย เก็บไว้ในหน่วยความจำ และบันทึกแบบ write-through ผ่าน config_cache
+config_cache.register("target_channel_id", load_target_channel_id, save_target_channel_id, cast=int)
+config_cache.register("qrcode_url", load_qrcode_url_async_local, _save_qrcode_config, cast=str)
+config_cache.register("thank_you_message", load_thank_you_message_async, _save_thank_you_config, cast=str)
+config_cache.register("categories", load_categories_from_db, save_categories_to_mongodb, cast=dict)
+config_cache.register("channel_state", load_channel_state, _save_channel_state_config, cast=channel_state_value)
+
 def save_countries():
     """Save country data to the JSON file"""
     with open(COUNTRIES_FILE, "w", encoding="utf-8") as f:
@@ -362,7 +417,7 @@ intents.message_content = True
 bot = commands.Bot(command_prefix="!", intents=intents, help_command=None)
 
 def load_products(country=None, category=None):
-    """Load product data from the JSON file based on country and category
+    """Load product data from the in-memory catalog based on country and category
     
     Args:
         country (str, optional): Country code (1, 2, 3, 4, 5) or legacy code (thailand, japan, usa). Defaults to None.
@@ -380,15 +435,7 @@ def load_products(country=None, category=None):
         if country in COUNTRIES and category in CATEGORIES:
             # สร้างพาธไฟล์: categories/[country]/[category].json
             category_file = CATEGORIES_DIR / country / f"{category}.json"
-            try:
-                with open(category_file, "r", encoding="utf-8") as f:
-                    products = json.load(f)
-                    # เพิ่มข้อมูลประเทศและหมวดหมู่ให้แต่ละสินค้า
-                    for product in products:
-                        product["country"] = country
-                        product["category"] = category
-                    return products
-            except FileNotFoundError:
+            if not category_file.exists():
                 print(f"Category file not found at {category_file}, creating empty category file")
                 # สร้างโฟลเดอร์ประเทศหากยังไม่มี
                 country_dir = CATEGORIES_DIR / country
@@ -396,203 +443,109 @@ def load_products(country=None, category=None):
                 # สร้างไฟล์หมวดหมู่เปล่า
                 with open(category_file, "w", encoding="utf-8") as f:
                     json.dump([], f, ensure_ascii=False, indent=2)
+                catalog_store.mark_written(country, category, [])
                 return []
-            except json.JSONDecodeError:
-                print(f"Invalid JSON in category file at {category_file}, falling back to main products file")
-                return []
+            
+            # อ่านจากแคตตาล็อกในหน่วยความจำ (โหลดไฟล์ใหม่เฉพาะเมื่อไฟล์เปลี่ยน)
+            return catalog_store.get_products(COUNTRIES, CATEGORIES, country=country, category=category)
     
     # ถ้าระบุแค่ประเทศ โหลดสินค้าทั้งหมดจากทุกหมวดในประเทศนั้น
     elif country and country in COUNTRIES:
-        all_products = []
-        country_dir = CATEGORIES_DIR / country
-        country_dir.mkdir(exist_ok=True)  # สร้างโฟลเดอร์ประเทศหากยังไม่มี
-        
-        # วนลูปอ่านทุกไฟล์ในโฟลเดอร์ประเทศ
-        for category in CATEGORIES:
-            category_file = country_dir / f"{category}.json"
-            try:
-                with open(category_file, "r", encoding="utf-8") as f:
-                    products = json.load(f)
-                    # เพิ่มข้อมูลประเทศและหมวดหมู่ให้แต่ละสินค้า
-                    for product in products:
-                        product["country"] = country
-                        product["category"] = category
-                    all_products.extend(products)
-            except (FileNotFoundError, json.JSONDecodeError):
-                # ข้ามไปหากไม่มีไฟล์หรือไฟล์ไม่ถูกต้อง
-                continue
-        
-        return all_products
+        return catalog_store.get_products(COUNTRIES, CATEGORIES, country=country)
     
     # ถ้าระบุแค่หมวดหมู่ โหลดสินค้าในหมวดนั้นจากทุกประเทศ
     elif category and category in CATEGORIES:
-        all_products = []
-        
-        # วนลูปอ่านจากทุกประเทศ
-        for country in COUNTRIES:
-            country_dir = CATEGORIES_DIR / country
-            country_dir.mkdir(exist_ok=True)
-            
-            category_file = country_dir / f"{category}.json"
-            try:
-                with open(category_file, "r", encoding="utf-8") as f:
-                    products = json.load(f)
-                    # เพิ่มข้อมูลประเทศและหมวดหมู่ให้แต่ละสินค้า
-                    for product in products:
-                        product["country"] = country
-                        product["category"] = category
-                    all_products.extend(products)
-            except (FileNotFoundError, json.JSONDecodeError):
-                # ข้ามไปหากไม่มีไฟล์หรือไฟล์ไม่ถูกต้อง
-                continue
-        
-        return all_products
+        return catalog_store.get_products(COUNTRIES, CATEGORIES, category=category)
     
     # ถ้าไม่ระบุอะไรเลย โหลดสินค้าทั้งหมด
     else:
-        all_products = []
-        
-        # วนลูปอ่านจากทุกประเทศและทุกหมวดหมู่
-        for country in COUNTRIES:
-            country_dir = CATEGORIES_DIR / country
-            country_dir.mkdir(exist_ok=True)
-            
-            for category in CATEGORIES:
-                category_file = country_dir / f"{category}.json"
-                try:
-                    with open(category_file, "r", encoding="utf-8") as f:
-                        products = json.load(f)
-                        # เพิ่มข้อมูลประเทศและหมวดหมู่ให้แต่ละสินค้า
-                        for product in products:
-                            product["country"] = country
-                            product["category"] = category
-                        all_products.extend(products)
-                except (FileNotFoundError, json.JSONDecodeError):
-                    # ข้ามไปหากไม่มีไฟล์หรือไฟล์ไม่ถูกต้อง
-                    continue
+        all_products = catalog_store.get_products(COUNTRIES, CATEGORIES)
         
         # ถ้าไม่มีสินค้าในระบบใหม่ ลองโหลดจากไฟล์หลักเดิม (เพื่อการเข้ากันได้กับระบบเก่า)
         if not all_products:
-            try:
-                with open(PRODUCTS_FILE, "r", encoding="utf-8") as f:
-                    legacy_products = json.load(f)
-                    return legacy_products
-            except (FileNotFoundError, json.JSONDecodeError):
-                return []
+            return catalog_store.load_legacy_products()
         
         return all_products
 
+def _strip_location(product):
+    """สร้างสำเนาสินค้าที่ไม่มีข้อมูล country และ category (ไม่จำเป็นต้องเก็บซ้ำในไฟล์หมวด)"""
+    clean_product = dict(product)
+    clean_product.pop("country", None)
+    clean_product.pop("category", None)
+    return clean_product
+
+def _read_json(path):
+    """อ่านไฟล์ JSON (งานที่บล็อก ให้เรียกผ่าน run_blocking จาก coroutine)"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_json(path, data):
+    """เขียนไฟล์ JSON (งานที่บล็อก ให้เรียกผ่าน run_blocking จาก coroutine)"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+def _read_category_files(categories_dir):
+    """อ่านไฟล์หมวดหมู่ทุกไฟล์ในโฟลเดอร์ categories (งานที่บล็อก ให้เรียกผ่าน run_blocking)
+    
+    Returns:
+        list: (รหัสประเทศ, รหัสหมวดหมู่, ไฟล์, สินค้า หรือ exception ถ้าอ่านไฟล์ไม่ได้)
+    """
+    results = []
+    if not categories_dir.exists():
+        return results
+    for country_dir in sorted(categories_dir.iterdir()):
+        if not country_dir.is_dir():
+            continue
+        for category_file in sorted(country_dir.iterdir()):
+            if category_file.is_file() and category_file.suffix == '.json':
+                try:
+                    category_products = _read_json(category_file)
+                except Exception as e:
+                    category_products = e
+                results.append((country_dir.name, category_file.stem, category_file, category_products))
+    return results
+
 def save_products(products, country=None, category=None):
-    """Save product data to the JSON file or category file"""
+    """Save product data to the JSON file or category file
+    
+    ไฟล์จะไม่ถูกเขียนทันที แต่ส่งเข้า category_writer เพื่อรวมการแก้ไขที่เกิดติดกันให้เหลือการเขียนครั้งเดียวต่อไฟล์
+    """
     # บันทึกลงไฟล์หลักเสมอ (backward compatibility)
-    with open(PRODUCTS_FILE, "w", encoding="utf-8") as f:
-        json.dump(products, f, ensure_ascii=False, indent=2)
+    category_writer.stage_legacy(products)
+    
+    # จัดกลุ่มสินค้าตามประเทศและหมวดหมู่ครั้งเดียว
+    grouped_products = {}
+    for product in products:
+        key = (product.get("country"), product.get("category"))
+        grouped_products.setdefault(key, []).append(_strip_location(product))
     
     # ถ้าระบุทั้งประเทศและหมวดหมู่ บันทึกเฉพาะสินค้าในประเทศและหมวดนั้น
     if country and category:
         if country in COUNTRIES and category in CATEGORIES:
-            # กรองสินค้าตามประเทศและหมวดหมู่
-            filtered_products = [p for p in products if p.get("country") == country and p.get("category") == category]
-            
-            # สร้างโฟลเดอร์ประเทศและบันทึกไฟล์
-            country_dir = CATEGORIES_DIR / country
-            country_dir.mkdir(exist_ok=True)
-            
-            category_file = country_dir / f"{category}.json"
-            with open(category_file, "w", encoding="utf-8") as f:
-                # ลบข้อมูล country และ category ก่อนบันทึกลงไฟล์เฉพาะหมวด (ไม่จำเป็นต้องเก็บซ้ำ)
-                clean_products = []
-                for product in filtered_products:
-                    # สร้าง copy ของสินค้าเพื่อไม่ให้กระทบต้นฉบับ
-                    clean_product = product.copy()
-                    if "country" in clean_product:
-                        del clean_product["country"]
-                    if "category" in clean_product:
-                        del clean_product["category"]
-                    clean_products.append(clean_product)
-                
-                json.dump(clean_products, f, ensure_ascii=False, indent=2)
+            category_writer.stage(country, category, grouped_products.get((country, category), []))
     
     # ถ้าระบุแค่ประเทศ บันทึกทุกหมวดหมู่ในประเทศนั้น
     elif country and country in COUNTRIES:
-        # สร้างโฟลเดอร์ประเทศ
-        country_dir = CATEGORIES_DIR / country
-        country_dir.mkdir(exist_ok=True)
-        
-        # แยกสินค้าตามหมวดหมู่และบันทึก
         for category in CATEGORIES:
-            # กรองสินค้าในประเทศและหมวดหมู่นี้
-            category_products = [p for p in products if p.get("country") == country and p.get("category") == category]
-            
             # ถ้ามีสินค้าในหมวดนี้ให้บันทึก
-            if category_products:
-                category_file = country_dir / f"{category}.json"
-                with open(category_file, "w", encoding="utf-8") as f:
-                    # ลบข้อมูล country และ category ก่อนบันทึก
-                    clean_products = []
-                    for product in category_products:
-                        clean_product = product.copy()
-                        if "country" in clean_product:
-                            del clean_product["country"]
-                        if "category" in clean_product:
-                            del clean_product["category"]
-                        clean_products.append(clean_product)
-                    
-                    json.dump(clean_products, f, ensure_ascii=False, indent=2)
+            if (country, category) in grouped_products:
+                category_writer.stage(country, category, grouped_products[(country, category)])
     
     # ถ้าระบุแค่หมวดหมู่ บันทึกหมวดนั้นในทุกประเทศ
     elif category and category in CATEGORIES:
         for country in COUNTRIES:
-            # กรองสินค้าในประเทศและหมวดหมู่นี้
-            country_products = [p for p in products if p.get("country") == country and p.get("category") == category]
-            
             # ถ้ามีสินค้าในประเทศนี้ให้บันทึก
-            if country_products:
-                # สร้างโฟลเดอร์ประเทศ
-                country_dir = CATEGORIES_DIR / country
-                country_dir.mkdir(exist_ok=True)
-                
-                category_file = country_dir / f"{category}.json"
-                with open(category_file, "w", encoding="utf-8") as f:
-                    # ลบข้อมูล country และ category ก่อนบันทึก
-                    clean_products = []
-                    for product in country_products:
-                        clean_product = product.copy()
-                        if "country" in clean_product:
-                            del clean_product["country"]
-                        if "category" in clean_product:
-                            del clean_product["category"]
-                        clean_products.append(clean_product)
-                    
-                    json.dump(clean_products, f, ensure_ascii=False, indent=2)
+            if (country, category) in grouped_products:
+                category_writer.stage(country, category, grouped_products[(country, category)])
     
     # ถ้าไม่ระบุอะไรเลย บันทึกทุกสินค้าแยกตามประเทศและหมวดหมู่
     else:
-        # จัดกลุ่มสินค้าตามประเทศและหมวดหมู่
         for country in COUNTRIES:
-            # สร้างโฟลเดอร์ประเทศ
-            country_dir = CATEGORIES_DIR / country
-            country_dir.mkdir(exist_ok=True)
-            
             for category in CATEGORIES:
-                # กรองสินค้าในประเทศและหมวดหมู่นี้
-                filtered_products = [p for p in products if p.get("country") == country and p.get("category") == category]
-                
                 # ถ้ามีสินค้าในประเทศและหมวดหมู่นี้ให้บันทึก
-                if filtered_products:
-                    category_file = country_dir / f"{category}.json"
-                    with open(category_file, "w", encoding="utf-8") as f:
-                        # ลบข้อมูล country และ category ก่อนบันทึก
-                        clean_products = []
-                        for product in filtered_products:
-                            clean_product = product.copy()
-                            if "country" in clean_product:
-                                del clean_product["country"]
-                            if "category" in clean_product:
-                                del clean_product["category"]
-                            clean_products.append(clean_product)
-                        
-                        json.dump(clean_products, f, ensure_ascii=False, indent=2)
+                if (country, category) in grouped_products:
+                    category_writer.stage(country, category, grouped_products[(country, category)])
             
 def save_product_to_category(product):
     """Save a single product to its category file
@@ -605,61 +558,26 @@ def save_product_to_category(product):
     
     # Check if country and category are valid
     if country in COUNTRIES and category in CATEGORIES:
-        # Ensure country directory exists
-        country_dir = CATEGORIES_DIR / country
-        country_dir.mkdir(exist_ok=True)
+        # อ่านสินค้าปัจจุบันจากแคตตาล็อก (รวมการแก้ไขที่ยังรอเขียนลงไฟล์) และลบสินค้าชื่อเดียวกันออก
+        category_products = [_strip_location(p) for p in catalog_store.get_products(COUNTRIES, CATEGORIES, country=country, category=category)
+                             if p.get("name") != product.get("name")]
         
-        # Set path to category file
-        category_file = country_dir / f"{category}.json"
+        # Add the clean product
+        category_products.append(_strip_location(product))
         
-        try:
-            # Try to read existing products from the category file
-            with open(category_file, "r", encoding="utf-8") as f:
-                category_products = json.load(f)
-                
-            # Remove product with same name if exists
-            category_products = [p for p in category_products if p.get("name") != product.get("name")]
-            
-            # Create a clean version of the product without country and category
-            clean_product = product.copy()
-            if "country" in clean_product:
-                del clean_product["country"]
-            if "category" in clean_product:
-                del clean_product["category"]
-            
-            # Add the clean product
-            category_products.append(clean_product)
-            
-            # Save back to category file
-            with open(category_file, "w", encoding="utf-8") as f:
-                json.dump(category_products, f, ensure_ascii=False, indent=2)
-                
-        except (FileNotFoundError, json.JSONDecodeError):
-            # Create a clean version of the product without country and category
-            clean_product = product.copy()
-            if "country" in clean_product:
-                del clean_product["country"]
-            if "category" in clean_product:
-                del clean_product["category"]
-                
-            # Create new category file with the single product
-            with open(category_file, "w", encoding="utf-8") as f:
-                json.dump([clean_product], f, ensure_ascii=False, indent=2)
+        # Save back to category file (ผ่าน write-behind)
+        category_writer.stage(country, category, category_products)
 
 def log_purchase(user, items, total_price):
-    """Log purchase history to the JSON file"""
-    # Create the history file if it doesn't exist
-    if not HISTORY_FILE.exists():
-        HISTORY_FILE.touch()
-        
-    with open(HISTORY_FILE, "a", encoding="utf-8") as f:
-        data = {
-            "user": str(user),
-            "items": items,
-            "total": total_price,
-            "timestamp": datetime.now().isoformat()
-        }
-        f.write(json.dumps(data, ensure_ascii=False) + "\n")
+    """Log purchase history to the segmented history store (see purchase_history.py)"""
+    data = {
+        "user": str(user),
+        "items": items,
+        "total": total_price,
+        "timestamp": datetime.now().isoformat()
+    }
+    position = history_store.append(data)
+    sales_rollup.record(data, position)
 
 def clear_category_products(category, country=None):
     """Delete all products in a specific category
@@ -679,25 +597,18 @@ def clear_category_products(category, country=None):
             category_file = country_dir / f"{category}.json"
             
             # ถ้ามีไฟล์อยู่แล้ว ให้เขียนอาร์เรย์ว่างทับ
-            if category_file.exists():
-                with open(category_file, "w", encoding="utf-8") as f:
-                    json.dump([], f, ensure_ascii=False, indent=2)
+            if category_file.exists() or category_writer.is_pending(country, category):
+                category_writer.stage(country, category, [])
             
-            # โหลดสินค้าทั้งหมดจากไฟล์หลัก
-            all_products = []
-            try:
-                with open(PRODUCTS_FILE, "r", encoding="utf-8") as f:
-                    all_products = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass
+            # โหลดสินค้าทั้งหมดจากไฟล์หลัก (รวมข้อมูลที่ยังรอเขียน)
+            all_products = category_writer.legacy_products()
             
             # กรองสินค้าออกเฉพาะในประเทศและหมวดที่ต้องการลบ
             filtered_products = [p for p in all_products 
                                  if not (p.get("country") == country and p.get("category") == category)]
             
             # บันทึกกลับไปที่ไฟล์หลัก
-            with open(PRODUCTS_FILE, "w", encoding="utf-8") as f:
-                json.dump(filtered_products, f, ensure_ascii=False, indent=2)
+            category_writer.stage_legacy(filtered_products)
                 
         # ถ้าไม่ระบุประเทศ ล้างหมวดนี้ในทุกประเทศ
         else:
@@ -706,24 +617,17 @@ def clear_category_products(category, country=None):
                 category_file = country_dir / f"{category}.json"
                 
                 # ถ้ามีไฟล์อยู่แล้ว ให้เขียนอาร์เรย์ว่างทับ
-                if category_file.exists():
-                    with open(category_file, "w", encoding="utf-8") as f:
-                        json.dump([], f, ensure_ascii=False, indent=2)
+                if category_file.exists() or category_writer.is_pending(country, category):
+                    category_writer.stage(country, category, [])
             
-            # โหลดสินค้าทั้งหมดจากไฟล์หลัก
-            all_products = []
-            try:
-                with open(PRODUCTS_FILE, "r", encoding="utf-8") as f:
-                    all_products = json.load(f)
-            except (FileNotFoundError, json.JSONDecodeError):
-                pass
+            # โหลดสินค้าทั้งหมดจากไฟล์หลัก (รวมข้อมูลที่ยังรอเขียน)
+            all_products = category_writer.legacy_products()
             
             # กรองสินค้าที่อยู่ในหมวดอื่นออก (เก็บเฉพาะที่ไม่ได้อยู่ในหมวดที่ต้องการลบ)
             filtered_products = [p for p in all_products if p.get("category") != category]
             
             # บันทึกกลับไปที่ไฟล์หลัก
-            with open(PRODUCTS_FILE, "w", encoding="utf-8") as f:
-                json.dump(filtered_products, f, ensure_ascii=False, indent=2)
+            category_writer.stage_legacy(filtered_products)
                 
         return True
     return False
@@ -738,17 +642,12 @@ def delete_all_products():
         # สร้างโฟลเดอร์ประเทศหากยังไม่มี
         country_dir.mkdir(exist_ok=True)
         
-        # ล้างทุกหมวดในประเทศนี้
+        # ล้างทุกหมวดในประเทศนี้ (เขียนรายการว่างผ่าน write-behind)
         for category in CATEGORIES:
-            category_file = country_dir / f"{category}.json"
-            
-            # เขียนรายการว่างลงไปในไฟล์
-            with open(category_file, "w", encoding="utf-8") as f:
-                json.dump([], f, ensure_ascii=False, indent=2)
+            category_writer.stage(country, category, [])
     
     # ล้างไฟล์หลัก
-    with open(PRODUCTS_FILE, "w", encoding="utf-8") as f:
-        json.dump([], f, ensure_ascii=False, indent=2)
+    category_writer.stage_legacy([])
     
     # ล้างไฟล์หมวดหมู่เดิม (สำหรับความเข้ากันได้กับระบบเก่า)
     old_categories = ["money.json", "weapon.json", "item.json", "car.json", "fashion.json", "rentcar.json"]
@@ -776,17 +675,8 @@ def add_no_product_placeholders():
         
         # ตรวจสอบทุกหมวดในประเทศนี้
         for category in CATEGORIES:
-            category_file = country_dir / f"{category}.json"
-            
-            # อ่านไฟล์หากมีอยู่แล้ว หรือสร้างไฟล์ว่างหากยังไม่มี
-            if category_file.exists():
-                try:
-                    with open(category_file, "r", encoding="utf-8") as f:
-                        products = json.load(f)
-                except (json.JSONDecodeError, FileNotFoundError):
-                    products = []
-            else:
-                products = []
+            # อ่านสินค้าจากแคตตาล็อก (รวมการแก้ไขที่ยังรอเขียนลงไฟล์)
+            products = catalog_store.get_products(COUNTRIES, CATEGORIES, country=country, category=category)
                 
             # เพิ่มสินค้า placeholder เฉพาะถ้าไม่มีสินค้าในหมวดนี้
             if not products:
@@ -798,9 +688,8 @@ def add_no_product_placeholders():
                     "country": country
                 })
                 
-                # บันทึกกลับไปที่ไฟล์
-                with open(category_file, "w", encoding="utf-8") as f:
-                    json.dump(products, f, ensure_ascii=False, indent=2)
+                # บันทึกกลับไปที่ไฟล์ (ผ่าน write-behind)
+                category_writer.stage(country, category, products)
                     
                 added_count += 1
     
@@ -906,13 +795,8 @@ def batch_add_products(products_data):
             # Add new products
             existing_category_products.extend(products)
             
-            # Save just the category file
+            # Save just the category file (สินค้าใหม่อยู่ในรายการนี้แล้ว ไม่ต้องบันทึกทีละรายการซ้ำ)
             save_products(existing_category_products, country, category)
-            
-            # บันทึกแต่ละสินค้าลงในไฟล์หลักด้วย (เพื่อให้การค้นหาสินค้าทำงานได้ถูกต้อง)
-            for product in products:
-                # Save each product individually to the appropriate category file
-                save_product_to_category(product)
     
     # คืนค่าจำนวนสินค้าที่เพิ่มและข้อผิดพลาด
     if added_count > 0:
@@ -944,26 +828,31 @@ class QuantityModal(Modal):
             # Convert input to integer
             quantity = int(self.quantity_input.value)
             if quantity < 0:
-                await interaction.response.send_message("❌ จำนวนต้องมากกว่าหรือเท่ากับ 0", ephemeral=True)
+                await responder(interaction).send("❌ จำนวนต้องมากกว่าหรือเท่ากับ 0", ephemeral=True)
                 return
                 
             self.quantity = quantity
-            await interaction.response.defer()
+            await responder(interaction).defer()
         except ValueError:
-            await interaction.response.send_message("❌ กรุณาใส่จำนวนเป็นตัวเลขเท่านั้น", ephemeral=True)
+            await responder(interaction).send("❌ กรุณาใส่จำนวนเป็นตัวเลขเท่านั้น", ephemeral=True)
 
-class PageIndicatorButton(Button):
+class PageIndicatorButton(discord.ui.DynamicItem[Button], template=r"s:i:(?P<page>\d+):(?P<total>\d+)"):
     """Button that shows current page (disabled - cannot be clicked)"""
-    def __init__(self, page, total_pages, row=0, view=None):
+    def __init__(self, page, total_pages, row=0):
         self.page = page
         self.total_pages = total_pages
-        self.parent_view = view
-        super().__init__(
+        # ต้องมี custom_id แบบ dynamic เพื่อไม่ให้ view ของข้อความถูกเก็บไว้ในหน่วยความจำ
+        super().__init__(Button(
             label=f"หน้า {page + 1}/{total_pages}",
             style=discord.ButtonStyle.secondary,
             disabled=True,  # Set button to disabled/non-clickable
+            custom_id=f"s:i:{page}:{total_pages}",
             row=row
-        )
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(int(match["page"]), int(match["total"]))
 
 class PageInputModal(Modal):
     """Modal for entering page number"""
@@ -988,11 +877,11 @@ class PageInputModal(Modal):
                 await self.view.go_to_page(interaction, page_number)
             else:
                 # Fallback if go_to_page is not available
-                await interaction.response.send_message(f"กำลังพยายามไปที่หน้า {page_number}", ephemeral=True)
+                await responder(interaction).send(f"กำลังพยายามไปที่หน้า {page_number}", ephemeral=True)
         except ValueError:
-            await interaction.response.send_message("กรุณาระบุเลขหน้าเป็นตัวเลขเท่านั้น", ephemeral=True)
+            await responder(interaction).send("กรุณาระบุเลขหน้าเป็นตัวเลขเท่านั้น", ephemeral=True)
         except Exception as e:
-            await interaction.response.send_message(f"เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+            await responder(interaction).send(f"เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
 
 class MultiCategoryView(View):
     """View for selecting multiple categories"""
@@ -1048,77 +937,179 @@ class MultiCategoryButton(Button):
         # Update message with current selections
         selected_text = ", ".join([f"`{cat}`" for cat in view.selected_categories]) if view.selected_categories else "ยังไม่ได้เลือกหมวดหมู่"
         
-        # ป้องกันข้อความ "การโต้ตอบล้มเหลว"
-        await interaction.response.defer()
-        
-        # ใช้ message.edit แทน response.edit_message เพื่อให้กดหลายครั้งได้
-        await interaction.message.edit(
+        # แก้ข้อความด้วยการตอบครั้งเดียว (defer ให้อัตโนมัติถ้าช้า)
+        await responder(interaction).edit(
             content=f"📋 เลือกหมวดหมู่สินค้า (กดปุ่มเพื่อเลือก/ยกเลิก):\nหมวดหมู่ที่เลือก: {selected_text}", 
             view=view
         )
 
-class CategoryNavButton(Button):
-    """Button to navigate between categories in the shop view"""
-    def __init__(self, category, is_active=False, row=0, country="thailand"):
-        self.category = category
-        self.country = country
-        style = discord.ButtonStyle.success if is_active else discord.ButtonStyle.secondary
-        # Use category name in Thai if available
-        label = CATEGORY_NAMES.get(category, category)
-        # ใช้อีโมจิตามหมวดหมู่
-        emoji = CATEGORY_EMOJIS.get(category, "")
-        super().__init__(
+# สถานะของหน้าร้านใน custom_id: ประเทศ:หมวด:หน้า:แสดงทุกประเทศ (0/1)
+# ปุ่มทุกปุ่มของหน้าร้านเป็น DynamicItem ที่ถอดสถานะจาก custom_id เอง จึงใช้งานได้ต่อหลังรีสตาร์ทบอท
+# และไม่ต้องเก็บ view ของแต่ละข้อความไว้ในหน่วยความจำ
+SHOP_ROUTE = r"(?P<country>[^:]+):(?P<category>[^:]+):(?P<page>\d+):(?P<all>[01])"
+
+def shop_route(country, category, page, showing_all_countries):
+    """สร้างส่วนสถานะหน้าร้านของ custom_id"""
+    return f"{country}:{category}:{page}:{int(bool(showing_all_countries))}"
+
+def _route_args(match):
+    """ถอดสถานะหน้าร้านจากผลการจับคู่ SHOP_ROUTE"""
+    return match["country"], match["category"], int(match["page"]), match["all"] == "1"
+
+async def current_catalog():
+    """snapshot ของแคตตาล็อกสำหรับ coroutine (อ่านจากหน่วยความจำ ถ้ายังไม่เคยโหลดจะโหลดใน thread pool)"""
+    return catalog_store.current(COUNTRIES, CATEGORIES) or await run_blocking(catalog_store.snapshot, COUNTRIES, CATEGORIES)
+
+def cart_key(interaction):
+    """คีย์ตะกร้าของผู้ใช้ใน cart_store: (guild id, user id) (0 แทน guild ใน DM)"""
+    return (interaction.guild_id or 0, interaction.user.id)
+
+def build_shop_view(interaction, country, category, page=0, showing_all_countries=False):
+    """สร้าง CategoryShopView จากสถานะใน custom_id พร้อมตะกร้าของผู้ใช้ที่กดปุ่ม
+
+    Returns:
+        CategoryShopView: view ของหน้าร้าน หรือ None ถ้าประเทศหรือหมวดหมู่ถูกลบไปแล้ว
+    """
+    if country not in COUNTRIES or category not in CATEGORIES:
+        return None
+    return CategoryShopView(
+        CATEGORIES,
+        current_category=category,
+        country=country,
+        cart=cart_store.get(cart_key(interaction)),
+        page=page,
+        showing_all_countries=showing_all_countries,
+        mode=shop_modes.get(interaction.channel_id)
+    )
+
+def cart_view(route):
+    """ปุ่มล้างตะกร้า/ยืนยันการซื้อใต้ข้อความสรุปตะกร้าแบบ ephemeral"""
+    view = View(timeout=None)
+    view.add_item(ResetCartButton(*route, summary=True))
+    view.add_item(ConfirmButton(*route))
+    return view
+
+async def send_cart_summary(interaction, view, edit=False):
+    """ตอบผู้ใช้ด้วยสรุปตะกร้าแบบ ephemeral (ข้อความหน้าร้านสาธารณะไม่ถูกแก้)
+
+    Args:
+        edit (bool): แก้ข้อความสรุปตะกร้าที่ผู้ใช้กดอยู่แทนการส่งข้อความใหม่
+    """
+    content = view.render_cart()
+    summary_view = cart_view(view.route) if len(view.cart) else None
+    if edit:
+        await responder(interaction).edit(content=content, view=summary_view)
+    elif summary_view is not None:
+        await responder(interaction).send(content, view=summary_view, ephemeral=True)
+    else:
+        await responder(interaction).send(content, ephemeral=True)
+
+async def send_shop_gone(interaction):
+    """แจ้งผู้ใช้เมื่อหน้าร้านอ้างถึงประเทศหรือหมวดหมู่ที่ไม่มีแล้ว"""
+    await responder(interaction).send("❌ ไม่พบประเทศหรือหมวดหมู่ของหน้าร้านนี้แล้ว กรุณาเปิดร้านใหม่ด้วยคำสั่ง `!shop`", ephemeral=True)
+
+class ShopNavButton(discord.ui.DynamicItem[Button], template=r"s:n:" + SHOP_ROUTE + r":(?P<slot>\w)"):
+    """Button to navigate the shop view (country, category and page buttons)
+    
+    custom_id เก็บหน้าปลายทาง ส่วน slot ใช้แยกปุ่มที่พาไปหน้าเดียวกันเพื่อไม่ให้ custom_id ซ้ำกันในข้อความ
+    """
+    def __init__(self, country, category, page, showing_all_countries, slot, label=None, emoji=None, style=discord.ButtonStyle.secondary, row=None):
+        self.route = (country, category, page, showing_all_countries)
+        super().__init__(Button(
             label=label,
             emoji=emoji,
             style=style,
-            custom_id=f"nav_{country}_{category}",
+            custom_id=f"s:n:{shop_route(country, category, page, showing_all_countries)}:{slot}",
             row=row
-        )
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(*_route_args(match), match["slot"])
     
     async def callback(self, interaction: discord.Interaction):
-        view = self.view
-        
-        # Create a new view with the same categories but showing this category's products
-        new_view = CategoryShopView(
-            view.all_categories, 
-            current_category=self.category, 
-            country=self.country,
-            quantities=view.quantities, 
-            page=0,
-            showing_all_countries=False if hasattr(view, 'showing_all_countries') else False
-        )
-        
-        # Create summary of current cart
-        summary_lines = []
-        total = 0
-        
-        if hasattr(view, 'all_products') and view.all_products:
-            for product in view.all_products:
-                # ตรวจสอบว่ามี id ใน product หรือไม่
-                if 'id' in product:
-                    qty = view.quantities.get(product['id'], 0)
-                    if qty > 0:
-                        item_total = product['price'] * qty
-                        total += item_total
-                        summary_lines.append(f"{product['emoji']} {product['name']} - {product['price']:.2f}฿ x {qty} = {item_total:.2f}฿")
-        
-        # แสดงชื่อประเทศและหมวดหมู่ในภาษาไทย
-        category_thai = CATEGORY_NAMES.get(self.category, self.category)
-        country_thai = COUNTRY_NAMES.get(self.country, self.country)
-        content = f"🛍️ สินค้าในประเทศ `{country_thai}` หมวด `{category_thai}`:"
-        
-        if summary_lines:
-            content += f"\n\n📝 รายการที่เลือก:\n" + "\n".join(summary_lines) + f"\n\n💵 ยอดรวม: {total:.2f}฿"
+        new_view = build_shop_view(interaction, *self.route)
+        if new_view is None:
+            await send_shop_gone(interaction)
+            return
         
-        # ป้องกันข้อความ "การโต้ตอบล้มเหลว"
-        await interaction.response.defer()
+        if interaction.message.flags.ephemeral:
+            # หน้าร้านส่วนตัวที่เปิดจากหน้าร้านถาวร แก้ได้ผ่าน response เท่านั้น
+            await responder(interaction).edit(content=new_view.render_content(), view=new_view)
+            return
+        if storefront_store.is_storefront(interaction.message.id):
+            # หน้าร้านถาวรของช่องไม่เปลี่ยนตามผู้ใช้คนใดคนหนึ่ง เปิดหน้าที่เลือกเป็นข้อความส่วนตัวแทน
+            await responder(interaction).send(new_view.render_content(), view=new_view, ephemeral=True)
+            return
         
-        # ใช้ message.edit แทน response.edit_message เพื่อให้กดหลายครั้งได้
-        await interaction.message.edit(content=content, view=new_view)
+        # แก้ข้อความหน้าร้านด้วยการตอบครั้งเดียว (defer ให้อัตโนมัติถ้าช้า)
+        await responder(interaction).edit(content=new_view.render_content(), view=new_view)
+
+# จำนวนเลย์เอาต์ปุ่มของหน้าร้านที่เก็บไว้สูงสุด (ลบเลย์เอาต์ที่ไม่ได้ใช้นานที่สุดก่อน)
+SHOP_LAYOUT_CACHE_SIZE = int(os.getenv("SHOP_LAYOUT_CACHE_SIZE", "512"))
+
+class ShopLayoutCache:
+    """ปุ่มของหน้าร้านที่สร้างไว้แล้วตามสถานะ (ประเทศ, หมวด, หน้า, แสดงทุกประเทศ)
+    
+    ปุ่มทุกปุ่มของหน้าร้านขึ้นกับสถานะใน custom_id แคตตาล็อก และชื่อ/อีโมจิของประเทศและหมวดหมู่เท่านั้น
+    ไม่มีข้อมูลของผู้ใช้ จึงสร้างครั้งเดียวแล้วให้ทุก view ใช้สำเนา (copy.copy) ของปุ่มชุดเดิม
+    แคชทั้งหมดถูกล้างเมื่อแคตตาล็อกเปลี่ยนเวอร์ชันหรือมีการแก้ไขประเทศ/หมวดหมู่
+    """
+    def __init__(self, max_layouts=SHOP_LAYOUT_CACHE_SIZE):
+        self.max_layouts = max_layouts
+        self._layouts = OrderedDict()
+        self._stamp = None
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, route, stamp):
+        """ปุ่มของสถานะนี้ (ต้องคัดลอกก่อนใส่ใน view) หรือ None ถ้ายังไม่มีในแคช"""
+        if stamp != self._stamp:
+            self._layouts.clear()
+            self._stamp = stamp
+        layout = self._layouts.get(route)
+        if layout is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._layouts.move_to_end(route)
+        return layout
+    
+    def put(self, route, stamp, items):
+        """เก็บปุ่มที่เพิ่งสร้างของสถานะนี้ (เก็บเป็นสำเนาที่ไม่ผูกกับ view ใด)"""
+        if stamp != self._stamp:
+            return
+        layout = []
+        for item in items:
+            item = copy.copy(item)
+            item._view = None
+            layout.append(item)
+        self._layouts[route] = tuple(layout)
+        while len(self._layouts) > self.max_layouts:
+            self._layouts.popitem(last=False)
+    
+    def stats(self):
+        """สถิติของแคช"""
+        return {"layouts": len(self._layouts), "hits": self.hits, "misses": self.misses}
+
+# แคชเลย์เอาต์ปุ่มของหน้าร้านที่ใช้ร่วมกันทั้งโปรเซส
+shop_layouts = ShopLayoutCache()
+
+def shop_layout_stamp(catalog, all_categories):
+    """สิ่งที่เลย์เอาต์ปุ่มของหน้าร้านขึ้นอยู่ด้วย นอกจากสถานะใน custom_id"""
+    return (
+        catalog.version,
+        tuple(all_categories),
+        tuple(COUNTRIES),
+        tuple(COUNTRY_NAMES.items()),
+        tuple(COUNTRY_EMOJIS.items()),
+        tuple(category_names().items()),
+        tuple(category_emojis().items())
+    )
 
 class CategoryShopView(View):
     """View for displaying products from a category with navigation to other categories"""
-    def __init__(self, all_categories, current_category=None, country="1", quantities=None, page=0, showing_all_countries=True, all_products=None, cart_items=None):
+    def __init__(self, all_categories, current_category=None, country="1", cart=None, page=0, showing_all_countries=True, catalog=None, mode=SHOP_MODE_BUTTONS):
         super().__init__(timeout=None)
         self.all_categories = all_categories
         self.current_category = current_category
@@ -1132,53 +1123,51 @@ class CategoryShopView(View):
             country = old_to_new[country]
             
         self.country = country  # ประเทศที่เลือก (เป็นตัวเลข 1-5)
-        self.quantities = quantities or {}  # Dict to store quantities by product ID
+        self.cart = cart if cart is not None else Cart()  # ตะกร้าสินค้าของผู้ใช้ (จาก cart_store)
         self.page = page
-        self.products_per_page = 5  # Number of products shown per page - ปรับจาก 10 เป็น 5
-        
-        # กำหนดค่าเริ่มต้นสำหรับการแสดงประเทศทั้งหมดหรือเฉพาะที่เลือก
-        self.showing_all_countries = showing_all_countries
-        
-        # รับค่า cart_items จากภายนอก (ถ้ามี)
-        self.cart_items = cart_items or {}
-        
-        # เพิ่มปุ่มเลือกประเทศด้านบนสุด
-        self.add_country_buttons()
-        
-        # ถ้ามีการส่ง all_products มาให้ใช้เลย
-        if all_products:
-            self.all_products = all_products
+        # รูปแบบการเลือกสินค้าของช่อง: ปุ่มหน้าละ 5 สินค้า หรือเมนูเลือกหน้าละ 25 สินค้า (ข้อจำกัดของ Discord ทั้งคู่)
+        self.mode = mode
+        self.products_per_page = PRODUCT_SELECT_PAGE_SIZE if mode == SHOP_MODE_SELECT else 5  # Number of products shown per page - ปรับจาก 10 เป็น 5
+        
+        # กำหนดค่าเริ่มต้นสำหรับการแสดงประเทศทั้งหมดหรือเฉพาะที่เลือก (แสดงทุกประเทศ เว้นแต่ส่ง False มา)
+        self.showing_all_countries = showing_all_countries is not False
+        
+        # ใช้ภาพนิ่งของแคตตาล็อกที่ใช้ร่วมกันทุก view (สร้างใหม่เฉพาะเมื่อแคตตาล็อกเปลี่ยนเวอร์ชัน)
+        # ถ้า view เดิมส่ง snapshot เวอร์ชันเก่ามา ให้ใช้เวอร์ชันล่าสุดแทน
+        # อ่านจากหน่วยความจำเท่านั้น (view ถูกสร้างใน event loop) ไฟล์ถูกตรวจโดย catalog_refresh_task
+        # แคตตาล็อกถูกโหลดครั้งแรกใน setup_hook ก่อนรับ interaction ใดๆ จึงไม่ต้องอ่านไฟล์ที่นี่
+        current_catalog = catalog_store.current(COUNTRIES, CATEGORIES)
+        if current_catalog is None:
+            current_catalog = catalog if catalog is not None else CatalogSnapshot(0, COUNTRIES, CATEGORIES, {})
+        self.catalog = catalog if catalog is not None and catalog.version == current_catalog.version else current_catalog
+        
+        # ปรับตะกร้าให้ตรงกับแคตตาล็อก (เฉพาะสินค้าที่ยังอยู่ในแคตตาล็อก)
+        self.cart.sync(self.catalog)
+        
+        # หน้าใน custom_id ของข้อความเก่าอาจเกินจำนวนหน้าถ้าสินค้าถูกลบไป
+        if current_category:
+            self.total_pages = max(1, (self.catalog.count(self.country, current_category) - 1) // self.products_per_page + 1)
+            self.page = min(self.page, self.total_pages - 1)
+        
+        # ใช้ปุ่มชุดที่สร้างไว้แล้วของสถานะนี้ (สร้างใหม่เฉพาะครั้งแรก หรือเมื่อแคตตาล็อก/ประเทศ/หมวดหมู่เปลี่ยน)
+        stamp = shop_layout_stamp(self.catalog, all_categories)
+        layout = shop_layouts.get((self.route, self.mode), stamp)
+        if layout is None:
+            self.add_country_buttons()
+            shop_layouts.put((self.route, self.mode), stamp, self.children)
         else:
-            # Load products from ALL countries and ALL categories (to track cart items from any country/category)
-            self.all_products = []
-            # ใช้ set เพื่อตรวจสอบไม่ให้เกิดการซ้ำซ้อน
-            seen_product_ids = set()
-            
-            # โหลดสินค้าจากทุกประเทศและทุกหมวดหมู่
-            for c_code in COUNTRIES:
-                for c_category in all_categories:
-                    c_products = load_products(c_code, c_category)  # โหลดสินค้าจากทุกประเทศและหมวดหมู่
-                    if c_products:
-                        for curr_product in c_products:
-                            # Add category, country, and create unique ID
-                            curr_product['category'] = c_category
-                            curr_product['country'] = c_code
-                            curr_product_id = f"{c_code}_{c_category}_{curr_product['name']}"
-                            curr_product['id'] = curr_product_id
-                            
-                            # ตรวจสอบว่ามีสินค้านี้อยู่แล้วหรือไม่
-                            if curr_product_id not in seen_product_ids:
-                                seen_product_ids.add(curr_product_id)
-                                self.all_products.append(curr_product)
-                                
-                                # Initialize quantity if not already set
-                                if curr_product_id not in self.quantities:
-                                    self.quantities[curr_product_id] = 0
-                                    
-                                # นำข้อมูลจำนวนสินค้าจาก cart_items มาใช้ถ้ามี
-                                if self.cart_items and curr_product_id in self.cart_items:
-                                    self.quantities[curr_product_id] = self.cart_items[curr_product_id]
-
+            for item in layout:
+                self.add_item(copy.copy(item))
+    
+    @property
+    def all_products(self):
+        """สินค้าทั้งหมดจากทุกประเทศและทุกหมวดหมู่ (อ่านจาก snapshot ที่ใช้ร่วมกัน)"""
+        return self.catalog.all_products
+    
+    @property
+    def quantities(self):
+        """จำนวนสินค้าที่เลือกไว้ตามรหัสสินค้า (อ่านจากตะกร้า)"""
+        return self.cart.quantities
     
     def add_country_buttons(self):
         """Add buttons for country selection in the top row"""
@@ -1197,80 +1186,23 @@ class CategoryShopView(View):
             country_emoji = COUNTRY_EMOJIS.get(country_code, "🌏")
             
             # เพิ่มปุ่มประเทศที่เลือก (สีน้ำเงิน) อยู่แถว 0
-            selected_button = Button(
+            selected_button = ShopNavButton(
+                country_code, self.current_category, 0, False, "h",
                 label=country_name,
                 emoji=country_emoji,
                 style=discord.ButtonStyle.blurple,
-                custom_id=f"selected_country_{country_code}",
                 row=0
             )
             self.add_item(selected_button)
             
-            # เพิ่มปุ่มสำหรับกลับไปดูประเทศทั้งหมด อยู่แถว 0 เช่นกัน
-            back_button = Button(
+            # เพิ่มปุ่มสำหรับกลับไปดูประเทศทั้งหมด อยู่แถว 0 เช่นกัน (ใช้ประเทศเดิม แต่แสดงปุ่มประเทศทั้งหมด)
+            back_button = ShopNavButton(
+                country_code, self.current_category, 0, True, "b",
                 label="เลือกประเทศอื่น",
                 emoji="🔄",
                 style=discord.ButtonStyle.primary,
-                custom_id="show_all_countries",
                 row=0
             )
-            
-            # สร้างฟังก์ชัน back_to_countries สำหรับปุ่มกลับไปเลือกประเทศ
-            async def back_to_countries(interaction):
-                await interaction.response.defer()
-                
-                # ตรวจสอบและแปลงรหัสประเทศถ้าจำเป็น
-                display_country = selected_country
-                if display_country in COUNTRY_CODES:
-                    display_country = COUNTRY_CODES[display_country]
-                
-                # สร้าง view ใหม่โดยใช้ประเทศเดิม แต่แสดงปุ่มประเทศทั้งหมด  
-                new_view = CategoryShopView(
-                    self.all_categories,
-                    current_category=self.current_category,
-                    country=display_country,
-                    quantities=self.quantities,
-                    page=0,
-                    showing_all_countries=True
-                )
-                
-                # เตรียมข้อความที่แสดงพร้อมตรวจสอบข้อผิดพลาด
-                try:
-                    country_name = COUNTRY_NAMES[display_country]
-                    category_name = CATEGORY_NAMES[self.current_category]
-                    display_message = f"🛍️ สินค้าในประเทศ `{country_name}` หมวด `{category_name}`"
-                except KeyError:
-                    # กรณีไม่พบประเทศหรือหมวดหมู่ เพิ่มรายละเอียดการดีบัก
-                    display_message = f"🛍️ สินค้า (รหัสประเทศ: `{display_country}`, หมวด: `{self.current_category}`)"
-                
-                # ตรวจสอบสินค้าที่เลือกไว้และแสดงใน content
-                summary_lines = []
-                total = 0
-                
-                # โหลดสินค้าทั้งหมดในหมวดหมู่ปัจจุบัน
-                all_products = []
-                products = load_products(display_country, self.current_category)
-                all_products.extend(products)
-                
-                # สร้างรายการสินค้าที่เลือกไว้
-                for product in all_products:
-                    if 'id' in product:
-                        qty = self.quantities.get(product['id'], 0)
-                        if qty > 0:
-                            item_total = product['price'] * qty
-                            total += item_total
-                            summary_lines.append(f"{product['emoji']} {product['name']} - {product['price']:.2f}฿ x {qty} = {item_total:.2f}฿")
-                
-                # เพิ่มรายการสินค้าที่เลือกไว้ใน content
-                if summary_lines:
-                    display_message += f"\n\n📝 รายการที่เลือก:\n" + "\n".join(summary_lines) + f"\n\n💵 ยอดรวม: {total:.2f}฿"
-                
-                await interaction.message.edit(
-                    content=display_message, 
-                    view=new_view
-                )
-                
-            back_button.callback = back_to_countries
             self.add_item(back_button)
             
         else:
@@ -1289,80 +1221,15 @@ class CategoryShopView(View):
                 # ใช้อีโมจิธงชาติสำหรับแต่ละประเทศจากตัวแปรกลาง
                 country_emoji = COUNTRY_EMOJIS.get(country_code, "🌏")
                 
-                country_button = Button(
+                # กดแล้วเปลี่ยนประเทศ กลับไปหน้าแรก และซ่อนประเทศอื่นๆ
+                country_button = ShopNavButton(
+                    country_code, self.current_category, 0, False, "k",
                     label=country_name,
                     emoji=country_emoji,
                     style=discord.ButtonStyle.blurple if is_active else discord.ButtonStyle.primary,
-                    custom_id=f"country_{country_code}",
                     row=button_row
                 )
                 
-                # กำหนดตัวแปรเพื่อเก็บค่า country_code สำหรับใช้ใน callback
-                current_country = country_code
-                
-                # สร้าง closure สำหรับเก็บค่า country_code แยกสำหรับแต่ละปุ่ม
-                def create_country_callback(country_to_display):
-                    async def country_button_callback(interaction):
-                        # ป้องกันการแสดงข้อความ "การโต้ตอบล้มเหลว"
-                        await interaction.response.defer()
-                        
-                        # ตรวจสอบว่า country_to_display เป็นรหัสประเทศที่ถูกต้อง
-                        # แปลงรหัสประเทศเก่าเป็นเลขถ้าจำเป็น
-                        display_country = country_to_display
-                        if display_country in COUNTRY_CODES:
-                            display_country = COUNTRY_CODES[display_country]
-                            
-                        # สร้าง view ใหม่โดยเปลี่ยนประเทศ และซ่อนประเทศอื่นๆ
-                        new_view = CategoryShopView(
-                            self.all_categories,
-                            current_category=self.current_category,
-                            country=display_country,
-                            quantities=self.quantities,
-                            page=0,  # กลับไปหน้าแรก
-                            showing_all_countries=False
-                        )
-                        
-                        # เตรียมข้อความที่แสดงพร้อมตรวจสอบข้อผิดพลาด
-                        try:
-                            country_name = COUNTRY_NAMES[display_country]
-                            category_name = CATEGORY_NAMES[self.current_category]
-                            display_message = f"🛍️ สินค้าในประเทศ `{country_name}` หมวด `{category_name}`"
-                        except KeyError:
-                            # กรณีไม่พบประเทศหรือหมวดหมู่ เพิ่มรายละเอียดการดีบัก
-                            display_message = f"🛍️ สินค้า (รหัสประเทศ: `{display_country}`, หมวด: `{self.current_category}`)"
-                        
-                        # ตรวจสอบสินค้าที่เลือกไว้และแสดงใน content
-                        summary_lines = []
-                        total = 0
-                        
-                        # โหลดสินค้าทั้งหมดในหมวดหมู่ปัจจุบัน
-                        all_products = []
-                        products = load_products(display_country, self.current_category)
-                        all_products.extend(products)
-                        
-                        # สร้างรายการสินค้าที่เลือกไว้
-                        for product in all_products:
-                            if 'id' in product:
-                                qty = self.quantities.get(product['id'], 0)
-                                if qty > 0:
-                                    item_total = product['price'] * qty
-                                    total += item_total
-                                    summary_lines.append(f"{product['emoji']} {product['name']} - {product['price']:.2f}฿ x {qty} = {item_total:.2f}฿")
-                        
-                        # เพิ่มรายการสินค้าที่เลือกไว้ใน content
-                        if summary_lines:
-                            display_message += f"\n\n📝 รายการที่เลือก:\n" + "\n".join(summary_lines) + f"\n\n💵 ยอดรวม: {total:.2f}฿"
-                        
-                        # ใช้ message.edit แทน response.edit_message เพื่อให้กดหลายครั้งได้
-                        await interaction.message.edit(
-                            content=display_message, 
-                            view=new_view
-                        )
-                    return country_button_callback
-                
-                # กำหนด callback ให้กับปุ่ม
-                country_button.callback = create_country_callback(country_code)
-                
                 # เพิ่มปุ่มลงใน view
                 self.add_item(country_button)
         
@@ -1376,69 +1243,88 @@ class CategoryShopView(View):
             if i >= 10:
                 break
                 
-            self.add_item(CategoryNavButton(category, is_active=is_active, row=row, country=self.country))
+            self.add_item(ShopNavButton(
+                self.country, category, 0, False, "g",
+                label=category_names().get(category, category),
+                emoji=category_emojis().get(category, ""),
+                style=discord.ButtonStyle.success if is_active else discord.ButtonStyle.secondary,
+                row=row
+            ))
         
         # Display products for current category only (all products in the same row)
         if self.current_category:
             # Get products for the current category from current country
-            # ตรวจสอบว่า self.all_products มีหรือไม่ก่อนใช้งาน
-            if hasattr(self, 'all_products') and self.all_products:
-                category_products = [p for p in self.all_products if p.get('category') == self.current_category and p.get('country') == self.country]
-            else:
-                # ถ้าไม่มี self.all_products ให้โหลดสินค้าใหม่
-                category_products = load_products(self.country, self.current_category)
+            total_products = self.catalog.count(self.country, self.current_category)
             
             # Calculate start and end indices for pagination
             start_idx = self.page * self.products_per_page
             end_idx = start_idx + self.products_per_page
             
-            # Get current page of products
-            page_products = category_products[start_idx:end_idx]
+            # Get current page of products (อ่านเฉพาะสินค้าในหน้านี้จาก snapshot)
+            page_products = self.catalog.page(self.country, self.current_category, self.page, self.products_per_page)
             
             # แสดงสินค้าในแถว 3 (เนื่องจากแถว 0-1 ใช้แสดงประเทศและแถว 2 ใช้แสดงหมวดหมู่)
-            for i, product in enumerate(page_products):
-                if i < 5:  # แสดงไม่เกิน 5 สินค้าต่อหน้า (ข้อจำกัด Discord: ไม่เกิน 5 ปุ่มต่อแถว)
-                    button = ProductButton(product)
-                    button.row = 3  # แสดงสินค้าในแถวที่ 3 เสมอ
-                    self.add_item(button)
+            if self.mode == SHOP_MODE_SELECT:
+                # เมนูเลือกสินค้าหนึ่งเมนูเต็มแถว
+                if page_products:
+                    self.add_item(ProductSelect(self.route, page_products, row=3))
+            else:
+                for i, product in enumerate(page_products):
+                    if i < 5:  # แสดงไม่เกิน 5 สินค้าต่อหน้า (ข้อจำกัด Discord: ไม่เกิน 5 ปุ่มต่อแถว)
+                        button = ProductButton(self.route, start_idx + i, product, row=3)  # แสดงสินค้าในแถวที่ 3 เสมอ
+                        self.add_item(button)
             
             # Add pagination buttons if needed
-            if len(category_products) > self.products_per_page:
+            if total_products > self.products_per_page:
                 # Previous page button (left arrow)
                 if self.page > 0:
-                    prev_button = Button(emoji="⬅️", style=discord.ButtonStyle.secondary, row=4)
-                    prev_button.callback = self.prev_page_callback
+                    prev_button = ShopNavButton(
+                        self.country, self.current_category, self.page - 1, self.showing_all_countries, "p",
+                        emoji="⬅️", style=discord.ButtonStyle.secondary, row=4
+                    )
                     self.add_item(prev_button)
                 
-                # Page indicator - clickable for page navigation
-                total_pages = (len(category_products) - 1) // self.products_per_page + 1
-                self.total_pages = total_pages  # Store for callback use
-                # Create a PageIndicatorButton instead of a regular Button with callback
+                # Page indicator (จำนวนหน้าคำนวณไว้แล้วตอนสร้าง view)
                 page_indicator = PageIndicatorButton(
                     page=self.page,
-                    total_pages=total_pages, 
-                    row=4,
-                    view=self
+                    total_pages=self.total_pages,
+                    row=4
                 )
                 self.add_item(page_indicator)
                 
                 # Next page button (right arrow)
-                if end_idx < len(category_products):
-                    next_button = Button(emoji="➡️", style=discord.ButtonStyle.secondary, row=4)
-                    next_button.callback = self.next_page_callback
+                if end_idx < total_products:
+                    next_button = ShopNavButton(
+                        self.country, self.current_category, self.page + 1, self.showing_all_countries, "x",
+                        emoji="➡️", style=discord.ButtonStyle.secondary, row=4
+                    )
                     self.add_item(next_button)
         
         # Add control buttons at the bottom - use row 4 after pagination buttons
-        reset_button = ResetCartButton()
-        reset_button.row = 4
-        self.add_item(reset_button)
-        
-        # ตรวจสอบว่า all_products มีการกำหนดค่าและไม่เป็น None ก่อนส่งไปยัง ConfirmButton
-        products_to_use = self.all_products if hasattr(self, 'all_products') and self.all_products else []
-        
-        confirm_button = ConfirmButton(products_to_use)
-        confirm_button.row = 4
-        self.add_item(confirm_button)
+        self.add_item(ResetCartButton(*self.route, row=4))
+        self.add_item(ConfirmButton(*self.route, row=4))
+    
+    @property
+    def route(self):
+        """สถานะของหน้าร้านนี้ (ประเทศ, หมวด, หน้า, แสดงทุกประเทศ) สำหรับสร้าง custom_id"""
+        return (self.country, self.current_category, self.page, self.showing_all_countries)
+    
+    def render_content(self):
+        """ข้อความของหน้าร้านตามสถานะปัจจุบัน
+
+        ไม่รวมรายการในตะกร้า เพราะข้อความหน้าร้านทุกคนเห็นเหมือนกัน (ตะกร้าแสดงแบบ ephemeral แยกแต่ละคน)
+        """
+        category_name = category_names().get(self.current_category, self.current_category)
+        country_name = COUNTRY_NAMES.get(self.country, self.country)
+        if self.showing_all_countries:
+            return f"🛍️ สินค้าในหมวด `{category_name}`"
+        return f"🛍️ สินค้าในประเทศ `{country_name}` หมวด `{category_name}`"
+    
+    def render_cart(self):
+        """ข้อความสรุปตะกร้าของผู้ใช้สำหรับส่งแบบ ephemeral"""
+        if not len(self.cart):
+            return "🛒 ตะกร้าของคุณว่างอยู่"
+        return "🛒 ตะกร้าของคุณ" + self.cart.render_summary(COUNTRY_NAMES)
     
     async def go_to_page(self, interaction: discord.Interaction, page_number: int):
         """Navigate to a specific page number"""
@@ -1457,194 +1343,23 @@ class CategoryShopView(View):
         # ดึงข้อมูลสถานะการแสดงประเทศ
         showing_all_countries = getattr(self, 'showing_all_countries', False)
         
-        # สร้าง quantities_copy เพื่อป้องกันการเปลี่ยนแปลงที่ไม่ตั้งใจ
-        quantities_copy = {}
-        for product_id, qty in self.quantities.items():
-            quantities_copy[product_id] = qty
-        
         # Create a new view with the requested page
         new_view = CategoryShopView(
             self.all_categories,
             current_category=self.current_category,
             country=display_country,
-            quantities=quantities_copy,
+            cart=self.cart,  # ใช้ตะกร้าเดิม ไม่ต้องคัดลอกจำนวนสินค้าทีละรายการ
             page=page_index,
             showing_all_countries=showing_all_countries,
-            all_products=self.all_products,  # ส่งข้อมูลสินค้าทั้งหมดไปด้วย
-            cart_items=self.quantities  # ส่งข้อมูลตะกร้าสินค้าแยกต่างหาก
+            catalog=self.catalog,  # ส่ง snapshot ของแคตตาล็อกที่ใช้ร่วมกันไปด้วย
+            mode=self.mode
         )
         
-        # ช่วยให้แน่ใจว่าการอ้างอิง objects ไม่สูญหาย
-        for product_id, qty in self.quantities.items():
-            if qty > 0:  # เฉพาะรายการที่มีการเลือก
-                new_view.quantities[product_id] = qty
-        
-        # สร้างข้อความสำหรับแสดงผล
-        category_name = CATEGORY_NAMES.get(self.current_category, self.current_category)
-        country_name = COUNTRY_NAMES.get(display_country, display_country)
-        
-        # สร้างข้อความแสดงผลตามสถานะการแสดงประเทศ
-        if showing_all_countries:
-            content_message = f"🛍️ สินค้าในหมวด `{category_name}`"
-        else:
-            content_message = f"🛍️ สินค้าในประเทศ `{country_name}` หมวด `{category_name}`"
-            
-        # สร้างรายการสินค้าที่เลือก
-        selected_items = []
-        total_price = 0
-        
-        # จากข้อมูล quantities ตรวจสอบสินค้าที่ถูกเลือกในตะกร้า
-        for product in self.all_products:
-            if 'id' in product:
-                product_id = product['id']
-                qty = quantities_copy.get(product_id, 0)
-                if qty > 0:
-                    item_total = product['price'] * qty
-                    total_price += item_total
-                    
-                    # ดึงชื่อประเทศที่สินค้าอยู่ (ถ้ามี)
-                    product_country = product.get('country', '')
-                    if product_country in COUNTRY_NAMES:
-                        country_name_in_product = COUNTRY_NAMES[product_country]
-                        selected_items.append(f"{product['emoji']} {product['name']} ({country_name_in_product}) - {product['price']:.2f}฿ x {qty} = {item_total:.2f}฿")
-                    else:
-                        selected_items.append(f"{product['emoji']} {product['name']} - {product['price']:.2f}฿ x {qty} = {item_total:.2f}฿")
+        # ข้อความหน้าร้าน (ไม่รวมตะกร้า)
+        content_message = new_view.render_content()
         
-        # เพิ่มรายการสินค้าที่เลือกไว้ใน content
-        if selected_items:
-            content_message += f"\n\n📝 รายการที่เลือก:\n" + "\n".join(selected_items) + f"\n\n💵 ยอดรวม: {total_price:.2f}฿"
-        
-        # ตรวจสอบว่า interaction ถูก defer แล้วหรือไม่
-        if interaction.response.is_done():
-            # ถ้า defer แล้ว ให้ใช้ message.edit ได้เลย
-            await interaction.message.edit(content=content_message, view=new_view)
-        else:
-            # ถ้ายังไม่ได้ defer ให้ใช้ defer ก่อน
-            await interaction.response.defer()
-            # ใช้ message.edit แทน response.edit_message เพื่อให้กดหลายครั้งได้    
-            await interaction.message.edit(content=content_message, view=new_view)
-        
-    async def prev_page_callback(self, interaction: discord.Interaction):
-        """Callback for previous page button"""
-        # คำนวณหน้าใหม่
-        new_page = max(0, self.page - 1)
-        
-        # คำนวณหน้ารวม
-        total_products = len(load_products(self.country, self.current_category))
-        total_pages = (total_products - 1) // self.products_per_page + 1
-        
-        if interaction.response.is_done():
-            # ถ้าตอบกลับไปแล้ว ให้ใช้ Edit Message
-            new_view = CategoryShopView(
-                self.all_categories,
-                current_category=self.current_category,
-                country=self.country,
-                quantities=self.quantities,
-                page=new_page,
-                showing_all_countries=self.showing_all_countries,
-                all_products=self.all_products  # ส่งข้อมูลสินค้าทั้งหมดไปด้วย
-            )
-            
-            # โอนย้ายข้อมูลสำคัญจาก view ปัจจุบันไปยัง view ใหม่
-            self._transfer_data_to_new_view(new_view)
-            
-            # สร้างข้อความที่จะแสดงพร้อมรายการที่เลือก
-            display_message = self._generate_content_with_selected_items(new_view)
-            
-            await interaction.message.edit(content=display_message, view=new_view)
-        else:
-            # ถ้ายังไม่ได้ตอบกลับ
-            await interaction.response.defer()
-            await self.go_to_page(interaction, new_page + 1)  # +1 เพราะ UI นับเริ่มจาก 1 แต่โค้ดนับเริ่มจาก 0
-    
-    async def next_page_callback(self, interaction: discord.Interaction):
-        """Callback for next page button"""
-        # คำนวณหน้าใหม่
-        total_products = len(load_products(self.country, self.current_category))
-        total_pages = (total_products - 1) // self.products_per_page + 1
-        new_page = min(self.page + 1, total_pages - 1)
-        
-        if interaction.response.is_done():
-            # ถ้าตอบกลับไปแล้ว ให้ใช้ Edit Message
-            new_view = CategoryShopView(
-                self.all_categories,
-                current_category=self.current_category,
-                country=self.country,
-                quantities=self.quantities,
-                page=new_page,
-                showing_all_countries=self.showing_all_countries,
-                all_products=self.all_products  # ส่งข้อมูลสินค้าทั้งหมดไปด้วย
-            )
-            
-            # โอนย้ายข้อมูลสำคัญจาก view ปัจจุบันไปยัง view ใหม่
-            self._transfer_data_to_new_view(new_view)
-            
-            # สร้างข้อความที่จะแสดงพร้อมรายการที่เลือก
-            display_message = self._generate_content_with_selected_items(new_view)
-            
-            await interaction.message.edit(content=display_message, view=new_view)
-        else:
-            # ถ้ายังไม่ได้ตอบกลับ
-            await interaction.response.defer()
-            await self.go_to_page(interaction, new_page + 1)  # +1 เพราะ UI นับเริ่มจาก 1 แต่โค้ดนับเริ่มจาก 0
-    
-    def _transfer_data_to_new_view(self, new_view):
-        """ส่งต่อข้อมูลสำคัญจาก view ปัจจุบันไปยัง view ใหม่"""
-        # ส่งต่อข้อมูลสินค้าทั้งหมด
-        if hasattr(self, 'all_products') and self.all_products:
-            new_view.all_products = self.all_products
-            
-        # ส่งต่อข้อมูลปริมาณสินค้าที่เลือก
-        if hasattr(self, 'quantities') and self.quantities:
-            for product_id, qty in self.quantities.items():
-                if qty > 0:  # เฉพาะรายการที่มีการเลือก
-                    new_view.quantities[product_id] = qty
-        
-        return new_view
-        
-    def _generate_content_with_selected_items(self, view):
-        """สร้างข้อความที่จะแสดงพร้อมรายการที่เลือก"""
-        # ดึงข้อมูลชื่อหมวดหมู่และประเทศในภาษาไทย
-        category_name = CATEGORY_NAMES.get(self.current_category, self.current_category)
-        country_name = COUNTRY_NAMES.get(self.country, self.country)
-        
-        # สร้างข้อความแสดงผลตามสถานะการแสดงประเทศ
-        if self.showing_all_countries:
-            content_message = f"🛍️ สินค้าในหมวด `{category_name}`"
-        else:
-            content_message = f"🛍️ สินค้าในประเทศ `{country_name}` หมวด `{category_name}`"
-        
-        # โหลดสินค้าและตรวจสอบรายการที่เลือกจากทุกประเทศและทุกหมวดหมู่
-        selected_item_summary_lines = []
-        total_selected = 0
-        
-        # อ่านประวัติการเลือกสินค้าจากทุกประเทศและทุกหมวดหมู่
-        for country_code in COUNTRIES:
-            for category in self.all_categories:
-                # โหลดสินค้าในประเทศและหมวดหมู่นี้
-                country_category_products = load_products(country_code, category)
-                
-                # ตรวจสอบว่ามีสินค้าที่เลือกในประเทศและหมวดหมู่นี้หรือไม่
-                for product in country_category_products:
-                    if 'id' in product:
-                        qty = self.quantities.get(product['id'], 0)
-                        if qty > 0:
-                            item_total = product['price'] * qty
-                            total_selected += item_total
-                            
-                            # ดึงชื่อประเทศที่สินค้าอยู่ (ถ้ามี)
-                            product_country = product.get('country', '')
-                            if product_country in COUNTRY_NAMES:
-                                country_name_in_product = COUNTRY_NAMES[product_country]
-                                selected_item_summary_lines.append(f"{product['emoji']} {product['name']} ({country_name_in_product}) - {product['price']:.2f}฿ x {qty} = {item_total:.2f}฿")
-                            else:
-                                selected_item_summary_lines.append(f"{product['emoji']} {product['name']} - {product['price']:.2f}฿ x {qty} = {item_total:.2f}฿")
-        
-        # เพิ่มรายการสินค้าที่เลือกไว้ใน content
-        if selected_item_summary_lines:
-            content_message += f"\n\n📝 รายการที่เลือก:\n" + "\n".join(selected_item_summary_lines) + f"\n\n💵 ยอดรวม: {total_selected:.2f}฿"
-            
-        return content_message
+        # edit_message ถ้ายังไม่ได้ตอบ หรือแก้ข้อความเดิมถ้าถูก defer ไปแล้ว
+        await responder(interaction).edit(content=content_message, view=new_view)
 
 class CategoryLabel(Button):
     """Non-interactive button that serves as a category label"""
@@ -1662,7 +1377,7 @@ class CategoryLabel(Button):
 class ProductQuantityModal(Modal):
     """Modal for entering product quantity in shop view"""
     def __init__(self, product, view):
-        super().__init__(title=f"จำนวน {product['name']}")
+        super().__init__(title=f"จำนวน {product['name']}", timeout=600)  # ไม่เก็บ modal ที่ผู้ใช้ปิดไว้ตลอดไป
         self.product = product
         # ตรวจสอบว่ามี id ใน product หรือไม่
         self.product_id = product.get('id', f"{product.get('country', '')}_"
@@ -1686,230 +1401,293 @@ class ProductQuantityModal(Modal):
             # Convert input to integer
             quantity = int(self.quantity_input.value)
             if quantity < 0:
-                await interaction.response.send_message("❌ จำนวนต้องมากกว่าหรือเท่ากับ 0", ephemeral=True)
+                await responder(interaction).send("❌ จำนวนต้องมากกว่าหรือเท่ากับ 0", ephemeral=True)
                 return
                 
-            # Set the quantity in the view
-            self.shop_view.quantities[self.product_id] = quantity
-            
-            # Create summary of selected items - track which products we've already shown
-            summary_lines = []
-            total = 0
-            seen_product_ids = set()
-            
-            for product in self.shop_view.all_products:
-                # ตรวจสอบและสร้าง id ถ้าไม่มี
-                if 'id' not in product:
-                    product['id'] = f"{product.get('country', '')}_" \
-                                   f"{product.get('category', '')}_" \
-                                   f"{product['name']}"
-                
-                # ตรวจสอบว่าเคยแสดงสินค้านี้ไปแล้วหรือไม่
-                if product['id'] in seen_product_ids:
-                    continue
-                
-                seen_product_ids.add(product['id'])
-                qty = self.shop_view.quantities.get(product['id'], 0)
-                if qty > 0:
-                    item_total = product['price'] * qty
-                    total += item_total
-                    
-                    # เพิ่มชื่อประเทศในรายการสินค้า
-                    country_code = product.get('country', '')
-                    # แปลงรหัสประเทศเดิมถ้าจำเป็น
-                    if country_code in COUNTRY_CODES:
-                        country_code = COUNTRY_CODES[country_code]
-                    country_name = COUNTRY_NAMES.get(country_code, '')
-                    
-                    if country_name:
-                        summary_lines.append(f"{product['emoji']} {product['name']} ({country_name}) - {product['price']:.2f}฿ x {qty} = {item_total:.2f}฿")
-                    else:
-                        summary_lines.append(f"{product['emoji']} {product['name']} - {product['price']:.2f}฿ x {qty} = {item_total:.2f}฿")
-            
-            # Current category being displayed
-            current_category = self.shop_view.current_category
+            # Set the quantity in the cart (อัปเดตยอดรวมเฉพาะรายการนี้)
+            product = self.product if 'id' in self.product else dict(self.product, id=self.product_id)
+            self.shop_view.cart.set_quantity(product, quantity)
+            cart_store.save(cart_key(interaction), self.shop_view.cart)
             
-            # Update message with current cart
-            content = f"🛍️ สินค้าในหมวด `{current_category}`:"
-            if summary_lines:
-                content += f"\n\n📝 รายการที่เลือก:\n" + "\n".join(summary_lines) + f"\n\n💵 ยอดรวม: {total:.2f}฿"
-            
-            await interaction.response.edit_message(content=content, view=self.shop_view)
+            # แสดงตะกร้าเฉพาะผู้ใช้คนนี้ (ไม่แก้ข้อความหน้าร้านที่ทุกคนใช้ร่วมกัน)
+            await send_cart_summary(interaction, self.shop_view)
             
         except ValueError:
-            await interaction.response.send_message("❌ กรุณาใส่จำนวนเป็นตัวเลขเท่านั้น", ephemeral=True)
+            await responder(interaction).send("❌ กรุณาใส่จำนวนเป็นตัวเลขเท่านั้น", ephemeral=True)
 
-class ProductButton(Button):
-    """Button for products in shop view"""
-    def __init__(self, product, row=0):
-        self.product = product
-        # ตรวจสอบและสร้าง product id หากไม่มี
-        product_id = product.get('id')
-        if not product_id:
-            product_id = f"{product.get('country', '')}_" \
-                        f"{product.get('category', '')}_" \
-                        f"{product['name']}"
-            product['id'] = product_id
-            
-        super().__init__(
-            label=f"{product['emoji']} {product['name']} - {product['price']:.2f}฿", 
+def product_token(product):
+    """รหัสย่อของสินค้า (crc32 ของรหัสสินค้า) สำหรับตรวจว่าปุ่มยังชี้ไปที่สินค้าเดิม"""
+    return f"{zlib.crc32(product['id'].encode('utf-8')):08x}"
+
+class ProductButton(discord.ui.DynamicItem[Button], template=r"s:p:" + SHOP_ROUTE + r":(?P<index>\d+):(?P<token>[0-9a-f]{8})"):
+    """Button for products in shop view
+    
+    custom_id เก็บตำแหน่งของสินค้าในหมวดและรหัสย่อของสินค้า (ชื่อสินค้ายาวเกินกว่าจะใส่ใน custom_id ได้)
+    """
+    def __init__(self, route, index, product=None, token=None, row=None):
+        self.route = route
+        self.index = index
+        self.token = token or product_token(product)
+        label = f"{product['emoji']} {product['name']} - {product['price']:.2f}฿" if product is not None else None
+        super().__init__(Button(
+            label=label, 
             style=discord.ButtonStyle.primary,
-            custom_id=f"product_{product_id}",
+            custom_id=f"s:p:{shop_route(*route)}:{index}:{self.token}",
             row=row
-        )
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(_route_args(match), int(match["index"]), token=match["token"])
+    
+    def find_product(self, products):
+        """ค้นหาสินค้าของปุ่มนี้ (ถ้าตำแหน่งเลื่อนไปเพราะแคตตาล็อกเปลี่ยน จะค้นจากรหัสย่อแทน)"""
+        if self.index < len(products) and product_token(products[self.index]) == self.token:
+            return products[self.index]
+        return next((p for p in products if product_token(p) == self.token), None)
     
     async def callback(self, interaction: discord.Interaction):
-        view = self.view
+        view = build_shop_view(interaction, *self.route)
+        if view is None:
+            await send_shop_gone(interaction)
+            return
+        
+        product = self.find_product(view.catalog.products(view.country, view.current_category))
+        if product is None:
+            await responder(interaction).send("❌ ไม่พบสินค้านี้แล้ว กรุณาเลือกสินค้าใหม่อีกครั้ง", ephemeral=True)
+            return
         
         # Show modal for quantity input
-        modal = ProductQuantityModal(self.product, view)
-        await interaction.response.send_modal(modal)
+        modal = ProductQuantityModal(product, view)
+        await responder(interaction).send_modal(modal)
 
-class ResetCartButton(Button):
-    """Button to reset the cart in shop view"""
-    def __init__(self):
-        super().__init__(
+# จำนวนสินค้าต่อหน้าในโหมดเมนูเลือก (ตัวเลือกสูงสุดของ select menu) และจำนวนที่เลือกพร้อมกันได้ (ช่องกรอกสูงสุดของ modal)
+PRODUCT_SELECT_PAGE_SIZE = 25
+PRODUCT_SELECT_MAX_VALUES = 5
+
+class ProductSelect(discord.ui.DynamicItem[Select], template=r"s:m:" + SHOP_ROUTE):
+    """เมนูเลือกสินค้าของหน้าร้านโหมด select (ค่าของตัวเลือกคือรหัสย่อของสินค้า)
+    
+    เลือกได้หลายรายการ แล้วใส่จำนวนของทุกรายการใน ProductsQuantityModal เดียว
+    """
+    def __init__(self, route, products=(), row=None):
+        self.route = route
+        options = [
+            discord.SelectOption(
+                label=f"{product['emoji']} {product['name']}"[:100],
+                value=product_token(product),
+                description=f"{product['price']:.2f}฿"
+            )
+            for product in products
+        ]
+        super().__init__(Select(
+            placeholder=f"🛒 เลือกสินค้า (เลือกได้สูงสุด {PRODUCT_SELECT_MAX_VALUES} รายการ)",
+            min_values=1,
+            max_values=max(1, min(PRODUCT_SELECT_MAX_VALUES, len(options))),
+            options=options,
+            custom_id=f"s:m:{shop_route(*route)}",
+            row=row
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(_route_args(match))
+    
+    async def callback(self, interaction: discord.Interaction):
+        view = build_shop_view(interaction, *self.route)
+        if view is None:
+            await send_shop_gone(interaction)
+            return
+        
+        # ค้นจากรหัสย่อ (สินค้าในหมวดอาจถูกเพิ่ม/ลบหลังส่งเมนูนี้)
+        by_token = {product_token(p): p for p in view.catalog.products(view.country, view.current_category)}
+        products = [by_token[token] for token in self.item.values if token in by_token]
+        if not products:
+            await responder(interaction).send("❌ ไม่พบสินค้านี้แล้ว กรุณาเลือกสินค้าใหม่อีกครั้ง", ephemeral=True)
+            return
+        
+        await responder(interaction).send_modal(ProductsQuantityModal(products, view))
+
+class ProductsQuantityModal(Modal):
+    """Modal สำหรับใส่จำนวนของสินค้าหลายรายการที่เลือกจากเมนูพร้อมกัน"""
+    def __init__(self, products, view):
+        super().__init__(title="ใส่จำนวนสินค้าที่ต้องการ", timeout=600)  # ไม่เก็บ modal ที่ผู้ใช้ปิดไว้ตลอดไป
+        self.shop_view = view
+        self.inputs = []
+        for product in products[:PRODUCT_SELECT_MAX_VALUES]:
+            quantity_input = TextInput(
+                label=f"{product['name']}"[:45],
+                placeholder="ใส่จำนวน (0 = นำออกจากตะกร้า)",
+                required=True,
+                min_length=1,
+                max_length=10,
+                default=str(view.cart.get(product["id"]) or 1)
+            )
+            self.inputs.append((product, quantity_input))
+            self.add_item(quantity_input)
+    
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            quantities = [(product, int(quantity_input.value)) for product, quantity_input in self.inputs]
+        except ValueError:
+            await responder(interaction).send("❌ กรุณาใส่จำนวนเป็นตัวเลขเท่านั้น", ephemeral=True)
+            return
+        if any(quantity < 0 for _, quantity in quantities):
+            await responder(interaction).send("❌ จำนวนต้องมากกว่าหรือเท่ากับ 0", ephemeral=True)
+            return
+        
+        for product, quantity in quantities:
+            self.shop_view.cart.set_quantity(product, quantity)
+        cart_store.save(cart_key(interaction), self.shop_view.cart)
+        
+        # แสดงตะกร้าเฉพาะผู้ใช้คนนี้ (ไม่แก้ข้อความหน้าร้านที่ทุกคนใช้ร่วมกัน)
+        await send_cart_summary(interaction, self.shop_view)
+
+class ResetCartButton(discord.ui.DynamicItem[Button], template=r"s:r:" + SHOP_ROUTE + r"(?P<summary>:s)?"):
+    """Button to reset the cart in shop view
+    
+    summary=True คือปุ่มใต้ข้อความสรุปตะกร้า (กดแล้วแก้ข้อความสรุปนั้นแทนการส่งข้อความใหม่)
+    """
+    def __init__(self, country, category, page, showing_all_countries, row=None, summary=False):
+        self.route = (country, category, page, showing_all_countries)
+        self.summary = summary
+        super().__init__(Button(
             label="🗑️ ล้างตะกร้า", 
             style=discord.ButtonStyle.danger,
-            custom_id="reset_cart"
-        )
+            custom_id=f"s:r:{shop_route(*self.route)}" + (":s" if summary else ""),
+            row=row
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(*_route_args(match), summary=match["summary"] is not None)
     
     async def callback(self, interaction: discord.Interaction):
-        view = self.view
         # Reset all quantities
-        for product_id in view.quantities:
-            view.quantities[product_id] = 0
+        cart_store.discard(cart_key(interaction))
+        
+        view = build_shop_view(interaction, *self.route)
+        if view is None:
+            await send_shop_gone(interaction)
+            return
+        
+        await send_cart_summary(interaction, view, edit=self.summary)
+
+class DeliveredButton(discord.ui.DynamicItem[Button], template=r"s:d:(?P<customer>\d+)"):
+    """ปุ่ม "ส่งของแล้ว" สำหรับแอดมินใต้ใบเสร็จ (custom_id เก็บ id ของลูกค้า)"""
+    def __init__(self, customer_id):
+        self.customer_id = int(customer_id)
+        super().__init__(Button(
+            label="✅ ส่งของแล้ว (สำหรับแอดมิน)",
+            style=discord.ButtonStyle.success,
+            custom_id=f"s:d:{self.customer_id}"
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["customer"])
+    
+    async def callback(self, interaction: discord.Interaction):
+        # ตรวจสอบว่าเป็นแอดมินหรือไม่
+        if not interaction.user.guild_permissions.administrator:
+            await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้ปุ่มนี้ (เฉพาะแอดมินเท่านั้น)", ephemeral=True)
+            return
         
-        # ตรวจสอบและดึงข้อมูลสำหรับข้อความแสดงผล
-        current_category = getattr(view, 'current_category', "ไม่ระบุหมวด")
-        country = getattr(view, 'country', "1")
-        showing_all_countries = getattr(view, 'showing_all_countries', False)
+        # โหลดข้อความขอบคุณจากไฟล์คอนฟิก
+        thank_you_message = await config_cache.get("thank_you_message")
         
-        # ดึงชื่อหมวดหมู่และประเทศในภาษาไทย
-        category_name = CATEGORY_NAMES.get(current_category, current_category)
-        country_name = COUNTRY_NAMES.get(country, country)
+        # ส่งข้อความขอบคุณตามที่กำหนดไว้ในคำสั่ง !ty
+        await responder(interaction).send(f"<@{self.customer_id}> {thank_you_message}", ephemeral=False)
         
-        # สร้างข้อความแสดงผลตามสถานะการแสดงประเทศ
-        if showing_all_countries:
-            content_message = f"🛍️ สินค้าในหมวด `{category_name}`"
-        else:
-            content_message = f"🛍️ สินค้าในประเทศ `{country_name}` หมวด `{category_name}`"
+        # ปิดการใช้งานปุ่มหลังจากกดแล้ว
+        self.item.disabled = True
+        if self.view:
+            await responder(interaction).track("message.edit", interaction.message.edit(view=self.view))
+
+class OrderDeliveredButton(discord.ui.DynamicItem[Button], template=r"s:o:(?P<order>[0-9a-f]+)"):
+    """ปุ่ม "ส่งของแล้ว" ของคำสั่ง !สั่งของ (custom_id เก็บรหัสคำสั่งซื้อใน pending_orders)"""
+    def __init__(self, order_id):
+        self.order_id = order_id
+        super().__init__(Button(
+            label="✅ ส่งของแล้ว (สำหรับแอดมิน)",
+            style=discord.ButtonStyle.green,
+            custom_id=f"s:o:{order_id}"
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["order"])
+    
+    async def callback(self, interaction: discord.Interaction):
+        # ตรวจสอบว่าเป็นแอดมินหรือไม่
+        if not interaction.user.guild_permissions.administrator:
+            await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้ปุ่มนี้ (เฉพาะแอดมินเท่านั้น)", ephemeral=True)
+            return
         
-        await interaction.response.edit_message(
-            content=content_message, 
-            view=view
+        # นำคำสั่งซื้อออกจากรายการรอยืนยัน (กดซ้ำจะไม่บันทึกประวัติซ้ำ)
+        order = await run_blocking(pending_orders.pop, self.order_id)
+        if order is None:
+            await responder(interaction).send("❌ ไม่พบคำสั่งซื้อนี้ (ถูกยืนยันไปแล้ว หรือหมดอายุ)", ephemeral=True)
+            return
+        
+        # บันทึกประวัติการซื้อ
+        await run_blocking(log_purchase, order["user"], order["items"], order["total"])
+        
+        # โหลดข้อความขอบคุณ
+        thank_you_message = await config_cache.get("thank_you_message")
+        
+        # สร้าง embed ขอบคุณ
+        thank_you_embed = discord.Embed(
+            title="✅ การสั่งซื้อเสร็จสมบูรณ์",
+            description=thank_you_message,
+            color=discord.Color.green()
         )
+        
+        thank_you_embed.set_footer(text=f"รหัสคำสั่งซื้อ: {self.order_id}")
+        
+        await responder(interaction).edit(embed=thank_you_embed, view=None)
 
-class ConfirmButton(Button):
+class ConfirmButton(discord.ui.DynamicItem[Button], template=r"s:c:" + SHOP_ROUTE):
     """Button to confirm the purchase"""
-    def __init__(self, products):
-        self.products = products
-        super().__init__(
+    def __init__(self, country, category, page, showing_all_countries, row=None):
+        self.route = (country, category, page, showing_all_countries)
+        super().__init__(Button(
             label="✅ ยืนยันการซื้อ", 
             style=discord.ButtonStyle.success,
-            custom_id="confirm_purchase"
-        )
+            custom_id=f"s:c:{shop_route(*self.route)}",
+            row=row
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(*_route_args(match))
     
     async def callback(self, interaction: discord.Interaction):
-        view = self.view
-        
-        # ตรวจสอบว่า view มี all_products หรือไม่ (สำหรับ CategoryShopView)
-        products_to_check = []
-        if hasattr(view, 'all_products') and view.all_products:
-            products_to_check = view.all_products  # ใช้สินค้าทั้งหมดจาก view
-        else:
-            products_to_check = self.products  # ใช้สินค้าที่ส่งเข้ามาตอนสร้าง button
+        view = build_shop_view(interaction, *self.route)
+        if view is None:
+            await send_shop_gone(interaction)
+            return
         
-        # Calculate total and prepare items list
-        total_price = 0
-        items = []
-        lines = []
+        # ตะกร้าของผู้ใช้ที่กดปุ่ม (ปรับให้ตรงกับแคตตาล็อกล่าสุดแล้วตอนสร้าง view)
+        cart = view.cart
         
-        # ตรวจสอบว่า view มี attribute quantities หรือไม่
-        if not hasattr(view, 'quantities'):
-            await interaction.response.send_message("❗ เกิดข้อผิดพลาด: ไม่พบข้อมูลปริมาณสินค้า", ephemeral=True)
-            return
-            
-        for product in products_to_check:
-            # ตรวจสอบว่า product มี id หรือไม่
-            if 'id' not in product:
-                if 'name' in product and ('country' in product or 'category' in product):
-                    product['id'] = f"{product.get('country', '')}_" \
-                                   f"{product.get('category', '')}_" \
-                                   f"{product['name']}"
-                else:
-                    continue  # ข้ามสินค้าที่ไม่มีข้อมูลเพียงพอ
-                    
-            qty = view.quantities.get(product['id'], 0)
-            
-            # Convert qty to int if needed
-            try:
-                if isinstance(qty, str) and qty.isdigit():
-                    qty = int(qty)
-                elif not isinstance(qty, int):
-                    qty = 0
-            except (ValueError, TypeError):
-                qty = 0
-                
-            if qty > 0:
-                total = product['price'] * qty
-                total_price += total
-                
-                # ดึงชื่อประเทศจาก product
-                country_code = product.get('country', '')
-                # แปลงรหัสประเทศเดิมถ้าจำเป็น
-                if country_code in COUNTRY_CODES:
-                    country_code = COUNTRY_CODES[country_code]
-                country_name = COUNTRY_NAMES.get(country_code, '')
-                
-                # เพิ่มข้อมูลประเทศในการบันทึกและแสดงผล
-                items.append({
-                    "name": product["name"], 
-                    "qty": qty, 
-                    "price": product["price"],
-                    "country": country_name or country_code
-                })
-                
-                if country_name:
-                    lines.append(f"{product['emoji']} {product['name']} ({country_name}) - {product['price']:.2f}฿ x {qty} = {total:.2f}฿")
-                else:
-                    lines.append(f"{product['emoji']} {product['name']} - {product['price']:.2f}฿ x {qty} = {total:.2f}฿")
+        # Calculate total and prepare items list (จากรายการในตะกร้าเท่านั้น)
+        total_price = cart.total
         
         # Check if cart is empty
-        if total_price == 0:
-            await interaction.response.send_message("❗ กรุณาเลือกสินค้าก่อน", ephemeral=True)
+        if len(cart) == 0 or total_price == 0:
+            await responder(interaction).send("❗ กรุณาเลือกสินค้าก่อน", ephemeral=True)
             return
+        
+        items = cart.to_items(COUNTRY_NAMES)
+        lines = cart.render_lines(COUNTRY_NAMES)
             
         # Log purchase and create receipt
-        log_purchase(interaction.user, items, total_price)
+        await run_blocking(log_purchase, interaction.user, items, total_price)
         summary = "\n".join(lines)
         
         # สร้างข้อมูลประเทศที่ลูกค้าซื้อสินค้า
-        countries_purchased = set()
-        for product in products_to_check:
-            if 'id' in product and 'country' in product:
-                # ตรวจจำนวนสินค้าที่เลือก
-                product_qty = view.quantities.get(product['id'], 0)
-                
-                # แปลงเป็น int ถ้าจำเป็น
-                try:
-                    if isinstance(product_qty, str) and product_qty.isdigit():
-                        product_qty = int(product_qty)
-                    elif not isinstance(product_qty, int):
-                        product_qty = 0
-                except (ValueError, TypeError):
-                    product_qty = 0
-                
-                if product_qty > 0:
-                    country_code = product.get('country', '')
-                    # แปลงรหัสประเทศเดิมถ้าจำเป็น
-                    if country_code in COUNTRY_CODES:
-                        country_code = COUNTRY_CODES[country_code]
-                    # หาชื่อประเทศจาก country code
-                    country_name = COUNTRY_NAMES.get(country_code, '')
-                    if country_name:
-                        countries_purchased.add(country_name)
-                    
+        countries_purchased = cart.country_names(COUNTRY_NAMES)
         countries_text = "ทุกประเทศ" if not countries_purchased else ", ".join(countries_purchased)
         
         # Create receipt embeds
@@ -1919,16 +1697,10 @@ class ConfirmButton(Button):
         public_embed.add_field(name="ประเทศ", value=f"🌏 {countries_text}", inline=False)
         public_embed.add_field(name="ยอดรวม", value=f"💵 {total_price:.2f}฿", inline=False)
         
-        # โหลด QR Code URL จาก MongoDB หรือไฟล์ config
+        # โหลด QR Code URL จากแคชการตั้งค่า
         qr_code_url = ""
         try:
-            # ลองโหลดจากไฟล์ config ก่อน
-            with open(QRCODE_CONFIG_FILE, "r", encoding="utf-8") as f:
-                qr_code_url = json.load(f).get("url", "")
-            
-            # ถ้าไม่มีข้อมูลในไฟล์ config ลองโหลดจาก MongoDB
-            if not qr_code_url:
-                qr_code_url = load_qrcode_url()
+            qr_code_url = await config_cache.get("qrcode_url")
                 
             # ถ้ายังไม่มีข้อมูล ใช้ค่าเริ่มต้น
             if not qr_code_url:
@@ -1948,60 +1720,16 @@ class ConfirmButton(Button):
         qr_embed.set_image(url=qr_code_url)
         qr_embed.set_footer(text="กรุณาโอนเงินและแคปหลักฐานส่งให้แอดมิน")
         
-        # สร้างปุ่ม "ส่งของแล้ว" สำหรับแอดมิน
-        class DeliveredButtonNew(Button):
-            def __init__(self, customer):
-                self.customer = customer
-                super().__init__(label="✅ ส่งของแล้ว (สำหรับแอดมิน)", style=discord.ButtonStyle.success)
-            
-            async def callback(self, interaction):
-                # ตรวจสอบว่าเป็นแอดมินหรือไม่
-                if interaction.user.guild_permissions.administrator:
-                    # โหลดข้อความขอบคุณจากไฟล์คอนฟิก
-                    thank_you_message = load_thank_you_message()
-                    
-                    # ส่งข้อความขอบคุณตามที่กำหนดไว้ในคำสั่ง !ty
-                    await interaction.response.send_message(f"{self.customer.mention} {thank_you_message}", ephemeral=False)
-                    
-                    # ปิดการใช้งานปุ่มหลังจากกดแล้ว
-                    self.disabled = True
-                    if self.view:
-                        await interaction.message.edit(view=self.view)
-                else:
-                    await interaction.response.send_message("❌ คุณไม่มีสิทธิ์ใช้ปุ่มนี้ (เฉพาะแอดมินเท่านั้น)", ephemeral=True)
-        
-        # สร้าง View สำหรับปุ่ม
-        admin_view = View()
-        
-        # เพิ่มปุ่มในการแสดงผล
-        delivered_button = DeliveredButtonNew(interaction.user)
-        
-        # เพิ่มปุ่มในแสดงผล
-        admin_view.add_item(delivered_button)
+        # สร้างปุ่ม "ส่งของแล้ว" สำหรับแอดมิน (ใช้ได้ต่อหลังรีสตาร์ทบอท)
+        admin_view = View(timeout=None)
+        admin_view.add_item(DeliveredButton(interaction.user.id))
         
         # Send receipt with admin button
-        await interaction.response.send_message(embeds=[public_embed, qr_embed], view=admin_view)
-        
-        # Reset cart
-        for product_id in view.quantities:
-            view.quantities[product_id] = 0
-        
-        # ตรวจสอบและดึงข้อมูลสำหรับข้อความแสดงผล
-        current_category = getattr(view, 'current_category', "ไม่ระบุหมวด")
-        country = getattr(view, 'country', "1")
-        showing_all_countries = getattr(view, 'showing_all_countries', False)
+        await responder(interaction).send(embeds=[public_embed, qr_embed], view=admin_view)
         
-        # ดึงชื่อหมวดหมู่และประเทศในภาษาไทย
-        category_name = CATEGORY_NAMES.get(current_category, current_category)
-        country_name = COUNTRY_NAMES.get(country, country)
-        
-        # สร้างข้อความแสดงผลตามสถานะการแสดงประเทศ
-        if showing_all_countries:
-            content_message = f"🛍️ สินค้าในหมวด `{category_name}`"
-        else:
-            content_message = f"🛍️ สินค้าในประเทศ `{country_name}` หมวด `{category_name}`"
-            
-        await interaction.message.edit(content=content_message, view=view)
+        # Reset cart (ข้อความหน้าร้านไม่แสดงตะกร้า จึงไม่ต้องแก้)
+        cart.clear()
+        cart_store.discard(cart_key(interaction))
 
 
 
@@ -2019,19 +1747,19 @@ class ViewSelectedCategoriesButton(Button):
         view = self.view
         
         if not view.selected_categories:
-            await interaction.response.send_message("❌ กรุณาเลือกอย่างน้อยหนึ่งหมวดหมู่", ephemeral=True)
+            await responder(interaction).send("❌ กรุณาเลือกอย่างน้อยหนึ่งหมวดหมู่", ephemeral=True)
             return
         
         # Create a shop view with products from first selected category
         first_category = view.selected_categories[0]
-        shop_view = CategoryShopView(CATEGORIES, current_category=first_category)
+        shop_view = CategoryShopView(CATEGORIES, current_category=first_category, mode=shop_modes.get(interaction.channel_id))
         
         if not shop_view.all_products:
-            await interaction.response.send_message("❌ ไม่มีสินค้าในหมวดหมู่ที่เลือก", ephemeral=True)
+            await responder(interaction).send("❌ ไม่มีสินค้าในหมวดหมู่ที่เลือก", ephemeral=True)
             return
             
         # Send new message with product buttons
-        await interaction.response.send_message(
+        await responder(interaction).send(
             content=f"🛍️ สินค้าในหมวด `{first_category}`", 
             view=shop_view
         )
@@ -2053,10 +1781,10 @@ class CategoryButton(Button):
         view = ShopView(category=self.category)
         
         if len(view.products) == 0:
-            await interaction.response.send_message(f"❌ ไม่มีสินค้าในหมวด `{self.category}`", ephemeral=True)
+            await responder(interaction).send(f"❌ ไม่มีสินค้าในหมวด `{self.category}`", ephemeral=True)
             return
             
-        await interaction.response.edit_message(
+        await responder(interaction).edit(
             content=f"🛍️ หมวด `{self.category}` - เลือกสินค้าที่คุณต้องการ:", 
             view=view
         )
@@ -2091,7 +1819,7 @@ class ShopView(View):
         # Add reset and confirm buttons for shopping cart
         if category is not None:
             self.add_item(ResetButton())
-            self.add_item(ConfirmButton(self.products))
+            self.add_item(LegacyConfirmButton(self.products))
             
             # Add back button to return to categories
             self.add_item(BackButton())
@@ -2109,7 +1837,7 @@ class LegacyProductButton(Button):
         
         # Create modal for quantity input
         modal = QuantityModal(self.index, view.products[self.index])
-        await interaction.response.send_modal(modal)
+        await responder(interaction).send_modal(modal)
         # Wait for modal to be submitted
         await modal.wait()
         
@@ -2128,7 +1856,7 @@ class LegacyProductButton(Button):
             total = sum(view.products[i]['price'] * qty for i, qty in enumerate(view.quantities))
             
             message = f"🛍️ รายการที่เลือก:\n{summary}\n\n💵 ยอดรวม: {total:.2f}฿"
-            await interaction.message.edit(content=message, view=view)
+            await responder(interaction).track("message.edit", interaction.message.edit(content=message, view=view))
 
 class BackButton(Button):
     """Button to go back to category selection"""
@@ -2143,7 +1871,7 @@ class BackButton(Button):
     async def callback(self, interaction: discord.Interaction):
         # Create a new view with category buttons
         view = ShopView(category=None)
-        await interaction.response.edit_message(
+        await responder(interaction).edit(
             content="📋 เลือกหมวดหมู่สินค้า:", 
             view=view
         )
@@ -2156,7 +1884,7 @@ class ResetButton(Button):
     async def callback(self, interaction: discord.Interaction):
         view: ShopView = self.view
         view.quantities = [0] * len(view.products)
-        await interaction.response.edit_message(content="🛍️ รายการที่เลือก:\nยังไม่ได้เลือกสินค้า", view=view)
+        await responder(interaction).edit(content="🛍️ รายการที่เลือก:\nยังไม่ได้เลือกสินค้า", view=view)
 
 class LegacyConfirmButton(Button):
     """Button to confirm the purchase (legacy version)"""
@@ -2203,7 +1931,7 @@ class LegacyConfirmButton(Button):
             
             # No selected products
             if total_price == 0 or not selected_products:
-                await interaction.response.send_message("❗ กรุณาเลือกสินค้าก่อน", ephemeral=True)
+                await responder(interaction).send("❗ กรุณาเลือกสินค้าก่อน", ephemeral=True)
                 return
                 
             # Generate lines for receipt
@@ -2229,7 +1957,8 @@ class LegacyConfirmButton(Button):
                     "qty": qty, 
                     "price": price,
                     "country": country_code,
-                    "country_thai": country_thai
+                    "country_thai": country_thai,
+                    "category": product.get("category", "")
                 })
         else:
             # Legacy implementation for ShopView with list quantities
@@ -2255,14 +1984,14 @@ class LegacyConfirmButton(Button):
         
         # Check if cart is empty
         if total_price == 0:
-            await interaction.response.send_message("❗ กรุณาเลือกสินค้าก่อน", ephemeral=True)
+            await responder(interaction).send("❗ กรุณาเลือกสินค้าก่อน", ephemeral=True)
             return
             
         # Receipt lines and items were already generated in the code above
         
         # Log the purchase and generate receipt
         try:
-            log_purchase(interaction.user, items, total_price)
+            await run_blocking(log_purchase, interaction.user, items, total_price)
             summary = "\n".join(lines)
             embed = discord.Embed(
                 title="🧾 ใบเสร็จรับเงิน",
@@ -2274,7 +2003,7 @@ class LegacyConfirmButton(Button):
             embed.set_footer(text="ขอบคุณที่ใช้บริการ! 🙏")
             
             # แสดงใบเสร็จสำหรับผู้ซื้อ (แสดงเฉพาะผู้ซื้อเท่านั้น)
-            await interaction.response.send_message(embed=embed, ephemeral=True)
+            await responder(interaction).send(embed=embed, ephemeral=True)
             
             # สร้างใบเสร็จสำหรับแสดงในแชทสาธารณะและให้แอดมินเห็น
             public_embed = discord.Embed(
@@ -2294,182 +2023,124 @@ class LegacyConfirmButton(Button):
             qr_embed.set_footer(text="กรุณาสแกน QR Code ด้านล่างเพื่อชำระเงิน โอนเงินและแคปหลักฐานส่งให้แอดมิน")
             
             # สร้างปุ่ม "ส่งของแล้ว" สำหรับแอดมิน
-            class DeliveredButton(Button):
-                def __init__(self, customer):
-                    self.customer = customer
-                    super().__init__(label="✅ ส่งของแล้ว (สำหรับแอดมิน)", style=discord.ButtonStyle.success)
-                
-                async def callback(self, interaction):
-                    # ตรวจสอบว่าเป็นแอดมินหรือไม่
-                    if interaction.user.guild_permissions.administrator:
-                        # โหลดข้อความขอบคุณจากไฟล์คอนฟิก
-                        thank_you_message = load_thank_you_message()
-                        
-                        # ส่งข้อความขอบคุณตามที่กำหนดไว้ในคำสั่ง !ty
-                        await interaction.response.send_message(f"{self.customer.mention} {thank_you_message}", ephemeral=False)
-                        
-                        # ปิดการใช้งานปุ่มหลังจากกดแล้ว
-                        self.disabled = True
-                        if self.view:  # ใช้ self.view แทน _view
-                            await interaction.message.edit(view=self.view)
-                    else:
-                        await interaction.response.send_message("❌ คุณไม่มีสิทธิ์ใช้ปุ่มนี้ (เฉพาะแอดมินเท่านั้น)", ephemeral=True)
-            
-            # สร้าง View สำหรับปุ่ม
-            admin_view = View()
-            
-            # เพิ่มปุ่มในการแสดงผล
-            delivered_button = DeliveredButton(interaction.user)
-            
-            # เพิ่มปุ่มในแสดงผล
-            admin_view.add_item(delivered_button)
+            admin_view = View(timeout=None)
+            admin_view.add_item(DeliveredButton(interaction.user.id))
             
             # โหลดไฟล์ QR code จากฟังก์ชันที่เตรียมไว้
             qr_file = await get_qrcode_discord_file()
             
             # ส่งทั้งใบเสร็จสาธารณะและ QR Code ในข้อความเดียวกันพร้อมปุ่มแอดมิน
             print("กำลังส่งข้อความพร้อมปุ่ม ส่งของแล้ว (สำหรับแอดมิน)")
-            await interaction.followup.send(embeds=[public_embed, qr_embed], file=qr_file, view=admin_view)
+            await responder(interaction).followup(embeds=[public_embed, qr_embed], file=qr_file, view=admin_view)
             
             # Reset the cart based on view type
             if hasattr(view, 'products'):
                 # Old ShopView with list-based quantities
                 view.quantities = [0] * len(view.products)
-                await interaction.message.edit(content="🛍️ รายการที่เลือก:\nยังไม่ได้เลือกสินค้า", view=view)
-            elif hasattr(view, 'all_products') and isinstance(view.quantities, dict):
-                # CategoryShopView with dictionary-based quantities
-                for key in list(view.quantities.keys()):
-                    view.quantities[key] = 0
+                await responder(interaction).track("message.edit", interaction.message.edit(content="🛍️ รายการที่เลือก:\nยังไม่ได้เลือกสินค้า", view=view))
+            elif hasattr(view, 'cart'):
+                # CategoryShopView with Cart
+                view.cart.clear()
                 current_category = view.current_category
-                await interaction.message.edit(content=f"🛍️ สินค้าในหมวด `{current_category}`", view=view)
+                await responder(interaction).track("message.edit", interaction.message.edit(content=f"🛍️ สินค้าในหมวด `{current_category}`", view=view))
         except Exception as e:
-            await interaction.response.send_message(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+            await responder(interaction).send(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+
+# ไฟล์สำรองของการตั้งค่าที่ซิงค์จาก MongoDB (config_type -> ไฟล์)
+CONFIG_SYNC_FILES = {
+    "countries": COUNTRIES_FILE,
+    "categories": CATEGORIES_CONFIG_FILE,
+    "qrcode": QRCODE_CONFIG_FILE,
+    "thank_you": THANK_YOU_CONFIG_FILE
+}
 
 async def auto_download_from_mongodb():
-    """ดาวน์โหลดข้อมูลจาก MongoDB โดยอัตโนมัติเมื่อเริ่มต้นบอท"""
-    try:
-        from db_operations import (load_products_async, load_countries, load_categories,
-                                 load_qrcode_url_async, load_thank_you_message_async)
-        from mongodb_config import client
-        
-        # ตรวจสอบการเชื่อมต่อ MongoDB
-        if client is None:
-            print("❌ ไม่สามารถเชื่อมต่อกับ MongoDB ได้")
-            return False
-        
-        print("🔄 กำลังดาวน์โหลดข้อมูลจาก MongoDB อัตโนมัติ...")
-        
-        # 1. ดาวน์โหลดข้อมูลประเทศ
-        countries_data = await load_countries()
-        if countries_data:
-            # อัพเดตตัวแปรโกลบอล
-            global COUNTRIES, COUNTRY_NAMES, COUNTRY_EMOJIS, COUNTRY_CODES
-            if "countries" in countries_data:
-                COUNTRIES = countries_data["countries"]
-            if "country_names" in countries_data:
-                COUNTRY_NAMES = countries_data["country_names"]
-            if "country_emojis" in countries_data:
-                COUNTRY_EMOJIS = countries_data["country_emojis"]
-            if "country_codes" in countries_data:
-                COUNTRY_CODES = countries_data["country_codes"]
-            
-            # บันทึกลงไฟล์
-            with open(COUNTRIES_FILE, "w", encoding="utf-8") as f:
-                json.dump(countries_data, f, ensure_ascii=False, indent=2)
-            print("✅ ดาวน์โหลดข้อมูลประเทศสำเร็จ")
-        
-        # 2. ดาวน์โหลดข้อมูลหมวดหมู่
-        categories_data = await load_categories()
-        if categories_data:
-            # อัพเดตตัวแปรโกลบอล
-            global CATEGORY_NAMES, CATEGORY_EMOJIS
-            if "category_names" in categories_data:
-                CATEGORY_NAMES = categories_data["category_names"]
-            if "category_emojis" in categories_data:
-                CATEGORY_EMOJIS = categories_data["category_emojis"]
-            
-            # บันทึกลงไฟล์
-            with open(SCRIPT_DIR / "categories_config.json", "w", encoding="utf-8") as f:
-                json.dump(categories_data, f, ensure_ascii=False, indent=2)
-            print("✅ ดาวน์โหลดข้อมูลหมวดหมู่สำเร็จ")
-        
-        # 3. ดาวน์โหลดข้อมูลสินค้า
-        all_products = await load_products_async()
-        if all_products:
-            products_count = len(all_products)
+    """ดาวน์โหลดข้อมูลจาก MongoDB โดยอัตโนมัติเมื่อเริ่มต้นบอท
+
+    ดึงเฉพาะสินค้าที่เปลี่ยนตั้งแต่รอบก่อน และเขียนเฉพาะไฟล์ที่เนื้อหาเปลี่ยน (ดู delta_sync.py)
+    """
+    # ไม่ให้ทำงานซ้อนกับการใช้การเปลี่ยนแปลงจาก change stream
+    async with delta_sync.lock:
+        try:
+            from mongodb_config import client
             
-            # บันทึกลงในไฟล์ products.json
-            with open(PRODUCTS_FILE, "w", encoding="utf-8") as f:
-                json.dump(all_products, f, ensure_ascii=False, indent=2)
+            # ตรวจสอบการเชื่อมต่อ MongoDB
+            if client is None:
+                print("❌ ไม่สามารถเชื่อมต่อกับ MongoDB ได้")
+                return False
             
-            # บันทึกลงในโฟลเดอร์ categories แยกตามหมวดหมู่และประเทศ
-            # สร้างโครงสร้างข้อมูลสำหรับแยกสินค้าตามประเทศและหมวดหมู่
-            categorized_products = {}
+            print("🔄 กำลังดาวน์โหลดข้อมูลจาก MongoDB อัตโนมัติ...")
+            delta_sync.begin()
             
-            for product in all_products:
-                country = product.get("country", "1")
-                category = product.get("category", "money")
-                
-                if country not in categorized_products:
-                    categorized_products[country] = {}
-                
-                if category not in categorized_products[country]:
-                    categorized_products[country][category] = []
-                
-                # สร้างสำเนาของสินค้าที่ไม่มี country และ category
-                product_copy = product.copy()
-                if "country" in product_copy:
-                    del product_copy["country"]
-                if "category" in product_copy:
-                    del product_copy["category"]
-                if "_id" in product_copy:
-                    del product_copy["_id"]
+            # 1. ดาวน์โหลดเฉพาะการตั้งค่าที่เปลี่ยนตั้งแต่รอบก่อน (ประเทศ หมวดหมู่ QR Code ข้อความขอบคุณ)
+            configs = await delta_sync.sync_configs(CONFIG_SYNC_FILES)
+            countries_data = configs.get("countries")
+            if countries_data:
+                # อัพเดตตัวแปรโกลบอล
+                global COUNTRIES, COUNTRY_NAMES, COUNTRY_EMOJIS, COUNTRY_CODES
+                if "countries" in countries_data:
+                    COUNTRIES = countries_data["countries"]
+                if "country_names" in countries_data:
+                    COUNTRY_NAMES = countries_data["country_names"]
+                if "country_emojis" in countries_data:
+                    COUNTRY_EMOJIS = countries_data["country_emojis"]
+                if "country_codes" in countries_data:
+                    COUNTRY_CODES = countries_data["country_codes"]
                 
-                categorized_products[country][category].append(product_copy)
+                # บันทึกลงไฟล์ (เฉพาะเมื่อเปลี่ยน)
+                await run_blocking(delta_sync.write_json, COUNTRIES_FILE, countries_data)
+                print("✅ ดาวน์โหลดข้อมูลประเทศสำเร็จ")
             
-            # บันทึกไฟล์แยกตามประเทศและหมวดหมู่
-            categories_dir = SCRIPT_DIR / "categories"
-            for country, categories in categorized_products.items():
-                country_dir = categories_dir / country
-                country_dir.mkdir(parents=True, exist_ok=True)
-                
-                for category, products in categories.items():
-                    category_file = country_dir / f"{category}.json"
-                    with open(category_file, "w", encoding="utf-8") as f:
-                        json.dump(products, f, ensure_ascii=False, indent=2)
-            print(f"✅ ดาวน์โหลดข้อมูลสินค้าสำเร็จ ({products_count} รายการ)")
-        
-        # 4. ดาวน์โหลด QR Code URL
-        try:
-            qrcode_url = await load_qrcode_url_async()
+            # 2. ดาวน์โหลดข้อมูลหมวดหมู่
+            categories_data = configs.get("categories")
+            if categories_data:
+                config_cache.update("categories", categories_data)
+                await run_blocking(delta_sync.write_json, CATEGORIES_CONFIG_FILE, categories_data)
+                print("✅ ดาวน์โหลดข้อมูลหมวดหมู่สำเร็จ")
+            
+            # 3. ดาวน์โหลดข้อมูลสินค้า
+            # เขียนการแก้ไขที่ค้างอยู่ลงไฟล์ก่อน เพื่อไม่ให้เขียนทับข้อมูลที่ดาวน์โหลดมาภายหลัง
+            await run_blocking(category_writer.flush)
+            products_count = await delta_sync.sync_products()
+            if products_count:
+                print(f"✅ ดาวน์โหลดข้อมูลสินค้าสำเร็จ ({products_count} รายการ)")
+            
+            # 4. ดาวน์โหลด QR Code URL
+            qrcode_url = configs.get("qrcode", {}).get("url")
             if qrcode_url:
-                with open(QRCODE_CONFIG_FILE, "w", encoding="utf-8") as f:
-                    json.dump({"url": qrcode_url}, f, ensure_ascii=False, indent=2)
+                config_cache.update("qrcode_url", qrcode_url)
+                await run_blocking(delta_sync.write_json, QRCODE_CONFIG_FILE, {"url": qrcode_url})
                 print("✅ ดาวน์โหลด QR Code URL สำเร็จ")
-        except Exception as e:
-            print(f"⚠️ ไม่สามารถดาวน์โหลด QR Code URL: {str(e)}")
-        
-        # 5. ดาวน์โหลดข้อความขอบคุณ
-        try:
-            thank_you_message = await load_thank_you_message_async()
+            
+            # 5. ดาวน์โหลดข้อความขอบคุณ
+            thank_you_message = configs.get("thank_you", {}).get("message")
             if thank_you_message:
-                with open(SCRIPT_DIR / "thank_you_config.json", "w", encoding="utf-8") as f:
-                    json.dump({"message": thank_you_message}, f, ensure_ascii=False, indent=2)
+                config_cache.update("thank_you_message", thank_you_message)
+                await run_blocking(delta_sync.write_json, THANK_YOU_CONFIG_FILE, {"message": thank_you_message})
                 print("✅ ดาวน์โหลดข้อความขอบคุณสำเร็จ")
-        except Exception as e:
-            print(f"⚠️ ไม่สามารถดาวน์โหลดข้อความขอบคุณ: {str(e)}")
+                
+            report = await run_blocking(delta_sync.finish)
+            print(
+                f"✅ ดาวน์โหลดข้อมูลจาก MongoDB อัตโนมัติเสร็จสิ้นใน {report['elapsed']:.2f} วินาที "
+                f"({'ทั้งหมด' if report['mode'] == 'full' else 'เฉพาะที่เปลี่ยน'}: ดึง {report['fetched']} รายการ "
+                f"และการตั้งค่า {report['configs']} รายการ, "
+                f"➕ {report['added']} ✏️ {report['updated']} 🗑️ {report['removed']}, "
+                f"เขียน {report['files_written']} ไฟล์ ข้าม {report['files_skipped']} ไฟล์)"
+            )
+            return True
             
-        print("✅ ดาวน์โหลดข้อมูลจาก MongoDB อัตโนมัติเสร็จสิ้น")
-        return True
-        
-    except Exception as e:
-        print(f"❌ เกิดข้อผิดพลาดในการดาวน์โหลดข้อมูลอัตโนมัติ: {str(e)}")
-        return False
+        except Exception as e:
+            print(f"❌ เกิดข้อผิดพลาดในการดาวน์โหลดข้อมูลอัตโนมัติ: {str(e)}")
+            return False
 
 # ฟังก์ชัน task ที่จะทำงานทุก 30 นาที
 @tasks.loop(minutes=30)
 async def auto_download_task():
     """ทาสค์ที่จะดาวน์โหลดข้อมูลจาก MongoDB ทุก 30 นาที"""
+    if change_watcher.live:
+        # change stream นำการเปลี่ยนแปลงมาใช้อยู่แล้ว ไม่ต้องดาวน์โหลดซ้ำ
+        print("👀 ทาสค์อัตโนมัติ: change stream ทำงานอยู่ - ข้ามการดาวน์โหลดรอบนี้")
+        return
     print(f"⏱️ ทาสค์อัตโนมัติ: กำลังดาวน์โหลดข้อมูลจาก MongoDB... ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
     try:
         success = await auto_download_from_mongodb()
@@ -2480,6 +2151,57 @@ async def auto_download_task():
     except Exception as e:
         print(f"❌ ทาสค์อัตโนมัติ: เกิดข้อผิดพลาด {str(e)} ({datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
 
+async def setup_hook():
+    """ลงทะเบียนปุ่มแบบ persistent ก่อนเชื่อมต่อ Discord
+    
+    ปุ่มเหล่านี้ถอดสถานะจาก custom_id เอง จึงใช้งานได้กับข้อความที่ส่งไว้ก่อนรีสตาร์ท
+    และไม่ต้องเก็บ view ของแต่ละข้อความไว้ในหน่วยความจำ
+    """
+    # โหลดหน้าร้านถาวรและรูปแบบหน้าร้านของแต่ละช่องเข้าหน่วยความจำ (ปุ่มและคำสั่งอ่านจากหน่วยความจำเท่านั้น)
+    await run_blocking(storefront_store.open)
+    await run_blocking(shop_modes.open)
+    # โหลดแคตตาล็อกก่อนรับ interaction แรก (view ของหน้าร้านอ่านแคตตาล็อกจากหน่วยความจำเท่านั้น)
+    await run_blocking(catalog_store.refresh, COUNTRIES, CATEGORIES)
+    
+    bot.add_dynamic_items(
+        ShopNavButton,
+        ProductButton,
+        ProductSelect,
+        PageIndicatorButton,
+        ResetCartButton,
+        ConfirmButton,
+        DeliveredButton,
+        OrderDeliveredButton,
+        CountryPickButton
+    )
+
+bot.setup_hook = setup_hook
+
+@bot.event
+async def on_interaction(interaction):
+    """เริ่มจับเวลา defer อัตโนมัติของทุก interaction (ปุ่ม/modal ที่ช้าเกินจะถูก defer ให้ ดู responder.py)"""
+    responder(interaction).start_watchdog()
+
+def create_category_files(countries, categories):
+    """สร้างโฟลเดอร์ของแต่ละประเทศและไฟล์หมวดหมู่ว่างที่ยังไม่มี (เรียกใน thread pool)
+
+    Args:
+        countries (list): รหัสประเทศทั้งหมด
+        categories (list): รหัสหมวดหมู่ทั้งหมด
+    """
+    for country in countries:
+        country_dir = CATEGORIES_DIR / country
+        if not country_dir.exists():
+            country_dir.mkdir(parents=True, exist_ok=True)
+            print(f"Created country directory: {country_dir}")
+
+        for category in categories:
+            category_file = country_dir / f"{category}.json"
+            if not category_file.exists():
+                with open(category_file, 'w', encoding='utf-8') as f:
+                    f.write('[]')
+                print(f"Created empty category file: {category_file}")
+
 @bot.event
 async def on_ready():
     """Event triggered when the bot is ready"""
@@ -2493,44 +2215,67 @@ async def on_ready():
         else:
             print("⚠️ ไม่สามารถดาวน์โหลดข้อมูลจาก MongoDB โดยอัตโนมัติ")
             # โหลดข้อมูลจากไฟล์ท้องถิ่นแทน
-            load_categories()
+            await run_blocking(load_categories)
     except Exception as e:
         print(f"⚠️ เกิดข้อผิดพลาดในการดาวน์โหลดอัตโนมัติ: {str(e)}")
         # โหลดข้อมูลจากไฟล์ท้องถิ่นแทนในกรณีที่มีข้อผิดพลาด
-        load_categories()
+        await run_blocking(load_categories)
     
-    # Create history file if it doesn't exist
-    if not HISTORY_FILE.exists():
-        HISTORY_FILE.touch()
-        print(f"Created history file at {HISTORY_FILE}")
+    # เปิดที่เก็บประวัติการซื้อ (ย้าย history.json แบบเดิมเข้า segment ครั้งแรก)
+    try:
+        await run_blocking(history_store.open)
+        await run_blocking(sales_rollup.open, history_store)
+    except Exception as e:
+        print(f"⚠️ ไม่สามารถเปิดที่เก็บประวัติการซื้อ: {str(e)}")
         
-    # Create category folders for each country if they don't exist
-    for country in COUNTRIES:
-        country_dir = CATEGORIES_DIR / country
-        if not country_dir.exists():
-            country_dir.mkdir(parents=True, exist_ok=True)
-            print(f"Created country directory: {country_dir}")
+    # Create category folders and empty category files for each country if they don't exist
+    await run_blocking(create_category_files, COUNTRIES, CATEGORIES)
     
     # บันทึก Target Channel ID เริ่มต้นไปยัง MongoDB
     try:
-        current_target_id = load_target_channel_id()
+        current_target_id = await config_cache.get("target_channel_id")
         print(f"🎯 โหลด Target Channel ID: {current_target_id}")
     except Exception as e:
         print(f"⚠️ ไม่สามารถโหลด Target Channel ID: {str(e)}")
     
+    # เริ่มทาสค์เปลี่ยนชื่อช่องเครดิตร้านเบื้องหลัง
+    channel_counter.start()
+    
     # เริ่มทาสค์อัตโนมัติสำหรับดาวน์โหลดข้อมูลทุก 30 นาที
     if not auto_download_task.is_running():
         auto_download_task.start()
         print("⏱️ เริ่มทาสค์อัตโนมัติ: ดาวน์โหลดข้อมูลจาก MongoDB ทุก 30 นาที")
-            
-        # Create empty category files if they don't exist
-        for category in CATEGORIES:
-            category_file = country_dir / f"{category}.json"
-            if not category_file.exists():
-                with open(category_file, 'w', encoding='utf-8') as f:
-                    f.write('[]')
-                print(f"Created empty category file: {category_file}")
     
+    # เริ่มทาสค์อัปเดตหน้าร้านถาวรเมื่อแคตตาล็อกเปลี่ยน
+    if not storefront_refresh_task.is_running():
+        storefront_refresh_task.start()
+    
+    # เริ่มทาสค์ตรวจไฟล์หมวดหมู่ที่ถูกแก้จากภายนอก (view อ่านแคตตาล็อกจากหน่วยความจำเท่านั้น)
+    if not catalog_refresh_task.is_running():
+        catalog_refresh_task.start()
+    
+    # เริ่มทาสค์ลบตะกร้าที่หมดอายุ และทาสค์พิมพ์สถิติ
+    if not cart_purge_task.is_running():
+        cart_purge_task.start()
+    if not stats_log_task.is_running():
+        stats_log_task.start()
+
+    # ติดตามการเปลี่ยนแปลงจาก MongoDB แบบ real-time (ถ้า deployment รองรับ change stream)
+    if change_watcher.start():
+        print("👀 เริ่มติดตามการเปลี่ยนแปลงของสินค้าและการตั้งค่าผ่าน change stream")
+
+    # ตรวจสอบและสร้าง index ของ MongoDB
+    try:
+        from mongodb_config import ensure_indexes
+        await run_blocking(ensure_indexes)
+    except Exception as e:
+        print(f"⚠️ ไม่สามารถตรวจสอบ index ของ MongoDB: {str(e)}")
+
+    # โหลดแคตตาล็อกสินค้าทั้งหมดเข้าหน่วยความจำครั้งเดียวตอนเริ่มต้น
+    await run_blocking(catalog_store.refresh, COUNTRIES, CATEGORIES)
+    catalog_stats = catalog_store.stats()
+    print(f"📦 โหลดแคตตาล็อกสินค้า {catalog_stats['products']} รายการจาก {catalog_stats['files']} ไฟล์")
+
     # Register slash commands
     try:
         print("Registering slash commands...")
@@ -2615,6 +2360,11 @@ async def shop(ctx, ประเทศหรือหมวด: str = None, ห
     """
     # แสดงข้อมูลดีบัก
     print(f"shop command called with: ประเทศหรือหมวด={ประเทศหรือหมวด}, หมวด={หมวด}")
+    # ช่องที่มีหน้าร้านถาวรแล้ว ไม่ต้องส่งหน้าร้านใหม่ ให้ใช้หน้าร้านของช่องแทน
+    storefront = storefront_store.get(ctx.channel.id)
+    if storefront is not None:
+        await ctx.send(f"🛍️ ช่องนี้มีหน้าร้านอยู่แล้ว เลือกซื้อได้ที่ {storefront_url(ctx.guild, ctx.channel.id, storefront)}")
+        return
     # กรณีไม่ระบุอะไรเลย ให้แสดงปุ่มเลือกประเทศก่อน
     if ประเทศหรือหมวด is None:
         # สร้าง view แสดงปุ่มเลือกประเทศเท่านั้น
@@ -2625,37 +2375,9 @@ async def shop(ctx, ประเทศหรือหมวด: str = None, ห
             country_name = COUNTRY_NAMES[country_code]
             country_emoji = COUNTRY_EMOJIS.get(country_code, "🌏")
             
-            # สร้างปุ่มประเทศ กำหนด row ไม่เกิน 5 ปุ่มต่อแถว
-            button_row = 0 if i < 5 else 1
-            country_button = discord.ui.Button(
-                label=country_name,
-                emoji=country_emoji,
-                style=discord.ButtonStyle.primary,
-                custom_id=f"country_{country_code}",
-                row=button_row
-            )
-            
-            # สร้าง closure เพื่อเก็บค่า country_code ให้แยกกันสำหรับแต่ละปุ่ม
-            # ย้ายการสร้าง callback เข้าไปในฟังก์ชันอีกชั้นเพื่อแก้ปัญหา closure
-            def create_callback_for_country(country_value):
-                async def button_callback(interaction):
-                    # ป้องกันการแสดงข้อความ "การโต้ตอบล้มเหลว"
-                    await interaction.response.defer()
-                    
-                    # แสดงข้อมูลดีบัก
-                    print(f"Selected country: {country_value}")
-                    
-                    # เรียกคำสั่ง shop อีกครั้งโดยระบุประเทศ
-                    await shop(ctx, country_value)
-                    
-                    # ลบข้อความเดิมที่แสดงปุ่มเลือกประเทศ
-                    await interaction.message.delete()
-                    
-                return button_callback
-                
-            # กำหนด callback ให้กับปุ่มนี้
-            country_button.callback = create_callback_for_country(country_code)
-            view.add_item(country_button)
+            # สร้างปุ่มประเทศ กำหนด row ไม่เกิน 5 ปุ่มต่อแถว
+            button_row = 0 if i < 5 else 1
+            view.add_item(CountryPickButton(country_code, label=country_name, emoji=country_emoji, row=button_row))
         
         # แสดงข้อความให้เลือกประเทศ
         await ctx.send("🌏 กรุณาเลือกประเทศ:", view=view)
@@ -2699,47 +2421,207 @@ async def shop(ctx, ประเทศหรือหมวด: str = None, ห
         else:
             # แสดงข้อความแนะนำหากระบุอาร์กิวเมนต์ไม่ถูกต้อง
             countries_str = ", ".join([f"`{COUNTRY_NAMES[c]}`" for c in COUNTRIES])
-            categories_str = ", ".join([f"`{CATEGORY_NAMES[c]}`" for c in CATEGORIES])
+            categories_str = ", ".join([f"`{category_names()[c]}`" for c in CATEGORIES])
             await ctx.send(f"❌ ไม่พบประเทศหรือหมวดหมู่ที่ระบุ\nประเทศที่มี: {countries_str}\nหมวดหมู่ที่มี: {categories_str}")
             return
     
-    # โหลดสินค้าตามประเทศและหมวดหมู่
-    products = load_products(country, category)
-    
-    # ตรวจสอบว่ามีสินค้าในประเทศและหมวดหมู่นี้หรือไม่
-    if not products:
-        await ctx.send(f"❌ ไม่มีสินค้าในประเทศ `{COUNTRY_NAMES[country]}` หมวด `{CATEGORY_NAMES[category]}`")
-        return
-    
-    # โหลดสินค้าทั้งหมดจากทุกประเทศและทุกหมวดหมู่
-    all_products = []
-    for c in COUNTRIES:
-        for cat in CATEGORIES:
-            c_products = load_products(c, cat)
-            all_products.extend(c_products)
+    content, view = build_shop_message(country, category, shop_modes.get(ctx.channel.id))
+    await ctx.send(content, view=view)
+
+def build_shop_message(country, category, mode=SHOP_MODE_BUTTONS):
+    """สร้างข้อความหน้าร้านของประเทศและหมวดหมู่ที่เลือก
     
-    # สร้าง view ที่แสดงสินค้าพร้อมปุ่มเลือกประเทศและหมวดหมู่
-    view = CategoryShopView(CATEGORIES, current_category=category, country=country, showing_all_countries=False)
+    Args:
+        mode (str): รูปแบบการเลือกสินค้าของช่อง (ดู shop_modes.py)
     
-    # กำหนดค่า all_products ให้ view
-    view.all_products = all_products
+    Returns:
+        tuple: (ข้อความ, view) หรือ (ข้อความแจ้งข้อผิดพลาด, None) ถ้าไม่มีสินค้า
+    """
+    # สร้าง view ที่แสดงสินค้าพร้อมปุ่มเลือกประเทศและหมวดหมู่ (ใช้ snapshot ของแคตตาล็อกที่ใช้ร่วมกัน)
+    view = CategoryShopView(CATEGORIES, current_category=category, country=country, showing_all_countries=False, mode=mode)
+    country = view.country
     
     # หากไม่มีสินค้าในร้านทั้งหมด
-    if not all_products:
-        await ctx.send(f"❌ ไม่มีสินค้าในร้าน")
-        return
+    if not view.all_products:
+        return f"❌ ไม่มีสินค้าในร้าน", None
     
     # หาสินค้าในประเทศและหมวดหมู่ที่เลือก
-    current_products = [p for p in all_products if p.get('country') == country and p.get('category') == category]
+    current_products = view.catalog.products(country, category)
     
     # ตรวจสอบว่ามีสินค้าในประเทศและหมวดหมู่ที่เลือกหรือไม่
     if not current_products:
-        await ctx.send(f"❌ ไม่มีสินค้าในประเทศ `{COUNTRY_NAMES[country]}` หมวด `{CATEGORY_NAMES[category]}`")
-        return
+        return f"❌ ไม่มีสินค้าในประเทศ `{COUNTRY_NAMES[country]}` หมวด `{category_names()[category]}`", None
     
     # แสดงชื่อร้านและสินค้า
-    title = f"🛍️ สินค้าในประเทศ `{COUNTRY_NAMES[country]}` หมวด `{CATEGORY_NAMES[category]}`"
-    await ctx.send(title, view=view)
+    title = f"🛍️ สินค้าในประเทศ `{COUNTRY_NAMES[country]}` หมวด `{category_names()[category]}`"
+    return title, view
+
+class CountryPickButton(discord.ui.DynamicItem[Button], template=r"s:k:(?P<country>[^:]+)"):
+    """ปุ่มเลือกประเทศของคำสั่ง !shop (เปิดหน้าร้านของประเทศนั้นเป็นข้อความใหม่)"""
+    def __init__(self, country, label=None, emoji=None, row=None):
+        self.country = country
+        super().__init__(Button(
+            label=label,
+            emoji=emoji,
+            style=discord.ButtonStyle.primary,
+            custom_id=f"s:k:{country}",
+            row=row
+        ))
+    
+    @classmethod
+    async def from_custom_id(cls, interaction, item, match):
+        return cls(match["country"])
+    
+    async def callback(self, interaction: discord.Interaction):
+        if self.country not in COUNTRIES:
+            await send_shop_gone(interaction)
+            return
+        
+        # ป้องกันการแสดงข้อความ "การโต้ตอบล้มเหลว"
+        await responder(interaction).defer()
+        
+        # แสดงข้อมูลดีบัก
+        print(f"Selected country: {self.country}")
+        
+        # เปิดหน้าร้านของประเทศที่เลือก (หมวดหมู่เริ่มต้นเหมือนคำสั่ง !shop <ประเทศ>)
+        content, view = build_shop_message(self.country, "item", shop_modes.get(interaction.channel_id))
+        if view is None:
+            await responder(interaction).followup(content, ephemeral=True)
+            return
+        await responder(interaction).track("channel.send", interaction.channel.send(content, view=view))
+        
+        # ลบข้อความเดิมที่แสดงปุ่มเลือกประเทศ
+        await responder(interaction).track("message.delete", interaction.message.delete())
+
+# ความถี่ในการตรวจเวอร์ชันของแคตตาล็อกเพื่อแก้ข้อความหน้าร้านถาวร (วินาที)
+STOREFRONT_REFRESH_SECONDS = int(os.getenv("STOREFRONT_REFRESH_SECONDS", "60"))
+
+# ความถี่ในการพิมพ์สถิติการใช้งานของแคชและที่เก็บข้อมูลในหน่วยความจำ (วินาที)
+STATS_LOG_SECONDS = int(os.getenv("STATS_LOG_SECONDS", "1800"))
+
+def storefront_url(guild, channel_id, storefront):
+    """ลิงก์ไปยังข้อความหน้าร้านถาวรของช่อง"""
+    guild_part = guild.id if guild is not None else "@me"
+    return f"https://discord.com/channels/{guild_part}/{channel_id}/{storefront['message_id']}"
+
+def storefront_stamp(catalog):
+    """เวอร์ชันของสิ่งที่หน้าร้านถาวรแสดง (เวอร์ชันแคตตาล็อก รวมชื่อและอีโมจิของประเทศ/หมวดหมู่)"""
+    return shop_layout_stamp(catalog, CATEGORIES)
+
+def build_storefront_message(country, category, mode=SHOP_MODE_BUTTONS):
+    """สร้างข้อความหน้าร้านถาวรของช่อง (ไม่มีตะกร้า ผู้ใช้ทุกคนเห็นเหมือนกัน)
+    
+    Args:
+        mode (str): รูปแบบการเลือกสินค้าของช่อง (ดู shop_modes.py)
+    
+    Returns:
+        tuple: (ข้อความ, view) หรือ (None, None) ถ้าประเทศหรือหมวดหมู่ถูกลบไปแล้ว
+    """
+    if country not in COUNTRIES or category not in CATEGORIES:
+        return None, None
+    view = CategoryShopView(CATEGORIES, current_category=category, country=country, showing_all_countries=True, mode=mode)
+    content = view.render_content() + "\n\n🛒 กดปุ่มเพื่อเลือกซื้อ หน้าร้านและตะกร้าของคุณจะแสดงเฉพาะคุณเท่านั้น"
+    return content, view
+
+def resolve_storefront_args(country, category):
+    """แปลงประเทศ/หมวดหมู่ที่แอดมินพิมพ์ (รหัสหรือชื่อที่แสดง) เป็นรหัส
+    
+    Returns:
+        tuple: (รหัสประเทศ, รหัสหมวดหมู่) หรือ None ถ้าไม่พบ
+    """
+    if country is None:
+        country = COUNTRIES[0] if COUNTRIES else None
+    else:
+        country_names = {name: code for code, name in COUNTRY_NAMES.items()}
+        country = COUNTRY_CODES.get(country.lower(), country_names.get(country, country))
+    if category is None:
+        category = "item" if "item" in CATEGORIES else (CATEGORIES[0] if CATEGORIES else None)
+    else:
+        category_codes = {name: code for code, name in category_names().items()}
+        category = category_codes.get(category, category.lower())
+    if country not in COUNTRIES or category not in CATEGORIES:
+        return None
+    return country, category
+
+async def publish_storefront(channel, country, category):
+    """ส่งหน้าร้านถาวรของช่อง (ลบหน้าร้านเดิมของช่องนั้นถ้ามี)
+    
+    Returns:
+        discord.Message: ข้อความหน้าร้านที่ส่ง
+    """
+    content, view = build_storefront_message(country, category, shop_modes.get(channel.id))
+    message = await channel.send(content, view=view)
+    previous = await run_blocking(storefront_store.set, channel.id, message.id, country, category, storefront_stamp(view.catalog))
+    if previous is not None:
+        await delete_storefront_message(channel, previous)
+    return message
+
+async def delete_storefront_message(channel, storefront):
+    """ลบข้อความหน้าร้านเดิม (ไม่สนใจถ้าถูกลบไปแล้ว)"""
+    try:
+        await channel.get_partial_message(storefront["message_id"]).delete()
+    except discord.HTTPException:
+        pass
+
+@tasks.loop(seconds=CATALOG_CHECK_SECONDS)
+async def catalog_refresh_task():
+    """ตรวจ mtime ของไฟล์หมวดหมู่ใน thread pool และโหลดใหม่เฉพาะไฟล์ที่เปลี่ยน
+    
+    หน้าร้านและคำสั่งอ่านแคตตาล็อกผ่าน catalog_store.current() ซึ่งไม่แตะดิสก์ใน event loop
+    """
+    await run_blocking(catalog_store.snapshot, COUNTRIES, CATEGORIES)
+
+@tasks.loop(seconds=CART_TTL)
+async def cart_purge_task():
+    """ลบตะกร้าที่ไม่ถูกใช้เกิน CART_TTL_SECONDS (ตะกร้าที่ไม่มีใครกดอีกจะไม่ค้างในหน่วยความจำ)"""
+    purged = cart_store.purge()
+    if purged:
+        print(f"🛒 ลบตะกร้าที่หมดอายุ {purged} ตะกร้า")
+
+@tasks.loop(seconds=STATS_LOG_SECONDS)
+async def stats_log_task():
+    """พิมพ์สถิติของที่เก็บข้อมูลในหน่วยความจำ (ตะกร้า เลย์เอาต์หน้าร้าน) และการเรียก Discord API ทุก STATS_LOG_SECONDS วินาที"""
+    cart_stats = cart_store.stats()
+    print(
+        f"🛒 ตะกร้า: {cart_stats['carts']} ตะกร้า ({cart_stats['lines']} รายการ, ~{cart_stats['approx_bytes'] / 1024:.1f} KB) "
+        f"หมดอายุ {cart_stats['expired']} ถูกลบเพราะเต็ม {cart_stats['evicted']}"
+    )
+    layout_stats = shop_layouts.stats()
+    print(f"🧩 เลย์เอาต์หน้าร้าน: {layout_stats['layouts']} ชุด (ใช้ซ้ำ {layout_stats['hits']} สร้างใหม่ {layout_stats['misses']})")
+    api_stats = interaction_stats.stats(limit=5)
+    if api_stats["interactions"]:
+        kinds_text = ", ".join(f"{kind} {calls}/{count}" for kind, count, calls, _ in api_stats["kinds"])
+        print(
+            f"📡 Discord API: {api_stats['calls']} ครั้ง จาก {api_stats['interactions']} interaction "
+            f"(defer อัตโนมัติ {api_stats['deferred']}) - API/interaction: {kinds_text}"
+        )
+
+@tasks.loop(seconds=STOREFRONT_REFRESH_SECONDS)
+async def storefront_refresh_task():
+    """แก้ข้อความหน้าร้านถาวรเฉพาะเมื่อแคตตาล็อก หรือชื่อ/อีโมจิของประเทศและหมวดหมู่เปลี่ยน"""
+    catalog = await run_blocking(catalog_store.snapshot, COUNTRIES, CATEGORIES)
+    stamp = storefront_stamp(catalog)
+    for channel_id, storefront in storefront_store.outdated(stamp):
+        channel = bot.get_channel(channel_id)
+        if channel is None:
+            continue
+        content, view = build_storefront_message(storefront["country"], storefront["category"], shop_modes.get(channel_id))
+        if view is None:
+            print(f"⚠️ หน้าร้านของช่อง {channel_id} อ้างถึงประเทศหรือหมวดหมู่ที่ถูกลบไปแล้ว")
+            storefront_store.mark_published(channel_id, stamp)
+            continue
+        try:
+            await channel.get_partial_message(storefront["message_id"]).edit(content=content, view=view)
+        except discord.NotFound:
+            # ข้อความหน้าร้านถูกลบไปแล้ว
+            await run_blocking(storefront_store.remove, channel_id)
+            print(f"🗑️ ลบหน้าร้านของช่อง {channel_id} (ไม่พบข้อความหน้าร้านแล้ว)")
+            continue
+        except discord.HTTPException as e:
+            print(f"❌ ไม่สามารถอัปเดตหน้าร้านของช่อง {channel_id}: {str(e)}")
+            continue
+        storefront_store.mark_published(channel_id, storefront_stamp(view.catalog))
+        print(f"🔄 อัปเดตหน้าร้านของช่อง {channel_id} (แคตตาล็อกเวอร์ชัน {view.catalog.version})")
 
 @bot.command(name="เพิ่มสินค้า")
 @commands.has_permissions(administrator=True)
@@ -2826,7 +2708,7 @@ async def add_multiple_products(ctx, *, ข้อมูล: str):
             return
             
         # Add products using the batch function
-        added_count, errors = batch_add_products(products_to_add)
+        added_count, errors = await run_blocking(batch_add_products, products_to_add)
         
         # Create response message
         if added_count > 0:
@@ -2939,12 +2821,12 @@ async def remove_product(ctx, ชื่อ: str, หมวด: str = None, ป
         
         if หมวด:
             # ถ้าระบุหมวด ให้โหลดสินค้าจากหมวดในประเทศที่ระบุ
-            products = load_products(ประเทศ, หมวด)
+            products = await run_blocking(load_products, ประเทศ, หมวด)
             
             # ตรวจสอบว่ามีสินค้านี้หรือไม่
             product_to_delete = next((p for p in products if p["name"] == ชื่อ), None)
             if not product_to_delete:
-                await ctx.send(f"❌ ไม่พบสินค้า '{ชื่อ}' ในหมวด '{CATEGORY_NAMES.get(หมวด, หมวด)}' ของประเทศ '{COUNTRY_NAMES[ประเทศ]}'")
+                await ctx.send(f"❌ ไม่พบสินค้า '{ชื่อ}' ในหมวด '{category_names().get(หมวด, หมวด)}' ของประเทศ '{COUNTRY_NAMES[ประเทศ]}'")
                 return
             
             # ลบสินค้าออกจากรายการ
@@ -2954,14 +2836,14 @@ async def remove_product(ctx, ชื่อ: str, หมวด: str = None, ป
             save_products(products, ประเทศ, หมวด)
             
             # อัปเดตไฟล์ประเทศด้วย (รายการสินค้าทั้งหมดในประเทศ)
-            all_products = load_products(ประเทศ)
+            all_products = await run_blocking(load_products, ประเทศ)
             all_products = [p for p in all_products if not (p["name"] == ชื่อ and p.get("category") == หมวด)]
             save_products(all_products, ประเทศ)
             
-            await ctx.send(f"🗑️ ลบสินค้า '{ชื่อ}' จากหมวด '{CATEGORY_NAMES.get(หมวด, หมวด)}' ในประเทศ '{COUNTRY_NAMES[ประเทศ]}' เรียบร้อยแล้ว")
+            await ctx.send(f"🗑️ ลบสินค้า '{ชื่อ}' จากหมวด '{category_names().get(หมวด, หมวด)}' ในประเทศ '{COUNTRY_NAMES[ประเทศ]}' เรียบร้อยแล้ว")
         else:
             # ถ้าไม่ระบุหมวด ให้โหลดสินค้าทั้งหมดจากประเทศที่ระบุ
-            products = load_products(ประเทศ)
+            products = await run_blocking(load_products, ประเทศ)
             
             # หาสินค้าที่ต้องการลบ
             products_to_delete = [p for p in products if p["name"] == ชื่อ]
@@ -2979,12 +2861,12 @@ async def remove_product(ctx, ชื่อ: str, หมวด: str = None, ป
             # อัปเดตไฟล์หมวดหมู่ด้วย
             for category in categories_to_update:
                 if category in CATEGORIES:
-                    category_products = load_products(ประเทศ, category)
+                    category_products = await run_blocking(load_products, ประเทศ, category)
                     category_products = [p for p in category_products if p["name"] != ชื่อ]
                     save_products(category_products, ประเทศ, category)
             
             # สร้างข้อความรายละเอียดเพื่อแสดงหมวดหมู่ที่ลบ
-            categories_str = ", ".join([f"'{CATEGORY_NAMES.get(cat, cat)}'" for cat in categories_to_update if cat in CATEGORIES])
+            categories_str = ", ".join([f"'{category_names().get(cat, cat)}'" for cat in categories_to_update if cat in CATEGORIES])
             if categories_str:
                 await ctx.send(f"🗑️ ลบสินค้า '{ชื่อ}' จำนวน {len(products_to_delete)} รายการจากหมวด {categories_str} ในประเทศ '{COUNTRY_NAMES[ประเทศ]}' เรียบร้อยแล้ว")
             else:
@@ -3047,7 +2929,7 @@ async def edit_product(ctx, ชื่อ: str, ประเทศ: str = "1", 
                 
             # ตรวจสอบว่าหมวดหมู่ใหม่ถูกต้อง
             if หมวดใหม่.lower() not in CATEGORIES:
-                categories_str = ", ".join([f"`{CATEGORY_NAMES[c]}`" for c in CATEGORIES])
+                categories_str = ", ".join([f"`{category_names()[c]}`" for c in CATEGORIES])
                 await ctx.send(f"❌ หมวดหมู่ใหม่ไม่ถูกต้อง หมวดหมู่ที่รองรับ: {categories_str}")
                 return
                 
@@ -3055,7 +2937,7 @@ async def edit_product(ctx, ชื่อ: str, ประเทศ: str = "1", 
             หมวดใหม่ = หมวดใหม่.lower()
         
         # โหลดสินค้าจากประเทศที่ระบุ
-        products = load_products(ประเทศ)
+        products = await run_blocking(load_products, ประเทศ)
         
         # ตรวจสอบว่ามีสินค้านี้หรือไม่
         found = False
@@ -3094,13 +2976,13 @@ async def edit_product(ctx, ชื่อ: str, ประเทศ: str = "1", 
                 
                 # ลบออกจากไฟล์หมวดหมู่ของประเทศเดิม
                 if original_category in CATEGORIES:
-                    category_products = load_products(ประเทศ, original_category)
+                    category_products = await run_blocking(load_products, ประเทศ, original_category)
                     category_products = [p for p in category_products if p["name"] != ชื่อ]
                     save_products(category_products, ประเทศ, original_category)
                 
                 # 2. เพิ่มลงในประเทศใหม่
                 # โหลดสินค้าจากประเทศใหม่
-                new_country_products = load_products(ประเทศใหม่)
+                new_country_products = await run_blocking(load_products, ประเทศใหม่)
                 
                 # เปลี่ยนประเทศในข้อมูลสินค้า
                 original_product["country"] = ประเทศใหม่
@@ -3112,7 +2994,7 @@ async def edit_product(ctx, ชื่อ: str, ประเทศ: str = "1", 
                 save_products(new_country_products, ประเทศใหม่)
                 
                 # บันทึกลงไฟล์หมวดหมู่ในประเทศใหม่
-                save_product_to_category(original_product)
+                await run_blocking(save_product_to_category, original_product)
                 
                 # อัปเดตประเทศที่ใช้งานปัจจุบันเป็นประเทศใหม่ (สำหรับแสดงข้อมูล)
                 ประเทศ = ประเทศใหม่
@@ -3125,7 +3007,7 @@ async def edit_product(ctx, ชื่อ: str, ประเทศ: str = "1", 
                 if หมวดใหม่ and หมวดใหม่ != original_category:
                     # 1. ลบจากไฟล์หมวดหมู่เดิม
                     if original_category in CATEGORIES:
-                        category_products = load_products(ประเทศ, original_category)
+                        category_products = await run_blocking(load_products, ประเทศ, original_category)
                         category_products = [p for p in category_products if p["name"] != ชื่อ]
                         save_products(category_products, ประเทศ, original_category)
                     
@@ -3134,14 +3016,14 @@ async def edit_product(ctx, ชื่อ: str, ประเทศ: str = "1", 
                         # ตรวจสอบว่ามีหมวดหมู่และประเทศในข้อมูลสินค้า
                         original_product["category"] = หมวดใหม่
                         original_product["country"] = ประเทศ
-                        save_product_to_category(original_product)
+                        await run_blocking(save_product_to_category, original_product)
                 else:
                     # หมวดหมู่เดิม เพียงอัปเดตไฟล์
                     if original_category in CATEGORIES:
                         # ตรวจสอบว่ามีหมวดหมู่และประเทศในข้อมูลสินค้า
                         original_product["category"] = original_category
                         original_product["country"] = ประเทศ
-                        save_product_to_category(original_product)
+                        await run_blocking(save_product_to_category, original_product)
         
         product_name = ชื่อใหม่ if ชื่อใหม่ else ชื่อ
         await ctx.send(f"✏️ แก้ไขสินค้า '{ชื่อ}' เรียบร้อย")
@@ -3149,7 +3031,7 @@ async def edit_product(ctx, ชื่อ: str, ประเทศ: str = "1", 
         # Show updated product details
         # ถ้ามีการย้ายประเทศ ให้โหลดสินค้าจากประเทศใหม่
         if ประเทศใหม่ and ประเทศใหม่ != ประเทศ:
-            updated_products = load_products(ประเทศใหม่)
+            updated_products = await run_blocking(load_products, ประเทศใหม่)
         else:
             updated_products = products
             
@@ -3159,7 +3041,7 @@ async def edit_product(ctx, ชื่อ: str, ประเทศ: str = "1", 
             embed.add_field(name="ชื่อ", value=product["name"], inline=True)
             embed.add_field(name="ราคา", value=f"{product['price']:.2f}฿", inline=True)
             embed.add_field(name="อีโมจิ", value=product["emoji"], inline=True)
-            embed.add_field(name="หมวดหมู่", value=CATEGORY_NAMES.get(product.get("category", ""), product.get("category", "ไม่ระบุหมวด")), inline=True)
+            embed.add_field(name="หมวดหมู่", value=category_names().get(product.get("category", ""), product.get("category", "ไม่ระบุหมวด")), inline=True)
             embed.add_field(name="ประเทศ", value=COUNTRY_NAMES.get(product.get("country", "thailand"), "ไทย"), inline=True)
             await ctx.send(embed=embed)
             
@@ -3169,14 +3051,14 @@ async def edit_product(ctx, ชื่อ: str, ประเทศ: str = "1", 
 @bot.command(name="สินค้าทั้งหมด")
 async def list_products(ctx, หมวด: str = None):
     """Command to list all products"""
-    products = load_products(หมวด)
+    products = await run_blocking(load_products, หมวด)
     if not products:
         await ctx.send("❌ ไม่มีสินค้าในร้าน")
         return
     
     # Check if category is valid
     if หมวด and หมวด not in CATEGORIES:
-        categories_str = ", ".join([f"`{CATEGORY_NAMES[cat]}`" for cat in CATEGORIES])
+        categories_str = ", ".join([f"`{category_names()[cat]}`" for cat in CATEGORIES])
         await ctx.send(f"❌ หมวดหมู่ไม่ถูกต้อง หมวดหมู่ที่มี: {categories_str}")
         return
     
@@ -3231,44 +3113,178 @@ async def list_products(ctx, หมวด: str = None):
     
     await ctx.send(embed=embed)
 
+def _history_limit(amount):
+    """จำนวนรายการต่อหน้า (embed มีได้สูงสุด 25 field)"""
+    return min(amount, 25) if amount > 0 else 25
+
+def build_history_embed(entries, next_cursor=None, next_page_hint=None):
+    """สร้าง embed แสดงประวัติการซื้อ
+
+    Args:
+        entries (list): รายการประวัติเรียงจากเก่าไปใหม่
+        next_cursor (str, optional): cursor สำหรับหน้าที่เก่ากว่า
+        next_page_hint (str, optional): รูปแบบคำสั่งดูหน้าถัดไป (ใส่ {cursor} แทนตำแหน่ง cursor)
+    """
+    embed = discord.Embed(title="📜 ประวัติการซื้อ", color=0x00ff00)
+    for d in entries:
+        try:
+            dt = datetime.fromisoformat(d['timestamp'])
+            formatted_time = dt.strftime("%d/%m/%Y %H:%M")
+            summary = ", ".join([f"{x['name']} x{x['qty']}" for x in d['items']])
+            embed.add_field(
+                name=f"👤 {d['user']} ({formatted_time})",
+                value=f"{summary} = {d['total']}฿",
+                inline=False
+            )
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    if next_cursor is not None and next_page_hint:
+        embed.set_footer(text=f"ดูรายการที่เก่ากว่า: {next_page_hint.format(cursor=next_cursor)}")
+    return embed
+
 @bot.command(name="ประวัติ")
 @commands.has_permissions(administrator=True)
-async def history(ctx, จำนวน: int = 5):
+async def history(ctx, จำนวน: int = 5, ก่อนหน้า: str = None):
     """Command to view purchase history (Admin only)"""
     try:
-        if not HISTORY_FILE.exists() or HISTORY_FILE.stat().st_size == 0:
-            await ctx.send("❌ ยังไม่มีประวัติการซื้อ")
-            return
+        # อ่านเฉพาะท้ายไฟล์ ไม่ต้องโหลดประวัติทั้งหมด
+        limit = _history_limit(จำนวน)
+        entries, next_cursor = await run_blocking(read_history_page, limit, ก่อนหน้า)
             
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
-            
-        if not lines:
+        if not entries:
             await ctx.send("❌ ยังไม่มีประวัติการซื้อ")
             return
             
-        # Get the last N entries
-        entries = lines[-จำนวน:] if จำนวน > 0 else lines
-            
-        embed = discord.Embed(title="📜 ประวัติการซื้อ", color=0x00ff00)
-        for line in entries:
-            try:
-                d = json.loads(line)
-                dt = datetime.fromisoformat(d['timestamp'])
-                formatted_time = dt.strftime("%d/%m/%Y %H:%M")
-                summary = ", ".join([f"{x['name']} x{x['qty']}" for x in d['items']])
-                embed.add_field(
-                    name=f"👤 {d['user']} ({formatted_time})",
-                    value=f"{summary} = {d['total']}฿",
-                    inline=False
-                )
-            except (json.JSONDecodeError, KeyError) as e:
-                continue
-                
+        embed = build_history_embed(entries, next_cursor, f"!ประวัติ {limit} {{cursor}}")
         await ctx.send(embed=embed)
     except Exception as e:
         await ctx.send(f"❌ เกิดข้อผิดพลาด: {str(e)}")
 
+def _top_lines(group, limit=10, label=None):
+    """บรรทัดสรุปยอดขายของกลุ่ม เรียงตามยอดขายมากไปน้อย"""
+    rows = sorted(group.items(), key=lambda row: row[1][0], reverse=True)[:limit]
+    lines = []
+    for key, (revenue, units, orders) in rows:
+        name = label(key) if label else key
+        lines.append(f"{name or '-'} — {revenue:,.2f}฿ ({units:,.0f} ชิ้น)")
+    return "\n".join(lines)[:1024] or "-"
+
+def build_sales_embed(report):
+    """สร้าง embed รายงานยอดขายจากยอดสะสม (sales_rollup)"""
+    embed = discord.Embed(
+        title="📈 รายงานยอดขาย",
+        description=(
+            f"**ยอดขายรวม:** {report['revenue']:,.2f}฿\n"
+            f"**จำนวนชิ้น:** {report['units']:,.0f} ชิ้น\n"
+            f"**คำสั่งซื้อ:** {report['records']:,} ครั้ง"
+        ),
+        color=0x00ff00
+    )
+
+    embed.add_field(name="🛒 สินค้าขายดี", value=_top_lines(report["product"]), inline=False)
+    embed.add_field(
+        name="🌍 ตามประเทศ",
+        value=_top_lines(report["country"], label=lambda key: COUNTRY_NAMES.get(key, key)),
+        inline=True
+    )
+    embed.add_field(
+        name="📂 ตามหมวดหมู่",
+        value=_top_lines(report["category"], label=lambda key: category_names().get(key, key) if key else "ไม่ระบุ"),
+        inline=True
+    )
+
+    # 7 วันล่าสุด (วันที่ไม่มียอดขายแสดงเป็น 0)
+    today = datetime.now().date()
+    day_lines = []
+    for days_ago in range(6, -1, -1):
+        day = (today - timedelta(days=days_ago)).isoformat()
+        revenue, units, orders = report["day"].get(day, [0, 0, 0])
+        day_lines.append(f"{day} — {revenue:,.2f}฿ ({orders:,} คำสั่งซื้อ)")
+    embed.add_field(name="📅 รายวัน (7 วันล่าสุด)", value="\n".join(day_lines), inline=False)
+
+    week_lines = []
+    for week in sorted(report["week"], reverse=True)[:4]:
+        revenue, units, orders = report["week"][week]
+        week_lines.append(f"{week} — {revenue:,.2f}฿ ({orders:,} คำสั่งซื้อ)")
+    embed.add_field(name="🗓️ รายสัปดาห์ (4 สัปดาห์ล่าสุด)", value="\n".join(week_lines) or "-", inline=False)
+
+    embed.set_footer(text=f"ข้อมูล ณ {datetime.now().strftime('%d/%m/%Y %H:%M')}")
+    return embed
+
+@bot.command(name="ยอดขาย")
+@commands.has_permissions(administrator=True)
+async def sales_report(ctx):
+    """Command to view the sales report (Admin only)"""
+    try:
+        report = sales_rollup.report()
+        if not report["records"]:
+            await ctx.send("❌ ยังไม่มียอดขาย")
+            return
+        await ctx.send(embed=build_sales_embed(report))
+    except Exception as e:
+        await ctx.send(f"❌ เกิดข้อผิดพลาด: {str(e)}")
+
+@bot.command(name="หน้าร้าน", aliases=["storefront"])
+@commands.has_permissions(administrator=True)
+async def storefront_command(ctx, ประเทศ: str = None, หมวด: str = None):
+    """Command to publish the channel's persistent storefront (Admin only)
+    
+    Args:
+        ประเทศ: Country code or name shown on the storefront (ใช้ `ปิด` เพื่อลบหน้าร้านของช่องนี้)
+        หมวด: Category code or name shown on the storefront
+    """
+    try:
+        if ประเทศ == "ปิด":
+            storefront = await run_blocking(storefront_store.remove, ctx.channel.id)
+            if storefront is None:
+                await ctx.send("❌ ช่องนี้ไม่มีหน้าร้านถาวร")
+                return
+            await delete_storefront_message(ctx.channel, storefront)
+            await ctx.send("✅ ลบหน้าร้านของช่องนี้แล้ว")
+            return
+        
+        args = resolve_storefront_args(ประเทศ, หมวด)
+        if args is None:
+            countries_str = ", ".join([f"`{COUNTRY_NAMES[c]}`" for c in COUNTRIES])
+            categories_str = ", ".join([f"`{category_names()[c]}`" for c in CATEGORIES])
+            await ctx.send(f"❌ ไม่พบประเทศหรือหมวดหมู่ที่ระบุ\nประเทศที่มี: {countries_str}\nหมวดหมู่ที่มี: {categories_str}")
+            return
+        await publish_storefront(ctx.channel, *args)
+    except Exception as e:
+        await ctx.send(f"❌ เกิดข้อผิดพลาด: {str(e)}")
+
+SHOP_MODE_NAMES = {SHOP_MODE_BUTTONS: "ปุ่ม", SHOP_MODE_SELECT: "เมนู"}
+
+async def set_shop_mode(channel_id, mode):
+    """ตั้งรูปแบบการเลือกสินค้าของช่อง และให้หน้าร้านถาวรของช่องแสดงรูปแบบใหม่ในรอบอัปเดตถัดไป"""
+    await run_blocking(shop_modes.set, channel_id, mode)
+    storefront_store.mark_published(channel_id, None)
+
+@bot.command(name="โหมดร้าน", aliases=["shopmode"])
+@commands.has_permissions(administrator=True)
+async def shop_mode_command(ctx, โหมด: str = None):
+    """Command to switch the channel's product picker between buttons and a select menu (Admin only)
+    
+    Args:
+        โหมด: `ปุ่ม` (5 products per page) or `เมนู` (25 products per page, multi-select)
+    """
+    modes = {name: mode for mode, name in SHOP_MODE_NAMES.items()}
+    current = shop_modes.get(ctx.channel.id)
+    if โหมด is None:
+        # สลับรูปแบบเมื่อไม่ระบุ
+        mode = SHOP_MODE_SELECT if current == SHOP_MODE_BUTTONS else SHOP_MODE_BUTTONS
+    else:
+        mode = modes.get(โหมด, โหมด.lower())
+        if mode not in SHOP_MODES:
+            await ctx.send("❌ โหมดไม่ถูกต้อง ใช้ `!โหมดร้าน ปุ่ม` หรือ `!โหมดร้าน เมนู`")
+            return
+    try:
+        await set_shop_mode(ctx.channel.id, mode)
+        await ctx.send(f"✅ หน้าร้านในช่องนี้ใช้โหมด `{SHOP_MODE_NAMES[mode]}` แล้ว (มีผลกับหน้าร้านที่เปิดใหม่และหน้าร้านถาวรของช่อง)")
+    except Exception as e:
+        await ctx.send(f"❌ เกิดข้อผิดพลาด: {str(e)}")
+
 @bot.command(name="ลบสินค้าทั้งหมด")
 @commands.has_permissions(administrator=True)
 async def delete_all_products_command(ctx):
@@ -3289,19 +3305,23 @@ async def delete_all_products_command(ctx):
             @discord.ui.button(label="ยืนยันการลบ", style=discord.ButtonStyle.danger)
             async def confirm_button(self, button_interaction: discord.Interaction, button: discord.ui.Button):
                 if button_interaction.user.id != ctx.author.id:
-                    await button_interaction.response.send_message("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
+                    await responder(button_interaction).send("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
                     return
                     
-                success = delete_all_products()
+                # ลบสินค้าใน MongoDB และไฟล์อาจใช้เวลาเกิน 3 วินาที
+                    
+                await responder(button_interaction).expect_slow()
+                    
+                success = await run_blocking(delete_all_products)
                 
                 if success:
-                    await button_interaction.response.edit_message(
+                    await responder(button_interaction).edit(
                         content="✅ ลบสินค้าทั้งหมดในทุกหมวดหมู่และทุกประเทศเรียบร้อยแล้ว",
                         embed=None,
                         view=None
                     )
                 else:
-                    await button_interaction.response.edit_message(
+                    await responder(button_interaction).edit(
                         content="❌ เกิดข้อผิดพลาดในการลบสินค้าทั้งหมด",
                         embed=None,
                         view=None
@@ -3310,10 +3330,10 @@ async def delete_all_products_command(ctx):
             @discord.ui.button(label="ยกเลิก", style=discord.ButtonStyle.secondary)
             async def cancel_button(self, button_interaction: discord.Interaction, button: discord.ui.Button):
                 if button_interaction.user.id != ctx.author.id:
-                    await button_interaction.response.send_message("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
+                    await responder(button_interaction).send("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
                     return
                     
-                await button_interaction.response.edit_message(
+                await responder(button_interaction).edit(
                     content="❌ ยกเลิกการลบสินค้า",
                     embed=None,
                     view=None
@@ -3332,7 +3352,7 @@ async def add_no_product_placeholders_command(ctx):
     """Command to add 'ไม่มีสินค้า' placeholders to empty categories in all countries (Admin only)"""
     try:
         # เพิ่มสินค้า placeholder ในหมวดหมู่ที่ว่างเปล่า
-        added_count = add_no_product_placeholders()
+        added_count = await run_blocking(add_no_product_placeholders)
         
         if added_count > 0:
             await ctx.send(f"✅ เพิ่มสินค้า 'ไม่มีสินค้า' ในหมวดที่ว่างเปล่าแล้ว {added_count} หมวด")
@@ -3378,14 +3398,14 @@ async def clear_category_command(ctx, *, ข้อมูล: str = None):
                 categories_to_clear.append((หมวด, ประเทศ))
         
         if invalid_categories:
-            categories_str = ", ".join([f"`{CATEGORY_NAMES.get(cat, cat)}`" for cat in CATEGORIES])
+            categories_str = ", ".join([f"`{category_names().get(cat, cat)}`" for cat in CATEGORIES])
             await ctx.send(f"❌ หมวดหมู่ `{'`, `'.join(invalid_categories)}` ไม่ถูกต้อง หมวดหมู่ที่มี: {categories_str}")
             return
         
         # สร้างข้อความยืนยันตามจำนวนหมวดหมู่
         description_lines = []
         for หมวด, ประเทศ in categories_to_clear:
-            category_name = CATEGORY_NAMES.get(หมวด, หมวด)
+            category_name = category_names().get(หมวด, หมวด)
             if ประเทศ:
                 country_name = COUNTRY_NAMES.get(ประเทศ, ประเทศ)
                 description_lines.append(f"- หมวด **{category_name}** ในประเทศ **{country_name}**")
@@ -3407,20 +3427,22 @@ async def clear_category_command(ctx, *, ข้อมูล: str = None):
             @discord.ui.button(label="ยืนยันการลบ", style=discord.ButtonStyle.danger)
             async def confirm_button(self, button_interaction: discord.Interaction, button: discord.ui.Button):
                 if button_interaction.user.id != ctx.author.id:
-                    await button_interaction.response.send_message("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
+                    await responder(button_interaction).send("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
                     return
                 
                 success_count = 0
                 failed_categories = []
                 
+                # ลบสินค้าทีละหมวดใน MongoDB และไฟล์อาจใช้เวลาเกิน 3 วินาที
+                await responder(button_interaction).expect_slow()
                 for หมวด, ประเทศ in categories_to_clear:
-                    if clear_category_products(หมวด, ประเทศ):
+                    if await run_blocking(clear_category_products, หมวด, ประเทศ):
                         success_count += 1
                     else:
                         failed_categories.append((หมวด, ประเทศ))
                 
                 if success_count == len(categories_to_clear):
-                    await button_interaction.response.edit_message(
+                    await responder(button_interaction).edit(
                         content="✅ ลบสินค้าในทุกหมวดที่เลือกเรียบร้อยแล้ว",
                         embed=None,
                         view=None
@@ -3429,20 +3451,20 @@ async def clear_category_command(ctx, *, ข้อมูล: str = None):
                     # สร้างข้อความแสดงหมวดที่ล้มเหลว
                     fail_message = []
                     for หมวด, ประเทศ in failed_categories:
-                        category_name = CATEGORY_NAMES.get(หมวด, หมวด)
+                        category_name = category_names().get(หมวด, หมวด)
                         if ประเทศ:
                             country_name = COUNTRY_NAMES.get(ประเทศ, ประเทศ)
                             fail_message.append(f"- หมวด **{category_name}** ในประเทศ **{country_name}**")
                         else:
                             fail_message.append(f"- หมวด **{category_name}** ในทุกประเทศ")
                     
-                    await button_interaction.response.edit_message(
+                    await responder(button_interaction).edit(
                         content=f"⚠️ ลบสินค้าสำเร็จบางส่วน ({success_count}/{len(categories_to_clear)})\n\nไม่สามารถลบ:\n" + "\n".join(fail_message),
                         embed=None,
                         view=None
                     )
                 else:
-                    await button_interaction.response.edit_message(
+                    await responder(button_interaction).edit(
                         content="❌ เกิดข้อผิดพลาด ไม่สามารถลบสินค้าในหมวดที่เลือกได้",
                         embed=None,
                         view=None
@@ -3451,10 +3473,10 @@ async def clear_category_command(ctx, *, ข้อมูล: str = None):
             @discord.ui.button(label="ยกเลิก", style=discord.ButtonStyle.secondary)
             async def cancel_button(self, button_interaction: discord.Interaction, button: discord.ui.Button):
                 if button_interaction.user.id != ctx.author.id:
-                    await button_interaction.response.send_message("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
+                    await responder(button_interaction).send("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
                     return
                     
-                await button_interaction.response.edit_message(
+                await responder(button_interaction).edit(
                     content="❌ ยกเลิกการลบสินค้า",
                     embed=None,
                     view=None
@@ -3587,6 +3609,9 @@ async def order_many_command(ctx):
     # แยกข้อความเป็นรายการสั่งซื้อ
     order_lines = command_parts[1].strip().split("\n")
     
+    # ดัชนีชื่อสินค้าของแคตตาล็อกเวอร์ชันปัจจุบัน (ค้นหาทุกบรรทัดได้โดยไม่อ่านไฟล์ซ้ำ)
+    name_index = (await current_catalog()).name_index
+    
     for line in order_lines:
         # แยกชื่อสินค้าและจำนวน
         parts = line.strip().rsplit(" ", 1)
@@ -3606,24 +3631,21 @@ async def order_many_command(ctx):
             failed_orders.append((line, f"จำนวนต้องมากกว่า 0"))
             continue
         
-        # ค้นหาสินค้าจากชื่อในทุกประเทศ
-        found_product = None
-        found_country = None
+        # ค้นหาสินค้าจากชื่อในทุกประเทศ (ใช้รายการแรกตามลำดับประเทศและหมวดหมู่)
+        matches = name_index.find(product_name)
         
-        for country in COUNTRIES:
-            all_products = load_products(country=country)
-            for p in all_products:
-                if p["name"].lower() == product_name.lower():
-                    found_product = p
-                    found_country = country
-                    break
-            if found_product:
-                break
-        
-        if not found_product:
-            failed_orders.append((line, f"ไม่พบสินค้า: {product_name} ในทุกประเทศ"))
+        if not matches:
+            reason = f"ไม่พบสินค้า: {product_name} ในทุกประเทศ"
+            # difflib บนชื่อทั้งหมดใช้เวลาตามจำนวนสินค้า จึงรันนอก event loop
+            suggestions = await run_blocking(name_index.suggest, product_name)
+            if suggestions:
+                reason += f" (หมายถึง {', '.join(suggestions)} หรือไม่?)"
+            failed_orders.append((line, reason))
             continue
         
+        found_product = dict(matches[0])
+        found_country = found_product["country"]
+        
         # ตรวจสอบสินค้า placeholder
         if found_product["name"] == "ไม่มีสินค้า":
             failed_orders.append((line, "ไม่สามารถสั่งซื้อสินค้านี้ได้"))
@@ -3708,7 +3730,7 @@ async def order_many_command(ctx):
         @discord.ui.button(label="💳 ชำระเงิน", style=discord.ButtonStyle.green)
         async def checkout_button(self, button_interaction: discord.Interaction, button: discord.ui.Button):
             if button_interaction.user.id != ctx.author.id:
-                await button_interaction.response.send_message("❌ คุณไม่ใช่ผู้สั่งซื้อสินค้านี้", ephemeral=True)
+                await responder(button_interaction).send("❌ คุณไม่ใช่ผู้สั่งซื้อสินค้านี้", ephemeral=True)
                 return
             
             # สร้าง embed สำหรับการชำระเงิน
@@ -3741,47 +3763,25 @@ async def order_many_command(ctx):
             )
             
             # เพิ่ม QR Code
-            qr_url = await load_qrcode_url_async_local()
+            qr_url = await config_cache.get("qrcode_url")
             payment_embed.set_image(url=qr_url)
             
             # เพิ่มคำแนะนำ
             payment_embed.set_footer(text="หลังจากชำระเงินแล้ว รอแอดมินกดปุ่ม 'ส่งของแล้ว' เพื่อยืนยันการสั่งซื้อ")
             
+            # บันทึกคำสั่งซื้อที่รอยืนยัน ปุ่มของแอดมินเก็บเฉพาะรหัสคำสั่งซื้อ (ใช้ได้ต่อหลังรีสตาร์ทบอท)
+            order_id = await run_blocking(pending_orders.add, str(ctx.author), cart_items, total_price)
+            
             # สร้างปุ่มสำหรับหน้าชำระเงิน
-            class PaymentView(discord.ui.View):
-                def __init__(self):
-                    super().__init__(timeout=None)  # ไม่หมดเวลา
-                
-                @discord.ui.button(label="✅ ส่งของแล้ว (สำหรับแอดมิน)", style=discord.ButtonStyle.green)
-                async def confirm_button(self, confirm_interaction: discord.Interaction, confirm_button: discord.ui.Button):
-                    # ตรวจสอบว่าเป็นแอดมินหรือไม่
-                    if not confirm_interaction.user.guild_permissions.administrator:
-                        await confirm_interaction.response.send_message("❌ คุณไม่มีสิทธิ์ใช้ปุ่มนี้ (เฉพาะแอดมินเท่านั้น)", ephemeral=True)
-                        return
-                    
-                    # บันทึกประวัติการซื้อ
-                    purchase_id = log_purchase(ctx.author, cart_items, total_price)
-                    
-                    # โหลดข้อความขอบคุณ
-                    thank_you_message = load_thank_you_message()
-                    
-                    # สร้าง embed ขอบคุณ
-                    thank_you_embed = discord.Embed(
-                        title="✅ การสั่งซื้อเสร็จสมบูรณ์",
-                        description=thank_you_message,
-                        color=discord.Color.green()
-                    )
-                    
-                    thank_you_embed.set_footer(text=f"รหัสคำสั่งซื้อ: {purchase_id}")
-                    
-                    await confirm_interaction.response.edit_message(embed=thank_you_embed, view=None)
+            payment_view = discord.ui.View(timeout=None)  # ไม่หมดเวลา
+            payment_view.add_item(OrderDeliveredButton(order_id))
             
-            await button_interaction.response.edit_message(embed=payment_embed, view=PaymentView())
+            await responder(button_interaction).edit(embed=payment_embed, view=payment_view)
         
         @discord.ui.button(label="❌ ยกเลิก", style=discord.ButtonStyle.red)
         async def cancel_button(self, button_interaction: discord.Interaction, button: discord.ui.Button):
             if button_interaction.user.id != ctx.author.id:
-                await button_interaction.response.send_message("❌ คุณไม่ใช่ผู้สั่งซื้อสินค้านี้", ephemeral=True)
+                await responder(button_interaction).send("❌ คุณไม่ใช่ผู้สั่งซื้อสินค้านี้", ephemeral=True)
                 return
             
             cancel_embed = discord.Embed(
@@ -3790,7 +3790,7 @@ async def order_many_command(ctx):
                 color=discord.Color.red()
             )
             
-            await button_interaction.response.edit_message(embed=cancel_embed, view=None)
+            await responder(button_interaction).edit(embed=cancel_embed, view=None)
     
     await ctx.send(embed=cart_embed, view=CheckoutView())
 
@@ -3820,7 +3820,7 @@ async def save_all_command(ctx):
     # หากตัวแปรโกลบอลไม่มีข้อมูล ให้พยายามดึงจาก MongoDB
     if not countries:
         try:
-            countries, country_names, country_emojis, _ = load_countries()
+            countries, country_names, country_emojis, _ = await load_countries_tuple()
             processing_embed = discord.Embed(
                 title="ℹ️ ใช้ข้อมูลจาก MongoDB",
                 description="ดึงข้อมูลจาก MongoDB สำเร็จ",
@@ -3841,12 +3841,12 @@ async def save_all_command(ctx):
         return
     
     # 2. ข้อมูลหมวดหมู่
-    category_names = {}
-    category_emojis = {}
+    saved_category_names = {}
+    saved_category_emojis = {}
     try:
-        # ใช้ตัวแปรโกลบอล
-        category_names = CATEGORY_NAMES
-        category_emojis = CATEGORY_EMOJIS
+        # ใช้ค่าจากแคชการตั้งค่า
+        saved_category_names = category_names()
+        saved_category_emojis = category_emojis()
     except Exception as e:
         # แจ้งเตือนแต่ไม่ return
         await ctx.send(f"⚠️ ไม่สามารถโหลดข้อมูลหมวดหมู่: {str(e)[:100]}...")
@@ -3854,31 +3854,25 @@ async def save_all_command(ctx):
     # 3. ข้อมูลสินค้าทั้งหมด
     all_products = []
     
+    # เขียนการแก้ไขที่ค้างอยู่ลงไฟล์ก่อนอ่าน
+    await run_blocking(category_writer.flush)
+    
     # พยายามโหลดจากไฟล์ JSON ก่อน
     try:
         # ใช้ categories directory เพื่อรวบรวมสินค้าทั้งหมด
         categories_dir = SCRIPT_DIR / "categories"
         
-        if categories_dir.exists():
-            # วนลูปผ่านแต่ละประเทศ
-            for country_dir in sorted(categories_dir.iterdir()):
-                if country_dir.is_dir():
-                    country_code = country_dir.name
-                    # วนลูปผ่านแต่ละหมวดหมู่
-                    for category_file in sorted(country_dir.iterdir()):
-                        if category_file.is_file() and category_file.suffix == '.json':
-                            category_code = category_file.stem
-                            try:
-                                with open(category_file, "r", encoding="utf-8") as f:
-                                    category_products = json.load(f)
-                                    # เพิ่ม country และ category code สำหรับแต่ละสินค้า
-                                    for product in category_products:
-                                        if isinstance(product, dict) and "name" in product and product["name"] != "ไม่มีสินค้า":
-                                            product["country"] = country_code
-                                            product["category"] = category_code
-                                            all_products.append(product)
-                            except Exception as e:
-                                await ctx.send(f"⚠️ ไม่สามารถโหลดข้อมูลสินค้าจากไฟล์ {category_file}: {str(e)[:100]}...")
+        # วนลูปผ่านแต่ละประเทศและหมวดหมู่ (อ่านไฟล์ใน thread pool)
+        for country_code, category_code, category_file, category_products in await run_blocking(_read_category_files, categories_dir):
+            if isinstance(category_products, Exception):
+                await ctx.send(f"⚠️ ไม่สามารถโหลดข้อมูลสินค้าจากไฟล์ {category_file}: {str(category_products)[:100]}...")
+                continue
+            # เพิ่ม country และ category code สำหรับแต่ละสินค้า
+            for product in category_products:
+                if isinstance(product, dict) and "name" in product and product["name"] != "ไม่มีสินค้า":
+                    product["country"] = country_code
+                    product["category"] = category_code
+                    all_products.append(product)
         
         if all_products:
             processing_embed = discord.Embed(
@@ -3890,8 +3884,7 @@ async def save_all_command(ctx):
         else:
             # ถ้าไม่มีข้อมูลจากโฟลเดอร์ categories ให้ลองโหลดจาก products.json
             try:
-                with open(PRODUCTS_FILE, "r", encoding="utf-8") as f:
-                    all_products = json.load(f)
+                all_products = await run_blocking(_read_json, PRODUCTS_FILE)
                 if all_products:
                     processing_embed = discord.Embed(
                         title="ℹ️ โหลดข้อมูลสินค้าสำเร็จ",
@@ -3907,7 +3900,7 @@ async def save_all_command(ctx):
     # หากไม่มีข้อมูลจากไฟล์ JSON ให้ลองโหลดจาก MongoDB
     if not all_products:
         try:
-            all_products = load_products()
+            all_products = await run_blocking(load_products)
             if all_products:
                 processing_embed = discord.Embed(
                     title="ℹ️ โหลดข้อมูลสินค้าสำเร็จ",
@@ -3928,15 +3921,14 @@ async def save_all_command(ctx):
     qr_code_url = ""
     # พยายามเข้าถึงตัวแปรโกลบอล
     try:
-        with open(QRCODE_CONFIG_FILE, "r", encoding="utf-8") as f:
-            qr_code_url = json.load(f).get("url", "")
+        qr_code_url = (await run_blocking(_read_json, QRCODE_CONFIG_FILE)).get("url", "")
     except Exception:
         pass
     
     # หากไม่สำเร็จ ลองใช้ฟังก์ชันจาก db_operations
     if not qr_code_url:
         try:
-            temp_url = load_qrcode_url()
+            temp_url = await run_blocking(load_qrcode_url)
             if temp_url:
                 qr_code_url = temp_url
         except Exception as e:
@@ -3948,15 +3940,14 @@ async def save_all_command(ctx):
     # พยายามเข้าถึงจากไฟล์
     try:
         thank_you_file = SCRIPT_DIR / "thank_you_config.json"
-        with open(thank_you_file, "r", encoding="utf-8") as f:
-            thank_you_message = json.load(f).get("message", "ขอบคุณที่ใช้บริการ")
+        thank_you_message = (await run_blocking(_read_json, thank_you_file)).get("message", "ขอบคุณที่ใช้บริการ")
     except Exception:
         pass
     
     # หากไม่สำเร็จ ลองใช้ฟังก์ชันจาก db_operations
     if thank_you_message == "ขอบคุณที่ใช้บริการ":
         try:
-            temp_msg = load_thank_you_message()
+            temp_msg = await run_blocking(load_thank_you_message)
             if temp_msg:
                 thank_you_message = temp_msg
         except Exception as e:
@@ -3979,12 +3970,12 @@ async def save_all_command(ctx):
         commands_text += "\n"
     
     # 2. คำสั่งกู้คืนข้อมูลหมวดหมู่
-    if category_names:
+    if saved_category_names:
         commands_text += "# คำสั่งกู้คืนข้อมูลหมวดหมู่\n"
         commands_text += "!แก้ไขหมวดสินค้า\n"
-        for code in category_names:
-            emoji = category_emojis.get(code, "")
-            name = category_names.get(code, "")
+        for code in saved_category_names:
+            emoji = saved_category_emojis.get(code, "")
+            name = saved_category_names.get(code, "")
             if emoji and name:
                 commands_text += f"{code} {emoji} {name}\n"
         commands_text += "\n"
@@ -4039,7 +4030,7 @@ async def save_all_command(ctx):
     # ส่งข้อความแรกโดยการแก้ไขข้อความเดิม
     embed = discord.Embed(
         title="💾 สำรองข้อมูลสำเร็จ",
-        description=f"จำนวนประเทศ: {len(countries)} รายการ\nจำนวนหมวดหมู่: {len(category_names)} รายการ\nจำนวนสินค้า: {len(all_products)} รายการ",
+        description=f"จำนวนประเทศ: {len(countries)} รายการ\nจำนวนหมวดหมู่: {len(saved_category_names)} รายการ\nจำนวนสินค้า: {len(all_products)} รายการ",
         color=discord.Color.green()
     )
     embed.set_footer(text=f"ข้อมูลถูกแบ่งเป็น {len(parts)} ส่วน")
@@ -4066,8 +4057,8 @@ async def on_message(message):
     if message.author == bot.user:
         return
     
-    # โหลด Target Channel ID จาก MongoDB
-    TARGET_CHANNEL_ID = load_target_channel_id()
+    # โหลด Target Channel ID จากแคชการตั้งค่า
+    TARGET_CHANNEL_ID = await config_cache.get("target_channel_id")
     
     print(f"📨 Message from {message.author.name} in channel {message.channel.id} ({message.channel.name})")
     print(f"🎯 Target channel: {TARGET_CHANNEL_ID}")
@@ -4085,76 +4076,11 @@ async def on_message(message):
             await message.add_reaction("💗")
             print("💗 Added reaction successfully")
             
-            # ดึงช่องและชื่อปัจจุบัน
-            channel = message.channel
-            current_name = channel.name
-            print(f"🔍 Current channel name: '{current_name}'")
-            
-            # ซิงค์ตัวเลขจากชื่อช่องจริงก่อน
-            sync_channel_numbers(current_name)
-            
-            # ดึงข้อมูลล่าสุดจาก MongoDB ทุกครั้ง
-            channel_state = load_channel_state()
-            current_number_from_db = channel_state.get("current_number", 0)
-            pending_number_from_db = channel_state.get("pending_number", 0)
-            
-            # หาตัวเลขจริงจากชื่อช่อง
-            import re
-            number_match = re.search(r'(\d+)$', current_name)
-            actual_current_number = int(number_match.group(1)) if number_match else 0
-            
-            # ใช้ pending_number จาก MongoDB + 1 เสมอ (ไม่ดูตัวเลขจากชื่อช่อง)
-            new_pending_number = pending_number_from_db + 1
+            # นับข้อความ (บันทึกครั้งเดียว) แล้วให้ทาสค์เบื้องหลังเปลี่ยนชื่อช่องตามโควต้าของ Discord
+            new_number = await channel_counter.increment(message.channel)
+            counter_stats = channel_counter.stats()
+            print(f"📊 Counter: pending {new_number}, applied {counter_stats['applied']}, lag {counter_stats['lag']}")
             
-            print(f"📊 Current state - DB: {current_number_from_db}, Actual: {actual_current_number}, Old Pending: {pending_number_from_db}")
-            print(f"📊 New pending number will be: {new_pending_number}")
-            
-            print(f"🔍 Saving to MongoDB first...")
-            # บันทึกตัวเลขใหม่ลง MongoDB ก่อนลองเปลี่ยนชื่อ
-            save_result = save_channel_state(
-                current_name,
-                actual_current_number,
-                new_pending_number
-            )
-            print(f"📊 Saved pending number {new_pending_number} to MongoDB: {save_result}")
-            
-            # ลองเปลี่ยนชื่อช่อง (Discord จะจัดการ rate limit เอง)
-            try:
-                # ดึงข้อมูล pending_number ล่าสุดจาก MongoDB ก่อนเปลี่ยนชื่อทุกครั้ง
-                fresh_mongodb_state = load_channel_state()
-                fresh_pending = fresh_mongodb_state.get("pending_number", 0)
-                
-                # ดึงตัวเลขปัจจุบันจากชื่อช่องอีกครั้ง (อาจมีการเปลี่ยนแปลงระหว่างรอ)
-                fresh_current_name = channel.name
-                fresh_number_match = re.search(r'(\d+)$', fresh_current_name)
-                fresh_actual_current = int(fresh_number_match.group(1)) if fresh_number_match else 0
-                
-                print(f"🔄 FRESH CHECK - MongoDB pending: {fresh_pending}, Channel current: {fresh_actual_current}")
-                
-                # ใช้ pending_number จาก MongoDB โดยตรง (ไม่เปรียบเทียบกับชื่อช่อง)
-                if fresh_pending > 0:
-                    fresh_new_name = re.sub(r'\d+$', str(fresh_pending), fresh_current_name)
-                    print(f"🔄 Applying FRESH MongoDB pending: {fresh_actual_current} → {fresh_pending}")
-                    
-                    await channel.edit(name=fresh_new_name)
-                    print(f"✅ Applied FRESH MongoDB pending number successfully to {fresh_pending}!")
-                    
-                    # อัปเดต current_number เมื่อเปลี่ยนสำเร็จ แต่รักษา pending_number ไว้
-                    current_state = load_channel_state()
-                    current_pending = current_state.get("pending_number", fresh_pending)
-                    save_channel_state(fresh_new_name, fresh_pending, current_pending)
-                    print(f"💾 Updated current number to {fresh_pending}, keeping pending at {current_pending}")
-                else:
-                    print(f"📝 No valid MongoDB pending number ({fresh_pending})")
-                    
-            except discord.errors.HTTPException as rate_limit_error:
-                if rate_limit_error.status == 429:
-                    print(f"⏳ Rate limited - pending number {new_pending_number} saved to MongoDB, will apply when limit clears")
-                else:
-                    print(f"❌ Error applying pending change: {rate_limit_error}")
-            
-
-                
         except Exception as e:
             print(f"❌ Unexpected error: {e}")
     
@@ -4215,7 +4141,7 @@ async def idview_command(ctx, channel_id: int = None):
     
     # ถ้าไม่มี channel_id แสดงข้อมูลปัจจุบัน
     if channel_id is None:
-        current_id = load_target_channel_id()
+        current_id = await config_cache.get("target_channel_id")
         try:
             # พยายามดึงข้อมูลช่อง
             channel = bot.get_channel(current_id)
@@ -4231,6 +4157,16 @@ async def idview_command(ctx, channel_id: int = None):
             description=f"**ช่องเป้าหมาย:** {channel_info}",
             color=discord.Color.blue()
         )
+        counter_stats = channel_counter.stats()
+        embed.add_field(
+            name="ตัวนับชื่อช่อง",
+            value=(
+                f"ตัวเลขล่าสุด: {counter_stats['pending']} • ในชื่อช่อง: {counter_stats['applied']}\n"
+                f"ค้างอยู่: {counter_stats['lag']} ข้อความ ({counter_stats['lag_seconds']:.0f} วินาที)\n"
+                f"เปลี่ยนชื่อได้อีกใน: {counter_stats['next_rename_in']:.0f} วินาที"
+            ),
+            inline=False
+        )
         embed.add_field(
             name="การใช้งาน",
             value="```\n!idview [channel_id]  - เปลี่ยน ID เป้าหมายใหม่\n!idview              - ดู ID ปัจจุบัน```",
@@ -4253,12 +4189,14 @@ async def idview_command(ctx, channel_id: int = None):
         return
     
     # บันทึก Target Channel ID ใหม่
-    success = save_target_channel_id(channel_id)
+    success = await config_cache.set("target_channel_id", channel_id)
     
     if success:
+        # แอดมินเลือกช่องเอง จึงตั้งตัวนับตามตัวเลขในชื่อช่องใหม่ ($set แทน $max)
+        synced_number = await channel_counter.resync(target_channel)
         embed = discord.Embed(
             title="✅ เปลี่ยน Target Channel ID สำเร็จ",
-            description=f"**ช่องเป้าหมายใหม่:** #{target_channel.name} ({channel_id})",
+            description=f"**ช่องเป้าหมายใหม่:** #{target_channel.name} ({channel_id})\n**ตัวนับ:** {synced_number}",
             color=discord.Color.green()
         )
         embed.set_footer(text="เมื่อมีข้อความในช่องใหม่ บอทจะกดอีโมจิ 💗 และเปลี่ยนชื่อช่องอัตโนมัติ")
@@ -4288,7 +4226,7 @@ async def edit_category_command(ctx, *, ข้อมูล: str = None):
     
     if ข้อมูล is None:
         # แสดงรายการหมวดหมู่ทั้งหมดที่มี
-        category_list = "\n".join([f"- {code}: {CATEGORY_EMOJIS.get(code, '❓')} {CATEGORY_NAMES[code]}" for code in CATEGORIES])
+        category_list = "\n".join([f"- {code}: {category_emojis().get(code, '❓')} {category_names()[code]}" for code in CATEGORIES])
         
         embed = discord.Embed(
             title="📋 รายการหมวดหมู่สินค้าทั้งหมด",
@@ -4347,9 +4285,11 @@ async def edit_category_command(ctx, *, ข้อมูล: str = None):
             name = parts[2]
         
         # แก้ไขหมวดหมู่
-        result = edit_category(category_code, emoji, name)
+        result = await run_blocking(edit_category, category_code, emoji, name)
         
         if result:
+            # บันทึกลง MongoDB และอัปเดตแคชทันที (write-through)
+            await config_cache.set("categories", result)
             edited_categories.append(category_code)
         else:
             failed_categories.append((category_code, f"ไม่พบหมวดหมู่ {category_code}"))
@@ -4362,7 +4302,7 @@ async def edit_category_command(ctx, *, ข้อมูล: str = None):
     
     if edited_categories:
         # แสดงรายการหมวดหมู่ที่แก้ไขสำเร็จ
-        success_list = "\n".join([f"- {code}: {CATEGORY_EMOJIS.get(code, '❓')} {CATEGORY_NAMES[code]}" for code in edited_categories])
+        success_list = "\n".join([f"- {code}: {category_emojis().get(code, '❓')} {category_names()[code]}" for code in edited_categories])
         embed.add_field(
             name=f"✅ แก้ไขสำเร็จ ({len(edited_categories)} รายการ)",
             value=success_list,
@@ -4405,7 +4345,7 @@ async def shop_slash(interaction: discord.Interaction, ประเทศ: str =
         else:
             # แสดงข้อความแนะนำหากระบุประเทศไม่ถูกต้อง
             countries_str = ", ".join([f"`{COUNTRY_NAMES[c]}`" for c in COUNTRIES])
-            await interaction.response.send_message(f"❌ ไม่พบประเทศที่ระบุ\nประเทศที่มี: {countries_str}")
+            await responder(interaction).send(f"❌ ไม่พบประเทศที่ระบุ\nประเทศที่มี: {countries_str}")
             return
     
     # ตรวจสอบอาร์กิวเมนต์หมวดหมู่
@@ -4421,29 +4361,29 @@ async def shop_slash(interaction: discord.Interaction, ประเทศ: str =
             category = thai_to_eng[หมวด]
         else:
             # แสดงข้อความแนะนำหากระบุหมวดหมู่ไม่ถูกต้อง
-            categories_str = ", ".join([f"`{CATEGORY_NAMES[c]}`" for c in CATEGORIES])
-            await interaction.response.send_message(f"❌ ไม่พบหมวดหมู่ที่ระบุ\nหมวดหมู่ที่มี: {categories_str}")
+            categories_str = ", ".join([f"`{category_names()[c]}`" for c in CATEGORIES])
+            await responder(interaction).send(f"❌ ไม่พบหมวดหมู่ที่ระบุ\nหมวดหมู่ที่มี: {categories_str}")
             return
     
     # โหลดสินค้าตามประเทศและหมวดหมู่
-    products = load_products(country, category)
+    products = await run_blocking(load_products, country, category)
     
     # ตรวจสอบว่ามีสินค้าในประเทศและหมวดหมู่นี้หรือไม่
     if not products:
-        await interaction.response.send_message(f"❌ ไม่มีสินค้าในประเทศ `{COUNTRY_NAMES[country]}` หมวด `{CATEGORY_NAMES[category]}`")
+        await responder(interaction).send(f"❌ ไม่มีสินค้าในประเทศ `{COUNTRY_NAMES[country]}` หมวด `{category_names()[category]}`")
         return
     
     # สร้าง view ที่แสดงสินค้าพร้อมปุ่มเลือกประเทศและหมวดหมู่
-    view = CategoryShopView(CATEGORIES, current_category=category, country=country)
+    view = CategoryShopView(CATEGORIES, current_category=category, country=country, mode=shop_modes.get(interaction.channel_id))
     
     # หากไม่มีสินค้าในร้านทั้งหมด
     if not view.all_products:
-        await interaction.response.send_message(f"❌ ไม่มีสินค้าในร้าน")
+        await responder(interaction).send(f"❌ ไม่มีสินค้าในร้าน")
         return
     
-    # แสดงชื่อร้านและสินค้า
-    title = f"🛍️ สินค้าในประเทศ `{COUNTRY_NAMES[country]}` หมวด `{CATEGORY_NAMES[category]}`"
-    await interaction.response.send_message(title, view=view)
+    # แสดงชื่อร้านและสินค้า (ช่องที่มีหน้าร้านถาวรจะแสดงเฉพาะผู้ใช้คนนี้)
+    title = f"🛍️ สินค้าในประเทศ `{COUNTRY_NAMES[country]}` หมวด `{category_names()[category]}`"
+    await responder(interaction).send(title, view=view, ephemeral=storefront_store.get(interaction.channel_id) is not None)
 
 @bot.tree.command(name="สินค้าทั้งหมด", description="แสดงรายการสินค้าทั้งหมด")
 @discord.app_commands.describe(หมวด="หมวดหมู่สินค้าที่ต้องการดู")
@@ -4460,7 +4400,7 @@ async def list_products_slash(interaction: discord.Interaction, หมวด: st
     """Slash command to list all products"""
     # If category is specified, load products from that category
     if หมวด:
-        products = load_products(หมวด)
+        products = await run_blocking(load_products, หมวด)
         title = f"📋 รายการสินค้าหมวด `{หมวด}`"
     else:
         # Otherwise, collect products from all categories
@@ -4468,7 +4408,7 @@ async def list_products_slash(interaction: discord.Interaction, หมวด: st
         categories = ["money", "weapon", "item", "car", "fashion", "rentcar"]
         
         for category in categories:
-            products = load_products(category)
+            products = await run_blocking(load_products, category)
             if products:
                 # Add category name to each product for display
                 for product in products:
@@ -4480,9 +4420,9 @@ async def list_products_slash(interaction: discord.Interaction, หมวด: st
     
     if not products:
         if หมวด:
-            await interaction.response.send_message(f"❌ ไม่มีสินค้าในหมวด `{หมวด}`")
+            await responder(interaction).send(f"❌ ไม่มีสินค้าในหมวด `{หมวด}`")
         else:
-            await interaction.response.send_message("❌ ไม่มีสินค้าในร้าน")
+            await responder(interaction).send("❌ ไม่มีสินค้าในร้าน")
         return
         
     embed = discord.Embed(title=title, color=0x3498db)
@@ -4519,7 +4459,7 @@ async def list_products_slash(interaction: discord.Interaction, หมวด: st
                 inline=True
             )
     
-    await interaction.response.send_message(embed=embed)
+    await responder(interaction).send(embed=embed)
 
 @bot.tree.command(name="เพิ่มสินค้า", description="เพิ่มสินค้าใหม่เข้าร้าน (Admin only)")
 @discord.app_commands.describe(
@@ -4555,7 +4495,7 @@ async def add_product_slash(interaction: discord.Interaction, อีโมจิ
     """
     # Check if user has Administrator permissions
     if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
+        await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
         return
         
     try:
@@ -4572,7 +4512,7 @@ async def add_product_slash(interaction: discord.Interaction, อีโมจิ
             if found_emoji:
                 emoji_to_use = str(found_emoji)
             else:
-                await interaction.response.send_message(f"❌ ไม่พบอีโมจิ '{อีโมจิ}' ในเซิร์ฟเวอร์นี้", ephemeral=True)
+                await responder(interaction).send(f"❌ ไม่พบอีโมจิ '{อีโมจิ}' ในเซิร์ฟเวอร์นี้", ephemeral=True)
                 return
         
         # แปลงประเทศภาษาไทยเป็นภาษาอังกฤษ
@@ -4583,7 +4523,7 @@ async def add_product_slash(interaction: discord.Interaction, อีโมจิ
         # ตรวจสอบว่าประเทศถูกต้อง
         if ประเทศ.lower() not in COUNTRIES:
             countries_str = ", ".join([f"`{COUNTRY_NAMES[c]}`" for c in COUNTRIES])
-            await interaction.response.send_message(f"❌ ประเทศไม่ถูกต้อง ประเทศที่รองรับ: {countries_str}", ephemeral=True)
+            await responder(interaction).send(f"❌ ประเทศไม่ถูกต้อง ประเทศที่รองรับ: {countries_str}", ephemeral=True)
             return
         
         # แปลงหมวดหมู่ภาษาไทยเป็นภาษาอังกฤษ
@@ -4597,12 +4537,12 @@ async def add_product_slash(interaction: discord.Interaction, อีโมจิ
         ประเทศ = ประเทศ.lower()
         
         # โหลดสินค้าที่มีอยู่แล้ว
-        products = load_products(ประเทศ, หมวด)
+        products = await run_blocking(load_products, ประเทศ, หมวด)
         
         # ตรวจสอบว่ามีสินค้านี้อยู่แล้วหรือไม่
         for product in products:
             if product["name"] == ชื่อ:
-                await interaction.response.send_message(f"❌ มีสินค้า `{ชื่อ}` อยู่แล้วในประเทศ `{COUNTRY_NAMES[ประเทศ]}` หมวด `{CATEGORY_NAMES[หมวด]}`", ephemeral=True)
+                await responder(interaction).send(f"❌ มีสินค้า `{ชื่อ}` อยู่แล้วในประเทศ `{COUNTRY_NAMES[ประเทศ]}` หมวด `{category_names()[หมวด]}`", ephemeral=True)
                 return
         
         # สร้างสินค้าใหม่
@@ -4621,40 +4561,79 @@ async def add_product_slash(interaction: discord.Interaction, อีโมจิ
         save_products(products, ประเทศ, หมวด)
         
         # บันทึกลงไฟล์หมวดหมู่โดยตรง
-        save_product_to_category(new_product)
+        await run_blocking(save_product_to_category, new_product)
         
         # แจ้งยืนยันกับผู้ใช้
-        await interaction.response.send_message(f"✅ เพิ่มสินค้า: {emoji_to_use} {ชื่อ} - {ราคา:.2f}฿ (ประเทศ: {COUNTRY_NAMES[ประเทศ]}, หมวด: {CATEGORY_NAMES[หมวด]})")
+        await responder(interaction).send(f"✅ เพิ่มสินค้า: {emoji_to_use} {ชื่อ} - {ราคา:.2f}฿ (ประเทศ: {COUNTRY_NAMES[ประเทศ]}, หมวด: {category_names()[หมวด]})")
     except Exception as e:
-        await interaction.response.send_message(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+        await responder(interaction).send(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+
+async def product_name_autocomplete(interaction: discord.Interaction, current: str):
+    """แนะนำชื่อสินค้าระหว่างพิมพ์ (ค้นหาจากดัชนีชื่อสินค้าของแคตตาล็อกในหน่วยความจำ)"""
+    # ถ้าผู้ใช้เลือกประเทศไว้แล้ว แนะนำเฉพาะสินค้าในประเทศนั้น
+    country = getattr(interaction.namespace, "ประเทศ", None)
+    country = COUNTRY_CODES.get(country, country)
+    if country not in COUNTRIES:
+        country = None
+    
+    # value เป็นรหัสสินค้า (ไม่ถูกตัดเหมือนชื่อที่แสดง) คำสั่งจะแปลงกลับด้วย resolve_product_choice
+    name_index = (await current_catalog()).name_index
+    return [
+        discord.app_commands.Choice(name=name[:100], value=choice_value(product_id))
+        for name, product_id in name_index.complete(current, country=country)
+    ]
+
+async def resolve_product_choice(value):
+    """แปลง value จาก product_name_autocomplete กลับเป็นสินค้า
+    
+    Returns:
+        tuple: (ชื่อสินค้า, สินค้าที่เลือกจาก autocomplete หรือ None ถ้าผู้ใช้พิมพ์ชื่อเอง)
+    """
+    selected = (await current_catalog()).resolve(value)
+    if selected is None:
+        return value, None
+    return selected["name"], selected
+
+def _is_selected_product(product, name, selected):
+    """สินค้าตรงกับชื่อ (และตำแหน่งของสินค้าที่เลือกจาก autocomplete ถ้ามี) หรือไม่"""
+    if product["name"] != name:
+        return False
+    if selected is None:
+        return True
+    return product.get("country") == selected["country"] and product.get("category") == selected["category"]
 
 @bot.tree.command(name="ลบสินค้า", description="ลบสินค้าออกจากร้าน (Admin only)")
 @discord.app_commands.describe(ชื่อ="ชื่อของสินค้าที่ต้องการลบ")
+@discord.app_commands.autocomplete(ชื่อ=product_name_autocomplete)
 async def remove_product_slash(interaction: discord.Interaction, ชื่อ: str):
     """Slash command to remove a product (Admin only)"""
     # Check if user has Administrator permissions
     if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
+        await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
         return
         
     try:
-        products = load_products()
-        original_count = len(products)
+        name, selected = await resolve_product_choice(ชื่อ)
+        products = await run_blocking(load_products)
         
         # Find product to show category before deletion
-        product_to_delete = next((p for p in products if p["name"] == ชื่อ), None)
+        product_to_delete = next((p for p in products if _is_selected_product(p, name, selected)), None)
         if not product_to_delete:
-            await interaction.response.send_message(f"❌ ไม่พบสินค้า '{ชื่อ}'", ephemeral=True)
+            await responder(interaction).send(f"❌ ไม่พบสินค้า '{name}'", ephemeral=True)
             return
         
         # Remove the product
-        products = [p for p in products if p["name"] != ชื่อ]
-        save_products(products)
+        products = [p for p in products if not _is_selected_product(p, name, selected)]
+        if selected is not None:
+            # บันทึกหมวดของสินค้าที่เลือก (รวมกรณีที่หมวดว่างหลังลบ)
+            save_products(products, selected["country"], selected["category"])
+        else:
+            save_products(products)
         
         category = product_to_delete.get("category", "ไม่ระบุหมวด")
-        await interaction.response.send_message(f"🗑️ ลบสินค้า '{ชื่อ}' จากหมวด '{category}' เรียบร้อย")
+        await responder(interaction).send(f"🗑️ ลบสินค้า '{name}' จากหมวด '{category}' เรียบร้อย")
     except Exception as e:
-        await interaction.response.send_message(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+        await responder(interaction).send(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
 
 @bot.tree.command(name="แก้ไขสินค้า", description="แก้ไขข้อมูลสินค้า (Admin only)")
 @discord.app_commands.describe(
@@ -4673,27 +4652,30 @@ async def remove_product_slash(interaction: discord.Interaction, ชื่อ: s
     discord.app_commands.Choice(name="แฟชั่น", value="fashion"),
     discord.app_commands.Choice(name="เช่ารถ", value="rentcar")
 ])
+@discord.app_commands.autocomplete(ชื่อ=product_name_autocomplete)
 async def edit_product_slash(interaction: discord.Interaction, ชื่อ: str, ประเทศ: str = "thailand", อีโมจิใหม่: str = None, ชื่อใหม่: str = None, ราคาใหม่: float = None, หมวดใหม่: str = None, ประเทศใหม่: str = None):
     """Slash command to edit a product (Admin only)"""
     # Check if user has Administrator permissions
     if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
+        await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
         return
         
     # Check if the new category is valid if provided
     if หมวดใหม่ and หมวดใหม่ not in CATEGORIES:
-        categories_str = ", ".join([f"`{CATEGORY_NAMES[cat]}`" for cat in CATEGORIES])
-        await interaction.response.send_message(f"❌ หมวดหมู่ไม่ถูกต้อง หมวดหมู่ที่มี: {categories_str}", ephemeral=True)
+        categories_str = ", ".join([f"`{category_names()[cat]}`" for cat in CATEGORIES])
+        await responder(interaction).send(f"❌ หมวดหมู่ไม่ถูกต้อง หมวดหมู่ที่มี: {categories_str}", ephemeral=True)
         return
         
     try:
-        products = load_products()
+        name, selected = await resolve_product_choice(ชื่อ)
+        products = await run_blocking(load_products)
         
         # Find the product
-        found = False
+        found = None
         for product in products:
-            if product["name"] == ชื่อ:
-                found = True
+            if _is_selected_product(product, name, selected):
+                found = product
+                old_location = (product.get("country"), product.get("category"))
                 
                 # Update product details if provided
                 if ชื่อใหม่:
@@ -4708,15 +4690,16 @@ async def edit_product_slash(interaction: discord.Interaction, ชื่อ: str
                 break
         
         if not found:
-            await interaction.response.send_message(f"❌ ไม่พบสินค้า '{ชื่อ}'", ephemeral=True)
+            await responder(interaction).send(f"❌ ไม่พบสินค้า '{name}'", ephemeral=True)
             return
             
         save_products(products)
-        
-        product_name = ชื่อใหม่ if ชื่อใหม่ else ชื่อ
+        if หมวดใหม่ and หมวดใหม่ != old_location[1]:
+            # บันทึกหมวดเดิมด้วย (รวมกรณีที่หมวดเดิมว่างหลังย้ายสินค้าออก)
+            save_products(products, *old_location)
         
         # Show updated product details
-        product = next((p for p in products if p["name"] == product_name), None)
+        product = found
         if product:
             embed = discord.Embed(title="✅ ข้อมูลสินค้าที่อัปเดต", color=0x00ff00)
             embed.add_field(name="ชื่อ", value=product["name"], inline=True)
@@ -4726,57 +4709,112 @@ async def edit_product_slash(interaction: discord.Interaction, ชื่อ: str
             # Add category field if present
             if "category" in product:
                 category_name = product["category"]
-                # ใช้ CATEGORY_NAMES ที่นิยามไว้แล้วแทน dictionary ที่กำหนดใหม่
-                category_display = CATEGORY_NAMES.get(category_name, category_name)
+                # ใช้ชื่อหมวดหมู่จาก category_names() แทน dictionary ที่กำหนดใหม่
+                category_display = category_names().get(category_name, category_name)
                 embed.add_field(name="หมวดหมู่", value=category_display, inline=True)
                 
-            await interaction.response.send_message(embed=embed)
+            await responder(interaction).send(embed=embed)
             
     except Exception as e:
-        await interaction.response.send_message(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+        await responder(interaction).send(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
 
 @bot.tree.command(name="ประวัติ", description="ดูประวัติการซื้อล่าสุด (Admin only)")
-@discord.app_commands.describe(จำนวน="จำนวนรายการที่ต้องการดู (ค่าเริ่มต้นคือ 5)")
-async def history_slash(interaction: discord.Interaction, จำนวน: int = 5):
+@discord.app_commands.describe(
+    จำนวน="จำนวนรายการที่ต้องการดู (ค่าเริ่มต้นคือ 5)",
+    ก่อนหน้า="ตำแหน่งจากหน้าก่อน สำหรับดูรายการที่เก่ากว่า"
+)
+async def history_slash(interaction: discord.Interaction, จำนวน: int = 5, ก่อนหน้า: str = None):
     """Slash command to view purchase history (Admin only)"""
     # Check if user has Administrator permissions
     if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
+        await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
         return
         
     try:
-        if not HISTORY_FILE.exists() or HISTORY_FILE.stat().st_size == 0:
-            await interaction.response.send_message("❌ ยังไม่มีประวัติการซื้อ", ephemeral=True)
-            return
-            
-        with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-            lines = f.readlines()
+        # อ่านเฉพาะท้ายไฟล์ ไม่ต้องโหลดประวัติทั้งหมด
+        limit = _history_limit(จำนวน)
+        entries, next_cursor = await run_blocking(read_history_page, limit, ก่อนหน้า)
             
-        if not lines:
-            await interaction.response.send_message("❌ ยังไม่มีประวัติการซื้อ", ephemeral=True)
+        if not entries:
+            await responder(interaction).send("❌ ยังไม่มีประวัติการซื้อ", ephemeral=True)
             return
             
-        # Get the last N entries
-        entries = lines[-จำนวน:] if จำนวน > 0 else lines
-            
-        embed = discord.Embed(title="📜 ประวัติการซื้อ", color=0x00ff00)
-        for line in entries:
-            try:
-                d = json.loads(line)
-                dt = datetime.fromisoformat(d['timestamp'])
-                formatted_time = dt.strftime("%d/%m/%Y %H:%M")
-                summary = ", ".join([f"{x['name']} x{x['qty']}" for x in d['items']])
-                embed.add_field(
-                    name=f"👤 {d['user']} ({formatted_time})",
-                    value=f"{summary} = {d['total']}฿",
-                    inline=False
-                )
-            except (json.JSONDecodeError, KeyError) as e:
-                continue
-                
-        await interaction.response.send_message(embed=embed)
+        embed = build_history_embed(entries, next_cursor, f"/ประวัติ จำนวน:{limit} ก่อนหน้า:{{cursor}}")
+        await responder(interaction).send(embed=embed)
+    except Exception as e:
+        await responder(interaction).send(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+
+@bot.tree.command(name="ยอดขาย", description="ดูรายงานยอดขาย (Admin only)")
+async def sales_report_slash(interaction: discord.Interaction):
+    """Slash command to view the sales report (Admin only)"""
+    # Check if user has Administrator permissions
+    if not interaction.user.guild_permissions.administrator:
+        await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
+        return
+
+    try:
+        report = sales_rollup.report()
+        if not report["records"]:
+            await responder(interaction).send("❌ ยังไม่มียอดขาย", ephemeral=True)
+            return
+        await responder(interaction).send(embed=build_sales_embed(report), ephemeral=True)
+    except Exception as e:
+        await responder(interaction).send(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+
+@bot.tree.command(name="หน้าร้าน", description="ส่งหน้าร้านถาวรของช่องนี้ (Admin only)")
+@discord.app_commands.describe(
+    ประเทศ="ประเทศที่แสดงบนหน้าร้าน",
+    หมวด="หมวดหมู่ที่แสดงบนหน้าร้าน",
+    ปิด="ลบหน้าร้านของช่องนี้"
+)
+async def storefront_slash(interaction: discord.Interaction, ประเทศ: str = None, หมวด: str = None, ปิด: bool = False):
+    """Slash command to publish the channel's persistent storefront (Admin only)"""
+    # Check if user has Administrator permissions
+    if not interaction.user.guild_permissions.administrator:
+        await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
+        return
+    
+    try:
+        if ปิด:
+            storefront = await run_blocking(storefront_store.remove, interaction.channel_id)
+            if storefront is None:
+                await responder(interaction).send("❌ ช่องนี้ไม่มีหน้าร้านถาวร", ephemeral=True)
+                return
+            await delete_storefront_message(interaction.channel, storefront)
+            await responder(interaction).send("✅ ลบหน้าร้านของช่องนี้แล้ว", ephemeral=True)
+            return
+        
+        args = resolve_storefront_args(ประเทศ, หมวด)
+        if args is None:
+            countries_str = ", ".join([f"`{COUNTRY_NAMES[c]}`" for c in COUNTRIES])
+            categories_str = ", ".join([f"`{category_names()[c]}`" for c in CATEGORIES])
+            await responder(interaction).send(f"❌ ไม่พบประเทศหรือหมวดหมู่ที่ระบุ\nประเทศที่มี: {countries_str}\nหมวดหมู่ที่มี: {categories_str}", ephemeral=True)
+            return
+        # ส่งข้อความหน้าร้านและลบหน้าร้านเดิมอาจใช้เวลาเกิน 3 วินาที
+        await responder(interaction).expect_slow(ephemeral=True)
+        message = await publish_storefront(interaction.channel, *args)
+        await responder(interaction).send(f"✅ ส่งหน้าร้านของช่องนี้แล้ว: {message.jump_url}", ephemeral=True)
+    except Exception as e:
+        await responder(interaction).send(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+
+@bot.tree.command(name="โหมดร้าน", description="เลือกรูปแบบการเลือกสินค้าของหน้าร้านในช่องนี้ (Admin only)")
+@discord.app_commands.describe(โหมด="ปุ่ม (หน้าละ 5 สินค้า) หรือ เมนู (หน้าละ 25 สินค้า เลือกได้หลายรายการ)")
+@discord.app_commands.choices(โหมด=[
+    discord.app_commands.Choice(name="ปุ่ม", value=SHOP_MODE_BUTTONS),
+    discord.app_commands.Choice(name="เมนู", value=SHOP_MODE_SELECT)
+])
+async def shop_mode_slash(interaction: discord.Interaction, โหมด: str):
+    """Slash command to switch the channel's product picker (Admin only)"""
+    # Check if user has Administrator permissions
+    if not interaction.user.guild_permissions.administrator:
+        await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
+        return
+    
+    try:
+        await set_shop_mode(interaction.channel_id, โหมด)
+        await responder(interaction).send(f"✅ หน้าร้านในช่องนี้ใช้โหมด `{SHOP_MODE_NAMES[โหมด]}` แล้ว", ephemeral=True)
     except Exception as e:
-        await interaction.response.send_message(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+        await responder(interaction).send(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
 
 @bot.tree.command(name="ช่วยเหลือ", description="แสดงข้อมูลคำสั่งทั้งหมด")
 async def help_slash(interaction: discord.Interaction):
@@ -4824,6 +4862,21 @@ async def help_slash(interaction: discord.Interaction):
         value="ใช้คำสั่ง `!ประวัติ` หรือ `/ประวัติ` เพื่อดูประวัติการซื้อล่าสุด",
         inline=False
     )
+    embed.add_field(
+        name="📈 รายงานยอดขาย",
+        value="ใช้คำสั่ง `!ยอดขาย` หรือ `/ยอดขาย` เพื่อดูยอดขายตามสินค้า ประเทศ หมวดหมู่ รายวันและรายสัปดาห์",
+        inline=False
+    )
+    embed.add_field(
+        name="🏪 หน้าร้านถาวร",
+        value="ใช้คำสั่ง `!หน้าร้าน [ประเทศ] [หมวด]` หรือ `/หน้าร้าน` เพื่อส่งหน้าร้านถาวรของช่อง (ลูกค้าเลือกซื้อผ่านข้อความส่วนตัว) และ `!หน้าร้าน ปิด` เพื่อลบ",
+        inline=False
+    )
+    embed.add_field(
+        name="🧾 โหมดเลือกสินค้า",
+        value="ใช้คำสั่ง `!โหมดร้าน [ปุ่ม|เมนู]` หรือ `/โหมดร้าน` เพื่อเลือกระหว่างปุ่มหน้าละ 5 สินค้า กับเมนูเลือกหน้าละ 25 สินค้าที่เลือกได้หลายรายการ",
+        inline=False
+    )
     
     embed.add_field(
         name="🌏 จัดการประเทศ",
@@ -4849,14 +4902,14 @@ async def help_slash(interaction: discord.Interaction):
         inline=False
     )
     
-    await interaction.response.send_message(embed=embed)
+    await responder(interaction).send(embed=embed)
 
 @bot.tree.command(name="ลบสินค้าทั้งหมด", description="ลบรายการสินค้าทั้งหมดในทุกหมวดหมู่และทุกประเทศ (Admin only)")
 async def delete_all_products_slash(interaction: discord.Interaction):
     """Slash command to delete all products from all categories in all countries completely (Admin only)"""
     # Check if user has Administrator permissions
     if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
+        await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
         return
         
     try:
@@ -4875,19 +4928,23 @@ async def delete_all_products_slash(interaction: discord.Interaction):
             @discord.ui.button(label="ยืนยันการลบ", style=discord.ButtonStyle.danger)
             async def confirm_button(self, button_interaction: discord.Interaction, button: discord.ui.Button):
                 if button_interaction.user.id != interaction.user.id:
-                    await button_interaction.response.send_message("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
+                    await responder(button_interaction).send("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
                     return
                     
-                success = delete_all_products()
+                # ลบสินค้าใน MongoDB และไฟล์อาจใช้เวลาเกิน 3 วินาที
+                    
+                await responder(button_interaction).expect_slow()
+                    
+                success = await run_blocking(delete_all_products)
                 
                 if success:
-                    await button_interaction.response.edit_message(
+                    await responder(button_interaction).edit(
                         content="✅ ลบสินค้าทั้งหมดในทุกหมวดหมู่และทุกประเทศเรียบร้อยแล้ว",
                         embed=None,
                         view=None
                     )
                 else:
-                    await button_interaction.response.edit_message(
+                    await responder(button_interaction).edit(
                         content="❌ เกิดข้อผิดพลาดในการลบสินค้าทั้งหมด",
                         embed=None,
                         view=None
@@ -4896,20 +4953,20 @@ async def delete_all_products_slash(interaction: discord.Interaction):
             @discord.ui.button(label="ยกเลิก", style=discord.ButtonStyle.secondary)
             async def cancel_button(self, button_interaction: discord.Interaction, button: discord.ui.Button):
                 if button_interaction.user.id != interaction.user.id:
-                    await button_interaction.response.send_message("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
+                    await responder(button_interaction).send("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
                     return
                     
-                await button_interaction.response.edit_message(
+                await responder(button_interaction).edit(
                     content="❌ ยกเลิกการลบสินค้า",
                     embed=None,
                     view=None
                 )
                 
         # Send the confirmation message with buttons
-        await interaction.response.send_message(embed=confirm_embed, view=ConfirmView())
+        await responder(interaction).send(embed=confirm_embed, view=ConfirmView())
             
     except Exception as e:
-        await interaction.response.send_message(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+        await responder(interaction).send(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
 
 @bot.tree.command(name="ลบสินค้าทั้งหมวด", description="ลบรายการสินค้าทั้งหมดในหมวดที่เลือก (Admin only)")
 @discord.app_commands.describe(หมวด="หมวดหมู่ที่ต้องการลบสินค้าทั้งหมด")
@@ -4926,7 +4983,7 @@ async def clear_category_slash(interaction: discord.Interaction, หมวด: s
     """Slash command to remove all products from a category (Admin only)"""
     # Check if user has Administrator permissions
     if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
+        await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
         return
         
     try:
@@ -4945,19 +5002,23 @@ async def clear_category_slash(interaction: discord.Interaction, หมวด: s
             @discord.ui.button(label="ยืนยันการลบ", style=discord.ButtonStyle.danger)
             async def confirm_button(self, button_interaction: discord.Interaction, button: discord.ui.Button):
                 if button_interaction.user.id != interaction.user.id:
-                    await button_interaction.response.send_message("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
+                    await responder(button_interaction).send("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
                     return
                     
-                success = clear_category_products(หมวด)
+                # ลบสินค้าใน MongoDB และไฟล์อาจใช้เวลาเกิน 3 วินาที
+                    
+                await responder(button_interaction).expect_slow()
+                    
+                success = await run_blocking(clear_category_products, หมวด)
                 
                 if success:
-                    await button_interaction.response.edit_message(
+                    await responder(button_interaction).edit(
                         content=f"✅ ลบสินค้าทั้งหมดในหมวด **{หมวด}** เรียบร้อยแล้ว",
                         embed=None,
                         view=None
                     )
                 else:
-                    await button_interaction.response.edit_message(
+                    await responder(button_interaction).edit(
                         content=f"❌ เกิดข้อผิดพลาดในการลบสินค้าในหมวด **{หมวด}**",
                         embed=None,
                         view=None
@@ -4966,25 +5027,25 @@ async def clear_category_slash(interaction: discord.Interaction, หมวด: s
             @discord.ui.button(label="ยกเลิก", style=discord.ButtonStyle.secondary)
             async def cancel_button(self, button_interaction: discord.Interaction, button: discord.ui.Button):
                 if button_interaction.user.id != interaction.user.id:
-                    await button_interaction.response.send_message("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
+                    await responder(button_interaction).send("❌ คุณไม่ใช่ผู้ใช้คำสั่งนี้", ephemeral=True)
                     return
                     
-                await button_interaction.response.edit_message(
+                await responder(button_interaction).edit(
                     content="❌ ยกเลิกการลบสินค้า",
                     embed=None,
                     view=None
                 )
         
         # Send confirmation message with buttons
-        await interaction.response.send_message(embed=confirm_embed, view=ConfirmView())
+        await responder(interaction).send(embed=confirm_embed, view=ConfirmView())
         
     except Exception as e:
-        await interaction.response.send_message(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+        await responder(interaction).send(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
 
 @bot.tree.command(name="เพิ่มสินค้าเก่า", description="คำสั่งนี้ถูกแทนที่ด้วยคำสั่ง เพิ่มสินค้า แล้ว")
 async def batch_add_products_slash_old(interaction: discord.Interaction):
     """Slash command placeholder (deprecated)"""
-    await interaction.response.send_message("⚠️ คำสั่งนี้ถูกแทนที่แล้ว กรุณาใช้ `/เพิ่มสินค้า` แทน", ephemeral=True)
+    await responder(interaction).send("⚠️ คำสั่งนี้ถูกแทนที่แล้ว กรุณาใช้ `/เพิ่มสินค้า` แทน", ephemeral=True)
 
 # หมายเหตุ: คำสั่งจัดการประเทศถูกลบออกตามคำขอของผู้ใช้ (เดิมคือคำสั่ง เพิ่มประเทศ/addcountry)
 
@@ -5074,7 +5135,7 @@ async def edit_country_command(ctx, *, ข้อมูล: str = None):
         old_emoji = COUNTRY_EMOJIS.get(country_code, "❓")
         
         # ลองแก้ไขประเทศ
-        success = edit_country(country_code, name, emoji)
+        success = await run_blocking(edit_country, country_code, name, emoji)
         
         if success:
             # เก็บข้อมูลประเทศที่แก้ไขสำเร็จ
@@ -5133,10 +5194,10 @@ async def edit_country_slash(interaction: discord.Interaction, ข้อมู
     """Slash command to edit countries' name and emojis (Admin only)"""
     # Check if user is admin
     if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ คำสั่งนี้ใช้ได้เฉพาะแอดมินเท่านั้น", ephemeral=True)
+        await responder(interaction).send("❌ คำสั่งนี้ใช้ได้เฉพาะแอดมินเท่านั้น", ephemeral=True)
         return
     
-    await interaction.response.defer(ephemeral=False)
+    await responder(interaction).expect_slow()
     
     # ตรวจสอบว่ามีข้อมูลหรือไม่
     if ข้อมูล is None:
@@ -5161,7 +5222,7 @@ async def edit_country_slash(interaction: discord.Interaction, ข้อมู
             inline=False
         )
         
-        await interaction.followup.send(embed=embed)
+        await responder(interaction).followup(embed=embed)
         return
     
     # แยกข้อมูลเป็นบรรทัด (กรณีใน slash command จะมีแค่บรรทัดเดียว)
@@ -5169,7 +5230,7 @@ async def edit_country_slash(interaction: discord.Interaction, ข้อมู
     
     # ตรวจสอบว่ามีข้อมูลเพียงพอหรือไม่
     if len(parts) < 2:
-        await interaction.followup.send("❌ ข้อมูลไม่เพียงพอ โปรดระบุให้ครบถ้วน (รหัสประเทศ อีโมจิ/ชื่อ)")
+        await responder(interaction).followup("❌ ข้อมูลไม่เพียงพอ โปรดระบุให้ครบถ้วน (รหัสประเทศ อีโมจิ/ชื่อ)")
         return
     
     # แยกข้อมูลประเทศ, อีโมจิ, และชื่อ
@@ -5198,7 +5259,7 @@ async def edit_country_slash(interaction: discord.Interaction, ข้อมู
     old_emoji = COUNTRY_EMOJIS.get(country_code, "❓")
     
     # ลองแก้ไขประเทศ
-    success = edit_country(country_code, name, emoji)
+    success = await run_blocking(edit_country, country_code, name, emoji)
     
     if success:
         embed = discord.Embed(title="🌏 ผลการแก้ไขประเทศ", color=discord.Color.green())
@@ -5223,9 +5284,9 @@ async def edit_country_slash(interaction: discord.Interaction, ข้อมู
             inline=False
         )
         
-        await interaction.followup.send(embed=embed)
+        await responder(interaction).followup(embed=embed)
     else:
-        await interaction.followup.send(f"❌ ไม่พบประเทศที่มีรหัส `{country_code}`")
+        await responder(interaction).followup(f"❌ ไม่พบประเทศที่มีรหัส `{country_code}`")
 
 # Command to view or change QR code
 @bot.command(name="qrcode")
@@ -5238,7 +5299,7 @@ async def qrcode_command(ctx, url: str = None):
     
     if url is None:
         # Show current QR code
-        current_url = await load_qrcode_url_async_local()
+        current_url = await config_cache.get("qrcode_url")
         embed = discord.Embed(
             title="📲 QR Code ปัจจุบัน",
             description="QR Code ที่ใช้อยู่ในปัจจุบัน",
@@ -5254,9 +5315,9 @@ async def qrcode_command(ctx, url: str = None):
         await ctx.send(embed=embed)
     else:
         # Update QR code URL
-        old_url = await load_qrcode_url_async_local()
-        # ใช้ฟังก์ชัน async สำหรับบันทึกลง MongoDB
-        await save_qrcode_to_mongodb(url)
+        old_url = await config_cache.get("qrcode_url")
+        # บันทึกลงไฟล์และ MongoDB พร้อมอัปเดตแคช
+        await config_cache.set("qrcode_url", url)
         
         embed = discord.Embed(
             title="✅ เปลี่ยน QR Code สำเร็จ",
@@ -5274,20 +5335,22 @@ async def add_no_product_placeholders_slash(interaction: discord.Interaction):
     """Slash command to add 'ไม่มีสินค้า' placeholders to empty categories in all countries (Admin only)"""
     # Check if user has Administrator permissions
     if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
+        await responder(interaction).send("❌ คุณไม่มีสิทธิ์ใช้คำสั่งนี้ ต้องการสิทธิ์ผู้ดูแล (Administrator)", ephemeral=True)
         return
         
     try:
         # เพิ่มสินค้า placeholder ในหมวดหมู่ที่ว่างเปล่า
-        added_count = add_no_product_placeholders()
+        # ตรวจและเพิ่มสินค้าในทุกหมวดของทุกประเทศอาจใช้เวลาเกิน 3 วินาที
+        await responder(interaction).expect_slow()
+        added_count = await run_blocking(add_no_product_placeholders)
         
         if added_count > 0:
-            await interaction.response.send_message(f"✅ เพิ่มสินค้า 'ไม่มีสินค้า' ในหมวดที่ว่างเปล่าแล้ว {added_count} หมวด")
+            await responder(interaction).send(f"✅ เพิ่มสินค้า 'ไม่มีสินค้า' ในหมวดที่ว่างเปล่าแล้ว {added_count} หมวด")
         else:
-            await interaction.response.send_message("ℹ️ ไม่มีหมวดที่ว่างเปล่า ทุกหมวดมีสินค้าอยู่แล้ว")
+            await responder(interaction).send("ℹ️ ไม่มีหมวดที่ว่างเปล่า ทุกหมวดมีสินค้าอยู่แล้ว")
             
     except Exception as e:
-        await interaction.response.send_message(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
+        await responder(interaction).send(f"❌ เกิดข้อผิดพลาด: {str(e)}", ephemeral=True)
 
 # Slash command to view or change QR code
 @bot.tree.command(name="qrcode", description="เปลี่ยน QR Code (เฉพาะแอดมิน)")
@@ -5295,14 +5358,14 @@ async def qrcode_slash(interaction: discord.Interaction, url: str = None):
     """Slash command to change or view the QR code URL (Admin only)"""
     # Check if user is admin
     if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ คำสั่งนี้ใช้ได้เฉพาะแอดมินเท่านั้น", ephemeral=True)
+        await responder(interaction).send("❌ คำสั่งนี้ใช้ได้เฉพาะแอดมินเท่านั้น", ephemeral=True)
         return
     
-    await interaction.response.defer(ephemeral=False)
+    await responder(interaction).expect_slow()
     
     if url is None:
         # Show current QR code
-        current_url = await load_qrcode_url_async_local()
+        current_url = await config_cache.get("qrcode_url")
         embed = discord.Embed(
             title="📲 QR Code ปัจจุบัน",
             description="QR Code ที่ใช้อยู่ในปัจจุบัน",
@@ -5315,12 +5378,12 @@ async def qrcode_slash(interaction: discord.Interaction, url: str = None):
             value="ใช้คำสั่ง `/qrcode url:[URL]` โดยแทนที่ [URL] ด้วยลิงก์รูปภาพ QR Code ใหม่", 
             inline=False
         )
-        await interaction.followup.send(embed=embed)
+        await responder(interaction).followup(embed=embed)
     else:
         # Update QR code URL
-        old_url = await load_qrcode_url_async_local()
-        # ใช้ฟังก์ชัน async สำหรับบันทึกลง MongoDB
-        await save_qrcode_to_mongodb(url)
+        old_url = await config_cache.get("qrcode_url")
+        # บันทึกลงไฟล์และ MongoDB พร้อมอัปเดตแคช
+        await config_cache.set("qrcode_url", url)
         
         embed = discord.Embed(
             title="✅ เปลี่ยน QR Code สำเร็จ",
@@ -5330,7 +5393,7 @@ async def qrcode_slash(interaction: discord.Interaction, url: str = None):
         embed.add_field(name="URL เดิม", value=f"`{old_url}`", inline=False)
         embed.add_field(name="URL ใหม่", value=f"`{url}`", inline=False)
         embed.set_image(url=url)
-        await interaction.followup.send(embed=embed)
+        await responder(interaction).followup(embed=embed)
 
 # Command to view or change thank you message
 @bot.command(name="ty", aliases=["ขอบคุณ"])
@@ -5343,7 +5406,7 @@ async def ty_command(ctx, *, ข้อความ: str = None):
     
     if ข้อความ is None:
         # Show current thank you message
-        current_message = load_thank_you_message()
+        current_message = await config_cache.get("thank_you_message")
         embed = discord.Embed(
             title="💌 ข้อความขอบคุณปัจจุบัน",
             description=f"{current_message}",
@@ -5357,8 +5420,8 @@ async def ty_command(ctx, *, ข้อความ: str = None):
         await ctx.send(embed=embed)
     else:
         # Update thank you message
-        old_message = load_thank_you_message()
-        save_thank_you_message(ข้อความ)
+        old_message = await config_cache.get("thank_you_message")
+        await config_cache.set("thank_you_message", ข้อความ)
         
         embed = discord.Embed(
             title="✅ เปลี่ยนข้อความขอบคุณสำเร็จ",
@@ -5375,14 +5438,14 @@ async def ty_slash(interaction: discord.Interaction, ข้อความ: str
     """Slash command to change or view the thank you message (Admin only)"""
     # Check if user is admin
     if not interaction.user.guild_permissions.administrator:
-        await interaction.response.send_message("❌ คำสั่งนี้ใช้ได้เฉพาะแอดมินเท่านั้น", ephemeral=True)
+        await responder(interaction).send("❌ คำสั่งนี้ใช้ได้เฉพาะแอดมินเท่านั้น", ephemeral=True)
         return
     
-    await interaction.response.defer(ephemeral=False)
+    await responder(interaction).expect_slow()
     
     if ข้อความ is None:
         # Show current thank you message
-        current_message = load_thank_you_message()
+        current_message = await config_cache.get("thank_you_message")
         embed = discord.Embed(
             title="💌 ข้อความขอบคุณปัจจุบัน",
             description=f"{current_message}",
@@ -5393,11 +5456,11 @@ async def ty_slash(interaction: discord.Interaction, ข้อความ: str
             value="ใช้คำสั่ง `/ty ข้อความ:[ข้อความ]` โดยแทนที่ [ข้อความ] ด้วยข้อความขอบคุณใหม่", 
             inline=False
         )
-        await interaction.followup.send(embed=embed)
+        await responder(interaction).followup(embed=embed)
     else:
         # Update thank you message
-        old_message = load_thank_you_message()
-        save_thank_you_message(ข้อความ)
+        old_message = await config_cache.get("thank_you_message")
+        await config_cache.set("thank_you_message", ข้อความ)
         
         embed = discord.Embed(
             title="✅ เปลี่ยนข้อความขอบคุณสำเร็จ",
@@ -5405,7 +5468,7 @@ async def ty_slash(interaction: discord.Interaction, ข้อความ: str
         )
         embed.add_field(name="ข้อความเดิม", value=f"{old_message}", inline=False)
         embed.add_field(name="ข้อความใหม่", value=f"{ข้อความ}", inline=False)
-        await interaction.followup.send(embed=embed)
+        await responder(interaction).followup(embed=embed)
 
 # ======================================
 # คำสั่งจัดการข้อมูล MongoDB
@@ -5442,9 +5505,8 @@ async def upload_command(ctx):
     processing_message = await ctx.send("⏳ กำลังอัพโหลดข้อมูลไปยัง MongoDB...")
     
     try:
-        from db_operations import (save_products_to_mongodb, save_countries_to_mongodb, 
-                                  save_categories_to_mongodb, save_qrcode_to_mongodb,
-                                  save_thank_you_message_to_mongodb)
+        from async_db import (save_products_to_mongodb, save_countries_to_mongodb, 
+                              save_qrcode_to_mongodb, save_thank_you_message_to_mongodb)
         from mongodb_config import client
         
         # ตรวจสอบการเชื่อมต่อ MongoDB
@@ -5468,40 +5530,34 @@ async def upload_command(ctx):
         # 2. อัพโหลดข้อมูลหมวดหมู่
         categories_status = "✅"
         try:
-            categories_data = {
-                "category_names": CATEGORY_NAMES,
-                "category_emojis": CATEGORY_EMOJIS
-            }
-            await save_categories_to_mongodb(categories_data)
+            await config_cache.set("categories", categories_config())
         except Exception as e:
             categories_status = f"❌ ({str(e)[:30]}...)"
         
         # 3. อัพโหลดข้อมูลสินค้า
         products_status = "✅"
         products_count = 0
+        products_sync = None
         try:
+            # เขียนการแก้ไขที่ค้างอยู่ลงไฟล์ก่อนอ่าน
+            await run_blocking(category_writer.flush)
+            
             # โหลดข้อมูลจากโฟลเดอร์ categories
             all_products = []
             categories_dir = SCRIPT_DIR / "categories"
             
-            if categories_dir.exists():
-                for country_dir in sorted(categories_dir.iterdir()):
-                    if country_dir.is_dir():
-                        country_code = country_dir.name
-                        for category_file in sorted(country_dir.iterdir()):
-                            if category_file.is_file() and category_file.suffix == '.json':
-                                category_code = category_file.stem
-                                with open(category_file, "r", encoding="utf-8") as f:
-                                    category_products = json.load(f)
-                                    for product in category_products:
-                                        if isinstance(product, dict) and "name" in product:
-                                            product["country"] = country_code
-                                            product["category"] = category_code
-                                            all_products.append(product)
+            for country_code, category_code, category_file, category_products in await run_blocking(_read_category_files, categories_dir):
+                if isinstance(category_products, Exception):
+                    raise category_products
+                for product in category_products:
+                    if isinstance(product, dict) and "name" in product:
+                        product["country"] = country_code
+                        product["category"] = category_code
+                        all_products.append(product)
             
             products_count = len(all_products)
             if products_count > 0:
-                await save_products_to_mongodb(all_products)
+                products_sync = await save_products_to_mongodb(all_products)
             else:
                 products_status = "⚠️ (ไม่พบข้อมูลสินค้า)"
         except Exception as e:
@@ -5512,8 +5568,7 @@ async def upload_command(ctx):
         try:
             qr_code_url = ""
             try:
-                with open(QRCODE_CONFIG_FILE, "r", encoding="utf-8") as f:
-                    qr_code_url = json.load(f).get("url", "")
+                qr_code_url = (await run_blocking(_read_json, QRCODE_CONFIG_FILE)).get("url", "")
             except:
                 pass
             
@@ -5527,7 +5582,7 @@ async def upload_command(ctx):
         # 5. อัพโหลดข้อความขอบคุณ
         thank_you_status = "✅"
         try:
-            thank_you_message = load_thank_you_message()
+            thank_you_message = await config_cache.get("thank_you_message")
             if thank_you_message:
                 await save_thank_you_message_to_mongodb(thank_you_message)
             else:
@@ -5544,7 +5599,13 @@ async def upload_command(ctx):
         
         embed.add_field(name="📊 ข้อมูลประเทศ", value=countries_status, inline=True)
         embed.add_field(name="📂 ข้อมูลหมวดหมู่", value=categories_status, inline=True)
-        embed.add_field(name="🛒 ข้อมูลสินค้า", value=f"{products_status} ({products_count} รายการ)", inline=True)
+        products_value = f"{products_status} ({products_count} รายการ)"
+        if products_sync:
+            products_value += (
+                f"\n➕ เพิ่ม {products_sync['inserted']} • ✏️ แก้ไข {products_sync['updated']}"
+                f"\n🗑️ ลบ {products_sync['deleted']} • ⏸️ ไม่เปลี่ยน {products_sync['unchanged']}"
+            )
+        embed.add_field(name="🛒 ข้อมูลสินค้า", value=products_value, inline=True)
         embed.add_field(name="💵 QR Code", value=qrcode_status, inline=True)
         embed.add_field(name="💬 ข้อความขอบคุณ", value=thank_you_status, inline=True)
         
@@ -5586,8 +5647,7 @@ async def download_command(ctx):
     processing_message = await ctx.send("⏳ กำลังดาวน์โหลดข้อมูลจาก MongoDB...")
     
     try:
-        from db_operations import (load_products_async, load_countries, load_categories,
-                                 load_qrcode_url_async, load_thank_you_message_async)
+        from async_db import load_products_async, load_countries
         from mongodb_config import client
         
         # ตรวจสอบการเชื่อมต่อ MongoDB
@@ -5612,8 +5672,7 @@ async def download_command(ctx):
                     COUNTRY_CODES = countries_data["country_codes"]
                 
                 # บันทึกลงไฟล์
-                with open(COUNTRIES_FILE, "w", encoding="utf-8") as f:
-                    json.dump(countries_data, f, ensure_ascii=False, indent=2)
+                await run_blocking(_write_json, COUNTRIES_FILE, countries_data)
             else:
                 countries_status = "⚠️ (ไม่พบข้อมูล)"
         except Exception as e:
@@ -5622,18 +5681,12 @@ async def download_command(ctx):
         # 2. ดาวน์โหลดข้อมูลหมวดหมู่
         categories_status = "✅"
         try:
-            categories_data = await load_categories()
+            categories_data = await config_cache.refresh("categories")
             if categories_data:
-                # อัพเดตตัวแปรโกลบอล
-                global CATEGORY_NAMES, CATEGORY_EMOJIS
-                if "category_names" in categories_data:
-                    CATEGORY_NAMES = categories_data["category_names"]
-                if "category_emojis" in categories_data:
-                    CATEGORY_EMOJIS = categories_data["category_emojis"]
+                # ชื่อและอีโมจิหมวดหมู่อ่านจาก config_cache ที่เพิ่งโหลดใหม่แล้ว
                 
                 # บันทึกลงไฟล์
-                with open(SCRIPT_DIR / "categories_config.json", "w", encoding="utf-8") as f:
-                    json.dump(categories_data, f, ensure_ascii=False, indent=2)
+                await run_blocking(_write_json, SCRIPT_DIR / "categories_config.json", categories_data)
             else:
                 categories_status = "⚠️ (ไม่พบข้อมูล)"
         except Exception as e:
@@ -5643,13 +5696,14 @@ async def download_command(ctx):
         products_status = "✅"
         products_count = 0
         try:
+            # เขียนการแก้ไขที่ค้างอยู่ลงไฟล์ก่อน เพื่อไม่ให้เขียนทับข้อมูลที่ดาวน์โหลดมาภายหลัง
+            await run_blocking(category_writer.flush)
             all_products = await load_products_async()
             if all_products:
                 products_count = len(all_products)
                 
                 # บันทึกลงในไฟล์ products.json
-                with open(PRODUCTS_FILE, "w", encoding="utf-8") as f:
-                    json.dump(all_products, f, ensure_ascii=False, indent=2)
+                await run_blocking(_write_json, PRODUCTS_FILE, all_products)
                 
                 # บันทึกลงในโฟลเดอร์ categories แยกตามหมวดหมู่และประเทศ
                 # สร้างโครงสร้างข้อมูลสำหรับแยกสินค้าตามประเทศและหมวดหมู่
@@ -5673,6 +5727,8 @@ async def download_command(ctx):
                         del product_copy["category"]
                     if "_id" in product_copy:
                         del product_copy["_id"]
+                    if "updated_at" in product_copy:
+                        del product_copy["updated_at"]
                     
                     categorized_products[country][category].append(product_copy)
                 
@@ -5680,12 +5736,10 @@ async def download_command(ctx):
                 categories_dir = SCRIPT_DIR / "categories"
                 for country, categories in categorized_products.items():
                     country_dir = categories_dir / country
-                    country_dir.mkdir(parents=True, exist_ok=True)
-                    
                     for category, products in categories.items():
                         category_file = country_dir / f"{category}.json"
-                        with open(category_file, "w", encoding="utf-8") as f:
-                            json.dump(products, f, ensure_ascii=False, indent=2)
+                        await run_blocking(_write_json, category_file, products)
+                        catalog_store.mark_written(country, category, products)
             else:
                 products_status = "⚠️ (ไม่พบข้อมูล)"
         except Exception as e:
@@ -5694,10 +5748,9 @@ async def download_command(ctx):
         # 4. ดาวน์โหลด QR Code URL
         qrcode_status = "✅"
         try:
-            qrcode_url = await load_qrcode_url_async_local()
+            qrcode_url = await config_cache.refresh("qrcode_url")
             if qrcode_url:
-                with open(QRCODE_CONFIG_FILE, "w", encoding="utf-8") as f:
-                    json.dump({"url": qrcode_url}, f, ensure_ascii=False, indent=2)
+                await run_blocking(_write_json, QRCODE_CONFIG_FILE, {"url": qrcode_url})
             else:
                 qrcode_status = "⚠️ (ไม่พบข้อมูล)"
         except Exception as e:
@@ -5706,10 +5759,9 @@ async def download_command(ctx):
         # 5. ดาวน์โหลดข้อความขอบคุณ
         thank_you_status = "✅"
         try:
-            thank_you_message = await load_thank_you_message_async()
+            thank_you_message = await config_cache.refresh("thank_you_message")
             if thank_you_message:
-                with open(SCRIPT_DIR / "thank_you_config.json", "w", encoding="utf-8") as f:
-                    json.dump({"message": thank_you_message}, f, ensure_ascii=False, indent=2)
+                await run_blocking(_write_json, SCRIPT_DIR / "thank_you_config.json", {"message": thank_you_message})
             else:
                 thank_you_status = "⚠️ (ไม่พบข้อมูล)"
         except Exception as e:
@@ -5800,3 +5852,6 @@ if __name__ == "__main__":
         print("💡 แนะนำ: ตรวจสอบ Discord Token หรือการเชื่อมต่ออินเทอร์เน็ต")
         if is_render:
             time.sleep(60)  # รอ 1 นาที ก่อน exit
+    finally:
+        # เขียนการแก้ไขสินค้าที่ค้างอยู่ลงไฟล์ก่อนปิดบอท
+        category_writer.flush()
@@ -0,0 +1,100 @@
+"""
+หน้าร้านถาวรของแต่ละช่อง (คำสั่ง !หน้าร้าน) สำหรับบอท Discord Shop
+แต่ละช่องมีข้อความหน้าร้านเพียงข้อความเดียวที่ทุกคนใช้ร่วมกัน ผู้ใช้เลือกซื้อผ่านข้อความ ephemeral ของตัวเอง
+บอทแก้ข้อความหน้าร้านเฉพาะเมื่อเวอร์ชันของแคตตาล็อกเปลี่ยน (เวอร์ชันที่แสดงอยู่เก็บไว้ในหน่วยความจำเท่านั้น
+เพราะเวอร์ชันของแคตตาล็อกเริ่มนับใหม่ทุกครั้งที่รีสตาร์ท หลังรีสตาร์ทจึงแก้ทุกหน้าร้านหนึ่งครั้ง)
+"""
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from json_store import JsonFileStore
+
+SCRIPT_DIR = Path(__file__).parent.absolute()
+STOREFRONTS_FILE = SCRIPT_DIR / "storefronts.json"
+
+
+class StorefrontStore:
+    """ที่เก็บหน้าร้านถาวร (id ช่อง -> ข้อความหน้าร้านและประเทศ/หมวดที่แสดง)"""
+
+    def __init__(self, path=STOREFRONTS_FILE):
+        self._file = JsonFileStore(path)
+        self._lock = threading.Lock()
+        self._versions = {}   # id ช่อง -> stamp (เวอร์ชันแคตตาล็อก ชื่อและอีโมจิ) ที่แสดงอยู่บนข้อความ
+
+    def _load(self):
+        return self._file.load()
+
+    def _save(self):
+        self._file.save()
+
+    def open(self):
+        """โหลดไฟล์เข้าหน่วยความจำ (เรียกใน thread pool ก่อนใช้งานครั้งแรก)"""
+        with self._lock:
+            self._load()
+
+    def set(self, channel_id, message_id, country, category, version):
+        """บันทึกหน้าร้านของช่อง (แทนที่หน้าร้านเดิมของช่องนั้น)
+
+        Returns:
+            dict: ข้อมูลหน้าร้านเดิมของช่องนี้ หรือ None ถ้ายังไม่เคยมี
+        """
+        with self._lock:
+            storefronts = self._load()
+            previous = storefronts.get(str(channel_id))
+            storefronts[str(channel_id)] = {
+                "message_id": message_id,
+                "country": country,
+                "category": category,
+                "created_at": datetime.now().isoformat()
+            }
+            self._versions[str(channel_id)] = version
+            self._save()
+            return previous
+
+    def remove(self, channel_id):
+        """ลบหน้าร้านของช่อง
+
+        Returns:
+            dict: ข้อมูลหน้าร้านที่ถูกลบ หรือ None ถ้าไม่มี
+        """
+        with self._lock:
+            storefront = self._load().pop(str(channel_id), None)
+            self._versions.pop(str(channel_id), None)
+            if storefront is not None:
+                self._save()
+            return storefront
+
+    def get(self, channel_id):
+        """ข้อมูลหน้าร้านของช่อง หรือ None ถ้าช่องนี้ไม่มีหน้าร้านถาวร"""
+        with self._lock:
+            storefront = self._load().get(str(channel_id))
+            return dict(storefront) if storefront is not None else None
+
+    def is_storefront(self, message_id):
+        """ข้อความนี้เป็นหน้าร้านถาวรหรือไม่"""
+        with self._lock:
+            return any(s["message_id"] == message_id for s in self._load().values())
+
+    def outdated(self, version):
+        """หน้าร้านที่ยังแสดงแคตตาล็อกเวอร์ชันอื่นอยู่ (version คือ stamp ใดก็ได้ที่เทียบเท่ากันได้)
+
+        Returns:
+            list: รายการ (id ช่อง, ข้อมูลหน้าร้าน)
+        """
+        with self._lock:
+            return [(int(channel_id), dict(storefront)) for channel_id, storefront in self._load().items()
+                    if self._versions.get(channel_id) != version]
+
+    def mark_published(self, channel_id, version):
+        """บันทึกว่าข้อความหน้าร้านของช่องนี้แสดงแคตตาล็อกเวอร์ชันนี้แล้ว"""
+        with self._lock:
+            self._versions[str(channel_id)] = version
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+
+# หน้าร้านถาวรที่ใช้ร่วมกันทั้งโปรเซส
+storefront_store = StorefrontStore()
@@ -2,6 +2,8 @@ import os
 from dotenv import load_dotenv
 from pymongo import MongoClient
 import json
+import asyncio
+from datetime import datetime
 
 # โหลด environment variables
 load_dotenv()
@@ -49,4 +51,39 @@ try:
 except Exception as e:
     print(f"❌ เกิดข้อผิดพลาดในการเชื่อมต่อกับ MongoDB: {str(e)}")
     print("กรุณาตรวจสอบ MONGODB_URI ว่าถูกต้องหรือไม่")
-    exit(1)
\ No newline at end of file
+    exit(1)
+
+# ================================
+# ทดสอบ driver แบบ async ของ db_operations (ใช้ database แยกสำหรับทดสอบ)
+# ตัวอย่าง: MONGODB_URI=mongodb://localhost:27017 python test_mongodb.py
+# ================================
+os.environ["MONGODB_DB_NAME"] = os.getenv("MONGODB_TEST_DB_NAME", "discord_shop_bot_test")
+
+import db_operations
+from mongodb_config import async_client, MONGODB_DB_NAME
+
+async def test_async_backend():
+    if not db_operations.ASYNC_MONGODB_AVAILABLE:
+        print("⚠️ ไม่มี AsyncMongoClient (ต้องใช้ pymongo 4.13 ขึ้นไป) - ข้ามการทดสอบแบบ async")
+        return
+
+    products = db_operations.async_products_collection
+    await products.delete_many({})
+    await products.insert_many([
+        {"name": f"สินค้าทดสอบ {i}", "price": i, "emoji": "🧪", "country": "1", "category": "item"}
+        for i in range(20)
+    ])
+
+    # เรียกพร้อมกันหลายครั้ง (จำลองลูกค้าหลายคน) ต้องไม่บล็อกกันเอง
+    results = await asyncio.gather(*[db_operations.load_products_async("1", "item") for _ in range(20)])
+    assert all(len(r) == 20 for r in results)
+    print("✅ ทดสอบโหลดสินค้าแบบ async พร้อมกัน 20 ครั้งสำเร็จ")
+
+    state = await db_operations.load_channel_state_async()
+    assert state == {"channel_name": "", "current_number": 0, "pending_number": 0}
+    print("✅ ทดสอบโหลดสถานะช่องแบบ async สำเร็จ")
+
+    await async_client.drop_database(MONGODB_DB_NAME)
+    print(f"✅ ลบ database ทดสอบ {MONGODB_DB_NAME} สำเร็จ")
+
+asyncio.run(test_async_backend())
@@ -0,0 +1,10 @@
+"""ตั้งค่าร่วมของชุดทดสอบ: ให้ import โมดูลของบอทจากโฟลเดอร์หลักได้"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# shopbot ออกจากโปรแกรมตอน import ถ้าไม่มี token (บอทเริ่มทำงานเฉพาะตอนรันเป็นสคริปต์)
+os.environ.setdefault("DISCORD_TOKEN", "test-token")
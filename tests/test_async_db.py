@@ -0,0 +1,54 @@
+"""ทดสอบว่างานที่บล็อกของ db_operations ถูกส่งผ่าน thread pool กลางของ async_db"""
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import async_db
+import db_operations
+from async_db import BlockingExecutor
+
+
+@pytest.fixture
+def executor(monkeypatch):
+    executor = BlockingExecutor(max_workers=2, max_queue=2)
+    monkeypatch.setattr(async_db, "db_executor", executor)
+    yield executor
+    executor.shutdown()
+
+
+def test_file_io_of_async_operations_uses_db_executor(executor, tmp_path):
+    path = tmp_path / "config.json"
+
+    async def run():
+        await db_operations._run_blocking(db_operations._write_json_file, path, {"url": "x"})
+        return await db_operations._run_blocking(db_operations._read_json_file, path, {})
+
+    assert asyncio.run(run()) == {"url": "x"}
+    assert json.loads(path.read_text(encoding="utf-8")) == {"url": "x"}
+    stats = executor.stats()
+    assert stats["submitted"] == 2
+    assert stats["completed"] == 2
+    assert stats["failed"] == 0
+
+
+def test_executor_bounds_concurrent_jobs(executor):
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def job():
+        with lock:
+            active[0] += 1
+            active[1] = max(active[1], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+
+    async def run():
+        await asyncio.gather(*(async_db.run_blocking(job) for _ in range(8)))
+
+    asyncio.run(run())
+    assert active[1] <= executor.max_workers
+    assert executor.stats()["completed"] == 8
@@ -0,0 +1,107 @@
+"""ทดสอบ Cart และ CartStore: ยอดรวมแบบ incremental, TTL และการลบแบบ LRU"""
+import pytest
+
+import cart as cart_module
+from cart import Cart, CartStore
+
+
+def _product(product_id, price=10):
+    return {"id": product_id, "name": product_id, "price": price, "emoji": "📦", "country": "th"}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cart_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _filled_cart(product_id="a"):
+    cart = Cart()
+    cart.set_quantity(_product(product_id), 1)
+    return cart
+
+
+def test_cart_total_follows_quantity_changes():
+    cart = Cart()
+    cart.set_quantity(_product("a", 10), 2)
+    cart.set_quantity(_product("b", 5), "3")
+    assert cart.total == 35
+
+    cart.set_quantity(_product("a", 10), 1)
+    assert cart.total == 25
+    cart.set_quantity(_product("b", 5), 0)
+    assert cart.total == 10
+    assert cart.quantities == {"a": 1}
+
+
+def test_missing_cart_is_not_stored(clock):
+    store = CartStore(ttl=60, max_carts=10)
+
+    cart = store.get("user")
+    assert len(cart) == 0
+    assert len(store) == 0
+
+    store.save("user", cart)
+    assert len(store) == 0
+
+
+def test_saved_cart_is_returned_until_ttl(clock):
+    store = CartStore(ttl=60, max_carts=10)
+    cart = _filled_cart()
+    store.save("user", cart)
+
+    clock[0] += 59
+    assert store.get("user") is cart
+
+    # get นับเป็นการใช้งาน จึงต่ออายุตะกร้า
+    clock[0] += 59
+    assert store.get("user") is cart
+
+    clock[0] += 60
+    assert store.get("user") is not cart
+    assert store.expired == 1
+    assert len(store) == 0
+
+
+def test_purge_removes_only_expired_carts(clock):
+    store = CartStore(ttl=60, max_carts=10)
+    store.save("old", _filled_cart())
+    clock[0] += 30
+    store.save("new", _filled_cart())
+
+    clock[0] += 31
+    assert store.purge() == 1
+    assert len(store) == 1
+    assert store.stats()["expired"] == 1
+
+    assert store.purge() == 0
+
+
+def test_lru_eviction_keeps_recently_used_carts(clock):
+    store = CartStore(ttl=600, max_carts=2)
+    first = _filled_cart()
+    store.save("first", first)
+    clock[0] += 1
+    store.save("second", _filled_cart())
+    clock[0] += 1
+
+    # ใช้ตะกร้าแรกอีกครั้ง ตะกร้าที่สองจึงเป็นตัวที่ไม่ได้ใช้นานที่สุด
+    assert store.get("first") is first
+    store.save("third", _filled_cart())
+
+    assert len(store) == 2
+    assert store.evicted == 1
+    assert store.get("first") is first
+    assert len(store.get("second")) == 0
+
+
+def test_emptied_cart_is_discarded(clock):
+    store = CartStore(ttl=60, max_carts=10)
+    cart = _filled_cart("a")
+    store.save("user", cart)
+
+    cart.set_quantity(_product("a"), 0)
+    store.save("user", cart)
+    assert len(store) == 0
+    assert store.stats()["carts"] == 0
@@ -0,0 +1,235 @@
+"""ทดสอบ CatalogStore: โหลดไฟล์หมวดหมู่ โหลดใหม่เฉพาะไฟล์ที่เปลี่ยน และการค้นหาตามรหัส/ชื่อ"""
+import json
+import os
+
+import pytest
+
+from catalog_store import CatalogStore, NameIndex, choice_value, loose_name, make_product_id, normalize_name
+
+COUNTRIES = ["th", "jp"]
+CATEGORIES = ["food", "toy"]
+
+
+def _write(tmp_path, country, category, products, bump=0):
+    path = tmp_path / "categories" / country / f"{category}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(products, ensure_ascii=False), encoding="utf-8")
+    if bump:
+        # ให้ mtime เปลี่ยนแน่นอนแม้เขียนไฟล์ซ้ำภายในเสี้ยววินาทีเดียวกัน
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + bump * 1_000_000_000))
+    return path
+
+
+@pytest.fixture
+def store(tmp_path):
+    _write(tmp_path, "th", "food", [{"name": "Mama", "price": 10}, {"name": "ข้าวเหนียว", "price": 20}])
+    _write(tmp_path, "jp", "toy", [{"name": "Gundam", "price": 500}])
+    return CatalogStore(tmp_path / "categories", tmp_path / "products.json", check_interval=0)
+
+
+def test_normalize_name_folds_case_and_spaces():
+    assert normalize_name("  MaMa   Tom  Yum ") == "mama tom yum"
+    assert normalize_name("นํา") == normalize_name("นำ")
+
+
+def test_refresh_loads_every_category_once(store):
+    assert store.refresh(COUNTRIES, CATEGORIES)
+    assert store.stats() == {"version": 1, "files": 4, "products": 3, "file_reads": 2}
+
+    # ไม่มีไฟล์เปลี่ยน: ไม่อ่านไฟล์ซ้ำและเวอร์ชันคงเดิม
+    assert not store.refresh(COUNTRIES, CATEGORIES)
+    assert store.stats()["version"] == 1
+    assert store.stats()["file_reads"] == 2
+
+
+def test_refresh_reloads_only_changed_file(store, tmp_path):
+    store.refresh(COUNTRIES, CATEGORIES)
+
+    _write(tmp_path, "th", "food", [{"name": "Mama", "price": 12}], bump=1)
+    assert store.refresh(COUNTRIES, CATEGORIES)
+    assert store.stats()["file_reads"] == 3
+    assert store.find_by_id("th_food_Mama")["price"] == 12
+    assert store.find_by_id("th_food_ข้าวเหนียว") is None
+
+
+def test_products_carry_country_category_and_id(store):
+    store.refresh(COUNTRIES, CATEGORIES)
+
+    products = store.get_products(COUNTRIES, CATEGORIES, country="th")
+    assert [(p["name"], p["country"], p["category"]) for p in products] == [
+        ("Mama", "th", "food"), ("ข้าวเหนียว", "th", "food")]
+    assert make_product_id("jp", "toy", "Gundam") == "jp_toy_Gundam"
+    assert store.find_by_id("jp_toy_Gundam")["price"] == 500
+
+
+def test_returned_products_are_copies(store):
+    store.refresh(COUNTRIES, CATEGORIES)
+
+    store.get_products(COUNTRIES, CATEGORIES)[0]["price"] = 0
+    store.find_by_name("mama")[0]["price"] = 0
+    assert store.find_by_id("th_food_Mama")["price"] == 10
+
+
+def test_find_by_name_ignores_case_and_spaces(store):
+    store.refresh(COUNTRIES, CATEGORIES)
+
+    assert [p["name"] for p in store.find_by_name("  MAMA ")] == ["Mama"]
+    assert store.find_by_name("unknown") == []
+
+
+def test_mark_written_updates_memory_without_reading_file(store):
+    store.refresh(COUNTRIES, CATEGORIES)
+    reads = store.stats()["file_reads"]
+
+    store.mark_written("jp", "food", [{"name": "Pocky", "price": 40}])
+    assert store.find_by_id("jp_food_Pocky")["country"] == "jp"
+    assert store.stats()["file_reads"] == reads
+    assert store.stats()["version"] == 2
+
+
+def test_pinned_category_is_not_overwritten_from_file(store, tmp_path):
+    store.refresh(COUNTRIES, CATEGORIES)
+
+    store.mark_written("th", "food", [{"name": "Staged", "price": 1}], pin=True)
+    _write(tmp_path, "th", "food", [{"name": "OnDisk", "price": 2}], bump=1)
+    store.refresh(COUNTRIES, CATEGORIES)
+    assert store.find_by_id("th_food_Staged") is not None
+
+    store.unpin("th", "food")
+    store.invalidate()
+    store.refresh(COUNTRIES, CATEGORIES)
+    assert store.find_by_id("th_food_OnDisk") is not None
+    assert store.find_by_id("th_food_Staged") is None
+
+
+def test_removed_country_is_dropped(store):
+    store.refresh(COUNTRIES, CATEGORIES)
+
+    assert store.refresh(["th"], CATEGORIES)
+    assert store.find_by_id("jp_toy_Gundam") is None
+    assert store.stats()["files"] == 2
+
+
+def test_legacy_products_follow_file_changes(store, tmp_path):
+    assert store.load_legacy_products() == []
+
+    legacy = tmp_path / "products.json"
+    legacy.write_text(json.dumps([{"name": "Old", "price": 1}]), encoding="utf-8")
+    assert [p["name"] for p in store.load_legacy_products()] == ["Old"]
+
+
+def test_current_is_none_until_first_load(store):
+    assert store.current(COUNTRIES, CATEGORIES) is None
+
+    store.refresh(COUNTRIES, CATEGORIES)
+    assert len(store.current(COUNTRIES, CATEGORIES)) == 3
+
+
+def test_snapshot_is_shared_until_version_changes(store):
+    first = store.snapshot(COUNTRIES, CATEGORIES)
+    assert store.snapshot(COUNTRIES, CATEGORIES) is first
+    assert store.current(COUNTRIES, CATEGORIES) is first
+
+    store.mark_written("th", "toy", [{"name": "Ball", "price": 5}])
+    second = store.current(COUNTRIES, CATEGORIES)
+    assert second is not first
+    assert second.version == first.version + 1
+    # หมวดที่ไม่ได้แก้ใช้ tuple เดิมร่วมกัน
+    assert second.products("th", "food") is first.products("th", "food")
+    assert second.get("th_toy_Ball")["price"] == 5
+    assert first.get("th_toy_Ball") is None
+
+
+def test_snapshot_products_are_read_only(store):
+    snapshot = store.snapshot(COUNTRIES, CATEGORIES)
+
+    product = snapshot.get("th_food_Mama")
+    assert product["id"] == "th_food_Mama"
+    with pytest.raises(TypeError):
+        product["price"] = 0
+    assert [p["name"] for p in snapshot.page("th", "food", 1, 1)] == ["ข้าวเหนียว"]
+    assert snapshot.count("jp", "food") == 0
+
+
+def _index(*names, country="th", category="food"):
+    return NameIndex([{"name": name, "country": country, "category": category,
+                       "id": make_product_id(country, category, name)} for name in names])
+
+
+def test_name_index_find_exact_ignores_case_and_spaces():
+    index = NameIndex([
+        {"name": "Mama Tom Yum", "country": "th", "category": "food", "id": "th_food_Mama Tom Yum"},
+        {"name": "mama  tom yum", "country": "jp", "category": "food", "id": "jp_food_mama  tom yum"},
+    ])
+
+    assert [p["country"] for p in index.find("  MAMA TOM   YUM ")] == ["th", "jp"]
+    assert index.find("Mama") == ()
+
+
+def test_loose_name_drops_thai_marks_spaces_and_punctuation():
+    assert loose_name("ข้าว เหนียว!") == loose_name("ขาวเหนียว")
+    assert loose_name("Tom-Yum") == "tomyum"
+
+
+def test_suggest_prefers_loose_match_then_substring():
+    index = _index("ข้าวเหนียว", "ข้าวเหนียวมะม่วง", "ข้าวผัด")
+
+    # ต่างกันแค่วรรณยุกต์และช่องว่าง มาก่อนชื่อที่มีคำค้นอยู่ภายใน
+    assert index.suggest("ขาว เหนียว", limit=2) == ["ข้าวเหนียว", "ข้าวเหนียวมะม่วง"]
+    assert index.suggest("ขาวเหนียว", limit=1) == ["ข้าวเหนียว"]
+
+
+def test_suggest_fuzzy_cutoff():
+    index = _index("Gundam", "Pocky", "Doraemon")
+
+    assert index.suggest("gundum") == ["Gundam"]
+    # คล้ายกันน้อยกว่า cutoff ของ difflib จึงไม่แนะนำอะไรเลย
+    assert index.suggest("zzzzzz") == []
+    assert index.suggest("!!!") == []
+
+
+def test_suggest_respects_limit():
+    index = _index(*[f"Pocky {flavour}" for flavour in ("A", "B", "C", "D", "E")])
+
+    assert len(index.suggest("pocky")) == 3
+    assert len(index.suggest("pocky", limit=5)) == 5
+
+
+def test_complete_lists_prefix_matches_before_substring_matches():
+    index = _index("Pocky", "Mini Pocky", "Pocky Stick", "Pretz")
+
+    assert [name for name, _ in index.complete("pock")] == ["Pocky", "Pocky Stick", "Mini Pocky"]
+    assert index.complete("POCKY S") == [("Pocky Stick", "th_food_Pocky Stick")]
+    assert [name for name, _ in index.complete("")] == ["Mini Pocky", "Pocky", "Pocky Stick", "Pretz"]
+    assert [name for name, _ in index.complete("pock", limit=2)] == ["Pocky", "Pocky Stick"]
+
+
+def test_complete_filters_by_country(store):
+    store.refresh(COUNTRIES, CATEGORIES)
+    index = store.current(COUNTRIES, CATEGORIES).name_index
+
+    assert index.complete("", country="jp") == [("Gundam", "jp_toy_Gundam")]
+    assert index.complete("gun", country="th") == []
+
+
+def test_choice_value_round_trip_for_duplicate_names(store):
+    store.mark_written("th", "toy", [{"name": "Mama", "price": 99}])
+    snapshot = store.snapshot(COUNTRIES, CATEGORIES)
+
+    # ชื่อซ้ำกันคนละหมวดได้ value คนละค่า จึงแปลงกลับได้สินค้าที่ถูกต้อง
+    values = [choice_value(product["id"]) for product in snapshot.name_index.find("mama")]
+    assert values == ["th_food_Mama", "th_toy_Mama"]
+    assert [snapshot.resolve(value)["price"] for value in values] == [10, 99]
+    assert snapshot.resolve("th_food_Unknown") is None
+
+
+def test_choice_value_hashes_long_product_ids(store):
+    long_name = "ขนม" * 60
+    store.mark_written("jp", "food", [{"name": long_name, "price": 7}])
+    snapshot = store.snapshot(COUNTRIES, CATEGORIES)
+
+    value = choice_value(make_product_id("jp", "food", long_name))
+    assert value.startswith("#") and len(value) <= 100
+    assert snapshot.resolve(value)["name"] == long_name
+    assert snapshot.resolve("#" + "0" * 40) is None
@@ -0,0 +1,172 @@
+"""ทดสอบ ChangeWatcher ด้วย change stream จำลอง: รวมการเปลี่ยนแปลงของสินค้า, อัปเดตแคช และ resume token"""
+import asyncio
+import json
+
+import pytest
+from pymongo.errors import OperationFailure
+
+import change_watcher as watcher_module
+from change_watcher import ChangeWatcher
+from config_cache import ConfigCache
+
+
+class FakeStream:
+    def __init__(self, changes):
+        self.changes = list(changes)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.changes:
+            return self.changes.pop(0)
+        # ไม่มีเหตุการณ์ใหม่: รอไปเรื่อยๆ เหมือน change stream จริง
+        await asyncio.Event().wait()
+
+
+class FakeCollection:
+    def __init__(self, streams):
+        self.streams = list(streams)
+        self.resume_tokens = []
+
+    async def watch(self, full_document=None, resume_after=None):
+        self.resume_tokens.append(resume_after)
+        stream = self.streams.pop(0) if self.streams else []
+        if isinstance(stream, Exception):
+            raise stream
+        return FakeStream(stream)
+
+
+class FakeDeltaSync:
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.applied = []
+        self.written = []
+        self.full_syncs = 0
+
+    def begin(self):
+        pass
+
+    def finish(self):
+        return {"added": 0, "updated": 0, "removed": 0, "files_written": 0, "elapsed": 0.0}
+
+    async def apply_product_changes(self, changes):
+        self.applied.append(dict(changes))
+        return len(changes)
+
+    async def sync_products(self, full=False):
+        self.full_syncs += 1
+        return 0
+
+    def write_json(self, path, data):
+        self.written.append((path.name, data))
+        return True
+
+
+async def _run_blocking(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    cache = ConfigCache(ttl=0)
+
+    async def missing():
+        return None
+
+    for name in ("target_channel_id", "qrcode_url", "thank_you_message", "categories", "channel_state"):
+        cache.register(name, missing)
+    fake_sync = FakeDeltaSync()
+    monkeypatch.setattr(watcher_module, "config_cache", cache)
+    monkeypatch.setattr(watcher_module, "delta_sync", fake_sync)
+    monkeypatch.setattr(watcher_module, "run_blocking", _run_blocking)
+    monkeypatch.setattr(watcher_module, "SCRIPT_DIR", tmp_path)
+    monkeypatch.setattr(watcher_module, "CHANGE_STREAMS_ENABLED", True)
+    return cache, fake_sync
+
+
+def _watcher(tmp_path, products=(), configs=()):
+    database = {"products": FakeCollection(products), "configs": FakeCollection(configs)}
+    watcher = ChangeWatcher(database, debounce=0.01, token_file=tmp_path / "tokens.json")
+    return watcher, database
+
+
+async def _run_for(watcher, seconds=0.1):
+    assert watcher.start()
+    await asyncio.sleep(seconds)
+    for task in watcher._tasks:
+        task.cancel()
+    await asyncio.gather(*watcher._tasks, return_exceptions=True)
+
+
+def _tokens(tmp_path):
+    return json.loads((tmp_path / "tokens.json").read_text(encoding="utf-8"))
+
+
+def test_product_changes_are_batched_and_token_saved_after_apply(env, tmp_path):
+    _, fake_sync = env
+    changes = [
+        {"_id": {"t": 1}, "operationType": "insert", "fullDocument": {"_id": "a", "name": "A"}},
+        {"_id": {"t": 2}, "operationType": "update", "fullDocument": {"_id": "a", "name": "A2"}},
+        {"_id": {"t": 3}, "operationType": "delete", "documentKey": {"_id": "b"}},
+    ]
+    watcher, _ = _watcher(tmp_path, products=[changes])
+
+    asyncio.run(_run_for(watcher))
+    assert fake_sync.applied == [{"a": {"_id": "a", "name": "A2"}, "b": None}]
+    assert _tokens(tmp_path) == {"products": {"t": 3}}
+    assert watcher.stats()["reloads"] == 1
+    assert watcher.stats()["events"] == 3
+
+
+def test_config_change_updates_cache_backup_and_listeners(env, tmp_path):
+    cache, fake_sync = env
+    seen = []
+    watcher, _ = _watcher(tmp_path, configs=[[
+        {"_id": {"t": 7}, "operationType": "update",
+         "fullDocument": {"config_type": "qrcode", "url": "https://x", "updated_at": None}},
+        {"_id": {"t": 8}, "operationType": "update", "fullDocument": {"config_type": "unknown"}},
+    ]])
+    watcher.add_listener("qrcode", seen.append)
+
+    asyncio.run(_run_for(watcher))
+    assert cache.peek("qrcode_url") == "https://x"
+    assert fake_sync.written == [("qrcode_config.json", {"url": "https://x"})]
+    assert seen == ["https://x"]
+    assert _tokens(tmp_path) == {"configs": {"t": 7}}
+
+
+def test_restart_resumes_from_saved_tokens(env, tmp_path):
+    (tmp_path / "tokens.json").write_text(json.dumps({"products": {"t": 5}}), encoding="utf-8")
+    watcher, database = _watcher(tmp_path)
+
+    asyncio.run(_run_for(watcher, 0.02))
+    assert database["products"].resume_tokens == [{"t": 5}]
+    assert database["configs"].resume_tokens == [None]
+    assert watcher.live is False
+
+
+def test_expired_resume_token_triggers_full_resync(env, tmp_path):
+    _, fake_sync = env
+    (tmp_path / "tokens.json").write_text(json.dumps({"products": {"t": 5}}), encoding="utf-8")
+    watcher, database = _watcher(tmp_path, products=[OperationFailure("too old", code=286)])
+
+    asyncio.run(_run_for(watcher, 0.05))
+    assert fake_sync.full_syncs == 1
+    assert database["products"].resume_tokens == [{"t": 5}, None]
+    assert _tokens(tmp_path) == {}
+
+
+def test_unsupported_deployment_stops_watching(env, tmp_path):
+    error = OperationFailure("standalone", code=40573)
+    watcher, _ = _watcher(tmp_path, products=[error], configs=[error])
+
+    asyncio.run(_run_for(watcher, 0.02))
+    assert watcher.unsupported
+    assert not watcher.start()
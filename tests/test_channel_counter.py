@@ -0,0 +1,144 @@
+"""ทดสอบ ChannelCounter: รวมข้อความที่ค้างเป็นการเปลี่ยนชื่อครั้งเดียว และลองใหม่หลังเปลี่ยนชื่อไม่สำเร็จ"""
+import asyncio
+
+import pytest
+
+import channel_counter as counter_module
+from channel_counter import ChannelCounter, number_in_name
+from config_cache import ConfigCache
+
+
+class FakeChannel:
+    def __init__(self, name, failures=()):
+        self.id = 1
+        self.name = name
+        self.failures = list(failures)
+        self.edits = []
+
+    async def edit(self, name):
+        if self.failures:
+            raise self.failures.pop(0)
+        self.edits.append(name)
+        self.name = name
+
+
+class HTTPError(Exception):
+    def __init__(self, status):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+
+
+@pytest.fixture
+def state(monkeypatch):
+    """สถานะช่องใน MongoDB จำลอง (increment/advance แบบ atomic)"""
+    stored = {"channel_name": "", "current_number": 0, "pending_number": 0}
+
+    async def increment_channel_state(amount=1):
+        stored["pending_number"] += amount
+        return dict(stored)
+
+    async def advance_channel_state(channel_name, current_number, pending_number, exact=False):
+        stored["channel_name"] = channel_name
+        if exact:
+            stored.update(current_number=current_number, pending_number=pending_number)
+        else:
+            stored["current_number"] = max(stored["current_number"], current_number)
+            stored["pending_number"] = max(stored["pending_number"], pending_number)
+        return True, dict(stored)
+
+    cache = ConfigCache(ttl=0)
+
+    async def load_state():
+        return dict(stored)
+
+    cache.register("channel_state", load_state)
+    monkeypatch.setattr(counter_module, "increment_channel_state", increment_channel_state)
+    monkeypatch.setattr(counter_module, "advance_channel_state", advance_channel_state)
+    monkeypatch.setattr(counter_module, "config_cache", cache)
+    return stored
+
+
+async def _settle(counter, timeout=1.0):
+    """รอจนชื่อช่องตามตัวนับทัน"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while counter.lag and asyncio.get_running_loop().time() < deadline:
+        await asyncio.sleep(0.005)
+
+
+def test_number_in_name():
+    assert number_in_name("เครดิต-12") == 12
+    assert number_in_name("credit") == 0
+
+
+def test_burst_of_messages_is_one_rename(state):
+    channel = FakeChannel("credit-5")
+    counter = ChannelCounter(limit=1, window=60, retry=0.01)
+
+    async def run():
+        for _ in range(3):
+            await counter.increment(channel)
+        await _settle(counter)
+
+    asyncio.run(run())
+    assert channel.edits == ["credit-8"]
+    assert state["current_number"] == 8
+    assert counter.stats()["renames"] == 1
+
+
+def test_failed_rename_is_retried_without_using_quota(state):
+    channel = FakeChannel("credit-1", failures=[HTTPError(500)])
+    counter = ChannelCounter(limit=1, window=60, retry=0.01)
+
+    async def run():
+        await counter.increment(channel)
+        await _settle(counter)
+
+    asyncio.run(run())
+    assert channel.edits == ["credit-2"]
+    stats = counter.stats()
+    assert stats["failures"] == 1
+    assert stats["renames"] == 1
+    # คำขอที่ไม่สำเร็จไม่ถูกนับในโควต้า มีเพียงการเปลี่ยนชื่อที่สำเร็จ
+    assert len(counter._recent) == 1
+
+
+def test_retry_delay_backs_off(state, monkeypatch):
+    channel = FakeChannel("credit-1", failures=[HTTPError(500), HTTPError(503), HTTPError(502)])
+    counter = ChannelCounter(limit=1, window=60, retry=0.001)
+    delays = []
+    sleep = asyncio.sleep
+
+    async def record_sleep(delay):
+        delays.append(delay)
+        await sleep(0)
+
+    async def run():
+        await counter.increment(channel)
+        monkeypatch.setattr(counter_module.asyncio, "sleep", record_sleep)
+        try:
+            for _ in range(50):
+                if not counter.lag:
+                    break
+                await sleep(0.001)
+        finally:
+            monkeypatch.setattr(counter_module.asyncio, "sleep", sleep)
+
+    asyncio.run(run())
+    assert channel.edits == ["credit-2"]
+    assert delays == [0.001, 0.002, 0.004]
+
+
+def test_rate_limit_uses_up_the_window(state):
+    channel = FakeChannel("credit-1", failures=[HTTPError(429)])
+    counter = ChannelCounter(limit=2, window=60, retry=0.01)
+
+    async def run():
+        await counter.increment(channel)
+        await asyncio.sleep(0.02)
+
+    asyncio.run(run())
+    stats = counter.stats()
+    assert channel.edits == []
+    assert stats["rate_limited"] == 1
+    assert stats["lag"] == 1
+    assert stats["next_rename_in"] > 0
@@ -0,0 +1,67 @@
+"""ทดสอบตัวนับสถานะช่องของ db_operations แบบไม่มี MongoDB (ไฟล์ channel_state.json + file lock)"""
+import threading
+
+import pytest
+
+import db_operations
+from db_operations import _advance_update, advance_channel_state, increment_channel_state
+
+
+@pytest.fixture
+def state_file(tmp_path, monkeypatch):
+    path = tmp_path / "channel_state.json"
+    monkeypatch.setattr(db_operations, "MONGODB_AVAILABLE", False)
+    monkeypatch.setattr(db_operations, "CHANNEL_STATE_FILE", path)
+    return path
+
+
+def test_increment_creates_and_counts(state_file):
+    assert increment_channel_state()["pending_number"] == 1
+    assert increment_channel_state(2) == {"channel_name": "", "current_number": 0, "pending_number": 3}
+    assert db_operations._read_json_file(state_file, None)["pending_number"] == 3
+
+
+def test_concurrent_increments_are_not_lost(state_file):
+    def work():
+        for _ in range(25):
+            increment_channel_state()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert db_operations.get_next_channel_number() == 100
+
+
+def test_advance_only_moves_numbers_up(state_file):
+    advance_channel_state("credit-10", 10, 12)
+
+    before, after = advance_channel_state("credit-8", 8, 9)
+    assert before == {"channel_name": "credit-10", "current_number": 10, "pending_number": 12}
+    assert after == {"channel_name": "credit-8", "current_number": 10, "pending_number": 12}
+
+    _, after = advance_channel_state(None, 11, None)
+    assert after["current_number"] == 11
+    assert after["pending_number"] == 12
+    assert after["channel_name"] == "credit-8"
+
+
+def test_exact_advance_can_lower_numbers(state_file):
+    advance_channel_state("credit-10", 10, 12)
+
+    _, after = advance_channel_state("credit-3", 3, 3, exact=True)
+    assert after == {"channel_name": "credit-3", "current_number": 3, "pending_number": 3}
+    assert increment_channel_state()["pending_number"] == 4
+
+
+def test_advance_update_documents():
+    assert _advance_update("c-5", 5, 6) == {
+        "$max": {"current_number": 5, "pending_number": 6},
+        "$set": {"channel_name": "c-5"}
+    }
+    assert _advance_update("c-5", 5, 5, exact=True) == {
+        "$set": {"current_number": 5, "pending_number": 5, "channel_name": "c-5"}
+    }
+    assert _advance_update(None, None, 7) == {"$max": {"pending_number": 7}}
@@ -0,0 +1,146 @@
+"""ทดสอบ ConfigCache: โหลดครั้งเดียว, write-through, invalidate และ TTL"""
+import asyncio
+
+import pytest
+
+from config_cache import ConfigCache, channel_state_value
+
+
+class Source:
+    """แหล่งข้อมูลจำลองที่นับจำนวนการโหลดและบันทึก"""
+
+    def __init__(self, value, delay=0):
+        self.value = value
+        self.delay = delay
+        self.loads = 0
+        self.saved = []
+
+    async def load(self):
+        self.loads += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return self.value
+
+    async def save(self, value):
+        self.saved.append(value)
+        self.value = value
+        return True
+
+
+@pytest.fixture
+def source():
+    return Source("123")
+
+
+@pytest.fixture
+def cache(source):
+    cache = ConfigCache(ttl=0)
+    cache.register("target", source.load, source.save, cast=int)
+    return cache
+
+
+def test_value_is_loaded_once_and_cast(cache, source):
+    async def run():
+        return await cache.get("target"), await cache.get("target")
+
+    assert asyncio.run(run()) == (123, 123)
+    assert source.loads == 1
+    assert cache.stats() == {"entries": 1, "hits": 1, "misses": 1, "refreshes": 1, "writes": 0}
+
+
+def test_concurrent_first_reads_share_one_load():
+    source = Source({"a": 1}, delay=0.01)
+    cache = ConfigCache(ttl=0)
+    cache.register("names", source.load)
+
+    async def run():
+        return await asyncio.gather(*(cache.get("names") for _ in range(5)))
+
+    assert asyncio.run(run()) == [{"a": 1}] * 5
+    assert source.loads == 1
+
+
+def test_set_writes_through_and_updates_cache(cache, source):
+    async def run():
+        await cache.get("target")
+        assert await cache.set("target", "456") is True
+        return await cache.get("target")
+
+    assert asyncio.run(run()) == 456
+    assert source.saved == [456]
+    assert source.loads == 1
+
+
+def test_dict_values_are_copied_for_get_but_shared_for_read():
+    source = Source({"a": 1})
+    cache = ConfigCache(ttl=0)
+    cache.register("names", source.load)
+
+    value = asyncio.run(cache.get("names"))
+    value["a"] = 2
+    assert cache.peek("names") == {"a": 1}
+    assert cache.read("names") is cache.read("names")
+
+
+def test_read_does_not_load_missing_value(cache, source):
+    assert cache.read("target", default=0) == 0
+    assert cache.peek("target") is None
+    assert source.loads == 0
+
+
+def test_invalidate_forces_reload(cache, source):
+    async def run():
+        await cache.get("target")
+        source.value = "789"
+        cache.invalidate("target")
+        assert cache.read("target") is None
+        return await cache.get("target")
+
+    assert asyncio.run(run()) == 789
+    assert source.loads == 2
+
+
+def test_update_replaces_value_without_saving(cache, source):
+    cache.update("target", "42")
+
+    assert cache.read("target") == 42
+    assert source.saved == []
+    assert source.loads == 0
+
+
+def test_stale_value_is_served_while_refreshing(source):
+    cache = ConfigCache(ttl=0.01)
+    cache.register("target", source.load, cast=int)
+
+    async def run():
+        await cache.get("target")
+        source.value = "2"
+        await asyncio.sleep(0.02)
+        stale = await cache.get("target")
+        # ให้ทาสค์โหลดเบื้องหลังทำงานจบ
+        await asyncio.sleep(0.005)
+        return stale, cache.read("target")
+
+    assert asyncio.run(run()) == (123, 2)
+    assert source.loads == 2
+
+
+def test_load_finishing_after_set_keeps_written_value():
+    source = Source("1", delay=0.02)
+    cache = ConfigCache(ttl=0)
+    cache.register("target", source.load, source.save, cast=int)
+
+    async def run():
+        await cache.get("target")
+        refresh = asyncio.ensure_future(cache.refresh("target"))
+        await asyncio.sleep(0)
+        await cache.set("target", "5")
+        await refresh
+        return cache.read("target")
+
+    assert asyncio.run(run()) == 5
+
+
+def test_channel_state_value_fills_defaults():
+    assert channel_state_value(None) == {"channel_name": "", "current_number": 0, "pending_number": 0}
+    assert channel_state_value({"channel_name": "c", "pending_number": "3"})["pending_number"] == 3
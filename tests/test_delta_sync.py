@@ -0,0 +1,191 @@
+"""ทดสอบ DeltaSync: checkpoint, โหมด delta/full, การเทียบ hash ของไฟล์ และ change stream"""
+import asyncio
+import json
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+import delta_sync as sync_module
+from catalog_store import CatalogStore
+from db_operations import _product_key
+from delta_sync import DeltaSync
+from write_behind import CategoryWriteBehind
+
+
+class FakeMongo:
+    """คอลเลกชันสินค้าและการตั้งค่าจำลอง พร้อมบันทึกการเรียกแต่ละแบบ"""
+
+    def __init__(self, products):
+        self.products = {_product_key(p): dict(p) for p in products}
+        self.configs = {}
+        self.calls = []
+
+    async def load_products_async(self):
+        self.calls.append("full")
+        return [dict(p) for p in self.products.values()]
+
+    async def load_products_since(self, since):
+        self.calls.append("since")
+        return [dict(p) for p in self.products.values() if p["updated_at"] >= since.isoformat()]
+
+    async def load_product_keys(self):
+        return set(self.products)
+
+    async def load_configs_since(self, since=None):
+        self.calls.append(("configs", since))
+        return {name: dict(doc) for name, (doc, updated) in self.configs.items()
+                if since is None or updated >= since}
+
+
+def _product(name, price, updated_at="2024-01-01T00:00:00+00:00", country="th", category="food"):
+    return {"_id": name, "name": name, "price": price, "country": country, "category": category,
+            "updated_at": updated_at}
+
+
+async def _run_blocking(func, *args, **kwargs):
+    return func(*args, **kwargs)
+
+
+@pytest.fixture
+def mongo(tmp_path, monkeypatch):
+    mongo = FakeMongo([_product("Mama", 10), _product("Pocky", 20, category="snack")])
+    catalog = CatalogStore(tmp_path / "categories", tmp_path / "products.json", check_interval=0)
+    writer = CategoryWriteBehind(tmp_path / "categories", tmp_path / "products.json", delay=3600)
+    for name in ("load_products_async", "load_products_since", "load_product_keys", "load_configs_since"):
+        monkeypatch.setattr(sync_module, name, getattr(mongo, name))
+    monkeypatch.setattr(sync_module, "run_blocking", _run_blocking)
+    monkeypatch.setattr(sync_module, "catalog_store", catalog)
+    monkeypatch.setattr(sync_module, "category_writer", writer)
+    monkeypatch.setattr(sync_module, "PRODUCTS_FILE", tmp_path / "products.json")
+    monkeypatch.setattr(sync_module, "CATEGORIES_DIR", tmp_path / "categories")
+    mongo.catalog = catalog
+    return mongo
+
+
+@pytest.fixture
+def syncer(tmp_path, mongo):
+    return DeltaSync(tmp_path / "sync_state.json", overlap=0)
+
+
+def _sync(syncer, **kwargs):
+    async def run():
+        syncer.begin()
+        count = await syncer.sync_products(**kwargs)
+        return count, syncer.finish()
+
+    return asyncio.run(run())
+
+
+def _category(tmp_path, category):
+    return json.loads((tmp_path / "categories" / "th" / f"{category}.json").read_text(encoding="utf-8"))
+
+
+def test_first_sync_is_full_and_writes_files(syncer, mongo, tmp_path):
+    count, report = _sync(syncer)
+
+    assert count == 2
+    assert report["mode"] == "full"
+    assert report["added"] == 2
+    assert report["files_written"] == 3
+    assert _category(tmp_path, "food") == [{"name": "Mama", "price": 10}]
+    assert mongo.catalog.find_by_id("th_snack_Pocky")["price"] == 20
+    state = json.loads((tmp_path / "sync_state.json").read_text(encoding="utf-8"))
+    assert state["checkpoint"] is not None
+
+
+def test_second_sync_is_delta_and_skips_unchanged_files(syncer, mongo, tmp_path):
+    _sync(syncer)
+    mongo.products[("th", "food", "Mama")].update(price=12, updated_at=datetime.now(timezone.utc).isoformat())
+
+    count, report = _sync(syncer)
+    assert mongo.calls == ["full", "since"]
+    assert report["mode"] == "delta"
+    assert report["fetched"] == 1
+    assert report["updated"] == 1
+    # products.json และหมวด food เปลี่ยน ส่วนหมวด snack เนื้อหาเดิมจึงไม่เขียนซ้ำ
+    assert report["files_written"] == 2
+    assert report["files_skipped"] == 1
+    assert _category(tmp_path, "food") == [{"name": "Mama", "price": 12}]
+
+
+def test_deleted_product_empties_its_category(syncer, mongo, tmp_path):
+    _sync(syncer)
+    del mongo.products[("th", "snack", "Pocky")]
+
+    _, report = _sync(syncer)
+    assert report["removed"] == 1
+    assert _category(tmp_path, "snack") == []
+    assert mongo.catalog.find_by_id("th_snack_Pocky") is None
+
+
+def test_locally_edited_products_file_forces_full_sync(syncer, mongo, tmp_path):
+    _sync(syncer)
+    products_file = tmp_path / "products.json"
+    products_file.write_text("[]", encoding="utf-8")
+    stat = products_file.stat()
+    os.utime(products_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    _, report = _sync(syncer)
+    assert report["mode"] == "full"
+    assert mongo.calls == ["full", "full"]
+
+
+def test_state_is_reloaded_by_a_new_process(syncer, mongo, tmp_path):
+    _sync(syncer)
+
+    restarted = DeltaSync(tmp_path / "sync_state.json", overlap=0)
+    _, report = _sync(restarted)
+    assert report["mode"] == "delta"
+    assert report["files_written"] == 0
+
+
+def test_empty_remote_does_not_touch_files(syncer, mongo, tmp_path):
+    mongo.products.clear()
+
+    count, report = _sync(syncer)
+    assert count == 0
+    assert not (tmp_path / "products.json").exists()
+    assert json.loads((tmp_path / "sync_state.json").read_text(encoding="utf-8"))["checkpoint"] is None
+
+
+def test_config_sync_uses_checkpoint_until_file_is_edited(syncer, mongo, tmp_path):
+    config_file = tmp_path / "qrcode_config.json"
+    mongo.configs["qrcode"] = ({"url": "a"}, datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    async def run():
+        syncer.begin()
+        configs = await syncer.sync_configs({"qrcode": config_file})
+        syncer.write_json(config_file, configs["qrcode"])
+        syncer.finish()
+        syncer.begin()
+        unchanged = await syncer.sync_configs({"qrcode": config_file})
+        config_file.write_text('{"url": "local"}', encoding="utf-8")
+        syncer.begin()
+        edited = await syncer.sync_configs({"qrcode": config_file})
+        return configs, unchanged, edited
+
+    configs, unchanged, edited = asyncio.run(run())
+    assert configs == {"qrcode": {"url": "a"}}
+    # รอบที่สองดึงเฉพาะที่เปลี่ยนหลัง checkpoint (ไม่มี)
+    assert unchanged == {}
+    assert mongo.calls[1][1] is not None
+    # ไฟล์ถูกแก้จากที่อื่น ต้องดึงทั้งหมดใหม่
+    assert edited == {"qrcode": {"url": "a"}}
+    assert mongo.calls[2] == ("configs", None)
+
+
+def test_change_stream_updates_apply_without_fetching(syncer, mongo, tmp_path):
+    _sync(syncer)
+
+    async def run():
+        syncer.begin()
+        return await syncer.apply_product_changes({
+            "Mama": _product("Mama", 15),
+            "Pocky": None
+        })
+
+    assert asyncio.run(run()) == 1
+    assert mongo.calls == ["full"]
+    assert _category(tmp_path, "food") == [{"name": "Mama", "price": 15}]
+    assert _category(tmp_path, "snack") == []
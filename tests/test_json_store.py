@@ -0,0 +1,36 @@
+"""ทดสอบ JsonFileStore: โหลดครั้งเดียว ค่าเริ่มต้นเมื่อไฟล์เสีย และการเขียนแบบสลับไฟล์"""
+from json_store import JsonFileStore
+
+
+def test_missing_or_invalid_file_uses_default(tmp_path):
+    assert JsonFileStore(tmp_path / "missing.json").load() == {}
+
+    broken = tmp_path / "broken.json"
+    broken.write_text("{not json", encoding="utf-8")
+    assert JsonFileStore(broken, default=lambda: {"segments": []}).load() == {"segments": []}
+
+
+def test_load_reads_file_only_once(tmp_path):
+    path = tmp_path / "store.json"
+    path.write_text('{"a": 1}', encoding="utf-8")
+    store = JsonFileStore(path)
+
+    assert not store.loaded
+    assert store.load() == {"a": 1}
+    path.write_text('{"a": 2}', encoding="utf-8")
+    assert store.load() == {"a": 1}
+
+
+def test_save_replaces_file_without_leaving_temp_file(tmp_path):
+    path = tmp_path / "store.json"
+    store = JsonFileStore(path, indent=None)
+    store.load()["ชื่อ"] = "ข้าว"
+    store.save()
+
+    assert path.read_text(encoding="utf-8") == '{"ชื่อ": "ข้าว"}'
+    assert [p.name for p in tmp_path.iterdir()] == ["store.json"]
+
+    # สำเนาที่ส่งมาถูกเขียนแทนข้อมูลในหน่วยความจำ
+    store.save({"b": 2})
+    assert JsonFileStore(path).load() == {"b": 2}
+    assert store.load() == {"ชื่อ": "ข้าว"}
@@ -0,0 +1,65 @@
+"""ทดสอบ PendingOrders: บันทึกข้ามการรีสตาร์ท และลบคำสั่งซื้อที่ค้างเกิน ttl_days"""
+import json
+from datetime import datetime, timedelta
+
+from pending_orders import PendingOrders
+
+
+def _write_orders(path, **ages):
+    """เขียนไฟล์คำสั่งซื้อที่สร้างไว้เมื่อ ages[order_id] วันก่อน"""
+    now = datetime.now()
+    orders = {order_id: {"user": "a", "items": [], "total": 1, "created_at": (now - timedelta(days=age)).isoformat()}
+              for order_id, age in ages.items()}
+    path.write_text(json.dumps(orders), encoding="utf-8")
+
+
+def test_orders_survive_restart(tmp_path):
+    path = tmp_path / "pending_orders.json"
+    order_id = PendingOrders(path).add("alice", [{"name": "Mama", "quantity": 2}], 20)
+
+    restarted = PendingOrders(path)
+    assert len(restarted) == 1
+    order = restarted.pop(order_id)
+    assert (order["user"], order["total"]) == ("alice", 20)
+    assert restarted.pop(order_id) is None
+    assert len(PendingOrders(path)) == 0
+
+
+def test_expired_orders_are_pruned_on_load(tmp_path):
+    path = tmp_path / "pending_orders.json"
+    _write_orders(path, fresh=1, stale=8)
+
+    orders = PendingOrders(path, ttl_days=7)
+    assert len(orders) == 1
+    assert orders.expired == 1
+    assert orders.pop("stale") is None
+    # การลบถูกบันทึกลงไฟล์ทันที
+    assert list(json.loads(path.read_text(encoding="utf-8"))) == ["fresh"]
+
+
+def test_orders_without_created_at_are_expired(tmp_path):
+    path = tmp_path / "pending_orders.json"
+    path.write_text(json.dumps({"legacy": {"user": "a", "items": [], "total": 1}}), encoding="utf-8")
+
+    assert len(PendingOrders(path, ttl_days=7)) == 0
+
+
+def test_add_prunes_orders_that_expired_while_running(tmp_path):
+    path = tmp_path / "pending_orders.json"
+    orders = PendingOrders(path, ttl_days=7)
+    old_id = orders.add("alice", [], 10)
+    orders._file.data[old_id]["created_at"] = (datetime.now() - timedelta(days=30)).isoformat()
+
+    new_id = orders.add("bob", [], 5)
+    assert orders.pop(old_id) is None
+    assert orders.expired == 1
+    assert list(json.loads(path.read_text(encoding="utf-8"))) == [new_id]
+
+
+def test_zero_ttl_keeps_every_order(tmp_path):
+    path = tmp_path / "pending_orders.json"
+    _write_orders(path, ancient=365)
+
+    orders = PendingOrders(path, ttl_days=0)
+    assert len(orders) == 1
+    assert orders.expired == 0
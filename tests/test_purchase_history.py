@@ -0,0 +1,252 @@
+"""ทดสอบประวัติการซื้อ: ตัวอ่าน JSONL ย้อนกลับพร้อม cursor และที่เก็บแบบ segment"""
+import gzip
+import json
+
+import pytest
+
+from purchase_history import HistoryStore, _iter_bytes_reverse, iter_history_reverse
+
+
+def _record(number, day="2024-01-01"):
+    return {"timestamp": f"{day}T00:00:{number:02d}", "user": "ผู้ซื้อ", "number": number}
+
+
+def _jsonl(records):
+    return b"".join((json.dumps(r, ensure_ascii=False) + "\n").encode("utf-8") for r in records)
+
+
+@pytest.fixture
+def history_file(tmp_path):
+    path = tmp_path / "history.json"
+    path.write_bytes(_jsonl(_record(n) for n in range(20)))
+    return path
+
+
+# ---------- ตัวอ่าน JSONL ย้อนกลับ ----------
+
+@pytest.mark.parametrize("block_size", [1, 7, 64, 4096])
+def test_reverse_reader_yields_newest_first_with_line_offsets(history_file, block_size):
+    data = history_file.read_bytes()
+
+    entries = list(iter_history_reverse(history_file, block_size=block_size))
+    assert [record["number"] for _, record in entries] == list(range(19, -1, -1))
+    for offset, record in entries:
+        # cursor ชี้ไปยังต้นบรรทัดของรายการนั้นพอดี (รวมกรณีตัวอักษรไทยถูกตัดกลาง block)
+        line = data[offset:data.index(b"\n", offset)]
+        assert json.loads(line) == record
+
+
+@pytest.mark.parametrize("limit", [1, 3, 6, 20])
+def test_cursor_pages_have_no_gaps_or_duplicates(history_file, limit):
+    numbers = []
+    before = None
+    while True:
+        page = []
+        for offset, record in iter_history_reverse(history_file, before, block_size=16):
+            page.append(record["number"])
+            before = offset
+            if len(page) == limit:
+                break
+        if not page:
+            break
+        numbers.extend(page)
+
+    assert numbers == list(range(19, -1, -1))
+
+
+def test_reverse_reader_skips_broken_lines_and_handles_missing_newline(tmp_path):
+    path = tmp_path / "history.json"
+    path.write_bytes(_jsonl([_record(1)]) + b"not json\n\n" + json.dumps(_record(2)).encode("utf-8"))
+
+    assert [record["number"] for _, record in iter_history_reverse(path, block_size=5)] == [2, 1]
+
+
+def test_reverse_reader_of_missing_file_is_empty(tmp_path):
+    assert list(iter_history_reverse(tmp_path / "missing.json")) == []
+
+
+def test_in_memory_reader_matches_file_reader(history_file):
+    data = history_file.read_bytes()
+
+    assert list(_iter_bytes_reverse(data)) == list(iter_history_reverse(history_file, block_size=32))
+    cursor = list(iter_history_reverse(history_file))[5][0]
+    assert list(_iter_bytes_reverse(data, cursor)) == list(iter_history_reverse(history_file, cursor))
+
+
+def test_read_page_returns_oldest_first_with_cursor(tmp_path):
+    store = HistoryStore(tmp_path / "history", tmp_path / "history.json")
+    for number in range(7):
+        store.append(_record(number))
+
+    records, cursor = store.read_page(3)
+    assert [record["number"] for record in records] == [4, 5, 6]
+    records, cursor = store.read_page(3, cursor)
+    assert [record["number"] for record in records] == [1, 2, 3]
+    records, cursor = store.read_page(3, cursor)
+    assert [record["number"] for record in records] == [0]
+    assert cursor is None
+
+
+def test_read_page_of_empty_store(tmp_path):
+    store = HistoryStore(tmp_path / "history", tmp_path / "history.json")
+
+    assert store.read_page(5) == ([], None)
+    assert store.read_page(5, "nonsense") == ([], None)
+
+
+# ---------- segment ----------
+
+@pytest.fixture
+def store(tmp_path):
+    # segment เล็กมาก: ทุก 3 รายการขึ้น segment ใหม่
+    size = len((json.dumps(_record(0), ensure_ascii=False) + "\n").encode("utf-8"))
+    return HistoryStore(tmp_path / "history", tmp_path / "history.json",
+                        max_bytes=size * 3, stride=2)
+
+
+def _fill(store, count, day="2024-01-01"):
+    for number in range(count):
+        store.append(_record(number, day))
+
+
+def _read_all_pages(store, limit):
+    pages = []
+    cursor = None
+    while True:
+        records, cursor = store.read_page(limit, cursor)
+        pages.append([record["number"] for record in records])
+        if cursor is None:
+            return pages
+
+
+def test_segments_rotate_and_finished_segments_are_gzipped(store):
+    _fill(store, 10)
+
+    segments = store.open()["segments"]
+    assert [segment["count"] for segment in segments] == [3, 3, 3, 1]
+    assert [segment["compressed"] for segment in segments] == [True, True, True, False]
+    for segment in segments[:-1]:
+        path = store.directory / segment["file"]
+        assert path.name.endswith(".jsonl.gz")
+        assert not (store.directory / segment["file"][:-3]).exists()
+        with gzip.open(path, 'rb') as f:
+            assert len(f.read().splitlines()) == 3
+    assert store.stats()["records"] == 10
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 4, 7, 10])
+def test_pages_cross_segment_boundaries_without_gaps(store, limit):
+    _fill(store, 10)
+
+    pages = _read_all_pages(store, limit)
+    numbers = [number for page in reversed(pages) for number in page]
+    assert numbers == list(range(10))
+    for page in pages:
+        assert page == sorted(page)
+        assert 0 < len(page) <= limit
+
+
+def test_exact_page_end_has_no_next_cursor(store):
+    _fill(store, 6)
+
+    records, cursor = store.read_page(3)
+    assert [record["number"] for record in records] == [3, 4, 5]
+    records, cursor = store.read_page(3, cursor)
+    assert [record["number"] for record in records] == [0, 1, 2]
+    assert cursor is None
+
+
+def test_cursor_survives_segment_compression(store):
+    _fill(store, 5)
+    records, cursor = store.read_page(1)
+    assert [record["number"] for record in records] == [4]
+
+    # รายการใหม่ทำให้ segment ของ cursor ถูกบีบอัดก่อนอ่านหน้าถัดไป
+    _fill(store, 3, day="2024-01-02")
+    records, cursor = store.read_page(2, cursor)
+    assert [record["number"] for record in records] == [2, 3]
+
+
+def test_unknown_cursor_returns_empty_page(store):
+    _fill(store, 4)
+
+    assert store.read_page(5, "2023-12-31.000:0") == ([], None)
+    assert store.read_page(5, "nonsense") == ([], None)
+
+
+def test_new_day_starts_new_segment(store):
+    store.append(_record(1, "2024-01-01"))
+    store.append(_record(2, "2024-01-02"))
+
+    segments = store.open()["segments"]
+    assert [segment["id"] for segment in segments] == ["2024-01-01.000", "2024-01-02.000"]
+    assert segments[0]["compressed"]
+
+
+def test_iter_range_reads_across_compressed_segments(store):
+    _fill(store, 10)
+
+    records = list(store.iter_range("2024-01-01T00:00:02", "2024-01-01T00:00:07"))
+    assert [record["number"] for record in records] == [2, 3, 4, 5, 6, 7]
+
+
+def test_index_reload_keeps_cursor_order(store):
+    _fill(store, 7)
+
+    reopened = HistoryStore(store.directory, store.legacy_file, max_bytes=store.max_bytes, stride=store.stride)
+    assert [number for page in reversed(_read_all_pages(reopened, 2)) for number in page] == list(range(7))
+
+
+def test_legacy_history_is_imported_once_and_file_is_kept(tmp_path):
+    legacy = tmp_path / "history.json"
+    legacy.write_text("".join(json.dumps(_record(n)) + "\n" for n in range(3)), encoding="utf-8")
+
+    store = HistoryStore(tmp_path / "history", legacy)
+    assert store.stats()["records"] == 3
+    assert legacy.exists()
+
+    # เปิดใหม่: ไม่ย้ายซ้ำ แต่ย้ายรายการที่เพิ่มต่อท้ายไฟล์เดิมภายหลัง
+    with open(legacy, "a", encoding="utf-8") as f:
+        f.write(json.dumps(_record(3)) + "\n")
+    reopened = HistoryStore(tmp_path / "history", legacy)
+    assert reopened.stats()["records"] == 4
+    assert [record["number"] for record in reopened.read_page(10)[0]] == [0, 1, 2, 3]
+
+
+def test_late_record_goes_to_segment_of_its_day(store):
+    store.append(_record(1, "2024-01-01"))
+    store.append(_record(2, "2024-01-03"))
+    store.append(_record(3, "2024-01-01"))
+
+    segments = store.open()["segments"]
+    assert [segment["day"] for segment in segments] == ["2024-01-01", "2024-01-03"]
+    assert segments[0]["count"] == 2
+    with gzip.open(store.directory / segments[0]["file"], 'rb') as f:
+        assert [json.loads(line)["number"] for line in f] == [1, 3]
+    records = list(store.iter_range("2024-01-01T00:00:00", "2024-01-01T23:59:59"))
+    assert [record["number"] for record in records] == [1, 3]
+
+
+def test_late_record_for_missing_day_keeps_segments_in_day_order(store):
+    store.append(_record(1, "2024-01-01"))
+    store.append(_record(3, "2024-01-03"))
+    store.append(_record(2, "2024-01-02"))
+
+    segments = store.open()["segments"]
+    assert [segment["id"] for segment in segments] == ["2024-01-01.000", "2024-01-02.000", "2024-01-03.000"]
+    assert segments[1]["compressed"]
+    assert [record["number"] for record in store.iter_range()] == [1, 2, 3]
+    assert [record["number"] for record in store.iter_range("2024-01-02", "2024-01-02T23:59:59")] == [2]
+    assert [number for page in reversed(_read_all_pages(store, 1)) for number in page] == [1, 2, 3]
+
+
+def test_out_of_order_records_within_a_day_are_found_by_range(store):
+    store.append({"timestamp": "2024-01-01T10:00:00", "number": 1})
+    store.append({"timestamp": "2024-01-01T20:00:00", "number": 2})
+    store.append({"timestamp": "2024-01-01T09:00:00", "number": 3})
+
+    segment = store.open()["segments"][-1]
+    assert segment["ordered"] is False
+    assert (segment["start"], segment["end"]) == ("2024-01-01T09:00:00", "2024-01-01T20:00:00")
+    records = list(store.iter_range("2024-01-01T08:00:00", "2024-01-01T12:00:00"))
+    assert [record["number"] for record in records] == [1, 3]
@@ -0,0 +1,165 @@
+"""ทดสอบ InteractionResponder ด้วย interaction จำลอง (ไม่เรียก Discord จริง)"""
+import asyncio
+from types import SimpleNamespace
+
+import discord
+
+from responder import InteractionResponder, InteractionStats, responder
+
+
+class FakeResponse:
+    def __init__(self, calls):
+        self.calls = calls
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def _respond(self, method, **kwargs):
+        assert not self._done, f"{method} หลังจากตอบไปแล้ว"
+        self._done = True
+        self.calls.append((method, kwargs))
+
+    async def defer(self, **kwargs):
+        await self._respond("defer", **kwargs)
+
+    async def edit_message(self, **kwargs):
+        await self._respond("edit_message", **kwargs)
+
+    async def send_message(self, content=None, **kwargs):
+        await self._respond("send_message", content=content, **kwargs)
+
+    async def send_modal(self, modal):
+        await self._respond("send_modal", modal=modal)
+
+
+class FakeFollowup:
+    def __init__(self, calls):
+        self.calls = calls
+
+    async def send(self, content=None, **kwargs):
+        self.calls.append(("followup.send", dict(content=content, **kwargs)))
+        return SimpleNamespace(content=content)
+
+
+class FakeInteraction:
+    def __init__(self, kind=discord.InteractionType.component, data=None):
+        self.type = kind
+        self.data = data if data is not None else {"custom_id": "s:n:th:0"}
+        self.extras = {}
+        self.calls = []
+        self.response = FakeResponse(self.calls)
+        self.followup = FakeFollowup(self.calls)
+
+    async def edit_original_response(self, **kwargs):
+        self.calls.append(("edit_original_response", kwargs))
+
+
+def _slash():
+    return FakeInteraction(discord.InteractionType.application_command, {"name": "ร้าน"})
+
+
+def _methods(interaction):
+    return [method for method, _ in interaction.calls]
+
+
+def test_edit_uses_single_request_when_fast():
+    interaction = FakeInteraction()
+    stats = InteractionStats()
+
+    asyncio.run(InteractionResponder(interaction, stats=stats).edit(content="x"))
+
+    assert _methods(interaction) == ["edit_message"]
+    assert stats.stats()["kinds"] == [("s:n", 1, 1, 0)]
+
+
+def test_send_after_defer_goes_to_followup():
+    interaction = FakeInteraction()
+    stats = InteractionStats()
+
+    async def run():
+        current = InteractionResponder(interaction, stats=stats)
+        await current.defer()
+        await current.defer()
+        await current.send("hello")
+        await current.edit(content="x")
+
+    asyncio.run(run())
+    assert _methods(interaction) == ["defer", "followup.send", "edit_original_response"]
+    assert stats.methods == {"defer": 1, "followup.send": 1, "edit_original_response": 1}
+
+
+def test_watchdog_defers_slow_component_once():
+    interaction = FakeInteraction()
+    stats = InteractionStats()
+
+    async def run():
+        current = InteractionResponder(interaction, stats=stats, defer_after=0.01)
+        current.start_watchdog()
+        await asyncio.sleep(0.05)
+        await current.edit(content="x")
+
+    asyncio.run(run())
+    assert _methods(interaction) == ["defer", "edit_original_response"]
+    assert stats.stats()["deferred"] == 1
+
+
+def test_watchdog_does_nothing_when_answered_in_time():
+    interaction = FakeInteraction()
+    stats = InteractionStats()
+
+    async def run():
+        current = InteractionResponder(interaction, stats=stats, defer_after=0.01)
+        current.start_watchdog()
+        await current.edit(content="x")
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert _methods(interaction) == ["edit_message"]
+    assert stats.stats()["deferred"] == 0
+
+
+def test_watchdog_skips_modal_responses():
+    interaction = FakeInteraction()
+
+    async def run():
+        current = InteractionResponder(interaction, stats=InteractionStats(), defer_after=0.01)
+        current.start_watchdog()
+        current.expect_modal = True
+        await asyncio.sleep(0.05)
+        await current.send_modal("modal")
+
+    asyncio.run(run())
+    assert _methods(interaction) == ["send_modal"]
+
+
+def test_slash_commands_are_not_auto_deferred():
+    interaction = _slash()
+
+    async def run():
+        current = InteractionResponder(interaction, stats=InteractionStats(), defer_after=0.01)
+        current.start_watchdog()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+    assert interaction.calls == []
+
+
+def test_expect_slow_shows_thinking_only_for_slash_commands():
+    slash = _slash()
+    component = FakeInteraction()
+
+    async def run():
+        await InteractionResponder(slash, stats=InteractionStats()).expect_slow(ephemeral=True)
+        await InteractionResponder(component, stats=InteractionStats()).expect_slow()
+
+    asyncio.run(run())
+    assert slash.calls == [("defer", {"ephemeral": True, "thinking": True})]
+    assert component.calls == [("defer", {"ephemeral": False, "thinking": False})]
+
+
+def test_responder_is_cached_per_interaction():
+    interaction = FakeInteraction()
+
+    assert responder(interaction) is responder(interaction)
+    assert responder(FakeInteraction()) is not responder(interaction)
@@ -0,0 +1,145 @@
+"""ทดสอบ SalesRollup: รูปแบบรายการซื้อ, การเขียนแบบหน่วงเวลา และ watermark เทียบกับประวัติการซื้อ"""
+import json
+
+import pytest
+
+from purchase_history import HistoryStore
+from sales_rollup import SalesRollup, purchase_lines, week_key
+
+
+def _purchase(day, name="Mama", qty=2, price=10):
+    return {"user": "u", "timestamp": f"{day}T12:00:00",
+            "items": [{"name": name, "qty": qty, "price": price, "country": "ไทย", "category": "food"}]}
+
+
+@pytest.fixture
+def history(tmp_path):
+    return HistoryStore(tmp_path / "history", tmp_path / "history.json")
+
+
+@pytest.fixture
+def rollup(tmp_path):
+    rollup = SalesRollup(tmp_path / "sales_rollup.json", delay=3600)
+    yield rollup
+    rollup.flush()
+
+
+def _log(history, rollup, purchase):
+    rollup.record(purchase, history.append(purchase))
+
+
+def test_purchase_lines_supports_both_item_formats():
+    record = {"items": [
+        {"name": "A", "qty": "2", "price": "5", "country": "ไทย", "category": "food"},
+        {"product": {"name": "B", "category": "toy"}, "quantity": 3, "subtotal": 30, "country": "ญี่ปุ่น"},
+        "broken"
+    ]}
+    assert list(purchase_lines(record)) == [("A", "ไทย", "food", 2, 10), ("B", "ญี่ปุ่น", "toy", 3, 30)]
+    assert week_key("2025-02-14") == "2025-W07"
+    assert week_key("") == ""
+
+
+def test_record_updates_groups_and_counts_orders_once(rollup):
+    purchase = _purchase("2024-01-01")
+    purchase["items"].append({"name": "Pocky", "qty": 1, "price": 20, "country": "ไทย", "category": "food"})
+    rollup.record(purchase)
+
+    report = rollup.report()
+    assert report["records"] == 1
+    assert report["revenue"] == 40
+    assert report["category"]["food"] == [40, 3, 1]
+    assert report["product"]["Pocky"] == [20, 1, 1]
+    assert report["week"]["2024-W01"] == [40, 3, 1]
+
+
+def test_records_are_written_behind_a_dirty_flag(rollup, tmp_path):
+    rollup.record(_purchase("2024-01-01"))
+    rollup.record(_purchase("2024-01-02"))
+
+    assert not (tmp_path / "sales_rollup.json").exists()
+    assert rollup.flush()
+    assert not rollup.flush()
+    assert rollup.writes == 1
+    saved = json.loads((tmp_path / "sales_rollup.json").read_text(encoding="utf-8"))
+    assert saved["records"] == 2
+
+
+def test_timer_flushes_pending_records(tmp_path):
+    rollup = SalesRollup(tmp_path / "sales_rollup.json", delay=0.01)
+    rollup.record(_purchase("2024-01-01"))
+    timer = rollup._timer
+
+    timer.join(5)
+    assert (tmp_path / "sales_rollup.json").exists()
+    assert rollup.writes == 1
+
+
+def test_open_adds_records_logged_after_last_flush(history, rollup, tmp_path):
+    rollup.open(history)
+    _log(history, rollup, _purchase("2024-01-01"))
+    rollup.flush()
+    # โปรเซสหยุดก่อน flush: รายการนี้อยู่ในประวัติแต่ไม่อยู่ในไฟล์ยอดสะสม
+    _log(history, rollup, _purchase("2024-01-02", qty=5))
+
+    restarted = SalesRollup(tmp_path / "sales_rollup.json", delay=3600)
+    restarted.open(history)
+    report = restarted.report()
+    assert report["records"] == 2
+    assert report["units"] == 7
+
+
+def test_open_does_not_double_count_flushed_records(history, rollup, tmp_path):
+    rollup.open(history)
+    for day in ("2024-01-01", "2024-01-02", "2024-01-01"):
+        _log(history, rollup, _purchase(day))
+    rollup.flush()
+
+    restarted = SalesRollup(tmp_path / "sales_rollup.json", delay=3600)
+    restarted.open(history)
+    assert restarted.report()["records"] == 3
+    assert restarted.writes == 0
+
+
+def test_pruned_history_segments_keep_their_sales(tmp_path, rollup):
+    history = HistoryStore(tmp_path / "history", tmp_path / "history.json", retention_days=1)
+    rollup.open(history)
+    # segment จะถูกลบเมื่อ segment ที่ใหม่กว่าวันที่กำหนดถูกปิด
+    for day in ("2024-01-01", "2024-01-02", "2024-01-05", "2024-01-06"):
+        _log(history, rollup, _purchase(day))
+    rollup.flush()
+    assert history.stats()["records"] == 2
+
+    restarted = SalesRollup(tmp_path / "sales_rollup.json", delay=3600)
+    restarted.open(HistoryStore(tmp_path / "history", tmp_path / "history.json", retention_days=1))
+    report = restarted.report()
+    assert report["records"] == 4
+    assert sorted(report["day"]) == ["2024-01-01", "2024-01-02", "2024-01-05", "2024-01-06"]
+    assert sorted(report["watermark"]) == ["2024-01-05.000", "2024-01-06.000"]
+
+
+def test_rollup_without_watermark_is_rebuilt_when_counts_differ(history, tmp_path):
+    for day in ("2024-01-01", "2024-01-02"):
+        history.append(_purchase(day))
+    (tmp_path / "sales_rollup.json").write_text(json.dumps(
+        {"records": 1, "revenue": 0, "units": 0, "product": {}, "country": {}, "category": {}, "day": {}, "week": {}}
+    ), encoding="utf-8")
+
+    rollup = SalesRollup(tmp_path / "sales_rollup.json", delay=3600)
+    rollup.open(history)
+    report = rollup.report()
+    assert report["records"] == 2
+    assert report["revenue"] == 40
+    assert report["watermark"] == history.positions()
+
+
+def test_late_record_in_older_segment_is_caught_up(history, rollup, tmp_path):
+    rollup.open(history)
+    for day in ("2024-01-01", "2024-01-02"):
+        _log(history, rollup, _purchase(day))
+    rollup.flush()
+    # รายการย้อนหลังถูกเขียนลง segment ของวันที่ 1 แต่โปรเซสหยุดก่อนบันทึกยอดสะสม
+    history.append(_purchase("2024-01-01", qty=4))
+
+    restarted = SalesRollup(tmp_path / "sales_rollup.json", delay=3600)
+    restarted.open(history)
+    assert restarted.report()["day"]["2024-01-01"] == [60, 6, 2]
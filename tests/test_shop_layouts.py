@@ -0,0 +1,62 @@
+"""ทดสอบ ShopLayoutCache ของหน้าร้าน"""
+import pytest
+
+from shopbot import ShopLayoutCache
+
+
+class FakeItem:
+    def __init__(self, label):
+        self.label = label
+        self._view = object()
+
+
+@pytest.fixture
+def cache():
+    return ShopLayoutCache(max_layouts=2)
+
+
+def test_miss_then_hit(cache):
+    assert cache.get("th:0", 1) is None
+    cache.put("th:0", 1, [FakeItem("a"), FakeItem("b")])
+
+    layout = cache.get("th:0", 1)
+    assert [item.label for item in layout] == ["a", "b"]
+    assert cache.stats() == {"layouts": 1, "hits": 1, "misses": 1}
+
+
+def test_put_stores_detached_copies(cache):
+    item = FakeItem("a")
+    cache.get("th:0", 1)
+    cache.put("th:0", 1, [item])
+
+    stored = cache.get("th:0", 1)[0]
+    assert stored is not item
+    assert stored._view is None
+    assert item._view is not None
+
+
+def test_stamp_change_clears_cache(cache):
+    cache.get("th:0", 1)
+    cache.put("th:0", 1, [FakeItem("a")])
+
+    assert cache.get("th:0", 2) is None
+    assert cache.stats()["layouts"] == 0
+
+
+def test_put_with_stale_stamp_is_ignored(cache):
+    cache.get("th:0", 2)
+    cache.put("th:0", 1, [FakeItem("a")])
+
+    assert cache.get("th:0", 2) is None
+
+
+def test_least_recently_used_layout_is_evicted(cache):
+    for route in ("a", "b"):
+        cache.get(route, 1)
+        cache.put(route, 1, [FakeItem(route)])
+    cache.get("a", 1)
+    cache.put("c", 1, [FakeItem("c")])
+
+    assert cache.get("b", 1) is None
+    assert cache.get("a", 1) is not None
+    assert cache.get("c", 1) is not None
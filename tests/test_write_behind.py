@@ -0,0 +1,114 @@
+"""ทดสอบ CategoryWriteBehind: รวมการเขียนซ้ำ, pin ในแคตตาล็อก และ write_through"""
+import json
+
+import pytest
+
+import write_behind
+from catalog_store import CatalogStore
+from write_behind import CategoryWriteBehind
+
+COUNTRIES = ["th"]
+CATEGORIES = ["food"]
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    store = CatalogStore(tmp_path / "categories", tmp_path / "products.json", check_interval=0)
+    monkeypatch.setattr(write_behind, "catalog_store", store)
+    return store
+
+
+@pytest.fixture
+def writer(tmp_path, catalog):
+    # ตั้งเวลานานมากเพื่อให้การเขียนเกิดเฉพาะตอนเรียก flush() ในการทดสอบ
+    writer = CategoryWriteBehind(tmp_path / "categories", tmp_path / "products.json", delay=3600)
+    yield writer
+    writer.flush()
+
+
+def _read(tmp_path, country="th", category="food"):
+    with open(tmp_path / "categories" / country / f"{category}.json", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_repeated_stages_are_written_once(writer, tmp_path):
+    for price in (1, 2, 3):
+        writer.stage("th", "food", [{"name": "Mama", "price": price}])
+
+    assert writer.is_pending("th", "food")
+    assert writer.flush() == 1
+    assert _read(tmp_path) == [{"name": "Mama", "price": 3}]
+    assert writer.stats() == {"staged": 3, "written": 1, "merged": 2, "pending": 0, "flushes": 1}
+    assert writer.flush() == 0
+
+
+def test_staged_products_are_visible_before_flush(writer, catalog, tmp_path):
+    writer.stage("th", "food", [{"name": "Mama", "price": 5}])
+
+    assert not (tmp_path / "categories" / "th" / "food.json").exists()
+    assert catalog.find_by_id("th_food_Mama")["price"] == 5
+
+
+def test_pinned_category_survives_refresh_until_flushed(writer, catalog, tmp_path):
+    path = tmp_path / "categories" / "th" / "food.json"
+    path.parent.mkdir(parents=True)
+    path.write_text(json.dumps([{"name": "OnDisk", "price": 1}]), encoding="utf-8")
+    catalog.refresh(COUNTRIES, CATEGORIES)
+
+    writer.stage("th", "food", [{"name": "Staged", "price": 2}])
+    catalog.refresh(COUNTRIES, CATEGORIES)
+    assert catalog.find_by_id("th_food_Staged") is not None
+
+    writer.flush()
+    reads = catalog.stats()["file_reads"]
+    catalog.refresh(COUNTRIES, CATEGORIES)
+    # หลังเขียนเสร็จ แคตตาล็อกรู้ mtime ใหม่แล้ว จึงไม่อ่านไฟล์ที่เพิ่งเขียนซ้ำ
+    assert catalog.stats()["file_reads"] == reads
+    assert catalog.find_by_id("th_food_Staged") is not None
+
+
+def test_legacy_products_include_pending_writes(writer, tmp_path):
+    writer.stage_legacy([{"name": "Old", "price": 1}])
+
+    assert writer.legacy_products() == [{"name": "Old", "price": 1}]
+    writer.flush()
+    assert json.loads((tmp_path / "products.json").read_text(encoding="utf-8")) == [{"name": "Old", "price": 1}]
+    assert writer.legacy_products() == [{"name": "Old", "price": 1}]
+
+
+def test_failed_write_is_requeued(writer, tmp_path):
+    # ไฟล์ชื่อเดียวกับโฟลเดอร์ประเทศทำให้สร้างโฟลเดอร์ไม่ได้
+    (tmp_path / "categories").mkdir()
+    blocker = tmp_path / "categories" / "th"
+    blocker.write_text("", encoding="utf-8")
+    writer.stage("th", "food", [{"name": "Mama", "price": 1}])
+
+    assert writer.flush() == 0
+    assert writer.is_pending("th", "food")
+
+    blocker.unlink()
+    assert writer.flush() == 1
+    assert _read(tmp_path) == [{"name": "Mama", "price": 1}]
+
+
+def test_write_through_flushes_pending_writes_first(writer, tmp_path):
+    writer.stage("th", "food", [{"name": "Staged", "price": 1}])
+    seen = []
+
+    def write():
+        seen.append(_read(tmp_path))
+        return "done"
+
+    assert writer.write_through(write) == "done"
+    assert seen == [[{"name": "Staged", "price": 1}]]
+    assert not writer.is_pending("th", "food")
+
+
+def test_timer_flushes_without_explicit_call(tmp_path, catalog):
+    writer = CategoryWriteBehind(tmp_path / "categories", tmp_path / "products.json", delay=0.01)
+    writer.stage("th", "food", [{"name": "Mama", "price": 1}])
+    timer = writer._timer
+
+    timer.join(5)
+    assert _read(tmp_path) == [{"name": "Mama", "price": 1}]
+    assert writer.stats()["pending"] == 0
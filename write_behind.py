@@ -0,0 +1,180 @@
+"""
+ระบบเขียนไฟล์สินค้าแบบหน่วงเวลา (write-behind) สำหรับบอท Discord Shop
+รวบรวมการแก้ไขของแต่ละไฟล์ categories/<ประเทศ>/<หมวด>.json และ products.json
+แล้วเขียนลงดิสก์ครั้งเดียวต่อไฟล์เมื่อครบเวลาที่กำหนด หรือเมื่อปิดบอท
+"""
+import atexit
+import json
+import os
+import threading
+from pathlib import Path
+
+from catalog_store import catalog_store
+
+# ตำแหน่งไฟล์ข้อมูลสินค้า
+SCRIPT_DIR = Path(__file__).parent.absolute()
+CATEGORIES_DIR = SCRIPT_DIR / "categories"
+PRODUCTS_FILE = SCRIPT_DIR / "products.json"
+
+# ระยะเวลารอก่อนเขียนไฟล์ (วินาที) ปรับได้ผ่าน environment variable
+FLUSH_DELAY = float(os.getenv("WRITE_BEHIND_DELAY", "2.0"))
+
+# คีย์พิเศษสำหรับไฟล์ products.json เดิม
+LEGACY_KEY = ("__legacy__", "products")
+
+
+class CategoryWriteBehind:
+    """รวมการเขียนไฟล์สินค้าที่เกิดติดกันให้เหลือการเขียนเพียงครั้งเดียวต่อไฟล์
+
+    การแก้ไขทุกครั้งจะอัปเดตแคตตาล็อกในหน่วยความจำทันที (อ่านแล้วเห็นข้อมูลใหม่เสมอ)
+    ส่วนการเขียนไฟล์จะเกิดขึ้นภายหลังใน flush()
+    """
+
+    def __init__(self, categories_dir=CATEGORIES_DIR, legacy_file=PRODUCTS_FILE, delay=FLUSH_DELAY):
+        self.categories_dir = Path(categories_dir)
+        self.legacy_file = Path(legacy_file)
+        self.delay = delay
+        self._lock = threading.Lock()
+        # RLock เพื่อให้ write_through() เรียก flush() ภายใต้ lock เดียวกันได้
+        self._flush_lock = threading.RLock()
+        self._pending = {}  # (country, category) -> list ของสินค้าที่จะเขียน
+        self._timer = None
+        self.staged = 0     # จำนวนการแก้ไขทั้งหมดที่ได้รับ
+        self.written = 0    # จำนวนการเขียนไฟล์จริง
+        self.merged = 0     # จำนวนการเขียนที่ถูกรวมหายไป
+        self.flushes = 0
+
+    def _schedule(self):
+        """ตั้งเวลา flush ถ้ายังไม่มีการตั้งไว้ (เรียกภายใต้ self._lock)"""
+        if self._timer is None:
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _stage(self, key, products):
+        """เพิ่มข้อมูลเข้าคิวรอเขียน (เรียกภายใต้ self._lock)"""
+        self.staged += 1
+        if key in self._pending:
+            self.merged += 1
+        self._pending[key] = list(products)
+        self._schedule()
+
+    def stage(self, country, category, products):
+        """บันทึกสินค้าของหมวดหนึ่งเพื่อรอเขียนลงไฟล์
+
+        Args:
+            country (str): รหัสประเทศ
+            category (str): รหัสหมวดหมู่
+            products (list): รายการสินค้าที่จะเขียนลงไฟล์ (แทนที่ทั้งไฟล์)
+        """
+        with self._lock:
+            self._stage((country, category), products)
+            # อัปเดตแคตตาล็อกในหน่วยความจำทันที และห้ามโหลดทับจากไฟล์จนกว่าจะเขียนเสร็จ
+            catalog_store.mark_written(country, category, products, pin=True)
+
+    def stage_legacy(self, products):
+        """บันทึกรายการสินค้าเพื่อรอเขียนลงไฟล์ products.json เดิม"""
+        with self._lock:
+            self._stage(LEGACY_KEY, products)
+
+    def legacy_products(self):
+        """รายการสินค้าใน products.json ล่าสุด (รวมข้อมูลที่ยังรอเขียน)"""
+        with self._lock:
+            pending = self._pending.get(LEGACY_KEY)
+            if pending is not None:
+                return list(pending)
+        return catalog_store.load_legacy_products()
+
+    def is_pending(self, country, category):
+        """ตรวจสอบว่าหมวดนี้ยังมีการแก้ไขที่ยังไม่ได้เขียนลงไฟล์หรือไม่"""
+        with self._lock:
+            return (country, category) in self._pending
+
+    def _write(self, key, products):
+        if key == LEGACY_KEY:
+            target = self.legacy_file
+        else:
+            country, category = key
+            target = self.categories_dir / country / f"{category}.json"
+            target.parent.mkdir(parents=True, exist_ok=True)
+
+        with open(target, "w", encoding="utf-8") as f:
+            json.dump(products, f, ensure_ascii=False, indent=2)
+
+        if key != LEGACY_KEY:
+            # บันทึก mtime ใหม่ให้แคตตาล็อก เพื่อไม่ต้องอ่านไฟล์ที่เพิ่งเขียนซ้ำ
+            # (ถ้ามีการแก้ไขใหม่เข้ามาระหว่างเขียน ให้คงสถานะรอเขียนไว้)
+            with self._lock:
+                if key not in self._pending:
+                    catalog_store.unpin(country, category)
+
+    def flush(self):
+        """เขียนการแก้ไขที่ค้างอยู่ทั้งหมดลงไฟล์
+
+        Returns:
+            int: จำนวนไฟล์ที่เขียน
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending = self._pending
+                self._pending = {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+
+            if not pending:
+                return 0
+
+            written = 0
+            for key, products in pending.items():
+                try:
+                    self._write(key, products)
+                    written += 1
+                except OSError as e:
+                    print(f"⚠️ ไม่สามารถเขียนไฟล์สินค้า {key}: {e}")
+                    # เก็บกลับเข้าคิวเพื่อลองใหม่ในรอบถัดไป (ถ้ายังไม่มีข้อมูลที่ใหม่กว่า)
+                    with self._lock:
+                        self._pending.setdefault(key, products)
+                        self._schedule()
+
+            with self._lock:
+                self.written += written
+                self.flushes += 1
+                merged = self.merged
+
+            print(f"💾 เขียนไฟล์สินค้า {written} ไฟล์ (รวมการเขียนซ้ำไปแล้ว {merged} ครั้ง)")
+            return written
+
+    def write_through(self, write):
+        """เขียนไฟล์สินค้าจากที่อื่น (เช่น delta sync) โดยไม่ชนกับ flush
+
+        การแก้ไขที่ค้างอยู่จะถูกเขียนลงไฟล์ก่อน แล้วจึงเรียก write() ภายใต้ lock เดียวกับ flush
+        จึงไม่มีการเขียนไฟล์เดียวกันพร้อมกันจากสองที่
+
+        Args:
+            write (callable): ฟังก์ชันที่เขียนไฟล์
+
+        Returns:
+            ค่าที่ write() คืนมา
+        """
+        with self._flush_lock:
+            self.flush()
+            return write()
+
+    def stats(self):
+        """สถิติการรวมการเขียนไฟล์"""
+        with self._lock:
+            return {
+                "staged": self.staged,
+                "written": self.written,
+                "merged": self.merged,
+                "pending": len(self._pending),
+                "flushes": self.flushes
+            }
+
+
+# ตัวเขียนไฟล์ที่ใช้ร่วมกันทั้งโปรเซส
+category_writer = CategoryWriteBehind()
+
+# เขียนไฟล์ที่ค้างอยู่ทั้งหมดก่อนปิดโปรแกรม
+atexit.register(category_writer.flush)